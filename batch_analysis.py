@@ -0,0 +1,117 @@
+import numpy as np
+
+from config import LEFT_ANKLE_IDX, RIGHT_ANKLE_IDX
+from keypoint_layout import DERIVED_KEYPOINTS, derive_keypoints
+from metric_registry import GAIT_EVALUATOR, POSTURE_EVALUATOR
+
+# 自定义关键点索引
+ILIAC_MIDPOINT_IDX = 0  # 髂前上棘连线中点
+NECK_MIDPOINT_IDX = 1   # 颈椎中点（喉结处）
+
+# 体态指标名称，顺序与analyze_body_posture的结果一致，定义见metric_registry.POSTURE_METRIC_SPECS
+POSTURE_METRICS = POSTURE_EVALUATOR.names
+
+# 步态指标名称，与gait_analysis.analyze_gait_metrics的数值结果一致，定义见metric_registry.GAIT_METRIC_SPECS
+GAIT_METRICS = GAIT_EVALUATOR.names
+
+
+def _as_batch(keypoints, keypoint_scores):
+    # 保持输入的浮点精度，使中点等中间结果与逐帧计算一致
+    keypoints = np.asarray(keypoints)
+    if not np.issubdtype(keypoints.dtype, np.floating):
+        keypoints = keypoints.astype(np.float64)
+    keypoint_scores = np.asarray(keypoint_scores)
+    if keypoints.ndim == 2:
+        keypoints = keypoints[None]
+        keypoint_scores = keypoint_scores[None]
+    return keypoints, keypoint_scores
+
+
+def derive_custom_keypoints_batch(keypoints, keypoint_scores, kpt_thr=0.5):
+    """批量计算髂前上棘连线中点和颈椎中点
+
+    Args:
+        keypoints: 关键点坐标，形状为(T, K, 2)
+        keypoint_scores: 关键点置信度，形状为(T, K)
+        kpt_thr: 关键点有效阈值，默认为0.5
+
+    Returns:
+        tuple:
+        - np.ndarray: 自定义关键点坐标，形状为(T, 2, 2)，无效处为-1
+        - np.ndarray: 自定义关键点置信度（组成关键点的平均分），形状为(T, 2)，
+          无效处为0
+    """
+    keypoints, keypoint_scores = _as_batch(keypoints, keypoint_scores)
+    custom_keypoints, custom_scores, custom_valid = derive_keypoints(keypoints, keypoint_scores, DERIVED_KEYPOINTS,
+                                                                     kpt_thr)
+    custom_keypoints = np.where(custom_valid[..., None], custom_keypoints, np.array(-1, dtype=keypoints.dtype))
+    custom_scores = np.where(custom_valid, custom_scores, 0.0)
+    return custom_keypoints, custom_scores
+
+
+def analyze_body_posture_batch(keypoints, keypoint_scores, custom_keypoints=None, custom_scores=None,
+                               kpt_thr=0.5):
+    """批量分析多帧的身体姿态，一次计算所有体态指标
+
+    Args:
+        keypoints: 关键点坐标，形状为(T, K, 2)或单帧(K, 2)
+        keypoint_scores: 关键点置信度，形状为(T, K)或单帧(K,)
+        custom_keypoints: 自定义关键点（髂前上棘中点、颈椎中点），形状为
+            (T, 2, 2)。为None时由 :func:`derive_custom_keypoints_batch` 计算
+        custom_scores: 自定义关键点置信度，形状为(T, 2)
+        kpt_thr: 关键点有效阈值，默认为0.5
+
+    Returns:
+        tuple:
+        - dict: 指标名称到形状为(T,)的数值数组的映射，无效处为NaN
+        - dict: 指标名称到形状为(T,)的布尔有效掩码的映射
+    """
+    keypoints, keypoint_scores = _as_batch(keypoints, keypoint_scores)
+
+    if custom_keypoints is None:
+        custom_keypoints, custom_scores = derive_custom_keypoints_batch(keypoints, keypoint_scores, kpt_thr)
+    else:
+        custom_keypoints = np.asarray(custom_keypoints, dtype=keypoints.dtype).reshape(len(keypoints), -1, 2)
+        custom_scores = np.asarray(custom_scores, dtype=np.float64).reshape(len(keypoints), -1)
+    # 缺少的自定义关键点视为无效
+    num_custom = custom_keypoints.shape[1]
+    if num_custom < 2:
+        pad = 2 - num_custom
+        custom_keypoints = np.concatenate(
+            [custom_keypoints, np.full((len(keypoints), pad, 2), -1.0, dtype=custom_keypoints.dtype)], axis=1)
+        custom_scores = np.concatenate([custom_scores, np.zeros((len(keypoints), pad))], axis=1)
+    custom_valid = custom_scores > kpt_thr
+
+    extra = {
+        'iliac_midpoint': (custom_keypoints[:, ILIAC_MIDPOINT_IDX], custom_valid[:, ILIAC_MIDPOINT_IDX]),
+        'neck_midpoint': (custom_keypoints[:, NECK_MIDPOINT_IDX], custom_valid[:, NECK_MIDPOINT_IDX]),
+    }
+    return POSTURE_EVALUATOR(keypoints, keypoint_scores, extra, kpt_thr)
+
+
+def analyze_gait_metrics_batch(keypoints, keypoint_scores, prev_ankle_y=None, kpt_thr=0.3):
+    """批量计算多帧的步态数值指标
+
+    与 ``gait_analysis.analyze_gait_metrics`` 的计算方式一致，步长由相邻两帧
+    脚踝Y坐标的变化得到；第一帧使用 ``prev_ankle_y``（若提供）。
+
+    Args:
+        keypoints: 关键点坐标，形状为(T, K, 2)或单帧(K, 2)
+        keypoint_scores: 关键点置信度，形状为(T, K)或单帧(K,)
+        prev_ankle_y: 第一帧之前一帧的左右脚踝Y坐标 (left, right)，可选
+        kpt_thr: 关键点有效阈值，默认为0.3
+
+    Returns:
+        tuple:
+        - dict: 指标名称到形状为(T,)的数值数组的映射，无效处为NaN
+        - dict: 指标名称到形状为(T,)的布尔有效掩码的映射
+    """
+    keypoints, keypoint_scores = _as_batch(keypoints, keypoint_scores)
+
+    prev_frame = None
+    if prev_ankle_y is not None:
+        # 只知道上一帧的脚踝Y坐标，视为膝踝关键点全部有效
+        prev_keypoints = np.zeros(keypoints.shape[1:], dtype=np.float64)
+        prev_keypoints[[LEFT_ANKLE_IDX, RIGHT_ANKLE_IDX], 1] = prev_ankle_y
+        prev_frame = (prev_keypoints, np.ones(keypoint_scores.shape[1]))
+    return GAIT_EVALUATOR(keypoints, keypoint_scores, kpt_thr=kpt_thr, prev_frame=prev_frame)
@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+"""批量重新分析归档的步态视频
+
+遍历目录（或清单文件）中的所有视频，分配给多个工作进程并行分析。每个工作
+进程可以各自加载一组模型（如每块GPU一个进程），也可以把视频交给常驻的
+:mod:`pose_server` 分析。每个视频的结果保存在输出目录下与视频相对路径对应
+的子目录中（子目录名保留扩展名，同名不同格式的视频不会冲突）:
+
+    session/          关键点和逐帧体态指标（:class:`session_store.SessionStore`
+                      的分块列式存储，可用 ``load_session`` 读取）
+    gait_cycles.json  每个完整步态周期的时间指标
+    summary.json      该视频的汇总指标，存在即表示该视频已处理完成
+
+全部视频处理完后，在输出目录写入所有视频的汇总表 ``summary.csv``。
+
+分析过程按块写入磁盘，中断后重新运行同一命令即可继续：已完成的视频被跳过，
+未完成的视频从最后一个已写入的块之后继续分析。
+
+示例::
+
+    python batch_reanalyze.py /data/archive -o /data/reanalysis --devices cuda:0 cuda:1
+    python batch_reanalyze.py videos.txt -o /data/reanalysis --server http://127.0.0.1:8765 --workers 4
+"""
+import csv
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from batch_analysis import POSTURE_METRICS
+from gait_engine import GAIT_TIME_METRICS, GaitEngine
+from offline_video import iter_offline_batches, summarize_offline_results
+from session_store import SessionStore, load_session
+from video_io import VideoReader
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.m4v', '.mpg', '.mpeg', '.wmv')
+
+# 汇总表中每个视频的基本信息列
+SUMMARY_COLUMNS = ('video', 'status', 'num_frames', 'num_person_frames', 'duration', 'num_gait_cycles')
+
+# 工作进程中的模型或服务客户端，由 _init_worker 初始化
+_worker = {}
+
+
+def find_videos(source, extensions=VIDEO_EXTENSIONS):
+    """列出待分析的视频
+
+    Args:
+        source: 视频目录（递归查找），或清单文件。清单为每行一个路径的文本
+            文件，或含 ``path`` 列的CSV文件，相对路径相对于清单所在目录
+        extensions: 目录模式下的视频扩展名
+
+    Returns:
+        tuple: (视频路径列表, 计算输出子目录时的根目录)
+    """
+    if os.path.isdir(source):
+        videos = []
+        for dirpath, dirnames, filenames in os.walk(source):
+            dirnames.sort()
+            videos.extend(
+                os.path.join(dirpath, name) for name in sorted(filenames) if name.lower().endswith(extensions))
+        return videos, source
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, encoding='utf-8') as f:
+        if source.lower().endswith('.csv'):
+            paths = [row['path'] for row in csv.DictReader(f)]
+        else:
+            paths = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    videos = [os.path.normpath(os.path.join(base_dir, path)) for path in paths]
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(v)) for v in videos]) if videos else base_dir
+    return videos, root
+
+
+def video_output_dir(output_root, video_path, root):
+    """视频对应的输出子目录，保留视频相对于根目录的路径"""
+    relpath = os.path.relpath(os.path.abspath(video_path), os.path.abspath(root))
+    return os.path.join(output_root, relpath)
+
+
+def _write_json(path, obj):
+    """先写临时文件再重命名，中断时不会留下不完整的文件"""
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(obj, f, ensure_ascii=False, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _iter_local_frames(args, video_path, start_frame, detector, pose_estimator, batch_size, frames_per_batch):
+    """用本进程的模型分析视频，按批产生 (帧序号, 时间戳, 关键点, 置信度, 边界框, 体态指标)"""
+    with VideoReader(video_path, start_frame=start_frame) as reader:
+        for batch in iter_offline_batches(args, reader, detector, pose_estimator, batch_size, frames_per_batch):
+            frame_results = summarize_offline_results(dict(frames=batch, fps=reader.fps), with_gait=False)
+            rows = []
+            for frame, result in zip(batch, frame_results):
+                timestamp = frame['timestamp']
+                if timestamp is None:
+                    timestamp = frame['frame_idx'] / (reader.fps or 30.0)
+                pred = getattr(frame['data_samples'], 'pred_instances', None)
+                if pred is None or len(pred) == 0:
+                    rows.append((frame['frame_idx'], timestamp, None, None, None, None))
+                    continue
+                rows.append((frame['frame_idx'], timestamp, pred.keypoints, pred.keypoint_scores,
+                             pred.get('bboxes', None), result.get('posture')))
+            yield rows
+
+
+def _iter_remote_frames(client, video_path, start_frame, frames_per_batch):
+    """由姿态分析服务分析视频，按批产生与 :func:`_iter_local_frames` 相同的结果"""
+    rows = []
+    for result in client.iter_video(os.path.abspath(video_path), start_frame=start_frame):
+        keypoints = result['keypoints'] or None
+        rows.append((result['frame_idx'], result['timestamp'], keypoints, result['keypoint_scores'] or None,
+                     result['bboxes'] or None, result['posture']))
+        if len(rows) >= frames_per_batch:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def summarize_session(session):
+    """由会话数据计算步态周期和视频的汇总指标
+
+    Args:
+        session: :func:`session_store.load_session` 的返回值
+
+    Returns:
+        tuple: (每个步态周期的指标列表, 汇总指标字典)
+    """
+    timestamps = session['timestamp']
+    num_frames = len(timestamps)
+    summary = dict(
+        num_frames=num_frames,
+        num_person_frames=int((session['num_instances'] > 0).sum()),
+        duration=float(timestamps[-1] - timestamps[0]) if num_frames > 1 else 0.0)
+
+    # 体态指标取检测到人体的帧的平均值
+    for name in POSTURE_METRICS:
+        values = session['metrics'][name]
+        values = values[np.isfinite(values)]
+        summary[name] = round(float(values.mean()), 2) if len(values) else None
+
+    # 步态指标由每帧第一个人的关键点按时间顺序重新计算
+    _, first = np.unique(session['instance_frame_idx'], return_index=True)
+    frame_rows = np.searchsorted(session['frame_idx'], session['instance_frame_idx'][first])
+    keypoints = session['keypoints'][first]
+    cycles = GaitEngine().process(timestamps[frame_rows], keypoints[..., :2], keypoints[..., 2])
+
+    summary['num_gait_cycles'] = len(cycles)
+    cycle_keys = {
+        '步时': 'cycle_time',
+        '摆动时间': 'swing_time',
+        '支撑时间': 'stance_time',
+        '双支撑时间': 'double_support_time'
+    }
+    for name in GAIT_TIME_METRICS:
+        if name in cycle_keys:
+            values = [c[cycle_keys[name]] for c in cycles]
+        else:
+            side = 'left' if name == '左腿抬起时间' else 'right'
+            values = [c['swing_time'] for c in cycles if c['side'] == side]
+        values = [v for v in values if v is not None]
+        summary[name] = round(float(np.mean(values)), 3) if values else None
+    return cycles, summary
+
+
+def reanalyze_video(args,
+                    video_path,
+                    output_dir,
+                    detector=None,
+                    pose_estimator=None,
+                    client=None,
+                    chunk_size=256,
+                    batch_size=32,
+                    frames_per_batch=16):
+    """分析一个视频并写入关键点、步态周期和汇总指标，支持中断后继续
+
+    提供 ``client`` 时由姿态分析服务分析，否则使用 ``detector`` 和
+    ``pose_estimator``。关键点每 ``chunk_size`` 帧写入一个块；继续分析
+    时从最后一个块之后的帧开始，关键点平滑的状态从该帧重新开始。
+
+    Returns:
+        dict: 汇总指标；视频此前已处理完成时直接读取已有的汇总
+    """
+    summary_path = os.path.join(output_dir, 'summary.json')
+    if os.path.exists(summary_path):
+        with open(summary_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    session_dir = os.path.join(output_dir, 'session')
+    store = SessionStore(session_dir, metric_names=POSTURE_METRICS, chunk_size=chunk_size, resume=True)
+    start_frame = 0 if store.last_frame_idx is None else store.last_frame_idx + 1
+    if client is not None:
+        batches = _iter_remote_frames(client, video_path, start_frame, frames_per_batch)
+    else:
+        batches = _iter_local_frames(args, video_path, start_frame, detector, pose_estimator, batch_size,
+                                     frames_per_batch)
+    for rows in batches:
+        for frame_idx, timestamp, keypoints, keypoint_scores, bboxes, posture in rows:
+            store.append(frame_idx, timestamp, keypoints, keypoint_scores, bboxes, posture)
+    store.close(dict(video=os.path.abspath(video_path), resumed_from=start_frame))
+
+    cycles, summary = summarize_session(load_session(session_dir))
+    _write_json(os.path.join(output_dir, 'gait_cycles.json'), cycles)
+    summary = dict(video=video_path, status='done', **summary)
+    _write_json(summary_path, summary)
+    return summary
+
+
+def _init_worker(args, devices, server_url, options):
+    """工作进程初始化：连接姿态分析服务，或在分配到的设备上加载模型"""
+    _worker['args'] = args
+    _worker['options'] = options
+    if server_url:
+        from pose_client import PoseClient
+        _worker['client'] = PoseClient(server_url, timeout=600)
+        return
+
+    from pose_server import load_models
+    if devices is not None:
+        args.device = devices.get()
+    _worker['detector'], _worker['pose_estimator'] = load_models(args)
+
+
+def _run_video(video_path, output_dir):
+    tic = time.perf_counter()
+    try:
+        summary = reanalyze_video(
+            _worker['args'],
+            video_path,
+            output_dir,
+            detector=_worker.get('detector'),
+            pose_estimator=_worker.get('pose_estimator'),
+            client=_worker.get('client'),
+            **_worker['options'])
+    except Exception as e:
+        summary = dict(video=video_path, status='failed', error=f'{type(e).__name__}: {e}')
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, 'error.txt'), 'w', encoding='utf-8') as f:
+            f.write(traceback.format_exc())
+    summary['elapsed'] = time.perf_counter() - tic
+    return summary
+
+
+def write_summary_table(path, summaries):
+    """把所有视频的汇总指标写入CSV表（UTF-8 BOM，便于Excel打开）"""
+    columns = list(SUMMARY_COLUMNS) + list(POSTURE_METRICS) + list(GAIT_TIME_METRICS) + ['error']
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+        for summary in summaries:
+            writer.writerow(summary)
+
+
+def reanalyze_archive(args,
+                      videos,
+                      root,
+                      output_root,
+                      workers=1,
+                      devices=None,
+                      server_url=None,
+                      chunk_size=256,
+                      batch_size=32,
+                      frames_per_batch=16):
+    """并行分析所有视频并写入汇总表
+
+    Args:
+        args: 配置对象，与 ``webcam_rtmw_demo.Config`` 相同
+        videos: 视频路径列表
+        root: 计算输出子目录时的根目录
+        output_root: 输出目录
+        workers: 工作进程数，为0时在当前进程中依次分析
+        devices: 推理设备列表，工作进程依次轮流分配，默认使用 ``args.device``
+        server_url: 姿态分析服务地址，提供时工作进程不加载模型
+        chunk_size: 每个关键点块（检查点）的帧数，默认为256
+        batch_size: 姿态估计每批的裁剪图像数量，默认为32
+        frames_per_batch: 每次批量处理的帧数，默认为16
+
+    Returns:
+        list[dict]: 与 ``videos`` 顺序一致的汇总指标
+    """
+    os.makedirs(output_root, exist_ok=True)
+    options = dict(chunk_size=chunk_size, batch_size=batch_size, frames_per_batch=frames_per_batch)
+    jobs = [(video, video_output_dir(output_root, video, root)) for video in videos]
+    summaries = {}
+
+    def report(video, summary):
+        summaries[video] = summary
+        status = summary['status']
+        detail = summary.get('error') or f"{summary.get('num_frames', 0)}帧"
+        print(f"[{len(summaries)}/{len(jobs)}] {video} {status} {detail} {summary.get('elapsed', 0):.1f}s")
+
+    if workers <= 0:
+        if devices:
+            args.device = devices[0]
+        _init_worker(args, None, server_url, options)
+        for video, output_dir in jobs:
+            report(video, _run_video(video, output_dir))
+    else:
+        # CUDA不支持fork，工作进程使用spawn方式启动
+        context = multiprocessing.get_context('spawn')
+        device_queue = None
+        if devices and not server_url:
+            device_queue = context.Queue()
+            for i in range(workers):
+                device_queue.put(devices[i % len(devices)])
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(args, device_queue, server_url, options)) as executor:
+            futures = {executor.submit(_run_video, video, output_dir): video for video, output_dir in jobs}
+            try:
+                for future in as_completed(futures):
+                    report(futures[future], future.result())
+            except KeyboardInterrupt:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    ordered = [summaries[video] for video, _ in jobs]
+    write_summary_table(os.path.join(output_root, 'summary.csv'), ordered)
+    return ordered
+
+
+def main():
+    parser = ArgumentParser(description='批量重新分析归档的步态视频')
+    parser.add_argument('source', help='视频目录，或每行一个视频路径的清单文件（.txt/.csv）')
+    parser.add_argument('-o', '--output', required=True, help='输出目录')
+    parser.add_argument('--workers', type=int, default=None, help='工作进程数，默认为设备数，0表示在当前进程中运行')
+    parser.add_argument('--devices', nargs='+', default=None, help='推理设备，如 cuda:0 cuda:1，工作进程轮流使用')
+    parser.add_argument('--server', default=None, help='姿态分析服务地址，提供时由服务统一推理')
+    parser.add_argument('--chunk-size', type=int, default=256, help='每个检查点块的帧数')
+    parser.add_argument('--batch-size', type=int, default=32, help='姿态估计每批的裁剪图像数量')
+    parser.add_argument('--frames-per-batch', type=int, default=16, help='每次批量处理的帧数')
+    parser.add_argument('--extensions', nargs='+', default=VIDEO_EXTENSIONS, help='目录模式下的视频扩展名')
+    cli_args = parser.parse_args()
+
+    from webcam_rtmw_demo import Config
+    args = Config()
+    videos, root = find_videos(cli_args.source, tuple(ext.lower() for ext in cli_args.extensions))
+    if not videos:
+        print(f'未找到视频: {cli_args.source}')
+        return
+
+    workers = cli_args.workers
+    if workers is None:
+        workers = len(cli_args.devices) if cli_args.devices else 1
+    print(f'共{len(videos)}个视频，{workers}个工作进程')
+    summaries = reanalyze_archive(
+        args,
+        videos,
+        root,
+        cli_args.output,
+        workers=workers,
+        devices=cli_args.devices,
+        server_url=cli_args.server,
+        chunk_size=cli_args.chunk_size,
+        batch_size=cli_args.batch_size,
+        frames_per_batch=cli_args.frames_per_batch)
+    num_failed = sum(summary['status'] != 'done' for summary in summaries)
+    print(f"完成{len(summaries) - num_failed}个，失败{num_failed}个，汇总表: {os.path.join(cli_args.output, 'summary.csv')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+import time
+from collections import deque
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from session_store import RingBuffer
+
+# 步态图表的曲线：(子图序号, 列名, 颜色, 线型)
+GAIT_CHART_SERIES = (
+    (0, '左腿抬起时间', '#1f77b4', '-'),
+    (0, '右腿抬起时间', '#ff7f0e', '--'),
+    (1, '双支撑时间', '#2ca02c', '-'),
+    (1, '步时', '#d62728', '-'),
+    (1, '摆动时间', '#9467bd', '-'),
+    (1, '支撑时间', '#8c564b', '-'),
+    (2, '左脚踝高度', '#17becf', '-'),
+    (2, '右脚踝高度', '#e377c2', '--'),
+)
+
+
+class RefreshThrottle:
+    """界面刷新节流器，使界面刷新率与推理帧率解耦
+
+    Args:
+        rate: 每秒最多刷新的次数，不大于0时每次都刷新
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._last = None
+
+    def ready(self):
+        """距离上次刷新已超过刷新间隔时返回True，并记录本次刷新时间"""
+        now = time.perf_counter()
+        if self._last is not None and now - self._last < self.interval:
+            return False
+        self._last = now
+        return True
+
+
+class StreamingRollingMean:
+    """多列数据的流式滑动平均，每次更新的开销为O(1)
+
+    与 ``DataFrame.rolling(window, min_periods=1).mean()`` 一致：窗口内的
+    NaN不参与平均，窗口内全部为NaN时结果为NaN。
+
+    Args:
+        num_columns: 列数
+        window: 窗口长度，默认为5
+    """
+
+    def __init__(self, num_columns, window=5):
+        self.window = window
+        self._values = deque()
+        self._sum = np.zeros(num_columns)
+        self._count = np.zeros(num_columns)
+
+    def update(self, values):
+        """加入一行新数据，返回当前窗口的平均值"""
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        self._values.append(values)
+        self._sum[valid] += values[valid]
+        self._count[valid] += 1
+        if len(self._values) > self.window:
+            old = self._values.popleft()
+            old_valid = ~np.isnan(old)
+            self._sum[old_valid] -= old[old_valid]
+            self._count[old_valid] -= 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(self._count > 0, self._sum / self._count, np.nan)
+
+
+class GaitChart:
+    """增量更新的步态图表
+
+    图表对象只创建一次；每帧只把新数据的滑动平均值追加到环形缓冲区，
+    需要刷新界面时再更新曲线数据，不重新创建图表。
+
+    Args:
+        normal_ranges: 步态指标正常范围，用于绘制参考区间
+        history_size: 显示的最大数据点数量，默认为100
+        smooth_window: 滑动平均窗口长度，默认为5
+        font_prop: 中文字体，可选
+    """
+
+    def __init__(self, normal_ranges, history_size=100, smooth_window=5, font_prop=None):
+        self.columns = [name for _, name, _, _ in GAIT_CHART_SERIES]
+        self.smooth_window = smooth_window
+        self.smoothed = RingBuffer(self.columns, capacity=history_size)
+        self.rolling = StreamingRollingMean(len(self.columns), smooth_window)
+
+        self.fig, self.axes = plt.subplots(3, 1, figsize=(5, 8), gridspec_kw={'height_ratios': [1, 1, 1]})
+        self.lines = {}
+        for ax_idx, name, color, linestyle in GAIT_CHART_SERIES:
+            self.lines[name], = self.axes[ax_idx].plot([], [], label=name, color=color, linestyle=linestyle)
+
+        titles = ("左右腿抬起时间对比", "步态周期时间分析", "左右脚踝高度变化")
+        ylabels = ("时间 (秒)", "时间 (秒)", "像素坐标 (Y轴)")
+        for ax, title, ylabel in zip(self.axes, titles, ylabels):
+            ax.set_title(title, fontproperties=font_prop, fontsize=12)
+            ax.set_ylabel(ylabel, fontproperties=font_prop)
+            ax.legend(loc='upper left', fontsize='small', prop=font_prop)
+            ax.grid(True, linestyle='--', alpha=0.7)
+        self.axes[2].set_xlabel("帧", fontproperties=font_prop)
+
+        # 添加正常范围参考线
+        min_val, max_val = normal_ranges['左腿抬起时间']
+        self.axes[0].axhspan(min_val, max_val, alpha=0.2, color='green', label='正常范围')
+
+        # 因为在图像中Y坐标是向下增加的，所以翻转Y轴使得数值越小显示在上方
+        self.axes[2].invert_yaxis()
+
+        if font_prop is not None:
+            for ax in self.axes:
+                for label in ax.get_xticklabels() + ax.get_yticklabels():
+                    label.set_fontproperties(font_prop)
+        self.fig.tight_layout()
+
+    def __len__(self):
+        return len(self.smoothed)
+
+    @property
+    def ready(self):
+        """数据点足够进行滑动平均时返回True"""
+        return len(self.smoothed) > self.smooth_window
+
+    def append(self, row):
+        """追加一帧的步态数据（列名到数值的映射，缺失值为None）"""
+        values = [np.nan if row.get(name) is None else row[name] for name in self.columns]
+        smoothed = self.rolling.update(values)
+        self.smoothed.append(dict(zip(self.columns, smoothed)))
+
+    def render(self):
+        """用当前数据更新曲线并返回图表对象"""
+        data = self.smoothed.window()
+        x = np.arange(len(data))
+        for i, name in enumerate(self.columns):
+            self.lines[name].set_data(x, data[:, i])
+        for ax in self.axes:
+            ax.relim()
+            ax.autoscale_view()
+        return self.fig
+
+    def close(self):
+        plt.close(self.fig)
@@ -2,7 +2,11 @@ import time
 import numpy as np
 
 # 从config模块导入常量
-from config import LEFT_ANKLE_IDX, RIGHT_ANKLE_IDX, LEFT_KNEE_IDX, RIGHT_KNEE_IDX, LEFT_HIP_IDX, RIGHT_HIP_IDX, LEFT_SHOULDER_IDX, RIGHT_SHOULDER_IDX, NOSE_IDX, STEP_WIDTH_RANGES, STEP_LENGTH_RANGES, STRIDE_LENGTH_RANGES, CADENCE_RANGES, STEP_LENGTH_SYMMETRY_RANGES, SUPPORT_TIME_DIFF_RANGES, SWING_TIME_DIFF_RANGES, PELVIC_ROTATION_RANGES, KNEE_FLEXION_RANGES, ANKLE_FLEXION_RANGES, WEIGHT_SHIFT_RANGES, get_severity_level
+from config import STEP_LENGTH_RANGES
+from batch_analysis import GAIT_METRICS, analyze_gait_metrics_batch
+from metric_registry import GAIT_EVALUATOR, SEVERITY_LEVELS, severity_codes
+from gait_engine import GAIT_TIME_METRICS
+from session_store import RingBuffer
 
 def calculate_angle(p1, p2, p3=None):
     """计算两点或三点之间的角度"""
@@ -22,88 +26,53 @@ def calculate_distance(p1, p2):
     return np.sqrt(np.sum((p2 - p1) ** 2))
 
 def analyze_gait_metrics(keypoints, keypoint_scores, prev_frame_data=None):
-    """分析步态指标"""
-    # 关键点索引定义
-    NOSE = 0
-    LEFT_EYE = 1
-    RIGHT_EYE = 2
-    LEFT_EAR = 3
-    RIGHT_EAR = 4
-    LEFT_SHOULDER = 5
-    RIGHT_SHOULDER = 6
-    LEFT_ELBOW = 7
-    RIGHT_ELBOW = 8
-    LEFT_WRIST = 9
-    RIGHT_WRIST = 10
-    LEFT_HIP = 11
-    RIGHT_HIP = 12
-    LEFT_KNEE = 13
-    RIGHT_KNEE = 14
-    LEFT_ANKLE = 15
-    RIGHT_ANKLE = 16
+    """分析单帧步态指标
 
-    results = {}
-    keypoints = np.array(keypoints)
+    数值由 :func:`batch_analysis.analyze_gait_metrics_batch` 计算，离线处理整段
+    视频时可直接调用批量版本。
+    """
+    prev_ankle_y = None
+    if prev_frame_data and all(v is not None for v in prev_frame_data.values()):
+        prev_ankle_y = (prev_frame_data['left_ankle_y'], prev_frame_data['right_ankle_y'])
 
-    # 计算步宽 (左右脚踝之间的距离)
-    if keypoint_scores[LEFT_ANKLE] > 0.3 and keypoint_scores[RIGHT_ANKLE] > 0.3:
-        step_width = calculate_distance(keypoints[LEFT_ANKLE], keypoints[RIGHT_ANKLE])
-        results['step_width'] = step_width
-        results['step_width_status'] = get_severity_level(step_width, STEP_WIDTH_RANGES)
+    values, masks = analyze_gait_metrics_batch(keypoints, keypoint_scores, prev_ankle_y=prev_ankle_y)
+    metrics = {name: float(values[name][0]) for name in GAIT_METRICS if masks[name][0]}
+    # 各指标的异常程度由指标声明中的范围一次计算
+    levels = {name: SEVERITY_LEVELS[codes[0]] for name, codes in GAIT_EVALUATOR.severity(values).items()
+              if codes[0] >= 0}
 
-    # 计算步长 (前后脚之间的距离)
-    if prev_frame_data and all(v is not None for v in prev_frame_data.values()):
-        left_step = abs(keypoints[LEFT_ANKLE][1] - prev_frame_data['left_ankle_y'])
-        right_step = abs(keypoints[RIGHT_ANKLE][1] - prev_frame_data['right_ankle_y'])
-        
+    results = {}
+    if 'step_width' in metrics:
+        results['step_width'] = metrics['step_width']
+        results['step_width_status'] = levels['step_width']
+
+    if 'left_step_length' in metrics:
+        left_step = metrics['left_step_length']
+        right_step = metrics['right_step_length']
         results['left_step_length'] = left_step
         results['right_step_length'] = right_step
-        results['step_length_status'] = get_severity_level((left_step + right_step) / 2, STEP_LENGTH_RANGES)
-        
-        # 计算步长对称性
-        step_diff = abs(left_step - right_step)
-        results['step_symmetry'] = step_diff
-        results['step_symmetry_status'] = get_severity_level(step_diff, STEP_LENGTH_SYMMETRY_RANGES)
-
-    # 计算骨盆旋转角度
-    if keypoint_scores[LEFT_HIP] > 0.3 and keypoint_scores[RIGHT_HIP] > 0.3:
-        pelvic_angle = calculate_angle(keypoints[LEFT_HIP], keypoints[RIGHT_HIP])
-        results['pelvic_rotation'] = pelvic_angle
-        results['pelvic_rotation_status'] = get_severity_level(abs(pelvic_angle), PELVIC_ROTATION_RANGES)
-
-    # 计算膝关节角度
-    if all(keypoint_scores[[LEFT_HIP, LEFT_KNEE, LEFT_ANKLE]] > 0.3):
-        left_knee_angle = calculate_angle(keypoints[LEFT_HIP], keypoints[LEFT_KNEE], keypoints[LEFT_ANKLE])
-        results['left_knee_angle'] = left_knee_angle
-        results['left_knee_status'] = get_severity_level(abs(left_knee_angle - 180), KNEE_FLEXION_RANGES)
-
-    if all(keypoint_scores[[RIGHT_HIP, RIGHT_KNEE, RIGHT_ANKLE]] > 0.3):
-        right_knee_angle = calculate_angle(keypoints[RIGHT_HIP], keypoints[RIGHT_KNEE], keypoints[RIGHT_ANKLE])
-        results['right_knee_angle'] = right_knee_angle
-        results['right_knee_status'] = get_severity_level(abs(right_knee_angle - 180), KNEE_FLEXION_RANGES)
-
-    # 计算踝关节角度
-    if all(keypoint_scores[[LEFT_KNEE, LEFT_ANKLE]] > 0.3):
-        left_ankle_angle = calculate_angle(keypoints[LEFT_KNEE], keypoints[LEFT_ANKLE])
-        results['left_ankle_angle'] = left_ankle_angle
-        results['left_ankle_status'] = get_severity_level(abs(left_ankle_angle - 90), ANKLE_FLEXION_RANGES)
-
-    if all(keypoint_scores[[RIGHT_KNEE, RIGHT_ANKLE]] > 0.3):
-        right_ankle_angle = calculate_angle(keypoints[RIGHT_KNEE], keypoints[RIGHT_ANKLE])
-        results['right_ankle_angle'] = right_ankle_angle
-        results['right_ankle_status'] = get_severity_level(abs(right_ankle_angle - 90), ANKLE_FLEXION_RANGES)
-
-    # 计算身体重心转移
-    if all(keypoint_scores[[LEFT_HIP, RIGHT_HIP]] > 0.3):
-        hip_center = (keypoints[LEFT_HIP] + keypoints[RIGHT_HIP]) / 2
-        if keypoint_scores[LEFT_ANKLE] > 0.3 and keypoint_scores[RIGHT_ANKLE] > 0.3:
-            ankle_center = (keypoints[LEFT_ANKLE] + keypoints[RIGHT_ANKLE]) / 2
-            weight_shift = calculate_distance(hip_center, ankle_center)
-            step_length = calculate_distance(keypoints[LEFT_ANKLE], keypoints[RIGHT_ANKLE])
-            if step_length > 0:
-                weight_shift_percent = (weight_shift / step_length) * 100
-                results['weight_shift'] = weight_shift_percent
-                results['weight_shift_status'] = get_severity_level(weight_shift_percent, WEIGHT_SHIFT_RANGES)
+        results['step_length_status'] = SEVERITY_LEVELS[int(severity_codes((left_step + right_step) / 2,
+                                                                           STEP_LENGTH_RANGES))]
+        results['step_symmetry'] = metrics['step_symmetry']
+        results['step_symmetry_status'] = levels['step_symmetry']
+
+    if 'pelvic_rotation' in metrics:
+        results['pelvic_rotation'] = metrics['pelvic_rotation']
+        results['pelvic_rotation_status'] = levels['pelvic_rotation']
+
+    for side in ('left', 'right'):
+        if f'{side}_knee_angle' in metrics:
+            results[f'{side}_knee_angle'] = metrics[f'{side}_knee_angle']
+            results[f'{side}_knee_status'] = levels[f'{side}_knee_angle']
+
+    for side in ('left', 'right'):
+        if f'{side}_ankle_angle' in metrics:
+            results[f'{side}_ankle_angle'] = metrics[f'{side}_ankle_angle']
+            results[f'{side}_ankle_status'] = levels[f'{side}_ankle_angle']
+
+    if 'weight_shift' in metrics:
+        results['weight_shift'] = metrics['weight_shift']
+        results['weight_shift_status'] = levels['weight_shift']
 
     return results
 
@@ -212,36 +181,26 @@ def display_gait_metric(title, value, unit="秒"):
     <div class="gait-metric-value">{value_rounded} {unit}</div>
 </div>"""
 
-def init_gait_history():
+def init_gait_history(max_history_points=100):
     """初始化步态历史数据
     
+    Args:
+        max_history_points: 最大历史数据点数量，默认为100
+    
     Returns:
-        dict: 包含空步态历史数据的字典
+        RingBuffer: 以步态时间指标为列的空环形缓冲区
     """
-    return {
-        '左腿抬起时间': [],
-        '右腿抬起时间': [],
-        '双支撑时间': [],
-        '步时': [],
-        '摆动时间': [],
-        '支撑时间': []
-    }
-
-def update_gait_history(gait_history, gait_metrics, max_history_points=100):
+    return RingBuffer(GAIT_TIME_METRICS, capacity=max_history_points)
+
+def update_gait_history(gait_history, gait_metrics):
     """更新步态历史数据
     
     Args:
-        gait_history: 现有的步态历史数据
+        gait_history: 现有的步态历史数据（环形缓冲区），超过容量时自动丢弃最旧的数据
         gait_metrics: 当前帧的步态指标
-        max_history_points: 最大历史数据点数量，默认为100
         
     Returns:
-        dict: 更新后的步态历史数据
+        RingBuffer: 更新后的步态历史数据
     """
-    for metric, value in gait_metrics.items():
-        gait_history[metric].append(value)
-        # 限制历史数据量
-        if len(gait_history[metric]) > max_history_points:
-            gait_history[metric] = gait_history[metric][-max_history_points:]
-    
-    return gait_history 
\ No newline at end of file
+    gait_history.append(gait_metrics)
+    return gait_history
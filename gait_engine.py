@@ -0,0 +1,285 @@
+from collections import deque
+
+import cv2
+import numpy as np
+
+from config import LEFT_ANKLE_IDX, RIGHT_ANKLE_IDX, LEFT_HIP_IDX, RIGHT_HIP_IDX
+
+# 与GAIT_NORMAL_RANGES一致的步态时间指标名称
+GAIT_TIME_METRICS = ('左腿抬起时间', '右腿抬起时间', '双支撑时间', '步时', '摆动时间', '支撑时间')
+
+# 每只脚保留的最近步态事件数。计算周期只用到最近一个周期内的事件，
+# 有界队列使长时间运行的会话内存不随步数增长
+MAX_GAIT_EVENTS = 16
+
+
+def frame_timestamp(cap, frame_idx=None, fps=None):
+    """获取视频帧的时间戳（秒）
+
+    优先使用视频容器中的 ``CAP_PROP_POS_MSEC``；该值不可用时按帧序号和帧率
+    计算。注意应在 ``cap.read()`` 之后调用，此时 ``CAP_PROP_POS_MSEC``
+    对应刚读出的帧。
+
+    Args:
+        cap: ``cv2.VideoCapture`` 对象
+        frame_idx: 从0开始的帧序号，用于回退计算
+        fps: 视频帧率，默认读取 ``CAP_PROP_FPS``
+
+    Returns:
+        float | None: 时间戳（秒），都无法获取时返回 ``None``
+    """
+    pos_msec = cap.get(cv2.CAP_PROP_POS_MSEC)
+    if pos_msec and pos_msec > 0:
+        return pos_msec / 1000.0
+    if fps is None:
+        fps = cap.get(cv2.CAP_PROP_FPS)
+    if frame_idx is not None and fps and fps > 0:
+        return frame_idx / fps
+    return None
+
+
+class _FootState:
+    """单只脚的支撑/摆动状态和步态事件记录"""
+
+    def __init__(self, ground_window):
+        self.in_swing = False
+        self.ground = deque()
+        self.ground_window = ground_window
+        self.prev_time = None
+        self.prev_lift = None
+        self.heel_strikes = deque(maxlen=MAX_GAIT_EVENTS)
+        self.toe_offs = deque(maxlen=MAX_GAIT_EVENTS)
+
+    def ground_level(self, timestamp, ankle_y):
+        """地面高度取最近一段时间内脚踝的最低位置（向下为正的竖直坐标最大值）"""
+        self.ground.append((timestamp, ankle_y))
+        while self.ground and timestamp - self.ground[0][0] > self.ground_window:
+            self.ground.popleft()
+        return max(y for _, y in self.ground)
+
+
+class GaitEngine:
+    """基于视频时间戳的步态时间分析引擎
+
+    从左右脚踝的轨迹中检测足跟着地（heel strike）和足尖离地（toe off）
+    事件，并据此计算每个步态周期的真实时间指标。所有时间都来自帧时间戳，
+    与处理速度无关，因此视频可以快于实时地处理、分批处理或跳帧处理。
+
+    脚踝相对地面抬起的高度按腿长归一化，超过 ``lift_thr`` 判定为摆动相，
+    低于 ``contact_thr`` 判定为支撑相（滞回避免抖动误判）。事件时间在相邻
+    两帧之间按抬起高度线性插值。
+
+    Args:
+        lift_thr: 进入摆动相的抬脚高度阈值（占腿长比例），默认为0.06
+        contact_thr: 回到支撑相的抬脚高度阈值（占腿长比例），默认为0.03
+        kpt_thr: 关键点置信度阈值，默认为0.3
+        ground_window: 估计地面高度的时间窗口（秒），默认为2.0
+        max_cycle_time: 超过该时长（秒）的步态周期视为中断并丢弃，默认为3.0
+        vertical_axis: 竖直方向的坐标轴，默认为1（图像坐标Y轴）
+        vertical_sign: 竖直坐标轴向下为正时取1，向上为正时取-1，默认为1。
+            输入 ``mmpose.utils.MultiViewTriangulator`` 三角化得到的
+            世界坐标（如Z轴向上）时，设置 ``vertical_axis=2,
+            vertical_sign=-1``，此时关键点形状为(K, 3)，腿长和抬脚高度
+            均为真实的度量尺度，不受摄像头距离和角度影响
+    """
+
+    def __init__(self,
+                 lift_thr=0.06,
+                 contact_thr=0.03,
+                 kpt_thr=0.3,
+                 ground_window=2.0,
+                 max_cycle_time=3.0,
+                 vertical_axis=1,
+                 vertical_sign=1):
+        self.lift_thr = lift_thr
+        self.contact_thr = contact_thr
+        self.kpt_thr = kpt_thr
+        self.ground_window = ground_window
+        self.max_cycle_time = max_cycle_time
+        self.vertical_axis = vertical_axis
+        self.vertical_sign = vertical_sign
+        self.reset()
+
+    def reset(self):
+        """清空所有状态和事件"""
+        self.feet = {
+            'left': _FootState(self.ground_window),
+            'right': _FootState(self.ground_window)
+        }
+        self.leg_length = None
+        self.last_timestamp = None
+        self.cycles = []
+        self._metrics = {name: 0.0 for name in GAIT_TIME_METRICS}
+
+    def update(self, timestamp, keypoints, keypoint_scores):
+        """输入一帧关键点，更新步态事件并返回当前的步态时间指标
+
+        Args:
+            timestamp: 帧时间戳（秒），需单调递增
+            keypoints: 关键点坐标数组，形状为(K, 2)或(K, 3)
+            keypoint_scores: 关键点置信度，形状为(K,)
+
+        Returns:
+            dict: 最近完成的步态周期的时间指标，键与 ``GAIT_TIME_METRICS``
+            一致，尚未完成周期时为0
+        """
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            return self.metrics
+        self.last_timestamp = timestamp
+
+        keypoints = np.asarray(keypoints, dtype=np.float64)
+        keypoint_scores = np.asarray(keypoint_scores)
+        joints = {
+            'left': (LEFT_HIP_IDX, LEFT_ANKLE_IDX),
+            'right': (RIGHT_HIP_IDX, RIGHT_ANKLE_IDX)
+        }
+
+        # 更新腿长估计（髋到踝的距离，指数平滑）
+        lengths = [
+            np.linalg.norm(keypoints[hip] - keypoints[ankle])
+            for hip, ankle in joints.values()
+            if keypoint_scores[hip] > self.kpt_thr
+            and keypoint_scores[ankle] > self.kpt_thr
+        ]
+        if lengths:
+            length = max(lengths)
+            self.leg_length = length if self.leg_length is None else (
+                0.9 * self.leg_length + 0.1 * length)
+        if not self.leg_length:
+            return self.metrics
+
+        new_heel_strike = False
+        for side, (_, ankle) in joints.items():
+            foot = self.feet[side]
+            if keypoint_scores[ankle] <= self.kpt_thr:
+                foot.prev_time = None
+                continue
+            ankle_y = self.vertical_sign * keypoints[ankle][self.vertical_axis]
+            lift = (foot.ground_level(timestamp, ankle_y) -
+                    ankle_y) / self.leg_length
+
+            if not foot.in_swing and lift > self.lift_thr:
+                foot.in_swing = True
+                foot.toe_offs.append(
+                    self._crossing_time(foot, timestamp, lift, self.lift_thr))
+            elif foot.in_swing and lift < self.contact_thr:
+                foot.in_swing = False
+                foot.heel_strikes.append(
+                    self._crossing_time(foot, timestamp, lift,
+                                        self.contact_thr))
+                new_heel_strike = True
+
+            foot.prev_time = timestamp
+            foot.prev_lift = lift
+
+        if new_heel_strike:
+            self._update_cycles()
+        return self.metrics
+
+    def process(self, timestamps, keypoints, keypoint_scores):
+        """离线处理整段关键点序列
+
+        Args:
+            timestamps: 帧时间戳（秒），形状为(T,)
+            keypoints: 关键点坐标，形状为(T, K, 2)或(T, K, 3)
+            keypoint_scores: 关键点置信度，形状为(T, K)
+
+        Returns:
+            list[dict]: 每个完整步态周期的时间指标
+        """
+        for t, kpts, scores in zip(timestamps, keypoints, keypoint_scores):
+            self.update(t, kpts, scores)
+        return self.cycles
+
+    @property
+    def metrics(self):
+        """最近完成的步态周期的时间指标"""
+        return dict(self._metrics)
+
+    @property
+    def left_leg_up(self):
+        return self.feet['left'].in_swing
+
+    @property
+    def right_leg_up(self):
+        return self.feet['right'].in_swing
+
+    @staticmethod
+    def _crossing_time(foot, timestamp, lift, thr):
+        """在上一帧和当前帧之间线性插值抬脚高度穿过阈值的时刻"""
+        if foot.prev_time is None or foot.prev_lift is None:
+            return float(timestamp)
+        delta = lift - foot.prev_lift
+        if delta == 0:
+            return float(timestamp)
+        ratio = min(max((thr - foot.prev_lift) / delta, 0.0), 1.0)
+        return float(foot.prev_time + ratio * (timestamp - foot.prev_time))
+
+    def _side_cycle(self, side):
+        """计算某只脚最近一个完整周期（相邻两次足跟着地）的时间"""
+        foot = self.feet[side]
+        if len(foot.heel_strikes) < 2:
+            return None
+        hs_start, hs_end = foot.heel_strikes[-2], foot.heel_strikes[-1]
+        cycle_time = hs_end - hs_start
+        if cycle_time <= 0 or cycle_time > self.max_cycle_time:
+            return None
+        toe_offs = [t for t in foot.toe_offs if hs_start < t < hs_end]
+        if not toe_offs:
+            return None
+        toe_off = toe_offs[-1]
+        return dict(
+            start=hs_start,
+            end=hs_end,
+            cycle_time=cycle_time,
+            stance_time=toe_off - hs_start,
+            swing_time=hs_end - toe_off)
+
+    def _double_support(self, start, end):
+        """统计[start, end]内每段双支撑期（一侧着地到对侧离地）的平均时长"""
+        events = []
+        for side, other in (('left', 'right'), ('right', 'left')):
+            for hs in self.feet[side].heel_strikes:
+                if not start <= hs < end:
+                    continue
+                toe_offs = [t for t in self.feet[other].toe_offs if t > hs]
+                if toe_offs and toe_offs[0] <= end:
+                    events.append(toe_offs[0] - hs)
+        return float(np.mean(events)) if events else None
+
+    def _update_cycles(self):
+        for side in ('left', 'right'):
+            cycle = self._side_cycle(side)
+            if cycle is None or any(
+                    c['side'] == side and c['end'] == cycle['end']
+                    for c in self.cycles[-2:]):
+                continue
+            cycle['side'] = side
+            cycle['double_support_time'] = self._double_support(
+                cycle['start'], cycle['end'])
+
+            # 单步时间：本侧足跟着地到对侧下一次足跟着地
+            other = 'right' if side == 'left' else 'left'
+            next_hs = [
+                t for t in self.feet[other].heel_strikes
+                if cycle['start'] < t < cycle['end']
+            ]
+            cycle['step_time'] = next_hs[0] - cycle['start'] if next_hs else None
+            self.cycles.append(cycle)
+
+            if side == 'left':
+                self._metrics['左腿抬起时间'] = cycle['swing_time']
+            else:
+                self._metrics['右腿抬起时间'] = cycle['swing_time']
+            self._metrics['步时'] = cycle['cycle_time']
+            if cycle['double_support_time'] is not None:
+                self._metrics['双支撑时间'] = cycle['double_support_time']
+
+            # 摆动和支撑时间取左右两侧最近周期的平均
+            recent = {}
+            for c in reversed(self.cycles):
+                recent.setdefault(c['side'], c)
+            self._metrics['摆动时间'] = float(
+                np.mean([c['swing_time'] for c in recent.values()]))
+            self._metrics['支撑时间'] = float(
+                np.mean([c['stance_time'] for c in recent.values()]))
@@ -1,11 +1,8 @@
 import cv2
 import numpy as np
 import os
-from mmdet.apis import inference_detector, init_detector
-from mmpose.apis import inference_topdown
-from mmpose.apis import init_model as init_pose_estimator
-from mmpose.utils import adapt_mmdet_pipeline
 from mmpose.structures import merge_data_samples
+from inference_backend import ORTDetector, ORTPoseEstimator, TorchDetector, TorchPoseEstimator
 from gait_analysis import analyze_gait_metrics
 from config import (
     STEP_WIDTH_RANGES, STEP_LENGTH_RANGES, STRIDE_LENGTH_RANGES,
@@ -13,7 +10,8 @@ from config import (
     SWING_TIME_DIFF_RANGES, PELVIC_ROTATION_RANGES, KNEE_FLEXION_RANGES,
     ANKLE_FLEXION_RANGES, WEIGHT_SHIFT_RANGES, get_severity_level
 )
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
+from text_overlay import TextPanel, load_font
 
 # 定义骨架连接
 SKELETON_CONNECTIONS = [
@@ -44,6 +42,17 @@ SKELETON_CONNECTIONS = [
     (0, 6),   # 鼻子 -> 右肩
 ]
 
+# 结果面板，字体和文本位图在帧之间缓存复用
+_results_panel = TextPanel()
+
+# 推理图像最长边的上限（像素），为None时使用摄像头原始分辨率推理
+INFERENCE_MAX_SIDE = None
+
+# 推理后端：'pytorch' 或 'onnxruntime'（只加载下面的ONNX模型，启动更快，适合只有CPU的电脑）
+INFERENCE_BACKEND = 'pytorch'
+DET_ONNX = 'rtmdet_m_person/end2end.onnx'
+POSE_ONNX = 'rtmw-x_384x288.onnx'
+
 def is_in_range(value, range_tuple):
     """检查值是否在正常范围内"""
     if value is None:
@@ -83,39 +92,33 @@ def draw_skeleton(frame, keypoints, keypoint_scores, threshold=0.3):
             point = (int(x), int(y))
             cv2.circle(frame, point, point_size, point_color, point_thickness)
 
+def resize_for_inference(frame, max_side=None):
+    """按最长边上限缩小推理图像，不放大
+
+    Returns:
+        tuple: (推理图像, 推理坐标到原始图像坐标的缩放比例)
+    """
+    height, width = frame.shape[:2]
+    if max_side is None or max(height, width) <= max_side:
+        return frame, 1.0
+    scale = max_side / max(height, width)
+    img = cv2.resize(frame, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+    return img, 1.0 / scale
+
+
+def get_display_size(window_name, frame):
+    """返回窗口的显示尺寸 (宽, 高)，窗口尺寸不可用时使用图像尺寸"""
+    _, _, width, height = cv2.getWindowImageRect(window_name)
+    if width <= 0 or height <= 0:
+        height, width = frame.shape[:2]
+    return width, height
+
+
 def put_chinese_text(img, text, position, text_color, font_size=20):
-    """在图片上添加中文文本"""
-    # 创建一个支持中文的图片
+    """在图片上添加中文文本（字体只加载一次）"""
     img_pil = Image.fromarray(img)
     draw = ImageDraw.Draw(img_pil)
-    
-    # 加载中文字体
-    try:
-        # 尝试多个可能的字体路径
-        font_paths = [
-            "simhei.ttf",
-            "NotoSansCJK-Regular.ttc",
-            "C:/Windows/Fonts/simhei.ttf",
-            "C:/Windows/Fonts/msyh.ttc",
-            "C:/Windows/Fonts/simkai.ttf"
-        ]
-        font = None
-        for font_path in font_paths:
-            try:
-                font = ImageFont.truetype(font_path, font_size)
-                break
-            except:
-                continue
-        if font is None:
-            raise Exception("未找到可用的中文字体")
-    except Exception as e:
-        print(f"警告：{str(e)}，将使用默认字体")
-        font = ImageFont.load_default()
-    
-    # 绘制文本
-    draw.text(position, text, font=font, fill=text_color)
-    
-    # 转换回OpenCV格式
+    draw.text(position, text, font=load_font(font_size), fill=text_color)
     return np.array(img_pil)
 
 def calculate_score(gait_results):
@@ -237,11 +240,10 @@ def draw_analysis_results(frame, gait_results):
     padding = int(width * 0.02)  # 根据图像宽度调整内边距
     line_height = int(height * 0.035)  # 稍微减小行高以适应更多内容
 
-    # 创建半透明黑色背景
-    overlay = frame.copy()
+    # 创建半透明黑色背景，所有文本先合成到面板上，最后一次性叠加到图像
     panel_width = int(width * 0.3)  # 增加面板宽度以适应评分
-    cv2.rectangle(overlay, (0, 0), (panel_width, height), (0, 0, 0), -1)
-    frame = cv2.addWeighted(overlay, 0.7, frame, 0.3, 0)
+    panel = _results_panel
+    panel.begin(panel_width + 1, height, (0, 0, 0), 0.7)
 
     # 计算评分
     scores, total_score, max_score = calculate_score(gait_results)
@@ -295,42 +297,48 @@ def draw_analysis_results(frame, gait_results):
 
     # 绘制标题
     title = "步态分析结果"
-    frame = put_chinese_text(frame, title, (padding, padding), text_color, font_size + 4)
+    panel.draw_text(title, (padding, padding), text_color, font_size + 4)
 
     # 绘制结果
     y = padding + font_size + line_height
     for text, status, status_color, score in texts:
         # 绘制指标值
-        frame = put_chinese_text(frame, text, (padding, y), text_color, font_size)
+        panel.draw_text(text, (padding, y), text_color, font_size)
         
         # 绘制状态
         status_x = int(panel_width * 0.5)  # 调整状态文本的起始x坐标
-        frame = put_chinese_text(frame, status, (status_x, y), status_color, font_size)
+        panel.draw_text(status, (status_x, y), status_color, font_size)
         
         # 绘制分数
         if score:
             score_x = int(panel_width * 0.75)  # 分数显示位置
-            frame = put_chinese_text(frame, score, (score_x, y), text_color, font_size)
+            panel.draw_text(score, (score_x, y), text_color, font_size)
         
         y += line_height
 
     # 绘制总分
     total_score_text = f"总分: {total_score:.1f}/{max_score}分"
-    frame = put_chinese_text(frame, total_score_text, (padding, y + line_height), text_color, font_size + 2)
+    panel.draw_text(total_score_text, (padding, y + line_height), text_color, font_size + 2)
 
+    panel.blend(frame)
     return frame
 
 def main():
     # 初始化检测器
     det_config = 'projects/rtmpose/rtmdet/person/rtmdet_m_640-8xb32_coco-person.py'
     det_checkpoint = 'rtmdet_m_8xb32-100e_coco-obj365-person-235e8209.pth'
-    detector = init_detector(det_config, det_checkpoint)
-    detector.cfg = adapt_mmdet_pipeline(detector.cfg)
+    if INFERENCE_BACKEND == 'onnxruntime':
+        detector = ORTDetector(DET_ONNX)
+    else:
+        detector = TorchDetector(det_config, det_checkpoint)
 
     # 初始化姿态估计器
     pose_config = 'configs/wholebody_2d_keypoint/rtmpose/cocktail14/rtmw-x_8xb320-270e_cocktail14-384x288.py'
     pose_checkpoint = 'rtmw-x_simcc-cocktail14_pt-ucoco_270e-384x288-f840f204_20231122.pth'
-    pose_estimator = init_pose_estimator(pose_config, pose_checkpoint)
+    if INFERENCE_BACKEND == 'onnxruntime':
+        pose_estimator = ORTPoseEstimator(POSE_ONNX, pose_config)
+    else:
+        pose_estimator = TorchPoseEstimator(pose_config, pose_checkpoint)
 
     # 打开摄像头
     cap = cv2.VideoCapture(0)
@@ -347,40 +355,44 @@ def main():
         if not ret:
             break
 
-        # 调整图像大小以适应全屏
-        screen_height = cv2.getWindowImageRect('步态分析')[3]
-        screen_width = cv2.getWindowImageRect('步态分析')[2]
-        frame = cv2.resize(frame, (screen_width, screen_height))
+        # 推理使用原始分辨率（或按配置缩小）的图像，不使用放大到全屏后的图像
+        inference_frame, inference_scale = resize_for_inference(frame, INFERENCE_MAX_SIDE)
+
+        # 显示图像只放大一次，关键点通过一次缩放映射到显示坐标
+        screen_width, screen_height = get_display_size('步态分析', frame)
+        display_scale = np.array([screen_width / frame.shape[1], screen_height / frame.shape[0]],
+                                 dtype=np.float32) * inference_scale
+        display_frame = cv2.resize(frame, (screen_width, screen_height))
 
         # 检测人体
-        det_result = inference_detector(detector, frame)
+        det_result = detector.detect([inference_frame])[0]
         
         # 确保检测到了人体
-        if len(det_result.pred_instances.bboxes) == 0:
+        if len(det_result.bboxes) == 0:
             # 即使没有检测到人体，也显示分析结果面板
-            frame = draw_analysis_results(frame, {})
-            cv2.imshow('步态分析', frame)
+            display_frame = draw_analysis_results(display_frame, {})
+            cv2.imshow('步态分析', display_frame)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
             continue
 
-        # 获取人体框并转换为CPU张量
-        bboxes = det_result.pred_instances.bboxes.cpu()
+        # 获取人体框
+        bboxes = det_result.bboxes
         
         # 进行姿态估计
-        pose_results = inference_topdown(pose_estimator, frame, bboxes)
+        pose_results = pose_estimator.predict([(inference_frame, bboxes)])[0]
         
         # 确保有姿态估计结果
         if not pose_results:
             # 即使没有姿态估计结果，也显示分析结果面板
-            frame = draw_analysis_results(frame, {})
-            cv2.imshow('步态分析', frame)
+            display_frame = draw_analysis_results(display_frame, {})
+            cv2.imshow('步态分析', display_frame)
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
             continue
             
-        # 获取关键点和分数
-        keypoints = pose_results[0].pred_instances.keypoints
+        # 获取关键点和分数，关键点映射到显示坐标，步态指标与之前一样基于显示坐标计算
+        keypoints = pose_results[0].pred_instances.keypoints * display_scale
         keypoint_scores = pose_results[0].pred_instances.keypoint_scores
         
         # 分析步态指标
@@ -395,13 +407,13 @@ def main():
         }
 
         # 在图像上绘制骨架
-        draw_skeleton(frame, keypoints[0], keypoint_scores[0])
+        draw_skeleton(display_frame, keypoints[0], keypoint_scores[0])
 
         # 在图像上绘制分析结果
-        frame = draw_analysis_results(frame, gait_results)
+        display_frame = draw_analysis_results(display_frame, gait_results)
 
         # 显示图像
-        cv2.imshow('步态分析', frame)
+        cv2.imshow('步态分析', display_frame)
         if cv2.waitKey(1) & 0xFF == ord('q'):
             break
 
@@ -0,0 +1,489 @@
+#!/usr/bin/env python
+"""可替换的推理后端：PyTorch（mmdet + mmpose）或 ONNX Runtime
+
+应用只通过下面的接口调用检测器和姿态估计器，不直接依赖具体的推理框架::
+
+    detector.detect(imgs)
+        -> list[DetectionResult]，每张图像的 bboxes (N, 4)、scores (N,)、labels (N,)
+    pose_estimator.predict([(img, bboxes), ...], batch_size, num_workers)
+        -> list[list[PoseDataSample]]，与 ``inference_topdown_batch`` 的格式相同
+
+姿态估计器另外提供 ``dataset_meta`` 和 ``cfg``（用于构建可视化器）。
+:func:`build_detector` 和 :func:`build_pose_estimator` 按 ``args.backend`` 选择后端。
+
+``onnxruntime`` 后端不构建PyTorch模型，也不需要mmdet，启动快、CPU推理快:
+    - 检测模型为mmdeploy导出的RTMDet end2end模型（输入 ``(B, 3, H, W)``，输出
+      ``dets (B, N, 5)`` 和 ``labels (B, N)``，图中已包含NMS）
+    - 姿态模型为SimCC姿态模型（RTMPose/RTMW），输出 ``simcc_x`` 和 ``simcc_y``，可用
+      ``python inference_backend.py <config> <checkpoint> <output.onnx>`` 从PyTorch权重导出，
+      也可以使用mmdeploy导出的end2end.onnx
+姿态模型的预处理复用 ``mmpose.structures.bbox`` 的边界框和仿射变换函数，解码使用配置文件
+中的 ``mmpose.codecs`` 编解码器，翻转测试和关键点子集与PyTorch模型头的行为一致。
+"""
+import inspect
+from argparse import ArgumentParser
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from mmengine.config import Config
+from mmengine.structures import InstanceData
+
+from mmpose.apis import inference_topdown, inference_topdown_batch, init_model
+from mmpose.apis.inference import dataset_meta_from_config
+from mmpose.registry import KEYPOINT_CODECS
+from mmpose.structures import PoseDataSample
+from mmpose.structures.bbox import bbox_clip_border, bbox_xyxy2cs, get_udp_warp_matrix, get_warp_matrix
+from mmpose.utils import adapt_mmdet_pipeline
+
+try:
+    from mmdet.apis import inference_detector, init_detector
+    has_mmdet = True
+except (ImportError, ModuleNotFoundError):
+    has_mmdet = False
+
+try:
+    import onnxruntime as ort
+    has_ort = True
+except (ImportError, ModuleNotFoundError):
+    has_ort = False
+
+# 单张图像的检测结果
+DetectionResult = namedtuple('DetectionResult', ['bboxes', 'scores', 'labels'])
+
+
+def pose_test_cfg(args):
+    """姿态估计模型的测试配置，设置了关键点子集时由模型头只解码这些关键点"""
+    test_cfg = dict(output_heatmaps=args.draw_heatmap)
+    if getattr(args, 'pose_keypoint_indices', None) is not None:
+        test_cfg['output_keypoint_indices'] = list(args.pose_keypoint_indices)
+    return test_cfg
+
+
+class TorchDetector:
+    """PyTorch（mmdet）人体检测后端"""
+
+    def __init__(self, config, checkpoint, device='cuda:0'):
+        assert has_mmdet, '请安装mmdet以使用PyTorch检测后端。'
+        self.model = init_detector(config, checkpoint, device=device)
+        self.model.cfg = adapt_mmdet_pipeline(self.model.cfg)
+
+    def detect(self, imgs):
+        """批量检测BGR图像，返回每张图像的 :class:`DetectionResult`"""
+        if not imgs:
+            return []
+        results = []
+        for det_result in inference_detector(self.model, list(imgs)):
+            pred_instances = det_result.pred_instances.cpu().numpy()
+            results.append(DetectionResult(pred_instances.bboxes, pred_instances.scores, pred_instances.labels))
+        return results
+
+
+class TorchPoseEstimator:
+    """PyTorch（mmpose）自顶向下姿态估计后端"""
+
+    def __init__(self, config, checkpoint, device='cuda:0', test_cfg=None):
+        cfg_options = dict(model=dict(test_cfg=test_cfg)) if test_cfg else None
+        self.model = init_model(config, checkpoint, device=device, cfg_options=cfg_options)
+        self.cfg = self.model.cfg
+        self.dataset_meta = self.model.dataset_meta
+
+    def predict(self, inputs, batch_size=32, num_workers=0):
+        """估计每张图像中各边界框的关键点
+
+        Args:
+            inputs: ``(BGR图像, 边界框)`` 列表，边界框为空时整张图像作为一个边界框
+            batch_size: 每次前向的裁剪图像数量，默认为32
+            num_workers: 裁剪图像的线程数，默认为0
+
+        Returns:
+            list[list[PoseDataSample]]: 每张图像各边界框的结果
+        """
+        if len(inputs) == 1:
+            # 单张图像不补齐批次，与逐帧调用 inference_topdown 相同
+            img, bboxes = inputs[0]
+            return [inference_topdown(self.model, img, bboxes)]
+        return inference_topdown_batch(self.model, inputs, batch_size=batch_size, num_workers=num_workers)
+
+
+def build_ort_session(onnx_file, device='cpu', num_threads=0):
+    """创建ONNX Runtime会话
+
+    Args:
+        onnx_file: ONNX模型路径
+        device: ``'cpu'`` 或 ``'cuda:0'`` 等，CUDA不可用时使用CPU
+        num_threads: 算子内并行的线程数，0表示由ONNX Runtime决定（物理核数）
+
+    Returns:
+        onnxruntime.InferenceSession
+    """
+    assert has_ort, '请安装onnxruntime（或onnxruntime-gpu）以使用ONNX Runtime后端。'
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = num_threads
+    # 检测和姿态估计的会话各自占用线程，顺序执行时不需要算子间并行
+    options.inter_op_num_threads = 1
+
+    providers = ['CPUExecutionProvider']
+    if device.startswith('cuda') and 'CUDAExecutionProvider' in ort.get_available_providers():
+        device_id = int(device.split(':')[1]) if ':' in device else 0
+        providers.insert(0, ('CUDAExecutionProvider', dict(device_id=device_id)))
+    return ort.InferenceSession(onnx_file, sess_options=options, providers=providers)
+
+
+class _ORTModel:
+    """ONNX Runtime会话的封装，可使用IO绑定减少输入输出的拷贝
+
+    Args:
+        onnx_file: ONNX模型路径
+        device: 推理设备
+        num_threads: 算子内并行的线程数，0表示使用默认值
+        io_binding: 是否使用IO绑定，None时仅在GPU上使用
+    """
+
+    def __init__(self, onnx_file, device='cpu', num_threads=0, io_binding=None):
+        self.session = build_ort_session(onnx_file, device, num_threads)
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_shape = model_input.shape
+        self.output_names = [output.name for output in self.session.get_outputs()]
+        # 静态批次的模型需要按固定批次大小推理
+        self.fixed_batch = self.input_shape[0] if isinstance(self.input_shape[0], int) else None
+
+        self.on_gpu = self.session.get_providers()[0] == 'CUDAExecutionProvider'
+        self.device_id = int(device.split(':')[1]) if self.on_gpu and ':' in device else 0
+        self.io_binding = self.on_gpu if io_binding is None else io_binding
+
+    def run(self, inputs):
+        """推理一个批次，返回按 ``output_names`` 顺序排列的numpy数组"""
+        inputs = np.ascontiguousarray(inputs, dtype=np.float32)
+        if not self.io_binding:
+            return self.session.run(self.output_names, {self.input_name: inputs})
+
+        # 输出直接分配在推理设备上，最后一次性拷贝回内存
+        binding = self.session.io_binding()
+        binding.bind_cpu_input(self.input_name, inputs)
+        for name in self.output_names:
+            binding.bind_output(name, 'cuda' if self.on_gpu else 'cpu', self.device_id)
+        self.session.run_with_iobinding(binding)
+        return binding.copy_outputs_to_cpu()
+
+    def iter_batches(self, inputs, batch_size):
+        """按批次推理，静态批次的模型补齐最后一批，依次产生每批（去掉补齐部分）的各个输出"""
+        if self.fixed_batch is not None:
+            batch_size = self.fixed_batch
+        for start in range(0, len(inputs), batch_size):
+            batch = inputs[start:start + batch_size]
+            num_valid = len(batch)
+            if self.fixed_batch is not None and num_valid < batch_size:
+                batch = np.concatenate([batch, np.repeat(batch[-1:], batch_size - num_valid, axis=0)])
+            yield [output[:num_valid] for output in self.run(batch)]
+
+    def run_batches(self, inputs, batch_size):
+        """按批次推理，返回拼接后的各个输出"""
+        return [np.concatenate(outputs) for outputs in zip(*self.iter_batches(inputs, batch_size))]
+
+
+class ORTDetector(_ORTModel):
+    """ONNX Runtime人体检测后端（mmdeploy导出的RTMDet end2end模型）
+
+    预处理与RTMDet的测试流程一致：保持宽高比缩放到模型输入尺寸，右下方用
+    ``pad_val`` 补齐，再按BGR通道归一化。
+
+    Args:
+        onnx_file: ONNX模型路径
+        device: 推理设备，默认为 ``'cpu'``
+        num_threads: 算子内并行的线程数，0表示使用默认值
+        io_binding: 是否使用IO绑定，None时仅在GPU上使用
+        input_size: 模型输入尺寸 (w, h)，模型输入为动态尺寸时使用，默认为 (640, 640)
+        mean: 归一化均值（BGR顺序）
+        std: 归一化标准差（BGR顺序）
+        pad_val: 补齐像素值，默认为114
+    """
+
+    def __init__(self,
+                 onnx_file,
+                 device='cpu',
+                 num_threads=0,
+                 io_binding=None,
+                 input_size=(640, 640),
+                 mean=(103.53, 116.28, 123.675),
+                 std=(57.375, 57.12, 58.395),
+                 pad_val=114):
+        super().__init__(onnx_file, device, num_threads, io_binding)
+        if all(isinstance(dim, int) for dim in self.input_shape[2:]):
+            input_size = (self.input_shape[3], self.input_shape[2])
+        self.input_size = tuple(input_size)
+        self.mean = np.array(mean, dtype=np.float32)
+        self.std = np.array(std, dtype=np.float32)
+        self.pad_val = pad_val
+
+    def preprocess(self, img):
+        """缩放并补齐图像，返回归一化后的 (H, W, 3) 图像和 (x, y) 缩放系数"""
+        in_w, in_h = self.input_size
+        h, w = img.shape[:2]
+        ratio = min(in_w / w, in_h / h)
+        new_w, new_h = int(w * ratio + 0.5), int(h * ratio + 0.5)
+        padded = np.full((in_h, in_w, 3), self.pad_val, dtype=np.float32)
+        padded[:new_h, :new_w] = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        return (padded - self.mean) / self.std, np.array([new_w / w, new_h / h], dtype=np.float32)
+
+    def detect(self, imgs):
+        """批量检测BGR图像，返回每张图像的 :class:`DetectionResult`"""
+        if not imgs:
+            return []
+        inputs, scale_factors = zip(*[self.preprocess(img) for img in imgs])
+        inputs = np.stack(inputs).transpose(0, 3, 1, 2)
+        # 各批次的检测框数量可能不同，按图像分别保存
+        dets, labels = [], []
+        for outputs in self.iter_batches(inputs, len(imgs)):
+            outputs = dict(zip(self.output_names, outputs))
+            dets.extend(outputs.get('dets', outputs[self.output_names[0]]))
+            labels.extend(outputs.get('labels', outputs[self.output_names[-1]]))
+
+        results = []
+        for img, scale_factor, img_dets, img_labels in zip(imgs, scale_factors, dets, labels):
+            bboxes = img_dets[:, :4] / np.tile(scale_factor, 2)
+            bboxes = bbox_clip_border(bboxes, (img.shape[1], img.shape[0]))
+            results.append(DetectionResult(bboxes, img_dets[:, 4], img_labels.astype(np.int64)))
+        return results
+
+
+class ORTPoseEstimator(_ORTModel):
+    """ONNX Runtime自顶向下姿态估计后端（SimCC模型）
+
+    数据集元数据、编解码器、输入尺寸、边界框扩展系数、归一化参数和翻转测试设置
+    都从姿态模型的配置文件读取，结果与 :class:`TorchPoseEstimator` 格式相同。
+
+    Args:
+        onnx_file: ONNX模型路径，模型输入为 ``(B, 3, H, W)``，输出 ``simcc_x`` 和
+            ``simcc_y``
+        config: 姿态模型的配置文件
+        device: 推理设备，默认为 ``'cpu'``
+        num_threads: 算子内并行的线程数，0表示使用默认值
+        io_binding: 是否使用IO绑定，None时仅在GPU上使用
+        keypoint_indices: 只解码这些关键点，默认解码全部关键点
+        flip_test: 是否使用翻转测试，默认使用配置文件 ``model.test_cfg`` 中的设置
+    """
+
+    def __init__(self,
+                 onnx_file,
+                 config,
+                 device='cpu',
+                 num_threads=0,
+                 io_binding=None,
+                 keypoint_indices=None,
+                 flip_test=None):
+        super().__init__(onnx_file, device, num_threads, io_binding)
+        self.cfg = Config.fromfile(config) if isinstance(config, str) else config
+        self.dataset_meta = dataset_meta_from_config(self.cfg, dataset_mode='train')
+        self.codec = KEYPOINT_CODECS.build(self.cfg.model.head.decoder)
+        self.input_size = tuple(self.codec.input_size)
+        self.keypoint_indices = None if keypoint_indices is None else list(keypoint_indices)
+        if flip_test is None:
+            flip_test = self.cfg.model.get('test_cfg', {}).get('flip_test', False)
+        self.flip_test = flip_test
+
+        preprocessor = self.cfg.model.data_preprocessor
+        self.mean = np.array(preprocessor.mean, dtype=np.float32)
+        self.std = np.array(preprocessor.std, dtype=np.float32)
+        self.bgr_to_rgb = preprocessor.get('bgr_to_rgb', False)
+
+        self.padding = 1.25
+        self.use_udp = False
+        for transform in self.cfg.test_dataloader.dataset.pipeline:
+            if transform['type'] == 'GetBBoxCenterScale':
+                self.padding = transform.get('padding', 1.25)
+            elif transform['type'] == 'TopdownAffine':
+                self.use_udp = transform.get('use_udp', False)
+
+    def crop(self, img, bbox):
+        """按边界框裁剪并仿射变换到模型输入尺寸，返回 (裁剪图像, 中心, 尺度)"""
+        w, h = self.input_size
+        center, scale = bbox_xyxy2cs(bbox, padding=self.padding)
+        # 扩展边界框使其宽高比与模型输入一致
+        aspect_ratio = w / h
+        if scale[0] > scale[1] * aspect_ratio:
+            scale = np.array([scale[0], scale[0] / aspect_ratio], dtype=np.float32)
+        else:
+            scale = np.array([scale[1] * aspect_ratio, scale[1]], dtype=np.float32)
+        if self.use_udp:
+            warp_mat = get_udp_warp_matrix(center, scale, 0, output_size=(w, h))
+        else:
+            warp_mat = get_warp_matrix(center, scale, 0, output_size=(w, h))
+        crop = cv2.warpAffine(img, warp_mat, (int(w), int(h)), flags=cv2.INTER_LINEAR)
+        return crop, center, scale
+
+    def predict(self, inputs, batch_size=32, num_workers=0):
+        """估计每张图像中各边界框的关键点
+
+        Args:
+            inputs: ``(BGR图像, 边界框)`` 列表，边界框为空时整张图像作为一个边界框
+            batch_size: 每次前向的裁剪图像数量，默认为32
+            num_workers: 裁剪图像的线程数，默认为0
+
+        Returns:
+            list[list[PoseDataSample]]: 每张图像各边界框的结果
+        """
+        tasks = []
+        for idx, (img, bboxes) in enumerate(inputs):
+            if bboxes is None or len(bboxes) == 0:
+                bboxes = np.array([[0, 0, img.shape[1], img.shape[0]]], dtype=np.float32)
+            for bbox in np.asarray(bboxes, dtype=np.float32)[:, :4]:
+                tasks.append((idx, bbox))
+        outputs = [[] for _ in range(len(inputs))]
+        if not tasks:
+            return outputs
+
+        def crop_task(task):
+            return self.crop(inputs[task[0]][0], task[1])
+
+        if num_workers > 0:
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                crops = list(executor.map(crop_task, tasks))
+        else:
+            crops = [crop_task(task) for task in tasks]
+
+        imgs = np.stack([crop for crop, _, _ in crops]).astype(np.float32)
+        if self.bgr_to_rgb:
+            imgs = imgs[..., ::-1]
+        imgs = ((imgs - self.mean) / self.std).transpose(0, 3, 1, 2)
+        keypoints, scores = self.decode(imgs, batch_size)
+
+        # 关键点从模型输入空间变换回原图
+        centers = np.stack([center for _, center, _ in crops])[:, None]
+        scales = np.stack([scale for _, _, scale in crops])[:, None]
+        keypoints = keypoints / np.array(self.input_size, dtype=np.float32) * scales + centers - 0.5 * scales
+
+        for i, (idx, bbox) in enumerate(tasks):
+            img = inputs[idx][0]
+            outputs[idx].append(self._to_data_sample(img, bbox, centers[i, 0], scales[i, 0], keypoints[i],
+                                                     scores[i]))
+        return outputs
+
+    def decode(self, imgs, batch_size):
+        """推理并解码SimCC输出，返回模型输入空间的关键点 (N, K, 2) 和置信度 (N, K)"""
+        num_imgs = len(imgs)
+        if self.flip_test:
+            imgs = np.concatenate([imgs, imgs[..., ::-1]])
+        simcc_x, simcc_y = self.run_batches(imgs, batch_size)[:2]
+
+        if self.flip_test:
+            flip_indices = self.dataset_meta['flip_indices']
+            simcc_x_flip = simcc_x[num_imgs:, flip_indices, ::-1]
+            simcc_y_flip = simcc_y[num_imgs:, flip_indices]
+            simcc_x = (simcc_x[:num_imgs] + simcc_x_flip) * 0.5
+            simcc_y = (simcc_y[:num_imgs] + simcc_y_flip) * 0.5
+        if self.keypoint_indices is not None:
+            simcc_x = simcc_x[:, self.keypoint_indices]
+            simcc_y = simcc_y[:, self.keypoint_indices]
+
+        keypoints, scores = self.codec.decode(np.ascontiguousarray(simcc_x), np.ascontiguousarray(simcc_y))
+        if isinstance(scores, tuple):
+            scores = scores[0]
+        return keypoints.astype(np.float32), scores.astype(np.float32)
+
+    def _to_data_sample(self, img, bbox, center, scale, keypoints, scores):
+        bbox_score = np.ones(1, dtype=np.float32)
+        data_sample = PoseDataSample(
+            metainfo=dict(
+                img_shape=img.shape[:2],
+                ori_shape=img.shape[:2],
+                input_size=self.input_size,
+                input_center=center,
+                input_scale=scale,
+                flip_indices=self.dataset_meta['flip_indices']))
+        data_sample.gt_instances = InstanceData(
+            bboxes=bbox[None], bbox_scores=bbox_score, bbox_centers=center[None], bbox_scales=scale[None])
+        data_sample.pred_instances = InstanceData(
+            keypoints=keypoints[None],
+            keypoint_scores=scores[None],
+            keypoints_visible=scores[None],
+            bboxes=bbox[None],
+            bbox_scores=bbox_score)
+        return data_sample
+
+
+def build_detector(args):
+    """按 ``args.backend`` 构建人体检测器"""
+    if getattr(args, 'backend', 'pytorch') == 'onnxruntime':
+        return ORTDetector(
+            args.det_onnx,
+            device=args.device,
+            num_threads=getattr(args, 'ort_num_threads', 0),
+            io_binding=getattr(args, 'ort_io_binding', None))
+    return TorchDetector(args.det_config, args.det_checkpoint, device=args.device)
+
+
+def build_pose_estimator(args):
+    """按 ``args.backend`` 构建姿态估计器"""
+    if getattr(args, 'backend', 'pytorch') == 'onnxruntime':
+        return ORTPoseEstimator(
+            args.pose_onnx,
+            args.pose_config,
+            device=args.device,
+            num_threads=getattr(args, 'ort_num_threads', 0),
+            io_binding=getattr(args, 'ort_io_binding', None),
+            keypoint_indices=getattr(args, 'pose_keypoint_indices', None))
+    return TorchPoseEstimator(args.pose_config, args.pose_checkpoint, device=args.device, test_cfg=pose_test_cfg(args))
+
+
+def export_pose_onnx(config, checkpoint, output_file, batch_size=None, opset_version=17):
+    """将SimCC姿态模型导出为ONNX Runtime后端使用的ONNX模型
+
+    Args:
+        config: 姿态模型的配置文件
+        checkpoint: 模型权重
+        output_file: 输出的ONNX模型路径
+        batch_size: 固定的批次大小，默认导出动态批次
+        opset_version: ONNX算子集版本，默认为17
+    """
+    import torch
+
+    model = init_model(config, checkpoint, device='cpu')
+
+    class SimCCOutputs(torch.nn.Module):
+        """只保留骨干网络和模型头的前向计算，输出 (simcc_x, simcc_y)"""
+
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, inputs):
+            return self.model._forward(inputs)
+
+    w, h = model.cfg.codec.input_size
+    dummy = torch.zeros(batch_size or 1, 3, h, w)
+    dynamic_axes = None
+    if batch_size is None:
+        dynamic_axes = {name: {0: 'batch'} for name in ('input', 'simcc_x', 'simcc_y')}
+    # 新版本PyTorch默认使用dynamo导出，这里使用支持dynamic_axes的TorchScript导出
+    export_kwargs = dict(dynamo=False) if 'dynamo' in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            SimCCOutputs(model).eval(),
+            dummy,
+            output_file,
+            input_names=['input'],
+            output_names=['simcc_x', 'simcc_y'],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset_version,
+            **export_kwargs)
+    return output_file
+
+
+def main():
+    parser = ArgumentParser(description='将SimCC姿态模型导出为ONNX Runtime后端使用的ONNX模型')
+    parser.add_argument('config', help='姿态模型的配置文件')
+    parser.add_argument('checkpoint', help='模型权重')
+    parser.add_argument('output', help='输出的ONNX模型路径')
+    parser.add_argument('--batch-size', type=int, default=None, help='固定的批次大小，默认导出动态批次')
+    parser.add_argument('--opset', type=int, default=17, help='ONNX算子集版本')
+    cli_args = parser.parse_args()
+    print(f'已导出: {export_pose_onnx(cli_args.config, cli_args.checkpoint, cli_args.output, cli_args.batch_size, cli_args.opset)}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from config import LEFT_HIP_IDX, LEFT_SHOULDER_IDX, NOSE_IDX, RIGHT_HIP_IDX, RIGHT_SHOULDER_IDX
+
+# 各关键点布局需要移除的关键点索引，键为关键点数量
+# COCO-17: 移除双眼
+# Halpe-26: 移除双眼，保留头顶、颈部、髋部中心和足部关键点
+# COCO-WholeBody/RTMW-133: 移除双眼、除鼻子和耳朵外的面部关键点(23-90)和手部关键点(91-132)
+KEYPOINT_LAYOUT_REMOVED = {
+    17: (1, 2),
+    26: (1, 2),
+    133: (1, 2) + tuple(range(23, 133)),
+}
+
+# 未知布局按全身关键点的规则移除（超出关键点数量的索引被忽略）
+DEFAULT_REMOVED = KEYPOINT_LAYOUT_REMOVED[133]
+
+
+@lru_cache(maxsize=None)
+def get_keep_mask(num_keypoints):
+    """返回指定关键点数量的布局中需要保留的关键点的布尔掩码，形状为(K,)
+
+    掩码按关键点数量缓存，每种布局只构建一次，不要原地修改返回值。
+    """
+    removed = KEYPOINT_LAYOUT_REMOVED.get(num_keypoints, DEFAULT_REMOVED)
+    keep = np.ones(num_keypoints, dtype=bool)
+    keep[[idx for idx in removed if idx < num_keypoints]] = False
+    return keep
+
+
+# 由已有关键点加权组合得到的派生关键点
+# weights为 (关键点索引, 权重) 的元组，option为控制是否添加该关键点的配置项名称
+DerivedKeypoint = namedtuple('DerivedKeypoint', ['name', 'weights', 'option'])
+
+
+def midpoint(idx1, idx2):
+    """两个关键点连线中点的权重"""
+    return ((idx1, 0.5), (idx2, 0.5))
+
+
+def interpolate(start, end, ratio):
+    """从 ``start`` 到 ``end`` 按 ``ratio`` 插值的权重，起止点均为 (索引, 权重) 元组"""
+    weights = {}
+    for idx, w in start:
+        weights[idx] = weights.get(idx, 0.0) + w * (1 - ratio)
+    for idx, w in end:
+        weights[idx] = weights.get(idx, 0.0) + w * ratio
+    return tuple(weights.items())
+
+
+# 自定义关键点，顺序与batch_analysis中的ILIAC_MIDPOINT_IDX、NECK_MIDPOINT_IDX一致
+DERIVED_KEYPOINTS = (
+    # 髂前上棘连线中点：左右髋部的中点
+    DerivedKeypoint('iliac_midpoint', midpoint(LEFT_HIP_IDX, RIGHT_HIP_IDX), 'draw_iliac_midpoint'),
+    # 颈椎中点（喉结处）：在肩膀中点到鼻子连线的下三分之一处
+    DerivedKeypoint('neck_midpoint', interpolate(midpoint(LEFT_SHOULDER_IDX, RIGHT_SHOULDER_IDX), ((NOSE_IDX, 1.0), ),
+                                                 1 / 3), 'draw_neck_midpoint'),
+)
+
+
+@lru_cache(maxsize=None)
+def _derived_matrices(derived, num_keypoints):
+    weights = np.zeros((len(derived), num_keypoints), dtype=np.float64)
+    components = np.zeros((len(derived), num_keypoints), dtype=bool)
+    for i, item in enumerate(derived):
+        for idx, w in item.weights:
+            weights[i, idx] = w
+            components[i, idx] = True
+    return weights, components
+
+
+def derive_keypoints(keypoints, keypoint_scores, derived=DERIVED_KEYPOINTS, kpt_thr=0.5):
+    """批量计算派生关键点
+
+    所有派生关键点的权重组成一个(D, K)矩阵，一次矩阵乘法得到所有实例的派生
+    关键点。组成关键点的置信度都高于 ``kpt_thr`` 时派生关键点有效，置信度为
+    组成关键点置信度的平均值。
+
+    Args:
+        keypoints: 关键点坐标，形状为(N, K, 2)
+        keypoint_scores: 关键点置信度，形状为(N, K)
+        derived: 派生关键点定义，默认为 :data:`DERIVED_KEYPOINTS`
+        kpt_thr: 关键点有效阈值，默认为0.5
+
+    Returns:
+        tuple:
+        - np.ndarray: 派生关键点坐标，形状为(N, D, 2)
+        - np.ndarray: 派生关键点置信度，形状为(N, D)
+        - np.ndarray: 派生关键点是否有效，形状为(N, D)
+    """
+    keypoints = np.asarray(keypoints)
+    keypoint_scores = np.asarray(keypoint_scores)
+    weights, components = _derived_matrices(tuple(derived), keypoints.shape[1])
+
+    points = np.einsum('dk,nkc->ndc', weights.astype(keypoints.dtype, copy=False), keypoints)
+    counts = components.sum(axis=1)
+    scores = keypoint_scores @ components.T.astype(keypoint_scores.dtype) / counts.astype(keypoint_scores.dtype)
+    valid = ((keypoint_scores > kpt_thr)[:, None, :] | ~components).all(axis=2)
+    return points, scores, valid
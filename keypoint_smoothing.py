@@ -0,0 +1,294 @@
+import numpy as np
+
+from mmpose.evaluation.functional import oks_matrix
+
+
+class OneEuroFilter:
+    """向量化的One-Euro滤波器
+
+    低速时截止频率低、抑制抖动，高速时截止频率随速度升高、减少延迟。
+    状态以与输入同形状的数组保存，一次处理所有实例的所有关键点。
+
+    Args:
+        min_cutoff: 最小截止频率(Hz)，越小越平滑，默认为1.0
+        beta: 速度系数（坐标单位为像素），越大快速运动时延迟越小，默认为0.05
+        d_cutoff: 速度估计的截止频率(Hz)，默认为1.0
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self.x = None
+        self.dx = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * np.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def __call__(self, x, valid, dt):
+        if self.x is None:
+            self.x = x.copy()
+            self.dx = np.zeros_like(x)
+            return x.copy()
+        dx = (x - self.x) / dt
+        dx_hat = self.dx + self._alpha(self.d_cutoff, dt) * (dx - self.dx)
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        x_hat = self.x + self._alpha(cutoff, dt) * (x - self.x)
+
+        # 无效关键点不更新状态
+        self.x = np.where(valid, x_hat, self.x)
+        self.dx = np.where(valid, dx_hat, self.dx)
+        return np.where(valid, x_hat, x)
+
+
+class KalmanFilter:
+    """向量化的匀速模型卡尔曼滤波器
+
+    每个坐标分量独立建模为 [位置, 速度] 状态，协方差矩阵的三个独立元素
+    以数组保存，预测和更新均为逐元素的数组运算。
+
+    Args:
+        process_noise: 过程噪声（加速度）强度，越大越跟随观测，默认为1000.0
+        measurement_noise: 观测噪声方差（像素^2），越大越平滑，默认为4.0
+    """
+
+    def __init__(self, process_noise=1000.0, measurement_noise=4.0):
+        self.q = process_noise
+        self.r = measurement_noise
+        self.reset()
+
+    def reset(self):
+        self.p = None
+
+    def __call__(self, x, valid, dt):
+        if self.p is None:
+            self.p = x.copy()
+            self.v = np.zeros_like(x)
+            self.p00 = np.full_like(x, self.r)
+            self.p01 = np.zeros_like(x)
+            self.p11 = np.full_like(x, self.q)
+            return x.copy()
+
+        # 预测
+        p = self.p + self.v * dt
+        p00 = self.p00 + dt * (2 * self.p01 + dt * self.p11) + self.q * dt**3 / 3
+        p01 = self.p01 + dt * self.p11 + self.q * dt**2 / 2
+        p11 = self.p11 + self.q * dt
+
+        # 更新
+        s = p00 + self.r
+        k0 = p00 / s
+        k1 = p01 / s
+        y = x - p
+        new_p = p + k0 * y
+        new_v = self.v + k1 * y
+
+        # 无效关键点只做预测，不使用观测
+        self.p = np.where(valid, new_p, p)
+        self.v = np.where(valid, new_v, self.v)
+        self.p00 = np.where(valid, (1 - k0) * p00, p00)
+        self.p01 = np.where(valid, (1 - k0) * p01, p01)
+        self.p11 = np.where(valid, p11 - k1 * p01, p11)
+        return np.where(valid, new_p, x)
+
+
+class SavgolFilter:
+    """因果Savitzky-Golay滤波器
+
+    对最近 ``window`` 帧拟合 ``polyorder`` 阶多项式并取当前帧的值，卷积
+    系数预先计算。假设帧间隔均匀，历史不足一个窗口时使用已有的帧。
+
+    Args:
+        window: 窗口长度（帧数），默认为7
+        polyorder: 多项式阶数，默认为2
+    """
+
+    def __init__(self, window=7, polyorder=2):
+        assert window > polyorder, 'window必须大于polyorder'
+        self.window = window
+        self.polyorder = polyorder
+        self._coeffs = {}
+        self.reset()
+
+    def reset(self):
+        self.history = None
+        self.size = 0
+
+    def _get_coeffs(self, n):
+        """n帧历史（从旧到新）在最新一帧处的拟合系数"""
+        if n not in self._coeffs:
+            order = min(self.polyorder, n - 1)
+            t = np.arange(-(n - 1), 1, dtype=np.float64)
+            vander = np.vander(t, order + 1, increasing=True)
+            self._coeffs[n] = np.linalg.pinv(vander)[0]
+        return self._coeffs[n]
+
+    def __call__(self, x, valid, dt):
+        if self.history is None:
+            self.history = np.empty((self.window, ) + x.shape, dtype=x.dtype)
+            self.size = 0
+        # 无效关键点沿用上一帧的值
+        if self.size > 0:
+            x_in = np.where(valid, x, self.history[-1])
+        else:
+            x_in = x
+        self.history = np.roll(self.history, -1, axis=0)
+        self.history[-1] = x_in
+        self.size = min(self.size + 1, self.window)
+
+        coeffs = self._get_coeffs(self.size)
+        smoothed = np.tensordot(coeffs, self.history[-self.size:], axes=1)
+        return np.where(valid, smoothed, x)
+
+
+SMOOTHING_FILTERS = {
+    'one_euro': OneEuroFilter,
+    'kalman': KalmanFilter,
+    'savgol': SavgolFilter,
+}
+
+
+class KeypointSmoother:
+    """有状态的关键点时间平滑器
+
+    平滑状态按跟踪序号保存，而不是按实例在 ``pred_instances`` 中的顺序：
+    每帧先用 :func:`mmpose.evaluation.functional.oks_matrix` 计算当前实例与
+    已有轨迹上一帧关键点的OKS，按OKS从高到低贪心匹配，OKS低于 ``oks_thr``
+    的实例开始新的轨迹。因此检测器调整实例顺序或有人离开画面时，不会把一个
+    人的历史混入另一个人的关键点。每条轨迹的滤波器对该实例的所有关键点做
+    一次数组运算。置信度不高于 ``kpt_thr`` 的关键点不参与平滑，保持原始输出。
+
+    Args:
+        method: 平滑方法，可选 ``'one_euro'``、``'kalman'`` 和 ``'savgol'``
+        kpt_thr: 参与平滑和匹配的关键点置信度阈值，默认为0.3
+        max_dt: 轨迹超过该时间（秒）未匹配到实例时删除，默认为1.0
+        oks_thr: 实例与轨迹匹配的最小OKS，默认为0.3
+        sigmas: 计算OKS的关键点sigma，形状为(K,)。默认所有关键点使用0.07
+        **kwargs: 传给对应滤波器的参数
+    """
+
+    def __init__(self,
+                 method='one_euro',
+                 kpt_thr=0.3,
+                 max_dt=1.0,
+                 oks_thr=0.3,
+                 sigmas=None,
+                 **kwargs):
+        if method not in SMOOTHING_FILTERS:
+            raise ValueError(f'不支持的平滑方法: {method}，可选 {list(SMOOTHING_FILTERS)}')
+        self.method = method
+        self.kpt_thr = kpt_thr
+        self.max_dt = max_dt
+        self.oks_thr = oks_thr
+        self.sigmas = sigmas
+        self.filter_kwargs = kwargs
+        self.reset()
+
+    def reset(self):
+        """清空所有跟踪状态"""
+        self._tracks = {}
+        self._next_track_id = 0
+        self._num_keypoints = None
+        self.track_ids = []
+
+    def _match(self, keypoints, keypoint_scores):
+        """按OKS将当前实例贪心匹配到已有轨迹
+
+        Returns:
+            list: 每个实例匹配到的轨迹序号，未匹配的实例为None
+        """
+        matches = [None] * len(keypoints)
+        if not self._tracks:
+            return matches
+        track_ids = list(self._tracks)
+        kpts = np.concatenate([keypoints, keypoint_scores[..., None]], axis=-1)
+        last_kpts = np.stack([self._tracks[i]['keypoints'] for i in track_ids])
+        areas = np.array([self._tracks[i]['area'] for i in track_ids])
+        sigmas = self.sigmas
+        if sigmas is None:
+            sigmas = np.full(keypoints.shape[1], 0.07)
+        oks = oks_matrix(kpts, last_kpts, self._areas(keypoints, keypoint_scores), areas, sigmas, self.kpt_thr)
+
+        used = set()
+        for idx in np.argsort(-oks, axis=None):
+            n, m = np.unravel_index(idx, oks.shape)
+            if oks[n, m] < self.oks_thr:
+                break
+            if matches[n] is None and m not in used:
+                matches[n] = track_ids[m]
+                used.add(m)
+        return matches
+
+    def _areas(self, keypoints, keypoint_scores):
+        """有效关键点外接框的面积，用于OKS的尺度归一化"""
+        valid = keypoint_scores > self.kpt_thr
+        # 没有有效关键点的实例使用全部关键点
+        valid[~valid.any(axis=1)] = True
+        masked = np.where(valid[..., None], keypoints, np.nan)
+        size = np.nanmax(masked, axis=1) - np.nanmin(masked, axis=1)
+        return np.maximum(size[:, 0] * size[:, 1], 1.0)
+
+    def __call__(self, keypoints, keypoint_scores, timestamp):
+        """平滑一帧的关键点
+
+        Args:
+            keypoints: 关键点坐标，形状为(N, K, 2)
+            keypoint_scores: 关键点置信度，形状为(N, K)
+            timestamp: 帧时间戳（秒）
+
+        Returns:
+            np.ndarray: 平滑后的关键点坐标，形状与输入相同。各实例对应的
+            轨迹序号保存在 ``track_ids`` 中
+        """
+        keypoints = np.asarray(keypoints)
+        if keypoints.size == 0:
+            self.reset()
+            return keypoints
+        if self._num_keypoints != keypoints.shape[1]:
+            self.reset()
+            self._num_keypoints = keypoints.shape[1]
+
+        # 删除长时间未匹配或时间戳回退的轨迹
+        self._tracks = {
+            track_id: track
+            for track_id, track in self._tracks.items()
+            if 0 < timestamp - track['timestamp'] <= self.max_dt
+        }
+
+        x = keypoints.astype(np.float64)
+        keypoint_scores = np.asarray(keypoint_scores, dtype=np.float64)
+        valid = (keypoint_scores > self.kpt_thr)[..., None]
+        areas = self._areas(x, keypoint_scores)
+        smoothed = np.empty_like(x)
+        self.track_ids = []
+        for i, track_id in enumerate(self._match(x, keypoint_scores)):
+            if track_id is None:
+                track_id = self._next_track_id
+                self._next_track_id += 1
+                track = dict(filter=SMOOTHING_FILTERS[self.method](**self.filter_kwargs))
+                dt = 1.0
+            else:
+                track = self._tracks[track_id]
+                dt = timestamp - track['timestamp']
+            smoothed[i] = track['filter'](x[i], valid[i], dt)
+            track.update(
+                keypoints=np.concatenate([x[i], keypoint_scores[i, :, None]], axis=-1),
+                area=areas[i],
+                timestamp=timestamp)
+            self._tracks[track_id] = track
+            self.track_ids.append(track_id)
+        return smoothed.astype(keypoints.dtype)
+
+    def smooth_data_samples(self, data_samples, timestamp):
+        """原地平滑 ``PoseDataSample`` 中所有实例的关键点"""
+        pred_instances = getattr(data_samples, 'pred_instances', None)
+        if pred_instances is None or len(pred_instances) == 0:
+            self.reset()
+            return data_samples
+        pred_instances.keypoints = self(pred_instances.keypoints, pred_instances.keypoint_scores, timestamp)
+        return data_samples
@@ -0,0 +1,483 @@
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from config import (LEFT_ANKLE_IDX, RIGHT_ANKLE_IDX, LEFT_KNEE_IDX, RIGHT_KNEE_IDX, LEFT_HIP_IDX, RIGHT_HIP_IDX,
+                    LEFT_SHOULDER_IDX, RIGHT_SHOULDER_IDX, NOSE_IDX, NORMAL_RANGES, STEP_WIDTH_RANGES,
+                    STEP_LENGTH_SYMMETRY_RANGES, PELVIC_ROTATION_RANGES, KNEE_FLEXION_RANGES,
+                    ANKLE_FLEXION_RANGES, WEIGHT_SHIFT_RANGES)
+
+LEFT_EAR_IDX = 3
+RIGHT_EAR_IDX = 4
+
+# ---------------------------------------------------------------------------
+# 正常范围和异常程度
+# ---------------------------------------------------------------------------
+
+# 数值范围，low_closed/high_closed表示是否包含端点
+NumericRange = namedtuple('NumericRange', ['low', 'high', 'low_closed', 'high_closed'])
+
+
+@lru_cache(maxsize=None)
+def parse_range(range_str):
+    """解析正常范围字符串，每个字符串只解析一次
+
+    Args:
+        range_str: 正常范围字符串，格式如"0°～5°", ">65°", "<39°", "0%～35%"等
+
+    Returns:
+        NumericRange: 数值范围，无法解析时为None
+    """
+    if not range_str:
+        return None
+    if '～' in range_str:
+        parts = range_str.replace('°', '').split('～')
+        return NumericRange(float(parts[0].replace('%', '')), float(parts[1].replace('%', '')), True, True)
+    if '<' in range_str:
+        return NumericRange(-np.inf, float(range_str.replace('<', '').replace('°', '').replace('%', '')), False, False)
+    if '>' in range_str:
+        return NumericRange(float(range_str.replace('>', '').replace('°', '').replace('%', '')), np.inf, False, False)
+    return None
+
+
+def in_range(values, value_range):
+    """批量检查数值是否在范围内
+
+    Args:
+        values: 数值或数值数组，NaN视为不在范围内
+        value_range: :class:`NumericRange` 或正常范围字符串
+
+    Returns:
+        np.ndarray: 与 ``values`` 形状相同的布尔数组
+    """
+    if isinstance(value_range, str):
+        value_range = parse_range(value_range)
+    values = np.asarray(values, dtype=np.float64)
+    if value_range is None:
+        return np.zeros(values.shape, dtype=bool)
+    low, high, low_closed, high_closed = value_range
+    above = values >= low if low_closed else values > low
+    below = values <= high if high_closed else values < high
+    return above & below
+
+
+# 异常程度，按 ``config.get_severity_level`` 的判断顺序排列，最后一级为兜底
+SEVERITY_LEVELS = ('正常', '轻度异常', '中度异常', '重度异常')
+SEVERITY_KEYS = ('normal', 'mild', 'moderate')
+
+
+@lru_cache(maxsize=None)
+def _compile_severity(ranges):
+    """将异常程度配置转换为(L, 2)的闭区间边界数组，缺少的等级为空区间"""
+    ranges = dict(ranges)
+    bounds = np.empty((len(SEVERITY_KEYS), 2), dtype=np.float64)
+    for i, key in enumerate(SEVERITY_KEYS):
+        bounds[i] = ranges[key] if ranges.get(key) else (np.inf, -np.inf)
+    return bounds
+
+
+def severity_codes(values, ranges):
+    """批量计算异常程度，与 ``config.get_severity_level`` 的判断一致
+
+    Args:
+        values: 数值或数值数组
+        ranges: 异常程度配置，如 ``config.STEP_WIDTH_RANGES``
+
+    Returns:
+        np.ndarray: :data:`SEVERITY_LEVELS` 中的等级序号，NaN处为-1
+    """
+    values = np.asarray(values, dtype=np.float64)
+    bounds = _compile_severity(tuple(ranges.items()))
+    hits = (values[..., None] >= bounds[:, 0]) & (values[..., None] <= bounds[:, 1])
+    # 第一个命中的等级，都不命中时为最后一级
+    codes = np.where(hits.any(axis=-1), hits.argmax(axis=-1), len(SEVERITY_KEYS))
+    return np.where(np.isnan(values), -1, codes)
+
+
+def severity_labels(values, ranges):
+    """批量计算异常程度名称，NaN处为None"""
+    codes = severity_codes(values, ranges)
+    labels = np.empty(codes.shape, dtype=object)
+    labels[...] = None
+    valid = codes >= 0
+    labels[valid] = np.asarray(SEVERITY_LEVELS, dtype=object)[codes[valid]]
+    return labels
+
+
+# ---------------------------------------------------------------------------
+# 几何计算
+# ---------------------------------------------------------------------------
+
+
+def calculate_angle_batch(p1, p2, p3=None):
+    """批量计算两点或三点之间的角度（度）
+
+    两个点时计算p1→p2与水平线的夹角；三个点时计算p1-p2-p3的有向夹角，
+    范围为[0, 360)。
+
+    Args:
+        p1, p2, p3: 形状为(..., 2)的点坐标数组
+
+    Returns:
+        np.ndarray: 形状为(...)的角度数组
+    """
+    if p3 is None:
+        d = (p2 - p1).astype(np.float64)
+        return np.degrees(np.arctan2(d[..., 1], d[..., 0]))
+    d1 = (p1 - p2).astype(np.float64)
+    d3 = (p3 - p2).astype(np.float64)
+    ang = np.degrees(np.arctan2(d3[..., 1], d3[..., 0]) - np.arctan2(d1[..., 1], d1[..., 0]))
+    return np.where(ang < 0, ang + 360, ang)
+
+
+def calculate_joint_angle_batch(p1, p2, p3):
+    """批量计算p1-p2-p3在p2处的无向夹角（度），范围为[0, 180]"""
+    v1 = p1 - p2
+    v2 = p3 - p2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cosine = (v1 * v2).sum(-1) / (np.linalg.norm(v1, axis=-1) * np.linalg.norm(v2, axis=-1))
+    return np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+
+def calculate_distance_batch(p1, p2):
+    """批量计算两点之间的欧几里得距离"""
+    return np.linalg.norm((p2 - p1).astype(np.float64), axis=-1)
+
+
+def fold_horizontal(angle):
+    """将与水平线的夹角折叠为偏离水平线的角度，范围为[0, 90]"""
+    angle = np.abs(angle)
+    return np.abs(np.where(angle <= 90, angle, 180 - angle))
+
+
+def _distance_asymmetry(center, p1, p2):
+    d1 = calculate_distance_batch(center, p1)
+    d2 = calculate_distance_batch(center, p2)
+    return np.abs(d1 - d2) / ((d1 + d2) / 2)
+
+
+def _line_angle_diff(p1, p2, p3, p4):
+    return calculate_angle_batch(p1, p2) - calculate_angle_batch(p3, p4)
+
+
+def _distance_ratio(p1, p2, p3, p4):
+    return calculate_distance_batch(p1, p2) / calculate_distance_batch(p3, p4)
+
+
+def _delta_y(point, prev_point):
+    return np.abs(point[..., 1].astype(np.float64) - prev_point[..., 1].astype(np.float64))
+
+
+def _delta_y_asymmetry(p1, p2, prev_p1, prev_p2):
+    return np.abs(_delta_y(p1, prev_p1) - _delta_y(p2, prev_p2))
+
+
+# 公式类型：(计算函数, 当前帧点数, 是否使用上一帧的同名点)
+# 使用上一帧时，计算函数的参数为当前帧的点之后依次跟上一帧的点
+METRIC_KINDS = {
+    'line_angle': (calculate_angle_batch, 2, False),  # p1→p2与水平线的夹角
+    'angle3': (calculate_angle_batch, 3, False),  # p1-p2-p3的有向夹角
+    'joint_angle': (calculate_joint_angle_batch, 3, False),  # p1-p2-p3的无向夹角
+    'line_angle_diff': (_line_angle_diff, 4, False),  # 两条线与水平线夹角之差
+    'distance': (calculate_distance_batch, 2, False),  # 两点距离
+    'distance_ratio': (_distance_ratio, 4, False),  # 两段距离之比
+    'distance_asymmetry': (_distance_asymmetry, 3, False),  # 中心点到两点距离的相对差异
+    'delta_y': (_delta_y, 1, True),  # 与上一帧的Y坐标变化量
+    'delta_y_asymmetry': (_delta_y_asymmetry, 2, True),  # 两个点Y坐标变化量之差
+}
+
+# 后处理操作，按顺序作用于公式结果
+METRIC_OPS = {
+    'abs': lambda x: np.abs(x),
+    'fold': fold_horizontal,
+    'add': lambda x, c: x + c,
+    'mul': lambda x, c: x * c,
+    'rsub': lambda x, c: c - x,
+}
+
+# ---------------------------------------------------------------------------
+# 指标声明
+# ---------------------------------------------------------------------------
+
+# 命名点：关键点索引、两个命名点的中点或外部提供的点（如自定义关键点）
+KEYPOINT_NAMES = {
+    'nose': NOSE_IDX,
+    'left_ear': LEFT_EAR_IDX,
+    'right_ear': RIGHT_EAR_IDX,
+    'left_shoulder': LEFT_SHOULDER_IDX,
+    'right_shoulder': RIGHT_SHOULDER_IDX,
+    'left_hip': LEFT_HIP_IDX,
+    'right_hip': RIGHT_HIP_IDX,
+    'left_knee': LEFT_KNEE_IDX,
+    'right_knee': RIGHT_KNEE_IDX,
+    'left_ankle': LEFT_ANKLE_IDX,
+    'right_ankle': RIGHT_ANKLE_IDX,
+}
+
+MIDPOINT_NAMES = {
+    'shoulder_mid': ('left_shoulder', 'right_shoulder'),
+    'hip_mid': ('left_hip', 'right_hip'),
+    'ankle_mid': ('left_ankle', 'right_ankle'),
+}
+
+# 指标声明
+#   name: 指标名称
+#   kind: METRIC_KINDS中的公式类型
+#   points: 公式使用的命名点
+#   ops: 后处理操作，如 (('add', -90), ('abs', ))
+#   fallback: 主要的点无效时改用的命名点（如左侧无效时使用右侧），可为None
+#   prev_points: 要求在上一帧有效的命名点，只用于时间相关的公式
+#   normal_range: 正常范围字符串，来自config.NORMAL_RANGES，可为None
+#   severity: (异常程度配置, 判断前的后处理操作)，可为None
+MetricSpec = namedtuple('MetricSpec',
+                        ['name', 'kind', 'points', 'ops', 'fallback', 'prev_points', 'normal_range', 'severity'])
+
+
+def metric(name, kind, points, ops=(), fallback=None, prev_points=(), normal_range=None, severity=None):
+    """声明一个指标，``normal_range`` 默认取 ``config.NORMAL_RANGES`` 中的同名项"""
+    if kind not in METRIC_KINDS:
+        raise ValueError(f'不支持的指标公式类型: {kind}')
+    if normal_range is None:
+        normal_range = NORMAL_RANGES.get(name)
+    return MetricSpec(name, kind, tuple(points), tuple(ops), fallback and tuple(fallback), tuple(prev_points),
+                      normal_range, severity)
+
+
+_LEG_POINTS = ('left_knee', 'right_knee', 'left_ankle', 'right_ankle')
+
+# 体态指标，顺序与analyze_body_posture的结果一致
+POSTURE_METRIC_SPECS = (
+    metric('头前倾角', 'line_angle', ('nose', 'neck_midpoint'), (('add', -90), ('abs', ))),
+    metric('头侧倾角', 'line_angle', ('left_ear', 'right_ear'), (('fold', ), )),
+    metric('头旋转角', 'distance_asymmetry', ('nose', 'left_ear', 'right_ear'), (('mul', 45), )),
+    metric('肩倾斜角', 'line_angle', ('left_shoulder', 'right_shoulder'), (('fold', ), )),
+    metric('圆肩角', 'angle3', ('shoulder_mid', 'neck_midpoint', 'nose')),
+    metric('背部角', 'angle3', ('left_shoulder', 'left_hip', 'left_knee'),
+           fallback=('right_shoulder', 'right_hip', 'right_knee')),
+    metric('腹部肥胖度', 'distance_ratio', ('left_hip', 'right_hip', 'left_shoulder', 'right_shoulder'),
+           (('mul', 100), ('add', -65))),
+    metric('腰曲度', 'line_angle', ('neck_midpoint', 'iliac_midpoint'), (('add', -90), ('abs', ))),
+    metric('骨盆前倾角', 'line_angle', ('hip_mid', 'iliac_midpoint'), (('add', -90), )),
+    metric('侧中位度', 'angle3', ('left_shoulder', 'left_hip', 'left_ankle'), (('rsub', 180), ),
+           fallback=('right_shoulder', 'right_hip', 'right_ankle')),
+    metric('腿型-左腿', 'angle3', ('left_hip', 'left_knee', 'left_ankle')),
+    metric('腿型-右腿', 'angle3', ('right_hip', 'right_knee', 'right_ankle')),
+    metric('左膝评估角', 'angle3', ('left_hip', 'left_knee', 'left_ankle'), (('rsub', 180), )),
+    metric('右膝评估角', 'angle3', ('right_hip', 'right_knee', 'right_ankle'), (('rsub', 180), )),
+    metric('身体倾斜度', 'line_angle', ('neck_midpoint', 'iliac_midpoint'), (('add', -90), ('abs', ))),
+    metric('足八角', 'line_angle_diff', ('left_knee', 'left_ankle', 'right_knee', 'right_ankle'), (('abs', ), )),
+)
+
+# 步态数值指标，与gait_analysis.analyze_gait_metrics的数值结果一致
+GAIT_METRIC_SPECS = (
+    metric('step_width', 'distance', ('left_ankle', 'right_ankle'), severity=(STEP_WIDTH_RANGES, ())),
+    # 步长：上一帧膝踝关键点全部有效时计算，步长状态由左右步长的平均值判断
+    metric('left_step_length', 'delta_y', ('left_ankle', ), prev_points=_LEG_POINTS),
+    metric('right_step_length', 'delta_y', ('right_ankle', ), prev_points=_LEG_POINTS),
+    metric('step_symmetry', 'delta_y_asymmetry', ('left_ankle', 'right_ankle'), prev_points=_LEG_POINTS,
+           severity=(STEP_LENGTH_SYMMETRY_RANGES, ())),
+    metric('pelvic_rotation', 'line_angle', ('left_hip', 'right_hip'),
+           severity=(PELVIC_ROTATION_RANGES, (('abs', ), ))),
+    metric('left_knee_angle', 'joint_angle', ('left_hip', 'left_knee', 'left_ankle'),
+           severity=(KNEE_FLEXION_RANGES, (('add', -180), ('abs', )))),
+    metric('right_knee_angle', 'joint_angle', ('right_hip', 'right_knee', 'right_ankle'),
+           severity=(KNEE_FLEXION_RANGES, (('add', -180), ('abs', )))),
+    metric('left_ankle_angle', 'line_angle', ('left_knee', 'left_ankle'),
+           severity=(ANKLE_FLEXION_RANGES, (('add', -90), ('abs', )))),
+    metric('right_ankle_angle', 'line_angle', ('right_knee', 'right_ankle'),
+           severity=(ANKLE_FLEXION_RANGES, (('add', -90), ('abs', )))),
+    # 身体重心转移（占左右脚踝距离的百分比）
+    metric('weight_shift', 'distance_ratio', ('hip_mid', 'ankle_mid', 'left_ankle', 'right_ankle'),
+           (('mul', 100), ), severity=(WEIGHT_SHIFT_RANGES, ())),
+)
+
+
+def apply_ops(values, ops):
+    """依次对数值应用后处理操作"""
+    for op in ops:
+        values = METRIC_OPS[op[0]](values, *op[1:])
+    return values
+
+
+# ---------------------------------------------------------------------------
+# 编译后的求值器
+# ---------------------------------------------------------------------------
+
+
+class MetricEvaluator:
+    """编译后的指标求值器
+
+    构建时把所有指标声明编译为命名点的索引数组：同一公式类型的指标（包括
+    左右侧回退）堆叠在一起，用一次数组运算计算所有帧的所有同类指标；每个
+    指标依赖的命名点组成一个布尔矩阵，有效掩码由一次数组比较得到。正常范围
+    字符串在构建时解析为数值边界。
+
+    Args:
+        specs: 指标声明序列，见 :func:`metric`
+        extra_points: 由调用方提供坐标的命名点名称，如自定义关键点
+    """
+
+    def __init__(self, specs, extra_points=()):
+        self.specs = tuple(specs)
+        self.names = tuple(spec.name for spec in self.specs)
+        self.extra_points = tuple(extra_points)
+
+        # 所有命名点：关键点、外部点、中点
+        self.point_names = list(KEYPOINT_NAMES) + list(self.extra_points) + list(MIDPOINT_NAMES)
+        self._point_index = {name: i for i, name in enumerate(self.point_names)}
+        self._keypoint_indices = np.array(list(KEYPOINT_NAMES.values()))
+        self._midpoints = np.array([[self._point_index[a], self._point_index[b]] for a, b in MIDPOINT_NAMES.values()])
+
+        # 每个(指标, 主要/回退)为一行，按公式类型分组
+        rows = []
+        for m, spec in enumerate(self.specs):
+            rows.append((m, spec.kind, spec.points, spec.prev_points))
+            if spec.fallback:
+                rows.append((m, spec.kind, spec.fallback, spec.prev_points))
+        self.num_rows = len(rows)
+        row_metric = [row[0] for row in rows]
+        self._metric_rows = [[r for r, m_ in enumerate(row_metric) if m_ == m] for m in range(len(self.specs))]
+
+        num_points = len(self.point_names)
+        self._requires = np.zeros((len(rows), num_points), dtype=bool)
+        self._requires_prev = np.zeros((len(rows), num_points), dtype=bool)
+        self._groups = {}
+        for r, (_, kind, points, prev_points) in enumerate(rows):
+            indices = [self._point_index[name] for name in points]
+            # 时间相关的公式只要求上一帧的点有效
+            _, num_args, uses_prev = METRIC_KINDS[kind]
+            assert len(indices) == num_args, f'{kind}需要{num_args}个点'
+            if not uses_prev:
+                self._requires[r, indices] = True
+            self._requires_prev[r, [self._point_index[name] for name in prev_points]] = True
+            self._groups.setdefault(kind, ([], []))
+            self._groups[kind][0].append(r)
+            self._groups[kind][1].append(indices)
+        self._groups = {
+            kind: (np.array(rows_), np.array(indices).T)
+            for kind, (rows_, indices) in self._groups.items()
+        }
+        self._uses_prev = self._requires_prev.any()
+        self._requires = self._requires.astype(np.float32)
+        self._requires_prev = self._requires_prev.astype(np.float32)
+
+        self.normal_ranges = {spec.name: parse_range(spec.normal_range) for spec in self.specs}
+
+    def build_points(self, keypoints, keypoint_scores, extra=None, kpt_thr=0.5):
+        """构建所有命名点的坐标和有效掩码
+
+        命名点放在第一维，同一命名点所有帧的坐标连续存放，按索引取点时只需
+        复制整块内存。
+
+        Args:
+            keypoints: 关键点坐标，形状为(T, K, 2)
+            keypoint_scores: 关键点置信度，形状为(T, K)
+            extra: 外部点名称到 (坐标(T, 2), 有效掩码(T,)) 的映射
+            kpt_thr: 关键点有效阈值
+
+        Returns:
+            tuple: 坐标(P, T, 2)和有效掩码(P, T)
+        """
+        num_frames, num_keypoints = keypoint_scores.shape
+        points = np.full((len(self.point_names), num_frames, 2), np.nan, dtype=keypoints.dtype)
+        valid = np.zeros((len(self.point_names), num_frames), dtype=bool)
+
+        # 超出关键点数量的索引视为无效
+        present = self._keypoint_indices < num_keypoints
+        num_named = len(KEYPOINT_NAMES)
+        idx = np.arange(num_named)[present]
+        points[idx] = keypoints[:, self._keypoint_indices[present]].transpose(1, 0, 2)
+        valid[idx] = (keypoint_scores[:, self._keypoint_indices[present]] > kpt_thr).T
+
+        for name, (coords, mask) in (extra or {}).items():
+            i = self._point_index[name]
+            points[i] = coords
+            valid[i] = mask
+
+        first = num_named + len(self.extra_points)
+        a, b = self._midpoints[:, 0], self._midpoints[:, 1]
+        points[first:] = (points[a] + points[b]) / 2
+        valid[first:] = valid[a] & valid[b]
+        return points, valid
+
+    def __call__(self, keypoints, keypoint_scores, extra=None, kpt_thr=0.5, prev_frame=None):
+        """一次计算所有指标
+
+        Args:
+            keypoints: 关键点坐标，形状为(T, K, 2)
+            keypoint_scores: 关键点置信度，形状为(T, K)
+            extra: 外部点名称到 (坐标(T, 2), 有效掩码(T,)) 的映射
+            kpt_thr: 关键点有效阈值
+            prev_frame: 第一帧之前一帧的 (关键点坐标(K, 2), 关键点置信度(K,))，
+                用于时间相关的公式，可选
+
+        Returns:
+            tuple:
+            - dict: 指标名称到形状为(T,)的数值数组的映射，无效处为NaN
+            - dict: 指标名称到形状为(T,)的布尔有效掩码的映射
+        """
+        points, valid = self.build_points(keypoints, keypoint_scores, extra, kpt_thr)
+        num_frames = points.shape[1]
+
+        # 上一帧的命名点，第一帧默认无效
+        if self._uses_prev:
+            first = None
+            if prev_frame is not None:
+                first = self.build_points(np.asarray(prev_frame[0])[None], np.asarray(prev_frame[1])[None], None,
+                                          kpt_thr)
+            prev_points = np.full(points.shape, np.nan, dtype=points.dtype if first is None else
+                                  np.result_type(points, first[0]))
+            prev_valid = np.zeros_like(valid)
+            prev_points[:, 1:], prev_valid[:, 1:] = points[:, :-1], valid[:, :-1]
+            if first is not None:
+                prev_points[:, 0], prev_valid[:, 0] = first[0][:, 0], first[1][:, 0]
+
+        # 所有行的有效掩码：依赖的命名点中无效点的数量为0
+        missing = self._requires @ (~valid).astype(np.float32)
+        if self._uses_prev:
+            missing += self._requires_prev @ (~prev_valid).astype(np.float32)
+        row_ok = missing == 0
+
+        row_values = np.full((self.num_rows, num_frames), np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for kind, (rows, indices) in self._groups.items():
+                func, _, uses_prev = METRIC_KINDS[kind]
+                args = [points[idx] for idx in indices]
+                if uses_prev:
+                    args += [prev_points[idx] for idx in indices]
+                row_values[rows] = func(*args)
+
+            # 主要的点有效时使用主要行，否则使用回退行
+            values, masks = {}, {}
+            for m, spec in enumerate(self.specs):
+                rows = self._metric_rows[m]
+                value, mask = row_values[rows[0]], row_ok[rows[0]]
+                for r in rows[1:]:
+                    value = np.where(mask, value, row_values[r])
+                    mask = mask | row_ok[r]
+                value = apply_ops(value, spec.ops)
+                mask = mask & np.isfinite(value)
+                values[spec.name] = np.where(mask, value, np.nan)
+                masks[spec.name] = mask
+        return values, masks
+
+    def check_normal(self, values):
+        """检查各指标是否在正常范围内，返回指标名称到布尔数组的映射"""
+        return {
+            name: in_range(values[name], self.normal_ranges[name])
+            for name in self.names if name in values and self.normal_ranges[name] is not None
+        }
+
+    def severity(self, values):
+        """计算各指标的异常程度序号，返回指标名称到 :func:`severity_codes` 结果的映射"""
+        results = {}
+        for spec in self.specs:
+            if spec.severity is not None and spec.name in values:
+                ranges, ops = spec.severity
+                results[spec.name] = severity_codes(apply_ops(values[spec.name], ops), ranges)
+        return results
+
+
+POSTURE_EVALUATOR = MetricEvaluator(POSTURE_METRIC_SPECS, extra_points=('iliac_midpoint', 'neck_midpoint'))
+GAIT_EVALUATOR = MetricEvaluator(GAIT_METRIC_SPECS)
@@ -1,7 +1,8 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import warnings
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import torch
@@ -131,6 +132,104 @@ def init_model(config: Union[str, Path, Config],
     return model
 
 
+def _get_test_pipeline(model: nn.Module) -> Tuple[Compose, dict]:
+    """Get the test data pipeline of a model and the dataset meta information
+    that the pipeline reads.
+
+    Building the pipeline requires initializing the default scope and
+    constructing every transform from the registry, which is costly compared
+    to running the transforms on a single bbox. The compiled pipeline is
+    therefore cached on the model and only rebuilt when ``model.cfg``, its
+    test pipeline config or ``model.dataset_meta`` is replaced. The cache is
+    keyed on the identity of these objects, so a pipeline config modified in
+    place is not detected; assign a new config instead.
+
+    The data infos only need the dataset meta keys that the pipeline packs
+    into the data samples (e.g. ``flip_indices``), so these keys are selected
+    once and cached with the pipeline instead of copying the whole dataset
+    meta into every sample.
+
+    Args:
+        model (nn.Module): The pose estimator
+
+    Returns:
+        tuple:
+        - pipeline (Compose): The test data pipeline
+        - meta (dict): The dataset meta information read by the pipeline
+    """
+    cfg = model.cfg
+    pipeline_cfg = cfg.test_dataloader.dataset.pipeline
+    dataset_meta = getattr(model, 'dataset_meta', None)
+    cache = getattr(model, '_test_pipeline_cache', None)
+
+    if (cache is None or cache['cfg'] is not cfg
+            or cache['pipeline_cfg'] is not pipeline_cfg
+            or cache['dataset_meta'] is not dataset_meta):
+        scope = cfg.get('default_scope', 'mmpose')
+        if scope is not None:
+            init_default_scope(scope)
+        pipeline = Compose(pipeline_cfg)
+        cache = dict(
+            cfg=cfg,
+            pipeline_cfg=pipeline_cfg,
+            pipeline=pipeline,
+            dataset_meta=dataset_meta,
+            meta=_get_pipeline_meta(pipeline, dataset_meta or {}))
+        model._test_pipeline_cache = cache
+
+    return cache['pipeline'], cache['meta']
+
+
+def _get_pipeline_meta(pipeline: Compose, dataset_meta: dict) -> dict:
+    """Select the dataset meta information packed by the transforms with
+    ``meta_keys``. The whole dataset meta is kept if no such transform is
+    found."""
+    meta_keys = set()
+    for transform in pipeline.transforms:
+        meta_keys.update(getattr(transform, 'meta_keys', None) or ())
+    if not meta_keys:
+        return dataset_meta
+    return {k: v for k, v in dataset_meta.items() if k in meta_keys}
+
+
+def _format_topdown_bboxes(img: Union[np.ndarray, str],
+                           bboxes: Optional[Union[List, np.ndarray]],
+                           bbox_format: str) -> np.ndarray:
+    """Convert the input bboxes of an image to an array in xyxy format. If no
+    bbox is given, the entire image is regarded as a single bbox area."""
+    if bboxes is None or len(bboxes) == 0:
+        # get bbox from the image size
+        if isinstance(img, str):
+            w, h = Image.open(img).size
+        else:
+            h, w = img.shape[:2]
+
+        return np.array([[0, 0, w, h]], dtype=np.float32)
+
+    if isinstance(bboxes, list):
+        bboxes = np.array(bboxes)
+
+    assert bbox_format in {'xyxy', 'xywh'}, \
+        f'Invalid bbox_format "{bbox_format}".'
+
+    if bbox_format == 'xywh':
+        bboxes = bbox_xywh2xyxy(bboxes)
+    return bboxes
+
+
+def _topdown_data_info(img: Union[np.ndarray, str], bbox: np.ndarray,
+                       meta: dict) -> dict:
+    """Construct the data info of a single bbox for the top-down pipeline."""
+    if isinstance(img, str):
+        data_info = dict(img_path=img)
+    else:
+        data_info = dict(img=img)
+    data_info['bbox'] = bbox[None]  # shape (1, 4)
+    data_info['bbox_score'] = np.ones(1, dtype=np.float32)  # shape (1,)
+    data_info.update(meta)
+    return data_info
+
+
 def inference_topdown(model: nn.Module,
                       img: Union[np.ndarray, str],
                       bboxes: Optional[Union[List, np.ndarray]] = None,
@@ -152,40 +251,14 @@ def inference_topdown(model: nn.Module,
         ``data_sample.pred_instances.keypoints`` and
         ``data_sample.pred_instances.keypoint_scores``.
     """
-    scope = model.cfg.get('default_scope', 'mmpose')
-    if scope is not None:
-        init_default_scope(scope)
-    pipeline = Compose(model.cfg.test_dataloader.dataset.pipeline)
+    pipeline, meta = _get_test_pipeline(model)
 
-    if bboxes is None or len(bboxes) == 0:
-        # get bbox from the image size
-        if isinstance(img, str):
-            w, h = Image.open(img).size
-        else:
-            h, w = img.shape[:2]
-
-        bboxes = np.array([[0, 0, w, h]], dtype=np.float32)
-    else:
-        if isinstance(bboxes, list):
-            bboxes = np.array(bboxes)
-
-        assert bbox_format in {'xyxy', 'xywh'}, \
-            f'Invalid bbox_format "{bbox_format}".'
-
-        if bbox_format == 'xywh':
-            bboxes = bbox_xywh2xyxy(bboxes)
+    bboxes = _format_topdown_bboxes(img, bboxes, bbox_format)
 
     # construct batch data samples
     data_list = []
     for bbox in bboxes:
-        if isinstance(img, str):
-            data_info = dict(img_path=img)
-        else:
-            data_info = dict(img=img)
-        data_info['bbox'] = bbox[None]  # shape (1, 4)
-        data_info['bbox_score'] = np.ones(1, dtype=np.float32)  # shape (1,)
-        data_info.update(model.dataset_meta)
-        data_list.append(pipeline(data_info))
+        data_list.append(pipeline(_topdown_data_info(img, bbox, meta)))
 
     if data_list:
         # collate data list into a batch, which is a dict with following keys:
@@ -200,6 +273,79 @@ def inference_topdown(model: nn.Module,
     return results
 
 
+def inference_topdown_batch(
+        model: nn.Module,
+        inputs: Sequence[Tuple[Union[np.ndarray, str],
+                               Optional[Union[List, np.ndarray]]]],
+        bbox_format: str = 'xyxy',
+        batch_size: int = 32,
+        num_workers: int = 0,
+        pad_batch: bool = False) -> List[List[PoseDataSample]]:
+    """Inference a batch of images with a top-down pose estimator.
+
+    Different from :func:`inference_topdown`, which handles the bboxes of a
+    single image, this function gathers the bboxes of all given images and
+    runs the model on fixed-size batches of crops across images. The data
+    pipeline is built only once, and the crops can be prepared in a thread
+    pool, so the throughput scales with ``batch_size`` on GPU and with
+    ``num_workers`` on CPU.
+
+    Args:
+        model (nn.Module): The top-down pose estimator
+        inputs (Sequence[tuple]): A sequence of ``(img, bboxes)`` pairs.
+            ``img`` is a loaded image or an image file, and ``bboxes`` is an
+            array in shape (N, 4). If ``bboxes`` is ``None`` or empty, the
+            entire image will be regarded as a single bbox area
+        bbox_format (str): The bbox format indicator. Options are ``'xywh'``
+            and ``'xyxy'``. Defaults to ``'xyxy'``
+        batch_size (int): The number of crops in each ``test_step`` call.
+            Defaults to 32
+        num_workers (int): The number of threads to prepare the crops. ``0``
+            means preparing the crops in the current thread. Defaults to 0
+        pad_batch (bool): Whether to pad the last batch to ``batch_size`` by
+            repeating its last crop, so that the model always receives
+            inputs of the same shape. The padded results are discarded.
+            This is only useful for backends that require a static batch
+            shape, since it runs ``batch_size`` crops even for a single
+            bbox. Defaults to ``False``
+
+    Returns:
+        List[List[:obj:`PoseDataSample`]]: The inference results of each
+        input image, in the same order as ``inputs``. Each item has the same
+        format as the output of :func:`inference_topdown`.
+    """
+    pipeline, meta = _get_test_pipeline(model)
+
+    data_infos = []
+    owners = []
+    for idx, (img, bboxes) in enumerate(inputs):
+        for bbox in _format_topdown_bboxes(img, bboxes, bbox_format):
+            data_infos.append(_topdown_data_info(img, bbox, meta))
+            owners.append(idx)
+
+    if num_workers > 0:
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            data_list = list(executor.map(pipeline, data_infos))
+    else:
+        data_list = [pipeline(data_info) for data_info in data_infos]
+
+    results = []
+    for start in range(0, len(data_list), batch_size):
+        batch_list = data_list[start:start + batch_size]
+        num_valid = len(batch_list)
+        if pad_batch and num_valid < batch_size:
+            batch_list = batch_list + [batch_list[-1]] * (
+                batch_size - num_valid)
+        batch = pseudo_collate(batch_list)
+        with torch.no_grad():
+            results.extend(model.test_step(batch)[:num_valid])
+
+    outputs = [[] for _ in range(len(inputs))]
+    for idx, result in zip(owners, results):
+        outputs[idx].append(result)
+    return outputs
+
+
 def inference_bottomup(model: nn.Module, img: Union[np.ndarray, str]):
     """Inference image with a bottom-up pose estimator.
 
@@ -213,14 +359,14 @@ def inference_bottomup(model: nn.Module, img: Union[np.ndarray, str]):
         ``data_sample.pred_instances.keypoints`` and
         ``data_sample.pred_instances.keypoint_scores``.
     """
-    pipeline = Compose(model.cfg.test_dataloader.dataset.pipeline)
+    pipeline, meta = _get_test_pipeline(model)
 
     # prepare data batch
     if isinstance(img, str):
         data_info = dict(img_path=img)
     else:
         data_info = dict(img=img)
-    data_info.update(model.dataset_meta)
+    data_info.update(meta)
     data = pipeline(data_info)
     batch = pseudo_collate([data])
 
@@ -3,7 +3,7 @@ import warnings
 
 import numpy as np
 
-from mmpose.evaluation.functional.nms import oks_iou
+from mmpose.evaluation.functional.nms import oks_matrix
 
 
 def _compute_iou(bboxA, bboxB):
@@ -67,29 +67,23 @@ def _track_by_oks(res, results_last, thr, sigmas=None):
     keypoint = np.concatenate((res.pred_instances.keypoints,
                                res.pred_instances.keypoint_scores[:, :, None]),
                               axis=2)
-    keypoint = np.squeeze(keypoint, axis=0).reshape((-1))
-    area = np.squeeze(res.pred_instances.areas, axis=0)
+    area = res.pred_instances.areas
     max_index = -1
     match_result = {}
 
     if len(results_last) == 0:
         return -1, results_last, match_result
 
-    keypoints_last = np.array([
-        np.squeeze(
-            np.concatenate(
-                (res_last.pred_instances.keypoints,
-                 res_last.pred_instances.keypoint_scores[:, :, None]),
-                axis=2),
-            axis=0).reshape((-1)) for res_last in results_last
-    ])
-    area_last = np.array([
-        np.squeeze(res_last.pred_instances.areas, axis=0)
-        for res_last in results_last
+    keypoints_last = np.concatenate([
+        np.concatenate((res_last.pred_instances.keypoints,
+                        res_last.pred_instances.keypoint_scores[:, :, None]),
+                       axis=2) for res_last in results_last
     ])
+    area_last = np.concatenate(
+        [res_last.pred_instances.areas for res_last in results_last])
 
-    oks_score = oks_iou(
-        keypoint, keypoints_last, area, area_last, sigmas=sigmas)
+    oks_score = oks_matrix(
+        keypoint, keypoints_last, area, area_last, sigmas=sigmas)[0]
 
     max_index = np.argmax(oks_score)
 
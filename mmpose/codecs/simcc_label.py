@@ -1,12 +1,16 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 from itertools import product
-from typing import Optional, Tuple, Union
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
+import torch
+from torch import Tensor
 
-from mmpose.codecs.utils import get_simcc_maximum
-from mmpose.codecs.utils.refinement import refine_simcc_dark
+from mmpose.codecs.utils import batch_get_simcc_maximum, get_simcc_maximum
+from mmpose.codecs.utils.refinement import (batch_refine_simcc_dark,
+                                            refine_simcc_dark)
 from mmpose.registry import KEYPOINT_CODECS
+from mmpose.utils.tensor_utils import to_numpy
 from .base import BaseKeypointCodec
 
 
@@ -153,6 +157,14 @@ class SimCCLabel(BaseKeypointCodec):
 
         return encoded
 
+    def _get_blur_kernel_sizes(self) -> Tuple[int, int]:
+        """The Gaussian blur kernel sizes of the DARK refinement."""
+        x_blur = int((self.sigma[0] * 20 - 7) // 3)
+        y_blur = int((self.sigma[1] * 20 - 7) // 3)
+        x_blur -= int((x_blur % 2) == 0)
+        y_blur -= int((y_blur % 2) == 0)
+        return x_blur, y_blur
+
     def decode(self, simcc_x: np.ndarray,
                simcc_y: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
         """Decode keypoint coordinates from SimCC representations. The decoded
@@ -179,10 +191,7 @@ class SimCCLabel(BaseKeypointCodec):
             scores = scores[None, :]
 
         if self.use_dark:
-            x_blur = int((self.sigma[0] * 20 - 7) // 3)
-            y_blur = int((self.sigma[1] * 20 - 7) // 3)
-            x_blur -= int((x_blur % 2) == 0)
-            y_blur -= int((y_blur % 2) == 0)
+            x_blur, y_blur = self._get_blur_kernel_sizes()
             keypoints[:, :, 0] = refine_simcc_dark(keypoints[:, :, 0], simcc_x,
                                                    x_blur)
             keypoints[:, :, 1] = refine_simcc_dark(keypoints[:, :, 1], simcc_y,
@@ -199,6 +208,65 @@ class SimCCLabel(BaseKeypointCodec):
         else:
             return keypoints, scores
 
+    def batch_decode(self, batch_simcc_x: Tensor, batch_simcc_y: Tensor
+                     ) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """Decode keypoint coordinates from a batch of SimCC representations.
+        The maximum search, the optional DARK refinement and the visibility
+        are computed on the device of the inputs, so only the decoded results
+        in shape (B, K, 3) (or (B, K, 4) with visibility) are transferred to
+        the host instead of the whole SimCC distributions. :meth:`decode` is
+        the NumPy reference implementation.
+
+        Args:
+            batch_simcc_x (Tensor): SimCC label for x-axis in shape
+                (B, K, Wx)
+            batch_simcc_y (Tensor): SimCC label for y-axis in shape
+                (B, K, Wy)
+
+        Returns:
+            tuple:
+            - batch_keypoints (List[np.ndarray]): Decoded coordinates of the
+                batch, each is in shape (1, K, D)
+            - batch_scores (List[np.ndarray]): The keypoint scores of the
+                batch, each is in shape (1, K). If ``decode_visibility`` is
+                set, a tuple of the scores and the visibilities is returned
+        """
+        if isinstance(batch_simcc_x, np.ndarray):
+            batch_simcc_x = torch.from_numpy(batch_simcc_x)
+            batch_simcc_y = torch.from_numpy(batch_simcc_y)
+
+        with torch.no_grad():
+            keypoints, scores = batch_get_simcc_maximum(
+                batch_simcc_x, batch_simcc_y)
+
+            if self.use_dark:
+                x_blur, y_blur = self._get_blur_kernel_sizes()
+                x = batch_refine_simcc_dark(keypoints[..., 0], batch_simcc_x,
+                                            x_blur)
+                y = batch_refine_simcc_dark(keypoints[..., 1], batch_simcc_y,
+                                            y_blur)
+                keypoints = torch.stack((x, y), dim=-1)
+
+            results = [keypoints / self.simcc_split_ratio, scores[..., None]]
+
+            if self.decode_visibility:
+                _, visibility = batch_get_simcc_maximum(
+                    batch_simcc_x * self.decode_beta * self.sigma[0],
+                    batch_simcc_y * self.decode_beta * self.sigma[1],
+                    apply_softmax=True)
+                results.append(visibility[..., None])
+
+            # B, K, 3 (or 4 with visibility)
+            results = to_numpy(torch.cat(results, dim=-1))
+
+        batch_keypoints = [res[None, :, :2] for res in results]
+        batch_scores = [res[None, :, 2] for res in results]
+        if self.decode_visibility:
+            batch_visibility = [res[None, :, 3] for res in results]
+            return batch_keypoints, (batch_scores, batch_visibility)
+        else:
+            return batch_keypoints, batch_scores
+
     def _map_coordinates(
         self,
         keypoints: np.ndarray,
@@ -1,5 +1,4 @@
 # Copyright (c) OpenMMLab. All rights reserved.
-from itertools import product
 from typing import Tuple
 
 import cv2
@@ -105,6 +104,55 @@ def get_simcc_maximum(simcc_x: np.ndarray,
     return locs, vals
 
 
+def batch_get_simcc_maximum(batch_simcc_x: Tensor,
+                            batch_simcc_y: Tensor,
+                            apply_softmax: bool = False
+                            ) -> Tuple[Tensor, Tensor]:
+    """Get maximum response location and value from a batch of simcc
+    representations on the device of the inputs. This is the tensor
+    counterpart of :func:`get_simcc_maximum`, so that only the small results
+    need to leave the device.
+
+    Note:
+        batch size: B
+        num_keypoints: K
+
+    Args:
+        batch_simcc_x (Tensor): x-axis SimCC in shape (K, Wx) or (B, K, Wx)
+        batch_simcc_y (Tensor): y-axis SimCC in shape (K, Wy) or (B, K, Wy)
+        apply_softmax (bool): whether to apply softmax on the heatmap.
+            Defaults to False.
+
+    Returns:
+        tuple:
+        - locs (Tensor): locations of maximum heatmap responses in shape
+            (K, 2) or (B, K, 2)
+        - vals (Tensor): values of maximum heatmap responses in shape
+            (K,) or (B, K)
+    """
+
+    assert isinstance(batch_simcc_x, Tensor), 'batch_simcc_x should be Tensor'
+    assert isinstance(batch_simcc_y, Tensor), 'batch_simcc_y should be Tensor'
+    assert batch_simcc_x.ndim == 2 or batch_simcc_x.ndim == 3, (
+        f'Invalid shape {batch_simcc_x.shape}')
+    assert batch_simcc_x.ndim == batch_simcc_y.ndim, (
+        f'{batch_simcc_x.shape} != {batch_simcc_y.shape}')
+
+    batch_simcc_x = batch_simcc_x.float()
+    batch_simcc_y = batch_simcc_y.float()
+    if apply_softmax:
+        batch_simcc_x = batch_simcc_x.softmax(dim=-1)
+        batch_simcc_y = batch_simcc_y.softmax(dim=-1)
+
+    max_val_x, x_locs = batch_simcc_x.max(dim=-1)
+    max_val_y, y_locs = batch_simcc_y.max(dim=-1)
+    locs = torch.stack((x_locs, y_locs), dim=-1).float()
+    vals = torch.minimum(max_val_x, max_val_y)
+    locs[vals <= 0.] = -1
+
+    return locs, vals
+
+
 def get_heatmap_3d_maximum(heatmaps: np.ndarray
                            ) -> Tuple[np.ndarray, np.ndarray]:
     """Get maximum response location and value from heatmaps.
@@ -199,7 +247,7 @@ def get_heatmap_maximum(heatmaps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
 
 
 def gaussian_blur(heatmaps: np.ndarray, kernel: int = 11) -> np.ndarray:
-    """Modulate heatmap distribution with Gaussian.
+    """Modulate heatmap distribution with Gaussian. The operation is in-place.
 
     Note:
         - num_keypoints: K
@@ -217,50 +265,85 @@ def gaussian_blur(heatmaps: np.ndarray, kernel: int = 11) -> np.ndarray:
     """
     assert kernel % 2 == 1
 
-    border = (kernel - 1) // 2
     K, H, W = heatmaps.shape
 
-    for k in range(K):
-        origin_max = np.max(heatmaps[k])
-        dr = np.zeros((H + 2 * border, W + 2 * border), dtype=np.float32)
-        dr[border:-border, border:-border] = heatmaps[k].copy()
-        dr = cv2.GaussianBlur(dr, (kernel, kernel), 0)
-        heatmaps[k] = dr[border:-border, border:-border].copy()
-        heatmaps[k] *= origin_max / np.max(heatmaps[k])
+    # The zero border of cv2 replaces the zero-padding of each heatmap. The
+    # blur itself dominates, so each heatmap is still blurred by its own call
+    blurred = np.empty((K, H, W), dtype=np.float32)
+    for k, heatmap in enumerate(heatmaps.astype(np.float32, copy=False)):
+        cv2.GaussianBlur(
+            heatmap, (kernel, kernel),
+            0,
+            dst=blurred[k],
+            borderType=cv2.BORDER_CONSTANT)
+
+    origin_max = np.max(heatmaps, axis=(1, 2), keepdims=True)
+    heatmaps[:] = blurred * (
+        origin_max / np.max(blurred, axis=(1, 2), keepdims=True))
     return heatmaps
 
 
 def gaussian_blur1d(simcc: np.ndarray, kernel: int = 11) -> np.ndarray:
-    """Modulate simcc distribution with Gaussian.
+    """Modulate simcc distribution with Gaussian. The operation is in-place.
 
     Note:
+        - instance number: N
         - num_keypoints: K
         - simcc length: Wx
 
     Args:
-        simcc (np.ndarray[K, Wx]): model predicted simcc.
+        simcc (np.ndarray[N, K, Wx]): model predicted simcc.
         kernel (int): Gaussian kernel size (K) for modulation, which should
             match the simcc gaussian sigma when training.
             K=17 for sigma=3 and k=11 for sigma=2.
 
     Returns:
-        np.ndarray ([K, Wx]): Modulated simcc distribution.
+        np.ndarray ([N, K, Wx]): Modulated simcc distribution.
     """
     assert kernel % 2 == 1
 
-    border = (kernel - 1) // 2
     N, K, Wx = simcc.shape
 
-    for n, k in product(range(N), range(K)):
-        origin_max = np.max(simcc[n, k])
-        dr = np.zeros((1, Wx + 2 * border), dtype=np.float32)
-        dr[0, border:-border] = simcc[n, k].copy()
-        dr = cv2.GaussianBlur(dr, (kernel, 1), 0)
-        simcc[n, k] = dr[0, border:-border].copy()
-        simcc[n, k] *= origin_max / np.max(simcc[n, k])
+    # Blur all N*K vectors in one call as the rows of an image
+    blurred = cv2.GaussianBlur(
+        simcc.reshape(N * K, Wx).astype(np.float32), (kernel, 1),
+        0,
+        borderType=cv2.BORDER_CONSTANT).reshape(N, K, Wx)
+
+    origin_max = np.max(simcc, axis=2, keepdims=True)
+    simcc[:] = blurred * (origin_max / np.max(blurred, axis=2, keepdims=True))
     return simcc
 
 
+def batch_gaussian_blur1d(batch_simcc: Tensor, kernel: int = 11) -> Tensor:
+    """Modulate a batch of simcc distributions with Gaussian on the device
+    of the input. This is the tensor counterpart of :func:`gaussian_blur1d`
+    and does not modify the input.
+
+    Args:
+        batch_simcc (Tensor): model predicted simcc in shape (B, K, Wx)
+        kernel (int): Gaussian kernel size (K) for modulation, which should
+            match the simcc gaussian sigma when training.
+            K=17 for sigma=3 and k=11 for sigma=2.
+
+    Returns:
+        Tensor: Modulated simcc distribution in shape (B, K, Wx).
+    """
+    assert kernel % 2 == 1
+
+    B, K, Wx = batch_simcc.shape
+    simcc = batch_simcc.reshape(B * K, 1, Wx)
+    # the same kernel as cv2.GaussianBlur with sigma=0
+    weight = torch.from_numpy(cv2.getGaussianKernel(kernel, 0,
+                                                    cv2.CV_32F)).to(simcc)
+    blurred = F.conv1d(simcc, weight.view(1, 1, -1), padding=kernel // 2)
+
+    origin_max = simcc.amax(dim=-1, keepdim=True)
+    blurred_max = blurred.amax(dim=-1, keepdim=True)
+    blurred = blurred * origin_max / blurred_max.clamp(min=1e-10)
+    return blurred.reshape(B, K, Wx)
+
+
 def batch_heatmap_nms(batch_heatmaps: Tensor, kernel_size: int = 5):
     """Apply NMS on a batch of heatmaps.
 
@@ -2,8 +2,11 @@
 from itertools import product
 
 import numpy as np
+import torch.nn.functional as F
+from torch import Tensor
 
-from .post_processing import gaussian_blur, gaussian_blur1d
+from .post_processing import (batch_gaussian_blur1d, gaussian_blur,
+                              gaussian_blur1d)
 
 
 def refine_keypoints(keypoints: np.ndarray,
@@ -69,7 +72,6 @@ def refine_keypoints_dark(keypoints: np.ndarray, heatmaps: np.ndarray,
 
     .. _`Dark Pose`: https://arxiv.org/abs/1910.06278
     """
-    N, K = keypoints.shape[:2]
     H, W = heatmaps.shape[1:]
 
     # modulate heatmaps
@@ -77,28 +79,31 @@ def refine_keypoints_dark(keypoints: np.ndarray, heatmaps: np.ndarray,
     np.maximum(heatmaps, 1e-10, heatmaps)
     np.log(heatmaps, heatmaps)
 
-    for n, k in product(range(N), range(K)):
-        x, y = keypoints[n, k, :2].astype(int)
-        if 1 < x < W - 2 and 1 < y < H - 2:
-            dx = 0.5 * (heatmaps[k, y, x + 1] - heatmaps[k, y, x - 1])
-            dy = 0.5 * (heatmaps[k, y + 1, x] - heatmaps[k, y - 1, x])
-
-            dxx = 0.25 * (
-                heatmaps[k, y, x + 2] - 2 * heatmaps[k, y, x] +
-                heatmaps[k, y, x - 2])
-            dxy = 0.25 * (
-                heatmaps[k, y + 1, x + 1] - heatmaps[k, y - 1, x + 1] -
-                heatmaps[k, y + 1, x - 1] + heatmaps[k, y - 1, x - 1])
-            dyy = 0.25 * (
-                heatmaps[k, y + 2, x] - 2 * heatmaps[k, y, x] +
-                heatmaps[k, y - 2, x])
-            derivative = np.array([[dx], [dy]])
-            hessian = np.array([[dxx, dxy], [dxy, dyy]])
-            if dxx * dyy - dxy**2 != 0:
-                hessianinv = np.linalg.inv(hessian)
-                offset = -hessianinv @ derivative
-                offset = np.squeeze(np.array(offset.T), axis=0)
-                keypoints[n, k, :2] += offset
+    # refine the N*K keypoints at once
+    x = keypoints[..., 0].astype(int)
+    y = keypoints[..., 1].astype(int)
+    valid = (1 < x) & (x < W - 2) & (1 < y) & (y < H - 2)
+    n, k = np.nonzero(valid)
+    x, y = x[n, k], y[n, k]
+
+    dx = 0.5 * (heatmaps[k, y, x + 1] - heatmaps[k, y, x - 1])
+    dy = 0.5 * (heatmaps[k, y + 1, x] - heatmaps[k, y - 1, x])
+    dxx = 0.25 * (
+        heatmaps[k, y, x + 2] - 2 * heatmaps[k, y, x] + heatmaps[k, y, x - 2])
+    dxy = 0.25 * (
+        heatmaps[k, y + 1, x + 1] - heatmaps[k, y - 1, x + 1] -
+        heatmaps[k, y + 1, x - 1] + heatmaps[k, y - 1, x - 1])
+    dyy = 0.25 * (
+        heatmaps[k, y + 2, x] - 2 * heatmaps[k, y, x] + heatmaps[k, y - 2, x])
+
+    # offset = -inv(hessian) @ derivative for the invertible hessians
+    det = dxx * dyy - dxy**2
+    invertible = det != 0
+    n, k, det = n[invertible], k[invertible], det[invertible]
+    dx, dy = dx[invertible], dy[invertible]
+    dxx, dxy, dyy = dxx[invertible], dxy[invertible], dyy[invertible]
+    keypoints[n, k, 0] -= (dyy * dx - dxy * dy) / det
+    keypoints[n, k, 1] -= (dxx * dy - dxy * dx) / det
     return keypoints
 
 
@@ -136,31 +141,28 @@ def refine_keypoints_dark_udp(keypoints: np.ndarray, heatmaps: np.ndarray,
     heatmaps_pad = np.pad(
         heatmaps, ((0, 0), (1, 1), (1, 1)), mode='edge').flatten()
 
-    for n in range(N):
-        index = keypoints[n, :, 0] + 1 + (keypoints[n, :, 1] + 1) * (W + 2)
-        index += (W + 2) * (H + 2) * np.arange(0, K)
-        index = index.astype(int).reshape(-1, 1)
-        i_ = heatmaps_pad[index]
-        ix1 = heatmaps_pad[index + 1]
-        iy1 = heatmaps_pad[index + W + 2]
-        ix1y1 = heatmaps_pad[index + W + 3]
-        ix1_y1_ = heatmaps_pad[index - W - 3]
-        ix1_ = heatmaps_pad[index - 1]
-        iy1_ = heatmaps_pad[index - 2 - W]
-
-        dx = 0.5 * (ix1 - ix1_)
-        dy = 0.5 * (iy1 - iy1_)
-        derivative = np.concatenate([dx, dy], axis=1)
-        derivative = derivative.reshape(K, 2, 1)
-
-        dxx = ix1 - 2 * i_ + ix1_
-        dyy = iy1 - 2 * i_ + iy1_
-        dxy = 0.5 * (ix1y1 - ix1 - iy1 + i_ + i_ - ix1_ - iy1_ + ix1_y1_)
-        hessian = np.concatenate([dxx, dxy, dxy, dyy], axis=1)
-        hessian = hessian.reshape(K, 2, 2)
-        hessian = np.linalg.inv(hessian + np.finfo(np.float32).eps * np.eye(2))
-        keypoints[n] -= np.einsum('imn,ink->imk', hessian,
-                                  derivative).squeeze()
+    # gather the neighbourhoods of all N*K keypoints at once
+    index = keypoints[..., 0] + 1 + (keypoints[..., 1] + 1) * (W + 2)
+    index += (W + 2) * (H + 2) * np.arange(0, K)
+    index = index.astype(int)
+    i_ = heatmaps_pad[index]
+    ix1 = heatmaps_pad[index + 1]
+    iy1 = heatmaps_pad[index + W + 2]
+    ix1y1 = heatmaps_pad[index + W + 3]
+    ix1_y1_ = heatmaps_pad[index - W - 3]
+    ix1_ = heatmaps_pad[index - 1]
+    iy1_ = heatmaps_pad[index - 2 - W]
+
+    dx = 0.5 * (ix1 - ix1_)
+    dy = 0.5 * (iy1 - iy1_)
+    derivative = np.stack([dx, dy], axis=-1)[..., None]  # N, K, 2, 1
+
+    dxx = ix1 - 2 * i_ + ix1_
+    dyy = iy1 - 2 * i_ + iy1_
+    dxy = 0.5 * (ix1y1 - ix1 - iy1 + i_ + i_ - ix1_ - iy1_ + ix1_y1_)
+    hessian = np.stack([dxx, dxy, dxy, dyy], axis=-1).reshape(N, K, 2, 2)
+    hessian = np.linalg.inv(hessian + np.finfo(np.float32).eps * np.eye(2))
+    keypoints[..., :2] -= (hessian @ derivative)[..., 0]
 
     return keypoints
 
@@ -188,8 +190,6 @@ def refine_simcc_dark(keypoints: np.ndarray, simcc: np.ndarray,
 
     .. _`UDP`: https://arxiv.org/abs/1911.07524
     """
-    N = simcc.shape[0]
-
     # modulate simcc
     simcc = gaussian_blur1d(simcc, blur_kernel_size)
     np.clip(simcc, 1e-3, 50., simcc)
@@ -197,19 +197,56 @@ def refine_simcc_dark(keypoints: np.ndarray, simcc: np.ndarray,
 
     simcc = np.pad(simcc, ((0, 0), (0, 0), (2, 2)), 'edge')
 
-    for n in range(N):
-        px = (keypoints[n] + 2.5).astype(np.int64).reshape(-1, 1)  # K, 1
+    px = (keypoints + 2.5).astype(np.int64)[..., None]  # N, K, 1
 
-        dx0 = np.take_along_axis(simcc[n], px, axis=1)  # K, 1
-        dx1 = np.take_along_axis(simcc[n], px + 1, axis=1)
-        dx_1 = np.take_along_axis(simcc[n], px - 1, axis=1)
-        dx2 = np.take_along_axis(simcc[n], px + 2, axis=1)
-        dx_2 = np.take_along_axis(simcc[n], px - 2, axis=1)
+    dx0 = np.take_along_axis(simcc, px, axis=2)  # N, K, 1
+    dx1 = np.take_along_axis(simcc, px + 1, axis=2)
+    dx_1 = np.take_along_axis(simcc, px - 1, axis=2)
+    dx2 = np.take_along_axis(simcc, px + 2, axis=2)
+    dx_2 = np.take_along_axis(simcc, px - 2, axis=2)
 
-        dx = 0.5 * (dx1 - dx_1)
-        dxx = 1e-9 + 0.25 * (dx2 - 2 * dx0 + dx_2)
+    dx = 0.5 * (dx1 - dx_1)
+    dxx = 1e-9 + 0.25 * (dx2 - 2 * dx0 + dx_2)
 
-        offset = dx / dxx
-        keypoints[n] -= offset.reshape(-1)
+    offset = dx / dxx
+    keypoints -= offset[..., 0]
 
     return keypoints
+
+
+def batch_refine_simcc_dark(batch_keypoints: Tensor, batch_simcc: Tensor,
+                            blur_kernel_size: int) -> Tensor:
+    """Tensor version of :func:`refine_simcc_dark`, which refines the
+    keypoints of a batch on the device of the inputs.
+
+    Note:
+
+        - batch size: B
+        - keypoint number: K
+
+    Args:
+        batch_keypoints (Tensor): The keypoint coordinates along the simcc
+            axis in shape (B, K)
+        batch_simcc (Tensor): The simcc in shape (B, K, Wx)
+        blur_kernel_size (int): The Gaussian blur kernel size of the simcc
+            modulation
+
+    Returns:
+        Tensor: Refined keypoint coordinates in shape (B, K)
+    """
+    # modulate simcc
+    simcc = batch_gaussian_blur1d(batch_simcc.float(), blur_kernel_size)
+    simcc = simcc.clamp(1e-3, 50.).log()
+    simcc = F.pad(simcc, (2, 2), mode='replicate')
+
+    px = (batch_keypoints + 2.5).long().unsqueeze(-1)  # B, K, 1
+    dx0 = simcc.gather(-1, px)
+    dx1 = simcc.gather(-1, px + 1)
+    dx_1 = simcc.gather(-1, px - 1)
+    dx2 = simcc.gather(-1, px + 2)
+    dx_2 = simcc.gather(-1, px - 2)
+
+    dx = 0.5 * (dx1 - dx_1)
+    dxx = 1e-9 + 0.25 * (dx2 - 2 * dx0 + dx_2)
+
+    return batch_keypoints - (dx / dxx).squeeze(-1)
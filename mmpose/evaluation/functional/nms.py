@@ -4,7 +4,7 @@
 # Original licence: Copyright (c) Microsoft, under the MIT License.
 # ------------------------------------------------------------------------------
 
-from typing import List, Optional
+from typing import List, Optional, Union
 
 import numpy as np
 import torch
@@ -55,6 +55,105 @@ def nms(dets: np.ndarray, thr: float) -> List[int]:
     return keep
 
 
+def oks_matrix(kpts_a: Union[np.ndarray, Tensor],
+               kpts_b: Union[np.ndarray, Tensor],
+               areas_a: Union[np.ndarray, Tensor],
+               areas_b: Union[np.ndarray, Tensor],
+               sigmas: Optional[np.ndarray] = None,
+               vis_thr: Optional[float] = None,
+               chunk_size: int = 2**22) -> Union[np.ndarray, Tensor]:
+    """Calculate the pairwise OKS between two groups of instances with
+    broadcasting.
+
+    Note:
+
+        - number of keypoints: K
+        - number of instances: N, M
+
+    Args:
+        kpts_a (np.ndarray | Tensor): The keypoints of the first group
+            containing the coordinates and the visibilities. Shape: (N, K, 3)
+            or (N, K*3)
+        kpts_b (np.ndarray | Tensor): The keypoints of the second group.
+            Shape: (M, K, 3) or (M, K*3)
+        areas_a (np.ndarray | Tensor): The areas of the first group.
+            Shape: (N, )
+        areas_b (np.ndarray | Tensor): The areas of the second group.
+            Shape: (M, )
+        sigmas (np.ndarray, optional): Keypoint labelling uncertainty.
+            Please refer to `COCO keypoint evaluation
+            <https://cocodataset.org/#keypoints-eval>`__ for more details.
+            If not given, use the sigmas on COCO dataset.
+            If specified, shape: (K, ). Defaults to ``None``
+        vis_thr(float, optional): Threshold of the keypoint visibility.
+            If specified, will calculate OKS based on those keypoints whose
+            visibility higher than vis_thr. If not given, calculate the OKS
+            based on all keypoints. Defaults to ``None``
+        chunk_size (int): The maximum number of the (N, M, K) intermediate
+            elements computed at once, which bounds the memory usage.
+            Defaults to ``2**22``
+
+    Returns:
+        np.ndarray | Tensor: The OKS matrix in shape (N, M). A tensor is
+        returned for tensor inputs.
+    """
+    if sigmas is None:
+        sigmas = np.array([
+            .26, .25, .25, .35, .35, .79, .79, .72, .72, .62, .62, 1.07, 1.07,
+            .87, .87, .89, .89
+        ]) / 10.0
+    vars = (sigmas * 2)**2
+
+    if isinstance(kpts_a, Tensor):
+        if not kpts_a.is_floating_point():
+            kpts_a = kpts_a.float()
+        kpts_b = torch.as_tensor(kpts_b).to(kpts_a)
+        vars = kpts_a.new_tensor(vars)
+        areas_a = torch.as_tensor(areas_a).to(kpts_a)
+        areas_b = torch.as_tensor(areas_b).to(kpts_a)
+        exp, clip = torch.exp, torch.clip
+        oks = kpts_a.new_zeros((len(kpts_a), len(kpts_b)))
+    else:
+        # compute in float64 like the per-pair formula did
+        kpts_a = np.asarray(kpts_a, dtype=np.float64)
+        kpts_b = np.asarray(kpts_b, dtype=np.float64)
+        areas_a = np.asarray(areas_a)
+        areas_b = np.asarray(areas_b)
+        exp, clip = np.exp, np.clip
+        oks = np.zeros((len(kpts_a), len(kpts_b)), dtype=np.float32)
+
+    K = len(vars)
+    kpts_a = kpts_a.reshape(len(kpts_a), K, 3)
+    kpts_b = kpts_b.reshape(len(kpts_b), K, 3)
+
+    # compute the (n, M, K) intermediates of n instances of the first group
+    # at once, in-place where possible
+    step = max(1, chunk_size // max(1, len(kpts_b) * K))
+    for start in range(0, len(kpts_a), step):
+        kpts = kpts_a[start:start + step, None]  # n, 1, K, 3
+
+        e = (kpts[..., 0] - kpts_b[None, :, :, 0])**2
+        e += (kpts[..., 1] - kpts_b[None, :, :, 1])**2
+        e /= vars
+        e /= ((areas_a[start:start + step, None] + areas_b[None]) / 2 +
+              np.spacing(1))[..., None]
+        e /= -2
+        exp(e, out=e)
+
+        if vis_thr is None:
+            oks[start:start + step] = e.sum(-1) / K
+        else:
+            valid_a = kpts[..., 2] > vis_thr
+            valid_b = kpts_b[None, :, :, 2] > vis_thr
+            valid = valid_a & valid_b
+            e *= valid
+            # instances without valid keypoints have an OKS of 0
+            num_valid = clip(valid.sum(-1), 1, None)
+            oks[start:start + step] = e.sum(-1) / num_valid
+
+    return oks
+
+
 def oks_iou(g: np.ndarray,
             d: np.ndarray,
             a_g: float,
@@ -88,28 +187,8 @@ def oks_iou(g: np.ndarray,
     Returns:
         np.ndarray: The oks ious.
     """
-    if sigmas is None:
-        sigmas = np.array([
-            .26, .25, .25, .35, .35, .79, .79, .72, .72, .62, .62, 1.07, 1.07,
-            .87, .87, .89, .89
-        ]) / 10.0
-    vars = (sigmas * 2)**2
-    xg = g[0::3]
-    yg = g[1::3]
-    vg = g[2::3]
-    ious = np.zeros(len(d), dtype=np.float32)
-    for n_d in range(0, len(d)):
-        xd = d[n_d, 0::3]
-        yd = d[n_d, 1::3]
-        vd = d[n_d, 2::3]
-        dx = xd - xg
-        dy = yd - yg
-        e = (dx**2 + dy**2) / vars / ((a_g + a_d[n_d]) / 2 + np.spacing(1)) / 2
-        if vis_thr is not None:
-            ind = list((vg > vis_thr) & (vd > vis_thr))
-            e = e[ind]
-        ious[n_d] = np.sum(np.exp(-e)) / len(e) if len(e) != 0 else 0.0
-    return ious
+    return oks_matrix(g[None], d, np.reshape(a_g, (1, )), a_d, sigmas,
+                      vis_thr)[0]
 
 
 def oks_nms(kpts_db: List[dict],
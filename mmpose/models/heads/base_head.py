@@ -37,6 +37,12 @@ class BaseHead(BaseModule, metaclass=ABCMeta):
              train_cfg: OptConfigType = {}) -> dict:
         """Calculate losses from a batch of inputs and data samples."""
 
+    @property
+    def support_keypoint_subset(self) -> bool:
+        """Return whether :meth:`predict` only predicts the keypoints selected
+        by ``output_keypoint_indices`` in ``test_cfg``."""
+        return False
+
     def decode(self, batch_outputs: Union[Tensor,
                                           Tuple[Tensor]]) -> InstanceList:
         """Decode keypoints from outputs.
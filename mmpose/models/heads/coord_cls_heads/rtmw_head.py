@@ -156,7 +156,10 @@ class RTMWHead(BaseHead):
         self.cls_x = nn.Linear(gau_cfg['hidden_dims'], W, bias=False)
         self.cls_y = nn.Linear(gau_cfg['hidden_dims'], H, bias=False)
 
-    def forward(self, feats: Tuple[Tensor]) -> Tuple[Tensor, Tensor]:
+    def forward(self,
+                feats: Tuple[Tensor],
+                keypoint_indices: Optional[Sequence[int]] = None
+                ) -> Tuple[Tensor, Tensor]:
         """Forward the network.
 
         The input is the featuremap extracted by backbone and the
@@ -164,6 +167,11 @@ class RTMWHead(BaseHead):
 
         Args:
             feats (Tuple[Tensor]): Multi scale feature maps.
+            keypoint_indices (Sequence[int], optional): If given, only the
+                SimCC vectors of these keypoints are computed. The keypoint
+                tokens still attend to each other in the GAU block, so the
+                selected outputs are identical to those of a full forward.
+                Defaults to ``None``
 
         Returns:
             pred_x (Tensor): 1d representation of x.
@@ -189,11 +197,20 @@ class RTMWHead(BaseHead):
 
         feats = self.gau(feats)
 
+        if keypoint_indices is not None:
+            feats = feats[:, keypoint_indices]
+
         pred_x = self.cls_x(feats)
         pred_y = self.cls_y(feats)
 
         return pred_x, pred_y
 
+    @property
+    def support_keypoint_subset(self) -> bool:
+        """The head computes and decodes only the keypoints selected by
+        ``output_keypoint_indices`` in ``test_cfg``."""
+        return True
+
     def predict(
         self,
         feats: Tuple[Tensor],
@@ -208,14 +225,16 @@ class RTMWHead(BaseHead):
             batch_data_samples (List[:obj:`PoseDataSample`]): The batch
                 data samples
             test_cfg (dict): The runtime config for testing process. Defaults
-                to {}
+                to {}. If ``output_keypoint_indices`` is set, only the
+                selected keypoints are computed and decoded
 
         Returns:
             List[InstanceData]: The pose predictions, each contains
             the following fields:
                 - keypoints (np.ndarray): predicted keypoint coordinates in
                     shape (num_instances, K, D) where K is the keypoint number
-                    and D is the keypoint dimension
+                    (or the number of selected keypoints) and D is the
+                    keypoint dimension
                 - keypoint_scores (np.ndarray): predicted keypoint scores in
                     shape (num_instances, K)
                 - keypoint_x_labels (np.ndarray, optional): The predicted 1-D
@@ -224,15 +243,30 @@ class RTMWHead(BaseHead):
                     intensity distribution in the y direction
         """
 
+        # only compute and decode the requested keypoints
+        keypoint_indices = test_cfg.get('output_keypoint_indices', None)
+
         if test_cfg.get('flip_test', False):
             # TTA: flip test -> feats = [orig, flipped]
             assert isinstance(feats, list) and len(feats) == 2
             flip_indices = batch_data_samples[0].metainfo['flip_indices']
             _feats, _feats_flip = feats
 
-            _batch_pred_x, _batch_pred_y = self.forward(_feats)
-
-            _batch_pred_x_flip, _batch_pred_y_flip = self.forward(_feats_flip)
+            _batch_pred_x, _batch_pred_y = self.forward(
+                _feats, keypoint_indices)
+
+            if keypoint_indices is not None:
+                # the flipped prediction of each selected keypoint comes
+                # from its symmetric keypoint
+                flip_keypoint_indices = [
+                    flip_indices[i] for i in keypoint_indices
+                ]
+                flip_indices = list(range(len(keypoint_indices)))
+            else:
+                flip_keypoint_indices = None
+
+            _batch_pred_x_flip, _batch_pred_y_flip = self.forward(
+                _feats_flip, flip_keypoint_indices)
             _batch_pred_x_flip, _batch_pred_y_flip = flip_vectors(
                 _batch_pred_x_flip,
                 _batch_pred_y_flip,
@@ -241,7 +275,7 @@ class RTMWHead(BaseHead):
             batch_pred_x = (_batch_pred_x + _batch_pred_x_flip) * 0.5
             batch_pred_y = (_batch_pred_y + _batch_pred_y_flip) * 0.5
         else:
-            batch_pred_x, batch_pred_y = self.forward(feats)
+            batch_pred_x, batch_pred_y = self.forward(feats, keypoint_indices)
 
         preds = self.decode((batch_pred_x, batch_pred_y))
 
@@ -142,6 +142,9 @@ class TopdownPoseEstimator(BasePoseEstimator):
             batch_pred_fields = []
         output_keypoint_indices = self.test_cfg.get('output_keypoint_indices',
                                                     None)
+        if getattr(self.head, 'support_keypoint_subset', False):
+            # the head has already selected the output keypoints
+            output_keypoint_indices = None
 
         for pred_instances, pred_fields, data_sample in zip_longest(
                 batch_pred_instances, batch_pred_fields, batch_data_samples):
@@ -6,9 +6,14 @@ from .dist_utils import reduce_mean
 from .logger import get_root_logger
 from .setup_env import register_all_modules, setup_multi_processes
 from .timer import StopWatch
+from .triangulation import (MultiViewTriangulator, camera_projection_matrix,
+                            project_points, triangulate_points,
+                            undistort_points)
 
 __all__ = [
     'get_root_logger', 'collect_env', 'StopWatch', 'setup_multi_processes',
     'register_all_modules', 'SimpleCamera', 'SimpleCameraTorch',
-    'adapt_mmdet_pipeline', 'reduce_mean'
+    'adapt_mmdet_pipeline', 'reduce_mean', 'MultiViewTriangulator',
+    'camera_projection_matrix', 'project_points', 'triangulate_points',
+    'undistort_points'
 ]
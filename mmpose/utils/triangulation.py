@@ -0,0 +1,218 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from typing import Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .camera import SimpleCamera
+
+
+def camera_projection_matrix(camera: SimpleCamera) -> np.ndarray:
+    """Compute the 3x4 pinhole projection matrix of a camera.
+
+    The matrix maps homogeneous world coordinates to homogeneous
+    (undistorted) pixel coordinates, i.e. ``P = K [R_w2c | t_w2c]`` in the
+    column-vector convention.
+
+    Args:
+        camera (SimpleCamera): A calibrated camera
+
+    Returns:
+        np.ndarray: The projection matrix in shape (3, 4)
+    """
+    intrinsic = np.eye(3)
+    intrinsic[:2] = camera.param['K'].T
+    # SimpleCamera stores the transposed matrices for row vectors
+    extrinsic = np.concatenate(
+        [camera.param['R_w2c'].T, camera.param['T_w2c'].reshape(3, 1)], axis=1)
+    return intrinsic @ extrinsic
+
+
+def undistort_points(camera: SimpleCamera,
+                     points: np.ndarray,
+                     num_iters: int = 10) -> np.ndarray:
+    """Remove the lens distortion of pixel coordinates.
+
+    This inverts the distortion model of :meth:`SimpleCamera.camera_to_pixel`
+    by fixed-point iteration in normalized image coordinates. Points are
+    returned unchanged if the camera has no distortion parameters.
+
+    Args:
+        camera (SimpleCamera): A calibrated camera
+        points (np.ndarray): Distorted pixel coordinates in shape (..., 2)
+        num_iters (int): The number of fixed-point iterations. Defaults to 10
+
+    Returns:
+        np.ndarray: Undistorted pixel coordinates in shape (..., 2)
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if not camera.undistortion:
+        return points
+
+    f = camera.param['f'].reshape(2)
+    c = camera.param['c'].reshape(2)
+    k = camera.param['k']
+    p = camera.param['p']
+    distorted = (points - c) / f
+    undistorted = distorted.copy()
+    for _ in range(num_iters):
+        r2 = (undistorted**2).sum(-1)
+        radial = 1 + sum(ki * r2**(i + 1) for i, ki in enumerate(k[:3]))
+        if k.size == 6:
+            radial /= 1 + sum(ki * r2**(i + 1) for i, ki in enumerate(k[3:]))
+        tangential = 2 * (
+            p[1] * undistorted[..., 0] + p[0] * undistorted[..., 1])
+        offset = undistorted * tangential[..., None] + r2[..., None] * p[::-1]
+        undistorted = (distorted - offset) / radial[..., None]
+    return undistorted * f + c
+
+
+def project_points(proj_matrices: np.ndarray,
+                   points_3d: np.ndarray) -> np.ndarray:
+    """Project world points into every view.
+
+    Args:
+        proj_matrices (np.ndarray): Projection matrices in shape (V, 3, 4)
+        points_3d (np.ndarray): World coordinates in shape (..., 3)
+
+    Returns:
+        np.ndarray: Pixel coordinates in shape (V, ..., 2)
+    """
+    points_3d = np.asarray(points_3d, dtype=np.float64)
+    homo = np.concatenate([points_3d, np.ones_like(points_3d[..., :1])], -1)
+    projected = np.einsum('vij,...j->v...i', proj_matrices, homo)
+    return projected[..., :2] / projected[..., 2:]
+
+
+def triangulate_points(proj_matrices: np.ndarray,
+                       points_2d: np.ndarray,
+                       weights: Optional[np.ndarray] = None
+                       ) -> Tuple[np.ndarray, np.ndarray]:
+    """Triangulate points observed in multiple views with weighted DLT.
+
+    Each view contributes two linear equations ``u * P3 - P1`` and
+    ``v * P3 - P2``. The equations are normalized to unit length and scaled
+    by the view weight, so that confident views dominate the solution and
+    views with zero weight are ignored. The homogeneous least-squares
+    solution of all points is computed at once as the eigenvector of the
+    smallest eigenvalue of ``A^T A``.
+
+    Args:
+        proj_matrices (np.ndarray): Projection matrices in shape (V, 3, 4)
+        points_2d (np.ndarray): Undistorted pixel coordinates in shape
+            (V, ..., 2)
+        weights (np.ndarray, optional): Non-negative view weights in shape
+            (V, ...), e.g. the keypoint scores. Defaults to ``None`` (all
+            views are weighted equally)
+
+    Returns:
+        tuple:
+        - points_3d (np.ndarray): World coordinates in shape (..., 3).
+            Points observed in fewer than two views are set to ``nan``
+        - valid (np.ndarray): Whether each point is observed in at least two
+            views, in shape (...)
+    """
+    proj_matrices = np.asarray(proj_matrices, dtype=np.float64)
+    points_2d = np.asarray(points_2d, dtype=np.float64)
+    num_views = proj_matrices.shape[0]
+    assert points_2d.shape[0] == num_views and points_2d.shape[-1] == 2
+    batch_shape = points_2d.shape[1:-1]
+
+    points_2d = points_2d.reshape(num_views, -1, 2)
+    if weights is None:
+        weights = np.ones(points_2d.shape[:2])
+    else:
+        weights = np.asarray(weights, dtype=np.float64).reshape(num_views, -1)
+    weights = np.where(np.isfinite(points_2d).all(-1), weights, 0)
+    points_2d = np.nan_to_num(points_2d)
+
+    # (V, N, 2, 4): two equations per view and point
+    rows = (
+        points_2d[..., None] * proj_matrices[:, None, 2:3, :] -
+        proj_matrices[:, None, :2, :])
+    norms = np.linalg.norm(rows, axis=-1, keepdims=True)
+    rows = rows / np.maximum(norms, 1e-12) * weights[..., None, None]
+
+    # (N, 4, 4) normal matrices summed over views and equations
+    normal = np.einsum('vnij,vnik->njk', rows, rows)
+    _, eigvecs = np.linalg.eigh(normal)
+    homo = eigvecs[..., 0]
+
+    valid = (weights > 0).sum(0) >= 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        points_3d = homo[:, :3] / homo[:, 3:]
+    valid &= np.isfinite(points_3d).all(-1)
+    points_3d[~valid] = np.nan
+    return points_3d.reshape(*batch_shape, 3), valid.reshape(batch_shape)
+
+
+class MultiViewTriangulator:
+    """Lift synchronized 2D keypoints of calibrated cameras to 3D.
+
+    Keypoints with scores not above ``score_thr`` are ignored, and the
+    remaining views are weighted by their keypoint scores.
+
+    Example:
+        >>> triangulator = MultiViewTriangulator([cam_front, cam_side])
+        >>> # keypoints: (V, T, K, 2), keypoint_scores: (V, T, K)
+        >>> kpts_3d, scores_3d = triangulator(keypoints, keypoint_scores)
+        >>> kpts_3d.shape, scores_3d.shape
+        ((T, K, 3), (T, K))
+
+    Args:
+        cameras (Sequence[SimpleCamera | dict]): The cameras, or their
+            parameters accepted by :class:`SimpleCamera`, in the same order
+            as the views of the keypoints
+        score_thr (float): The keypoint score threshold. Defaults to 0.3
+    """
+
+    def __init__(self,
+                 cameras: Sequence[Union[SimpleCamera, dict]],
+                 score_thr: float = 0.3):
+        assert len(cameras) >= 2, 'At least two cameras are required'
+        self.cameras = [
+            camera
+            if isinstance(camera, SimpleCamera) else SimpleCamera(camera)
+            for camera in cameras
+        ]
+        self.score_thr = score_thr
+        self.proj_matrices = np.stack(
+            [camera_projection_matrix(camera) for camera in self.cameras])
+
+    def __call__(
+        self,
+        keypoints: np.ndarray,
+        keypoint_scores: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Triangulate the keypoints.
+
+        Args:
+            keypoints (np.ndarray): Pixel coordinates in shape (V, ..., 2)
+            keypoint_scores (np.ndarray, optional): Scores in shape
+                (V, ...). Defaults to ``None`` (all keypoints are visible)
+
+        Returns:
+            tuple:
+            - keypoints_3d (np.ndarray): World coordinates in shape
+                (..., 3), ``nan`` where fewer than two views see the keypoint
+            - keypoint_scores_3d (np.ndarray): The mean score of the views
+                used for each keypoint in shape (...), 0 where invalid
+        """
+        keypoints = np.asarray(keypoints, dtype=np.float64)
+        assert keypoints.shape[0] == len(self.cameras)
+        if keypoint_scores is None:
+            keypoint_scores = np.ones(keypoints.shape[:-1])
+        keypoint_scores = np.asarray(keypoint_scores, dtype=np.float64)
+
+        keypoints = np.stack([
+            undistort_points(camera, kpts)
+            for camera, kpts in zip(self.cameras, keypoints)
+        ])
+        weights = np.where(keypoint_scores > self.score_thr, keypoint_scores,
+                           0)
+        keypoints_3d, valid = triangulate_points(self.proj_matrices, keypoints,
+                                                 weights)
+
+        num_used = (weights > 0).sum(0)
+        scores_3d = np.where(valid,
+                             weights.sum(0) / np.maximum(num_used, 1), 0)
+        return keypoints_3d, scores_3d
@@ -0,0 +1,443 @@
+#!/usr/bin/env python
+"""多路视频源共享一组检测器和姿态估计模型
+
+步态实验室通常有正面、侧面和背面等多台摄像头。每路视频源在独立线程中采集，
+调度线程每轮从所有视频源各取最新的一帧：需要检测的帧合并为一批送入检测器，
+所有帧的人体框裁剪合并为一批送入姿态估计器，因此一块GPU
+每轮只需各推理一次即可服务所有摄像头。边界框跟踪、关键点平滑和步态时间分析
+的状态按视频源分别保存，互不干扰。
+
+实时视频源（摄像头、RTSP）只保留最新的帧，推理跟不上时丢弃过期帧，使每路
+画面保持其原生帧率；视频文件默认保留每一帧，各路按轮流的顺序依次处理。
+"""
+import os
+import queue
+import threading
+import time
+from argparse import ArgumentParser
+
+import cv2
+import mmcv
+
+from gait_engine import GaitEngine, frame_timestamp
+from mmpose.registry import VISUALIZERS
+from inference_backend import has_mmdet
+from pose_pipeline import LatestQueue, StageStats
+from pose_server import load_models
+from webcam_rtmw_demo import (Config, analyze_body_posture, build_smoother, build_tracker, postprocess_pose_results,
+                              render_pose_results, select_person_bboxes)
+
+# 视频源读取结束标记
+_END_OF_STREAM = object()
+
+
+def parse_source(source):
+    """将命令行中的视频源转换为 ``cv2.VideoCapture`` 的参数，纯数字视为摄像头ID"""
+    if isinstance(source, str) and source.isdigit():
+        return int(source)
+    return source
+
+
+class CameraStream:
+    """单路视频源：后台线程采集，并保存该路的跟踪、平滑和步态状态
+
+    Args:
+        name: 视频源名称
+        source: 摄像头ID、视频文件路径或RTSP地址
+        args: 配置对象
+        drop_frames: 是否只保留最新的帧。默认视频文件为False（保留每一
+            帧），其余视频源为True
+        queue_size: 保留每一帧时的采集和输出队列长度，默认为4
+    """
+
+    def __init__(self, name, source, args, drop_frames=None, queue_size=4):
+        self.name = name
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+        if not self.cap.isOpened():
+            raise IOError(f'无法打开视频源: {source}')
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
+        self.drop_frames = not self.is_file if drop_frames is None else drop_frames
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+
+        self.tracker = build_tracker(args)
+        self.smoother = build_smoother(args)
+        self.gait_engine = GaitEngine()
+        self.stats = StageStats(name)
+
+        if self.drop_frames:
+            self.frames = LatestQueue(1, stats=self.stats)
+            self.outputs = LatestQueue(1)
+        else:
+            self.frames = queue.Queue(maxsize=queue_size)
+            self.outputs = queue.Queue(maxsize=queue_size)
+        self.exhausted = False
+        self.ended = False
+        self.finished = False
+        self._stop_event = threading.Event()
+        self._frame_ready = None
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+
+    def start(self, frame_ready=None):
+        """启动采集线程，``frame_ready`` 为有新帧时通知调度线程的事件"""
+        self._frame_ready = frame_ready
+        self._thread.start()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        self._thread.join(timeout=timeout)
+        self.cap.release()
+
+    def poll(self):
+        """取出一帧而不等待，没有新帧时返回 ``None``"""
+        if self.exhausted:
+            return None
+        try:
+            item = self.frames.get(timeout=0)
+        except queue.Empty:
+            return None
+        if item is _END_OF_STREAM:
+            self.exhausted = True
+            return None
+        return item
+
+    def read(self, timeout=None):
+        """获取该路最新处理完成的结果，超时或视频源结束时返回 ``None``"""
+        if self.finished:
+            return None
+        try:
+            item = self.outputs.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is _END_OF_STREAM:
+            self.finished = True
+            return None
+        return item
+
+    def emit(self, item):
+        """放入一帧的处理结果，保留每一帧时队列满则等待"""
+        return self._put(self.outputs, item)
+
+    def end(self):
+        """标记该路视频源的结果已全部放入"""
+        self.ended = True
+        self._put(self.outputs, _END_OF_STREAM)
+
+    def _put(self, target, item):
+        if self.drop_frames:
+            target.put(item)
+            return True
+        while not self._stop_event.is_set():
+            try:
+                target.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _notify(self):
+        if self._frame_ready is not None:
+            self._frame_ready.set()
+
+    def _capture_loop(self):
+        frame_idx = 0
+        while not self._stop_event.is_set():
+            tic = time.perf_counter()
+            success, img = self.cap.read()
+            if not success:
+                break
+            # 视频文件使用容器中的时间戳，实时视频源使用采集时刻
+            timestamp = frame_timestamp(self.cap, frame_idx, self.fps) if self.is_file else time.time()
+            if timestamp is None:
+                timestamp = frame_idx / (self.fps or 30.0)
+            self.stats.record(time.perf_counter() - tic)
+            if not self._put(self.frames, dict(stream=self.name, frame_idx=frame_idx, timestamp=timestamp, img=img)):
+                return
+            self._notify()
+            frame_idx += 1
+        self._put(self.frames, _END_OF_STREAM)
+        self._notify()
+
+
+class MultiStreamRunner:
+    """调度多路视频源，共享一个检测器和一个姿态估计模型
+
+    调度线程每轮从每路视频源取一帧（没有新帧的视频源跳过），跟踪器给出
+    边界框的帧跳过检测器，其余帧批量检测；所有帧的裁剪图像由
+    姿态估计器批量推理。每帧的结果放入对应视频源的输出
+    队列，由 :meth:`CameraStream.read` 或 :meth:`read` 读取。
+
+    推理抛出异常（如检测器出错、显存不足）时，调度线程记录异常并结束所有
+    视频源，异常随后由 :meth:`read`、:attr:`finished` 或 :meth:`stop`
+    重新抛出，不会静默卡死。
+
+    Args:
+        args: 配置对象，与 ``webcam_rtmw_demo.Config`` 相同
+        sources: 视频源列表，或 ``{名称: 视频源}`` 字典
+        detector: 人体检测器，见 :func:`inference_backend.build_detector`
+        pose_estimator: 姿态估计器，见 :func:`inference_backend.build_pose_estimator`
+        pose_batch_size: 姿态估计每次前向的裁剪图像数量，默认为32
+        drop_frames: 是否只保留每路最新的帧，默认按视频源类型决定
+    """
+
+    def __init__(self, args, sources, detector, pose_estimator, pose_batch_size=32, drop_frames=None):
+        if not isinstance(sources, dict):
+            sources = {f'camera{i}': source for i, source in enumerate(sources)}
+        self.args = args
+        self.detector = detector
+        self.pose_estimator = pose_estimator
+        self.pose_batch_size = pose_batch_size
+        self.num_keypoints = pose_estimator.dataset_meta['num_keypoints']
+        self.streams = {}
+        try:
+            for name, source in sources.items():
+                self.streams[name] = CameraStream(name, source, args, drop_frames=drop_frames)
+        except IOError:
+            for stream in self.streams.values():
+                stream.cap.release()
+            raise
+        self.stats = dict(detect=StageStats('detect'), pose=StageStats('pose'))
+        self.num_batches = 0
+        self.num_frames = 0
+
+        self._error = None
+        self._error_raised = False
+        self._error_lock = threading.Lock()
+        self._frame_ready = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._schedule_loop, daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        for stream in self.streams.values():
+            stream.start(self._frame_ready)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=1.0):
+        """停止调度和采集线程
+
+        若调度线程抛出过异常且尚未由 :meth:`read` 抛出，则在此重新抛出。
+        """
+        self._stop_event.set()
+        # 先停止各路视频源，使阻塞在输出队列上的调度线程退出
+        for stream in self.streams.values():
+            stream.stop(timeout)
+        self._thread.join(timeout=timeout)
+        self._raise_error()
+
+    @property
+    def error(self):
+        """调度线程中抛出的异常，没有异常时为 ``None``"""
+        return self._error
+
+    @property
+    def finished(self):
+        """所有视频源是否都已读完且结果都已取出
+
+        Raises:
+            Exception: 调度线程抛出的异常，在所有视频源结束时抛出
+        """
+        if not all(stream.finished for stream in self.streams.values()):
+            return False
+        self._raise_error()
+        return True
+
+    def read(self, timeout=0.01):
+        """依次获取每路视频源的最新结果
+
+        Returns:
+            dict: ``{视频源名称: 结果字典}``，只包含本次有新结果的视频源
+
+        Raises:
+            Exception: 调度线程抛出的异常，在所有视频源结束时抛出
+        """
+        results = {}
+        for name, stream in self.streams.items():
+            item = stream.read(timeout=timeout)
+            if item is not None:
+                results[name] = item
+        if all(stream.finished for stream in self.streams.values()):
+            self._raise_error()
+        return results
+
+    def get_stats(self):
+        stats = {name: stream.stats.summary() for name, stream in self.streams.items()}
+        stats.update({name: s.summary() for name, s in self.stats.items()})
+        return stats
+
+    def format_stats(self):
+        """将各路采集和共享推理阶段的统计格式化为一行文本"""
+        parts = []
+        for name, s in self.get_stats().items():
+            part = f"{name}: {s['latency_ms']:.1f}ms {s['fps']:.1f}fps"
+            if s['dropped']:
+                part += f" 丢帧{s['dropped']}"
+            parts.append(part)
+        if self.num_batches:
+            parts.append(f'平均每批{self.num_frames / self.num_batches:.1f}帧')
+        return ' | '.join(parts)
+
+    def process_frames(self, items):
+        """对来自不同视频源的一批帧共同推理，并按视频源更新跨帧状态
+
+        Args:
+            items: 帧字典列表，每项包含 ``stream``、``frame_idx``、
+                ``timestamp`` 和 ``img``，同一视频源在一批中最多一帧
+
+        Returns:
+            list[dict]: 输入的帧字典，添加了 ``bboxes``、``data_samples``、
+            ``posture`` 和 ``gait``（未检测到人体时为None）
+        """
+        args = self.args
+        streams = [self.streams[item['stream']] for item in items]
+
+        # 跟踪有效的视频源直接使用上一帧关键点推算的边界框，其余批量检测
+        tic = time.perf_counter()
+        bboxes_list = [stream.tracker.predict_bboxes() if stream.tracker is not None else None for stream in streams]
+        det_indices = [i for i, bboxes in enumerate(bboxes_list) if bboxes is None]
+        if det_indices:
+            det_results = self.detector.detect([items[i]['img'] for i in det_indices])
+            for i, det_result in zip(det_indices, det_results):
+                bboxes_list[i] = select_person_bboxes(args, det_result)
+                if streams[i].tracker is not None:
+                    streams[i].tracker.set_detections(bboxes_list[i])
+            self.stats['detect'].record(time.perf_counter() - tic)
+
+        tic = time.perf_counter()
+        pose_results = self.pose_estimator.predict(
+            [(item['img'], bboxes) for item, bboxes in zip(items, bboxes_list)], batch_size=self.pose_batch_size)
+        self.stats['pose'].record(time.perf_counter() - tic)
+
+        for item, stream, bboxes, results in zip(items, streams, bboxes_list, pose_results):
+            data_samples = postprocess_pose_results(args, item['img'], bboxes, results, self.num_keypoints,
+                                                    stream.tracker, stream.smoother, item['timestamp'])
+            item['bboxes'] = bboxes
+            item['data_samples'] = data_samples
+            item['posture'] = None
+            item['gait'] = None
+            if len(bboxes) > 0:
+                pred_instances = data_samples.pred_instances
+                keypoints = pred_instances.keypoints[0]
+                keypoint_scores = pred_instances.keypoint_scores[0]
+                custom_kpts = data_samples.custom_keypoints[0] if hasattr(data_samples, 'custom_keypoints') else None
+                item['posture'] = analyze_body_posture(keypoints, keypoint_scores, custom_kpts)
+                item['gait'] = stream.gait_engine.update(item['timestamp'], keypoints, keypoint_scores)
+        self.num_batches += 1
+        self.num_frames += len(items)
+        return items
+
+    def _set_error(self, error):
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+
+    def _raise_error(self):
+        """重新抛出记录的异常，每个异常只抛出一次"""
+        with self._error_lock:
+            if self._error is None or self._error_raised:
+                return
+            self._error_raised = True
+        raise self._error
+
+    def _schedule_loop(self):
+        try:
+            self._schedule()
+        except Exception as e:
+            # 记录异常并结束所有视频源，避免读取端无限等待
+            self._set_error(e)
+            for stream in self.streams.values():
+                if not stream.ended:
+                    stream.end()
+
+    def _schedule(self):
+        streams = list(self.streams.values())
+        while not self._stop_event.is_set():
+            # 先清除事件再取帧，取帧之后到达的新帧会在下一轮被处理
+            self._frame_ready.clear()
+            items = []
+            for stream in streams:
+                was_exhausted = stream.exhausted
+                item = stream.poll()
+                if item is not None:
+                    items.append(item)
+                elif stream.exhausted and not was_exhausted:
+                    stream.end()
+
+            if not items:
+                if all(stream.exhausted for stream in streams):
+                    return
+                self._frame_ready.wait(timeout=0.1)
+                continue
+
+            for item in self.process_frames(items):
+                stream = self.streams[item['stream']]
+                if not stream.emit(item):
+                    return
+
+
+def build_visualizer(args, pose_estimator):
+    pose_estimator.cfg.visualizer.radius = args.radius
+    pose_estimator.cfg.visualizer.alpha = args.alpha
+    pose_estimator.cfg.visualizer.line_width = args.thickness
+    visualizer = VISUALIZERS.build(pose_estimator.cfg.visualizer)
+    visualizer.set_dataset_meta(pose_estimator.dataset_meta, skeleton_style=args.skeleton_style)
+    return visualizer
+
+
+def main():
+    parser = ArgumentParser(description='多路摄像头共享模型的实时姿态分析')
+    parser.add_argument(
+        'sources', nargs='*', help='视频源：摄像头ID、视频文件路径或RTSP地址，默认使用Config.camera_sources')
+    parser.add_argument('--device', default=None, help='推理设备，默认使用Config中的设置')
+    parser.add_argument('--pose-batch-size', type=int, default=None, help='姿态估计每次前向的裁剪图像数量')
+    parser.add_argument('--keep-all-frames', action='store_true', help='实时视频源也保留每一帧，不丢弃过期帧')
+    parser.add_argument('--no-show', action='store_true', help='不显示画面，只打印统计')
+    cli_args = parser.parse_args()
+
+    args = Config()
+    if cli_args.device:
+        args.device = cli_args.device
+    assert has_mmdet or args.backend == 'onnxruntime', '请安装mmdet以运行演示。'
+    sources = [parse_source(source) for source in (cli_args.sources or args.camera_sources)]
+
+    detector, pose_estimator = load_models(args)
+    visualizer = None if cli_args.no_show else build_visualizer(args, pose_estimator)
+    # 渲染时不打印每帧的体态分析结果
+    args.show_posture_analysis = False
+    runner = MultiStreamRunner(
+        args,
+        sources,
+        detector,
+        pose_estimator,
+        pose_batch_size=cli_args.pose_batch_size or args.pose_batch_size,
+        drop_frames=False if cli_args.keep_all_frames else None)
+
+    print("按ESC键退出程序")
+    num_outputs = 0
+    with runner:
+        while not runner.finished:
+            results = runner.read()
+            for name, item in results.items():
+                num_outputs += 1
+                if args.stats_interval and num_outputs % args.stats_interval == 0:
+                    print(f"多路统计: {runner.format_stats()}")
+                if visualizer is None:
+                    continue
+                # 可视化器不是线程安全的，只在主线程中渲染
+                render_pose_results(args, item['img'], item['data_samples'], visualizer)
+                cv2.imshow(name, mmcv.rgb2bgr(visualizer.get_image()))
+            if visualizer is not None and cv2.waitKey(1) & 0xFF == 27:
+                break
+    print(f"多路统计: {runner.format_stats()}")
+    cv2.destroyAllWindows()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+import copy
+
+import cv2
+import numpy as np
+
+from batch_analysis import POSTURE_METRICS, analyze_body_posture_batch
+from gait_engine import GaitEngine
+from mmpose.structures import merge_data_samples
+from video_io import AsyncVideoWriter, VideoReader
+from webcam_rtmw_demo import (build_smoother, expand_keypoint_subset, filter_keypoints, render_pose_results,
+                              select_person_bboxes)
+
+
+def iter_offline_batches(args,
+                         reader,
+                         detector,
+                         pose_estimator,
+                         batch_size=32,
+                         frames_per_batch=16,
+                         num_workers=4):
+    """批量分析 :class:`video_io.VideoReader` 读出的帧，每处理完一批产生一次结果
+
+    每次取 ``frames_per_batch`` 帧，检测器对这些帧批量推理，所有人体框的
+    裁剪由姿态估计器在线程池中完成，并按 ``batch_size`` 批量送入姿态估计
+    模型（检测器和姿态估计器见 :mod:`inference_backend`）。配置了关键点平滑时，按帧顺序和视频时间戳对关键点
+    做时间平滑。
+
+    Yields:
+        list[dict]: 一批帧的结果，每项包含 ``frame_idx``、``timestamp`` 和
+        ``data_samples``（已过滤关键点并添加自定义关键点）
+    """
+    smoother = build_smoother(args)
+    num_keypoints = pose_estimator.dataset_meta['num_keypoints']
+
+    def process_batch(batch):
+        imgs = [img for _, _, img in batch]
+        det_results = detector.detect(imgs)
+        bboxes_list = [select_person_bboxes(args, r) for r in det_results]
+        pose_results = pose_estimator.predict(
+            list(zip(imgs, bboxes_list)), batch_size=batch_size, num_workers=num_workers)
+        frames = []
+        for (frame_idx, timestamp, _), results in zip(batch, pose_results):
+            data_samples = expand_keypoint_subset(merge_data_samples(results), args, num_keypoints)
+            if smoother is not None:
+                smoother.smooth_data_samples(
+                    data_samples, timestamp if timestamp is not None else frame_idx / (reader.fps or 30.0))
+            data_samples = filter_keypoints(data_samples, args)
+            frames.append(dict(frame_idx=frame_idx, timestamp=timestamp, data_samples=data_samples))
+        return frames
+
+    batch = []
+    for item in reader:
+        batch.append(item)
+        if len(batch) >= frames_per_batch:
+            yield process_batch(batch)
+            batch = []
+    if batch:
+        yield process_batch(batch)
+
+
+def analyze_video_offline(args,
+                          video_path,
+                          detector,
+                          pose_estimator,
+                          batch_size=32,
+                          frames_per_batch=16,
+                          num_workers=4,
+                          stride=1,
+                          backend='auto',
+                          progress_fn=None):
+    """离线批量分析整段视频，不进行渲染
+
+    解码在后台线程中进行，推理见 :func:`iter_offline_batches`。
+    结果只保存关键点，需要标注视频时再调用 :func:`render_offline_video`。
+
+    Args:
+        args: 配置对象
+        video_path: 视频文件路径
+        detector: 人体检测器，见 :func:`inference_backend.build_detector`
+        pose_estimator: 姿态估计器，见 :func:`inference_backend.build_pose_estimator`
+        batch_size: 姿态估计每批的裁剪图像数量，默认为32
+        frames_per_batch: 每次批量处理的帧数，默认为16
+        num_workers: 裁剪图像的线程数，默认为4
+        stride: 抽帧步长，只分析每 ``stride`` 帧中的一帧，默认为1
+        backend: 视频解码后端，见 :class:`video_io.VideoReader`
+        progress_fn: 进度回调函数，参数为 (已处理帧数, 总帧数)
+
+    Returns:
+        dict: 包含 ``fps``、``width``、``height`` 和 ``frames`` 的字典。
+        ``frames`` 中每一项包含 ``frame_idx``、``timestamp`` 和
+        ``data_samples``（已过滤关键点并添加自定义关键点），``frame_idx``
+        为视频中的原始帧序号
+    """
+    frames = []
+    with VideoReader(video_path, stride=stride, backend=backend) as reader:
+        for batch in iter_offline_batches(args, reader, detector, pose_estimator, batch_size, frames_per_batch,
+                                          num_workers):
+            frames.extend(batch)
+            if progress_fn is not None:
+                progress_fn(len(frames), reader.num_frames)
+
+    return dict(fps=reader.fps, width=reader.width, height=reader.height, frames=frames)
+
+
+def _stack_first_instance(frames):
+    """将每帧第一个人的关键点堆叠为数组，自定义关键点的置信度与逐帧分析一致"""
+    num_frames = len(frames)
+    present = np.zeros(num_frames, dtype=bool)
+    num_keypoints = 0
+    for i, frame in enumerate(frames):
+        pred = getattr(frame['data_samples'], 'pred_instances', None)
+        if pred is not None and len(pred) > 0:
+            present[i] = True
+            num_keypoints = pred.keypoints.shape[1]
+
+    keypoints = np.full((num_frames, num_keypoints, 2), -1, dtype=np.float32)
+    keypoint_scores = np.zeros((num_frames, num_keypoints), dtype=np.float32)
+    custom_keypoints = np.full((num_frames, 2, 2), -1, dtype=np.float32)
+    custom_scores = np.zeros((num_frames, 2), dtype=np.float32)
+    for i in np.flatnonzero(present):
+        data_samples = frames[i]['data_samples']
+        keypoints[i] = data_samples.pred_instances.keypoints[0]
+        keypoint_scores[i] = data_samples.pred_instances.keypoint_scores[0]
+        custom = getattr(data_samples, 'custom_keypoints', None)
+        if custom:
+            num_custom = min(len(custom[0]), 2)
+            if num_custom > 0:
+                custom_keypoints[i, :num_custom] = custom[0][:num_custom]
+                custom_scores[i, :num_custom] = keypoint_scores[i, -len(custom[0]):][:num_custom]
+    return keypoints, keypoint_scores, custom_keypoints, custom_scores, present
+
+
+def summarize_offline_results(video_result, gait_engine=None, with_gait=True):
+    """对离线分析的关键点序列批量计算体态和步态指标
+
+    Args:
+        video_result: :func:`analyze_video_offline` 的返回值
+        gait_engine: 步态时间分析引擎，默认新建 :class:`GaitEngine`
+        with_gait: 是否计算步态时间指标，默认为True。分段处理视频时可只
+            计算逐帧的体态指标，步态指标在整段视频处理完后统一计算
+
+    Returns:
+        list[dict]: 每帧的分析结果，检测到人体的帧包含 ``posture``
+        （保留一位小数）和 ``gait``（步态时间指标）
+    """
+    frames = video_result['frames']
+    keypoints, keypoint_scores, custom_keypoints, custom_scores, present = _stack_first_instance(frames)
+    if gait_engine is None and with_gait:
+        gait_engine = GaitEngine()
+
+    frame_results = [{} for _ in frames]
+    if not present.any():
+        return frame_results
+
+    values, masks = analyze_body_posture_batch(keypoints[present], keypoint_scores[present], custom_keypoints[present],
+                                               custom_scores[present])
+    for row, i in enumerate(np.flatnonzero(present)):
+        frame_results[i]['posture'] = {
+            name: round(float(values[name][row]), 1) if masks[name][row] else None
+            for name in POSTURE_METRICS
+        }
+        if not with_gait:
+            continue
+        timestamp = frames[i]['timestamp']
+        if timestamp is None:
+            timestamp = frames[i]['frame_idx'] / video_result['fps'] if video_result['fps'] else 0.0
+        frame_results[i]['gait'] = gait_engine.update(timestamp, keypoints[i], keypoint_scores[i])
+    return frame_results
+
+
+def render_offline_video(args, video_path, video_result, visualizer, output_path, progress_fn=None):
+    """按需渲染离线分析结果，重新解码视频并写入带关键点的标注视频
+
+    Args:
+        args: 配置对象
+        video_path: 原始视频文件路径
+        video_result: :func:`analyze_video_offline` 的返回值
+        visualizer: 姿态可视化器
+        output_path: 输出视频路径
+        progress_fn: 进度回调函数，参数为 (已渲染帧数, 总帧数)
+
+    Returns:
+        str: 输出视频路径
+    """
+    # 渲染时不重复打印每帧的体态分析结果
+    args = copy.copy(args)
+    args.show_posture_analysis = False
+
+    frames = {frame['frame_idx']: frame for frame in video_result['frames']}
+    # 编码在后台线程中进行，输出视频保持原始帧率
+    video_writer = AsyncVideoWriter(output_path, fps=video_result['fps'] or 25.0)
+    try:
+        with VideoReader(video_path) as reader:
+            for frame_idx, _, img in reader:
+                frame = frames.get(frame_idx)
+                if frame is None:
+                    video_writer.write(img)
+                    continue
+                render_pose_results(args, img, frame['data_samples'], visualizer)
+                video_writer.write(cv2.cvtColor(visualizer.get_image(), cv2.COLOR_RGB2BGR))
+                if progress_fn is not None:
+                    progress_fn(frame_idx + 1, reader.total_frames)
+    finally:
+        video_writer.close()
+    return output_path
@@ -0,0 +1,200 @@
+import http.client
+import json
+import time
+import uuid
+from urllib.parse import urlencode, urlparse
+
+import cv2
+import numpy as np
+from mmengine.structures import InstanceData
+
+from mmpose.structures import PoseDataSample
+
+DEFAULT_SERVER_URL = 'http://127.0.0.1:8765'
+
+
+class PoseClient:
+    """:mod:`pose_server` 的HTTP客户端
+
+    使用长连接依次发送请求，同一客户端的帧属于同一个 ``stream``，服务端
+    按 ``stream`` 保存关键点平滑和步态分析的状态。客户端不是线程安全的，
+    每个线程应使用各自的客户端。
+
+    Args:
+        url: 服务地址，默认为 ``http://127.0.0.1:8765``
+        stream: 视频流标识，默认随机生成
+        jpeg_quality: 上传帧的JPEG质量，默认为90
+        timeout: 请求超时（秒），默认为30
+    """
+
+    def __init__(self, url=DEFAULT_SERVER_URL, stream=None, jpeg_quality=90, timeout=30.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 8765
+        self.stream = stream or f'client-{uuid.uuid4().hex}'
+        self.jpeg_quality = jpeg_quality
+        self.timeout = timeout
+        self._conn = None
+        self._info = None
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _request(self, method, path, body=None, headers=None):
+        """发送请求并返回响应，连接断开时重连一次"""
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request(method, path, body=body, headers=headers or {})
+                return self._conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                self.close()
+                if attempt:
+                    raise
+
+    def _json(self, method, path, body=None, headers=None):
+        response = self._request(method, path, body, headers)
+        result = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f'姿态分析服务返回错误({response.status}): {result.get("error")}')
+        return result
+
+    def info(self):
+        """模型信息，``dataset_meta`` 中的数组字段已还原为 ``np.ndarray``"""
+        if self._info is None:
+            info = self._json('GET', '/info')
+            for key in info.pop('array_keys'):
+                info['dataset_meta'][key] = np.asarray(info['dataset_meta'][key])
+            self._info = info
+        return self._info
+
+    def health(self):
+        return self._json('GET', '/health')
+
+    def analyze_frame(self, img, timestamp=None):
+        """分析一帧BGR图像
+
+        Returns:
+            dict: 包含 ``bboxes``、``keypoints``、``keypoint_scores``、
+            ``custom_keypoints``、``custom_keypoint_scores``、``timestamp``、
+            ``posture`` 和 ``gait`` 的字典，未检测到人体时 ``posture`` 和
+            ``gait`` 为None
+        """
+        success, data = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not success:
+            raise ValueError('无法编码图像')
+        query = dict(stream=self.stream, timestamp=time.time() if timestamp is None else timestamp)
+        return self._json('POST', f'/frame?{urlencode(query)}', data.tobytes(), {'Content-Type': 'image/jpeg'})
+
+    def estimate_poses(self, img, timestamp=None):
+        """分析一帧BGR图像，返回与 ``webcam_rtmw_demo.estimate_poses`` 相同格式的 ``PoseDataSample``"""
+        result = self.analyze_frame(img, timestamp)
+        return result_to_data_samples(result), result
+
+    def iter_video(self, video_path, start_frame=0):
+        """逐帧分析服务端可访问的视频文件，从第 ``start_frame`` 帧开始依次产生每帧的结果"""
+        body = json.dumps(dict(path=video_path, start_frame=start_frame)).encode('utf-8')
+        response = self._request('POST', '/video', body, {'Content-Type': 'application/json'})
+        if response.status != 200:
+            result = json.loads(response.read())
+            raise IOError(result.get('error'))
+        for line in response:
+            result = json.loads(line)
+            if result.get('done'):
+                break
+            yield result
+        response.read()
+
+    def analyze_video(self, video_path, progress_fn=None):
+        """逐帧分析视频，返回与 ``offline_video.analyze_video_offline`` 相同格式的结果
+
+        Args:
+            video_path: 视频文件路径，需要服务端可以访问
+            progress_fn: 进度回调函数，参数为 (已处理帧数, 总帧数)
+        """
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise IOError(f'无法打开视频文件: {video_path}')
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        cap.release()
+
+        frames = []
+        for result in self.iter_video(video_path):
+            frames.append(
+                dict(
+                    frame_idx=result['frame_idx'],
+                    timestamp=result['timestamp'],
+                    data_samples=result_to_data_samples(result)))
+            if progress_fn is not None and len(frames) % 16 == 0:
+                progress_fn(len(frames), total_frames)
+        if progress_fn is not None:
+            progress_fn(len(frames), total_frames)
+        return dict(fps=fps, width=width, height=height, frames=frames)
+
+    def build_visualizer(self, args):
+        """按姿态估计配置和服务端的数据集元数据构建本地可视化器，不加载模型权重"""
+        from mmengine.config import Config as MMConfig
+
+        from mmpose.registry import VISUALIZERS
+
+        info = self.info()
+        vis_cfg = MMConfig.fromfile(info.get('pose_config') or args.pose_config).visualizer
+        vis_cfg.radius = args.radius
+        vis_cfg.alpha = args.alpha
+        vis_cfg.line_width = args.thickness
+        visualizer = VISUALIZERS.build(vis_cfg)
+        visualizer.set_dataset_meta(info['dataset_meta'], skeleton_style=args.skeleton_style)
+        return visualizer
+
+
+def result_to_data_samples(result):
+    """将服务端返回的单帧结果还原为 ``PoseDataSample``"""
+    data_samples = PoseDataSample()
+    pred_instances = InstanceData()
+    num_keypoints = len(result['keypoints'][0]) if result['keypoints'] else 0
+    pred_instances.bboxes = np.asarray(result['bboxes'], dtype=np.float32).reshape(-1, 4)
+    pred_instances.keypoints = np.asarray(result['keypoints'], dtype=np.float32).reshape(-1, num_keypoints, 2)
+    pred_instances.keypoint_scores = np.asarray(result['keypoint_scores'], dtype=np.float32).reshape(-1, num_keypoints)
+    data_samples.pred_instances = pred_instances
+    if result['custom_keypoints']:
+        data_samples.custom_keypoints = [
+            np.asarray(kpts, dtype=np.float32).reshape(-1, 2) for kpts in result['custom_keypoints']
+        ]
+        data_samples.custom_keypoint_scores = [
+            np.asarray(scores, dtype=np.float32) for scores in result['custom_keypoint_scores']
+        ]
+    return data_samples
+
+
+def iter_remote_frames(args, cap, client, visualizer):
+    """读取摄像头画面并由姿态分析服务推理，本地只负责渲染
+
+    与 ``webcam_rtmw_demo.iter_sequential_frames`` 的输出格式相同。
+
+    Yields:
+        tuple: (帧序号, 姿态估计结果, 可视化后的RGB图像)
+    """
+    # 渲染代码依赖的模型模块只在需要渲染时导入
+    from webcam_rtmw_demo import render_pose_results
+
+    frame_idx = 0
+    while cap.isOpened():
+        success, frame = cap.read()
+        frame_idx += 1
+        if not success:
+            break
+        data_samples, _ = client.estimate_poses(frame)
+        data_samples = render_pose_results(args, frame, data_samples, visualizer)
+        yield frame_idx, data_samples, visualizer.get_image()
@@ -0,0 +1,307 @@
+import queue
+import threading
+import time
+from collections import deque
+
+# 流水线结束标记，由采集线程发出并逐级向下游传递
+_END_OF_STREAM = object()
+
+
+class StageStats:
+    """单个流水线阶段的延迟与吞吐统计
+
+    Args:
+        name: 阶段名称
+        window: 统计窗口长度（帧数），默认为30
+    """
+
+    def __init__(self, name, window=30):
+        self.name = name
+        self.count = 0
+        self.dropped = 0
+        self._latencies = deque(maxlen=window)
+        self._timestamps = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        """记录一次处理耗时（秒）"""
+        with self._lock:
+            self.count += 1
+            self._latencies.append(latency)
+            self._timestamps.append(time.perf_counter())
+
+    def record_drop(self):
+        """记录一次因下游繁忙而丢弃的帧"""
+        with self._lock:
+            self.dropped += 1
+
+    def summary(self):
+        """返回该阶段的统计结果
+
+        Returns:
+            dict: 包含平均延迟(毫秒)、吞吐量(帧/秒)、已处理帧数和丢帧数
+        """
+        with self._lock:
+            latency_ms = (
+                sum(self._latencies) / len(self._latencies) *
+                1000 if self._latencies else 0.0)
+            fps = 0.0
+            if len(self._timestamps) > 1:
+                span = self._timestamps[-1] - self._timestamps[0]
+                if span > 0:
+                    fps = (len(self._timestamps) - 1) / span
+            return {
+                'latency_ms': latency_ms,
+                'fps': fps,
+                'count': self.count,
+                'dropped': self.dropped
+            }
+
+
+class LatestQueue:
+    """有界队列，队列满时丢弃最旧的元素而不是阻塞生产者
+
+    用于采集端和输出端，保证下游总是拿到最新的帧，不会积压过期帧。
+    """
+
+    def __init__(self, maxsize=1, stats=None):
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stats = stats
+
+    def put(self, item):
+        while True:
+            try:
+                self._queue.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    if self._stats is not None:
+                        self._stats.record_drop()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=None):
+        return self._queue.get(timeout=timeout)
+
+
+class PosePipeline:
+    """采集 → 检测 → 姿态估计 → 分析与渲染 的多线程流水线
+
+    每个阶段运行在独立线程中，阶段之间通过有界队列连接。采集阶段和输出端
+    队列满时丢弃最旧的帧，中间阶段的队列满时阻塞上游，因此整体帧率受最慢
+    阶段限制，而不是所有阶段耗时之和，且不会积压过期帧。
+
+    每个阶段函数接收并返回一个帧字典，字典中包含 ``frame_idx``、
+    ``timestamp`` 和 ``img`` 等字段，阶段函数可以添加新的字段。
+
+    某个阶段抛出异常时，该阶段线程记录异常并向下游发送结束标记，
+    异常随后由 :meth:`read` 或 :meth:`stop` 重新抛出，不会静默卡死。
+
+    Args:
+        capture: 视频源，需提供 ``read()`` 方法，如 ``cv2.VideoCapture``
+        detect_fn: 检测阶段函数，输入帧字典，返回帧字典（需写入 ``bboxes``）
+        pose_fn: 姿态估计阶段函数，输入帧字典，返回帧字典
+        render_fn: 分析与渲染阶段函数，输入帧字典，返回帧字典
+        queue_size: 中间阶段队列长度，默认为2
+        timestamp_fn: 获取帧时间戳（秒）的函数，参数为视频源。默认使用
+            ``time.time()``
+        drop_frames: 是否在采集端和输出端丢弃过期帧。实时摄像头应设为
+            True；处理视频文件需要保留每一帧时设为False，此时各级队列均
+            阻塞上游。默认为True
+    """
+
+    STAGES = ('capture', 'detect', 'pose', 'render')
+
+    def __init__(self,
+                 capture,
+                 detect_fn,
+                 pose_fn,
+                 render_fn,
+                 queue_size=2,
+                 timestamp_fn=None,
+                 drop_frames=True):
+        self.capture = capture
+        self.timestamp_fn = timestamp_fn
+        self.drop_frames = drop_frames
+        self.stats = {name: StageStats(name) for name in self.STAGES}
+
+        self._stop_event = threading.Event()
+        self._finished = threading.Event()
+        self._error = None
+        self._error_raised = False
+        self._error_lock = threading.Lock()
+        self._pose_queue = queue.Queue(maxsize=queue_size)
+        self._render_queue = queue.Queue(maxsize=queue_size)
+        if drop_frames:
+            self._det_queue = LatestQueue(1, stats=self.stats['capture'])
+            self._output_queue = LatestQueue(1, stats=self.stats['render'])
+        else:
+            self._det_queue = queue.Queue(maxsize=queue_size)
+            self._output_queue = queue.Queue(maxsize=queue_size)
+
+        self._threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(
+                target=self._stage_loop,
+                args=('detect', detect_fn, self._det_queue.get,
+                      self._pose_queue.put, True),
+                daemon=True),
+            threading.Thread(
+                target=self._stage_loop,
+                args=('pose', pose_fn, self._pose_queue.get,
+                      self._render_queue.put, True),
+                daemon=True),
+            threading.Thread(
+                target=self._stage_loop,
+                args=('render', render_fn, self._render_queue.get,
+                      self._output_queue.put, not drop_frames),
+                daemon=True),
+        ]
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        """启动所有阶段线程"""
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout=1.0):
+        """停止流水线并等待线程退出
+
+        若某个阶段抛出过异常且尚未由 :meth:`read` 抛出，则在此重新抛出。
+        """
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._raise_error()
+
+    close = stop
+
+    @property
+    def error(self):
+        """阶段线程中抛出的第一个异常，没有异常时为 ``None``"""
+        return self._error
+
+    @property
+    def finished(self):
+        """视频源是否已读完且所有帧都已输出"""
+        return self._finished.is_set()
+
+    def read(self, timeout=1.0):
+        """获取最新处理完成的帧字典
+
+        Returns:
+            dict | None: 处理结果；超时或流水线结束时返回 ``None``
+
+        Raises:
+            Exception: 某个阶段抛出的异常，在结束标记到达输出端时抛出
+        """
+        if self._finished.is_set():
+            return None
+        try:
+            item = self._output_queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if item is _END_OF_STREAM:
+            self._finished.set()
+            self._raise_error()
+            return None
+        return item
+
+    def get_stats(self):
+        """返回所有阶段的统计结果，键为阶段名称"""
+        return {name: s.summary() for name, s in self.stats.items()}
+
+    def format_stats(self):
+        """将各阶段统计格式化为一行文本，便于打印"""
+        parts = []
+        for name, s in self.get_stats().items():
+            part = f"{name}: {s['latency_ms']:.1f}ms {s['fps']:.1f}fps"
+            if s['dropped']:
+                part += f" 丢帧{s['dropped']}"
+            parts.append(part)
+        return ' | '.join(parts)
+
+    def _set_error(self, error):
+        """记录阶段线程中的异常，只保留第一个"""
+        with self._error_lock:
+            if self._error is None:
+                self._error = error
+
+    def _raise_error(self):
+        """重新抛出记录的异常，每个异常只抛出一次"""
+        with self._error_lock:
+            if self._error is None or self._error_raised:
+                return
+            self._error_raised = True
+        raise self._error
+
+    def _put(self, put_fn, item):
+        """向阻塞队列放入元素，期间响应停止信号"""
+        while not self._stop_event.is_set():
+            try:
+                put_fn(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _capture_loop(self):
+        frame_idx = 0
+        stats = self.stats['capture']
+        while not self._stop_event.is_set():
+            tic = time.perf_counter()
+            try:
+                success, img = self.capture.read()
+                if not success:
+                    break
+                timestamp = (
+                    self.timestamp_fn(self.capture)
+                    if self.timestamp_fn is not None else time.time())
+            except Exception as e:
+                self._set_error(e)
+                break
+            frame_idx += 1
+            stats.record(time.perf_counter() - tic)
+            item = dict(frame_idx=frame_idx, timestamp=timestamp, img=img)
+            if self.drop_frames:
+                self._det_queue.put(item)
+            elif not self._put(self._det_queue.put, item):
+                return
+        if self.drop_frames:
+            self._det_queue.put(_END_OF_STREAM)
+        else:
+            self._put(self._det_queue.put, _END_OF_STREAM)
+
+    def _stage_loop(self, name, stage_fn, get_fn, put_fn, blocking):
+        stats = self.stats[name]
+        while not self._stop_event.is_set():
+            try:
+                item = get_fn(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            if item is not _END_OF_STREAM:
+                tic = time.perf_counter()
+                try:
+                    item = stage_fn(item)
+                except Exception as e:
+                    # 记录异常并结束下游，避免读取端无限等待
+                    self._set_error(e)
+                    item = _END_OF_STREAM
+                else:
+                    stats.record(time.perf_counter() - tic)
+
+            if not blocking:
+                put_fn(item)
+            elif not self._put(put_fn, item):
+                break
+
+            if item is _END_OF_STREAM:
+                break
@@ -0,0 +1,590 @@
+#!/usr/bin/env python
+"""常驻的姿态分析服务
+
+服务进程只加载一次RTMDet和RTMW，所有客户端（浏览器、Streamlit应用、演示
+脚本）通过本地HTTP/WebSocket接口共享同一组模型。来自不同客户端的帧进入同
+一个队列，由 :class:`DynamicBatcher` 合并为一批，检测器和姿态估计模型对整批
+帧各推理一次。模型可以是PyTorch或ONNX Runtime后端（``Config.backend``）。
+
+HTTP接口:
+    GET  /info                      模型信息和数据集元数据
+    GET  /health                    服务状态和批处理统计
+    POST /frame?stream=ID&timestamp=T
+                                    请求体为JPEG/PNG图像，返回该帧的分析结果
+    POST /video                     请求体为JSON ``{"path": 视频路径}``，逐帧
+                                    返回JSON行（NDJSON），最后一行为
+                                    ``{"done": true, ...}``；可选字段
+                                    ``start_frame`` 指定开始的帧序号
+
+WebSocket接口 (GET /ws?stream=ID):
+    二进制消息为一帧JPEG/PNG图像，服务返回该帧分析结果的文本消息；
+    文本消息 ``{"timestamp": T}`` 设置下一帧的时间戳（秒）；
+    文本消息 ``{"video": 视频路径}`` 逐帧返回分析结果，最后返回
+    ``{"done": true, ...}``。
+
+同一 ``stream`` 的帧按到达顺序处理，关键点平滑和步态时间分析的状态按
+``stream`` 分别保存，空闲超过 ``stream_timeout`` 秒后释放。
+"""
+import base64
+import hashlib
+import json
+import queue
+import struct
+import threading
+import time
+import uuid
+from argparse import ArgumentParser
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import cv2
+import numpy as np
+
+from gait_engine import GaitEngine
+from inference_backend import build_detector, build_pose_estimator, has_mmdet
+from mmpose.structures import merge_data_samples
+from pose_pipeline import StageStats
+from video_io import VideoReader
+from webcam_rtmw_demo import (Config, analyze_body_posture, build_smoother, expand_keypoint_subset, filter_keypoints,
+                              select_person_bboxes)
+
+# 服务停止标记
+_STOP = object()
+
+
+class DynamicBatcher:
+    """跨客户端的动态批处理器
+
+    所有请求进入同一个队列，后台线程取出第一个请求后最多再等待
+    ``max_wait`` 秒，凑满 ``max_batch`` 个请求或超时后调用一次
+    ``batch_fn``。请求按到达顺序处理，每个请求的结果通过
+    ``concurrent.futures.Future`` 返回。
+
+    Args:
+        batch_fn: 批处理函数，输入请求列表，返回等长的结果列表
+        max_batch: 每批最多的请求数，默认为16
+        max_wait: 凑批的最长等待时间（秒），默认为0.01
+    """
+
+    def __init__(self, batch_fn, max_batch=16, max_wait=0.01):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = StageStats('batch')
+        self.num_batches = 0
+        self.num_items = 0
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """处理完队列中已有的请求后停止"""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def submit(self, item):
+        """提交一个请求，返回其结果的 ``Future``"""
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def summary(self):
+        """返回批处理统计：平均批大小、每批延迟和吞吐"""
+        summary = self.stats.summary()
+        summary['num_batches'] = self.num_batches
+        summary['num_items'] = self.num_items
+        summary['mean_batch_size'] = self.num_items / self.num_batches if self.num_batches else 0.0
+        summary['queue_size'] = self._queue.qsize()
+        return summary
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is _STOP:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # 处理完当前批次后再停止
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+            start = time.perf_counter()
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:  # 异常传递给所有等待该批结果的客户端
+                for future in futures:
+                    future.set_exception(e)
+                continue
+            self.stats.record(time.perf_counter() - start)
+            self.num_batches += 1
+            self.num_items += len(items)
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+
+class StreamState:
+    """单个客户端视频流的跨帧状态：关键点平滑器和步态时间分析引擎"""
+
+    def __init__(self, args):
+        self.smoother = build_smoother(args)
+        self.gait_engine = GaitEngine()
+        self.last_seen = time.time()
+
+
+def _to_list(value):
+    return value.tolist() if isinstance(value, np.ndarray) else value
+
+
+def _json_default(obj):
+    # numpy标量和数组（如步态引擎的结果）转换为Python类型
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f'无法序列化的类型: {type(obj).__name__}')
+
+
+def to_json(obj):
+    return json.dumps(obj, ensure_ascii=False, default=_json_default)
+
+
+def data_samples_to_dict(data_samples):
+    """将 ``PoseDataSample`` 中的实例转换为可JSON序列化的字典"""
+    result = dict(bboxes=[], keypoints=[], keypoint_scores=[], custom_keypoints=[], custom_keypoint_scores=[])
+    pred_instances = getattr(data_samples, 'pred_instances', None)
+    if pred_instances is None or len(pred_instances) == 0:
+        return result
+    result['bboxes'] = _to_list(pred_instances.bboxes)
+    result['keypoints'] = _to_list(pred_instances.keypoints)
+    result['keypoint_scores'] = _to_list(pred_instances.keypoint_scores)
+    if hasattr(data_samples, 'custom_keypoints'):
+        result['custom_keypoints'] = [_to_list(kpts) for kpts in data_samples.custom_keypoints]
+        result['custom_keypoint_scores'] = [_to_list(scores) for scores in data_samples.custom_keypoint_scores]
+    return result
+
+
+def dataset_meta_to_dict(dataset_meta):
+    """将数据集元数据转换为可JSON序列化的字典，数组字段的名称记录在 ``array_keys`` 中"""
+    meta = {}
+    array_keys = []
+    for key, value in dataset_meta.items():
+        if isinstance(value, np.ndarray):
+            array_keys.append(key)
+        meta[key] = _to_list(value)
+    return dict(dataset_meta=meta, array_keys=array_keys)
+
+
+class PoseService:
+    """持有检测器和姿态估计模型，批量分析来自多个客户端的帧
+
+    Args:
+        args: 配置对象，与 ``webcam_rtmw_demo.Config`` 相同
+        detector: 人体检测器，见 :func:`inference_backend.build_detector`
+        pose_estimator: 姿态估计器，见 :func:`inference_backend.build_pose_estimator`
+        max_batch: 每批最多的帧数，默认为16
+        max_wait: 凑批的最长等待时间（秒），默认为0.01
+        pose_batch_size: 姿态估计每次前向的裁剪图像数量，默认为32
+        stream_timeout: 客户端流空闲多久（秒）后释放其状态，默认为60
+    """
+
+    def __init__(self,
+                 args,
+                 detector,
+                 pose_estimator,
+                 max_batch=16,
+                 max_wait=0.01,
+                 pose_batch_size=32,
+                 stream_timeout=60.0):
+        self.args = args
+        self.detector = detector
+        self.pose_estimator = pose_estimator
+        self.pose_batch_size = pose_batch_size
+        self.stream_timeout = stream_timeout
+        self.num_keypoints = pose_estimator.dataset_meta['num_keypoints']
+        self.streams = {}
+        self._streams_lock = threading.Lock()
+        self.batcher = DynamicBatcher(self._process_batch, max_batch=max_batch, max_wait=max_wait)
+
+    def start(self):
+        self.batcher.start()
+        return self
+
+    def stop(self):
+        self.batcher.stop()
+
+    def submit(self, img, stream='default', timestamp=None):
+        """提交一帧BGR图像，返回分析结果的 ``Future``"""
+        if timestamp is None:
+            timestamp = time.time()
+        return self.batcher.submit(dict(img=img, stream=stream, timestamp=timestamp))
+
+    def analyze(self, img, stream='default', timestamp=None):
+        """同步分析一帧BGR图像"""
+        return self.submit(img, stream, timestamp).result()
+
+    def analyze_video(self, video_path, max_pending=None, start_frame=0):
+        """逐帧分析本地视频文件，依次产生每帧的结果
+
+        视频帧与其他客户端的帧一起参与动态批处理，同时最多有
+        ``max_pending`` 帧在队列中（默认为 ``max_batch``）。
+        ``start_frame`` 为开始分析的帧序号，用于中断后继续处理。
+        """
+        stream = f'video-{uuid.uuid4().hex}'
+        max_pending = max_pending or self.batcher.max_batch
+        pending = []
+        try:
+            with VideoReader(video_path, start_frame=start_frame) as reader:
+                for frame_idx, timestamp, img in reader:
+                    if timestamp is None:
+                        timestamp = frame_idx / (reader.fps or 30.0)
+                    pending.append((frame_idx, self.submit(img, stream, timestamp)))
+                    if len(pending) >= max_pending:
+                        frame_idx, future = pending.pop(0)
+                        yield dict(future.result(), frame_idx=frame_idx)
+                for frame_idx, future in pending:
+                    yield dict(future.result(), frame_idx=frame_idx)
+        finally:
+            self.release_stream(stream)
+
+    def release_stream(self, stream):
+        with self._streams_lock:
+            self.streams.pop(stream, None)
+
+    def _get_stream(self, stream):
+        with self._streams_lock:
+            now = time.time()
+            state = self.streams.get(stream)
+            if state is None:
+                # 顺便释放空闲超时的流
+                for key in [k for k, s in self.streams.items() if now - s.last_seen > self.stream_timeout]:
+                    del self.streams[key]
+                state = self.streams[stream] = StreamState(self.args)
+            state.last_seen = now
+            return state
+
+    def _process_batch(self, items):
+        args = self.args
+        imgs = [item['img'] for item in items]
+        det_results = self.detector.detect(imgs)
+        bboxes_list = [select_person_bboxes(args, r) for r in det_results]
+        pose_results = self.pose_estimator.predict(list(zip(imgs, bboxes_list)), batch_size=self.pose_batch_size)
+
+        # 平滑和步态分析有跨帧状态，按请求顺序逐帧处理
+        outputs = []
+        for item, bboxes, results in zip(items, bboxes_list, pose_results):
+            state = self._get_stream(item['stream'])
+            if len(bboxes) > 0:
+                data_samples = expand_keypoint_subset(merge_data_samples(results), args, self.num_keypoints)
+                if state.smoother is not None:
+                    state.smoother.smooth_data_samples(data_samples, item['timestamp'])
+                data_samples = filter_keypoints(data_samples, args)
+                output = data_samples_to_dict(data_samples)
+            else:
+                if state.smoother is not None:
+                    state.smoother.reset()
+                output = data_samples_to_dict(None)
+
+            output['timestamp'] = item['timestamp']
+            output['posture'] = None
+            output['gait'] = None
+            if output['keypoints']:
+                keypoints = np.asarray(output['keypoints'][0])
+                keypoint_scores = np.asarray(output['keypoint_scores'][0])
+                custom_kpts = np.asarray(output['custom_keypoints'][0]) if output['custom_keypoints'] else None
+                output['posture'] = analyze_body_posture(keypoints, keypoint_scores, custom_kpts)
+                output['gait'] = state.gait_engine.update(item['timestamp'], keypoints, keypoint_scores)
+            outputs.append(output)
+        return outputs
+
+    def info(self):
+        info = dataset_meta_to_dict(self.pose_estimator.dataset_meta)
+        info.update(num_keypoints=self.num_keypoints, pose_config=self.args.pose_config)
+        return info
+
+    def health(self):
+        with self._streams_lock:
+            num_streams = len(self.streams)
+        return dict(status='ok', num_streams=num_streams, batcher=self.batcher.summary())
+
+
+# ---------------------------------------------------------------------------
+# WebSocket (RFC 6455)
+# ---------------------------------------------------------------------------
+
+_WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x1, 0x2, 0x8, 0x9, 0xA
+
+
+def websocket_accept_key(key):
+    """根据客户端的 ``Sec-WebSocket-Key`` 计算握手响应的 ``Sec-WebSocket-Accept``"""
+    digest = hashlib.sha1((key + _WEBSOCKET_GUID).encode('ascii')).digest()
+    return base64.b64encode(digest).decode('ascii')
+
+
+def _read_exact(rfile, size):
+    data = rfile.read(size)
+    if len(data) < size:
+        raise ConnectionError('WebSocket连接已断开')
+    return data
+
+
+def read_websocket_frame(rfile):
+    """读取一个WebSocket帧，返回 (fin, opcode, payload)"""
+    first, second = _read_exact(rfile, 2)
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', _read_exact(rfile, 2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', _read_exact(rfile, 8))[0]
+    mask = _read_exact(rfile, 4) if second & 0x80 else None
+    payload = _read_exact(rfile, length)
+    if mask is not None:
+        payload = (np.frombuffer(payload, dtype=np.uint8) ^ np.resize(np.frombuffer(mask, dtype=np.uint8),
+                                                                       length)).tobytes()
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+def write_websocket_frame(wfile, opcode, payload, mask=False):
+    """写入一个不分片的WebSocket帧，客户端发送时需要设置 ``mask=True``"""
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
+    length = len(payload)
+    mask_bit = 0x80 if mask else 0
+    header = bytes([0x80 | opcode])
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < (1 << 16):
+        header += bytes([mask_bit | 126]) + struct.pack('>H', length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack('>Q', length)
+    if mask:
+        key = np.random.bytes(4)
+        header += key
+        payload = (np.frombuffer(payload, dtype=np.uint8) ^ np.resize(np.frombuffer(key, dtype=np.uint8),
+                                                                       length)).tobytes()
+    wfile.write(header + payload)
+    wfile.flush()
+
+
+def read_websocket_message(rfile, wfile):
+    """读取一条完整的消息（合并分片，自动回复ping），返回 (opcode, payload)，连接关闭时返回None"""
+    opcode, chunks = None, []
+    while True:
+        fin, frame_opcode, payload = read_websocket_frame(rfile)
+        if frame_opcode == WS_CLOSE:
+            write_websocket_frame(wfile, WS_CLOSE, payload[:2])
+            return None
+        if frame_opcode == WS_PING:
+            write_websocket_frame(wfile, WS_PONG, payload)
+            continue
+        if frame_opcode == WS_PONG:
+            continue
+        if frame_opcode != 0:
+            opcode = frame_opcode
+        chunks.append(payload)
+        if fin:
+            return opcode, b''.join(chunks)
+
+
+# ---------------------------------------------------------------------------
+# HTTP服务
+# ---------------------------------------------------------------------------
+
+
+def decode_image(data):
+    """将JPEG/PNG等编码的图像数据解码为BGR图像"""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError('无法解码图像数据')
+    return img
+
+
+class PoseRequestHandler(BaseHTTPRequestHandler):
+    """HTTP/WebSocket请求处理，``self.server.service`` 为 :class:`PoseService`"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _query(self):
+        url = urlparse(self.path)
+        return url.path, {key: values[-1] for key, values in parse_qs(url.query).items()}
+
+    def _send_json(self, obj, status=200):
+        body = to_json(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_GET(self):
+        path, query = self._query()
+        if path == '/info':
+            self._send_json(self.service.info())
+        elif path == '/health':
+            self._send_json(self.service.health())
+        elif path == '/ws' and self.headers.get('Upgrade', '').lower() == 'websocket':
+            self._handle_websocket(query.get('stream') or f'ws-{uuid.uuid4().hex}')
+        else:
+            self._send_json(dict(error=f'未知的接口: {path}'), 404)
+
+    def do_POST(self):
+        path, query = self._query()
+        try:
+            if path == '/frame':
+                timestamp = float(query['timestamp']) if 'timestamp' in query else None
+                result = self.service.analyze(decode_image(self._read_body()), query.get('stream', 'default'),
+                                              timestamp)
+                self._send_json(result)
+            elif path == '/video':
+                body = json.loads(self._read_body())
+                self._stream_video(body['path'], int(body.get('start_frame', 0)))
+            else:
+                self._send_json(dict(error=f'未知的接口: {path}'), 404)
+        except (ValueError, KeyError, IOError) as e:
+            self._send_json(dict(error=str(e)), 400)
+
+    def _stream_video(self, video_path, start_frame=0):
+        """以分块传输逐帧返回JSON行"""
+        results = self.service.analyze_video(video_path, start_frame=start_frame)
+        # 先取第一帧，视频无法打开时仍可返回错误状态码
+        first = next(results, None)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson; charset=utf-8')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+        def write_line(obj):
+            line = (to_json(obj) + '\n').encode('utf-8')
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(line), line))
+
+        num_frames = 0
+        if first is not None:
+            write_line(first)
+            num_frames += 1
+        for result in results:
+            write_line(result)
+            num_frames += 1
+        write_line(dict(done=True, num_frames=num_frames))
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _handle_websocket(self, stream):
+        key = self.headers.get('Sec-WebSocket-Key')
+        if not key:
+            self._send_json(dict(error='缺少Sec-WebSocket-Key'), 400)
+            return
+        self.send_response(101, 'Switching Protocols')
+        self.send_header('Upgrade', 'websocket')
+        self.send_header('Connection', 'Upgrade')
+        self.send_header('Sec-WebSocket-Accept', websocket_accept_key(key))
+        self.end_headers()
+        self.wfile.flush()
+        self.close_connection = True
+
+        timestamp = None
+        try:
+            while True:
+                message = read_websocket_message(self.rfile, self.wfile)
+                if message is None:
+                    break
+                opcode, payload = message
+                try:
+                    if opcode == WS_BINARY:
+                        result = self.service.analyze(decode_image(payload), stream, timestamp)
+                        timestamp = None
+                        write_websocket_frame(self.wfile, WS_TEXT, to_json(result))
+                        continue
+                    command = json.loads(payload)
+                    if 'timestamp' in command:
+                        timestamp = float(command['timestamp'])
+                    if 'video' in command:
+                        num_frames = 0
+                        for result in self.service.analyze_video(command['video']):
+                            write_websocket_frame(self.wfile, WS_TEXT, to_json(result))
+                            num_frames += 1
+                        write_websocket_frame(self.wfile, WS_TEXT, to_json(dict(done=True, num_frames=num_frames)))
+                except (ValueError, KeyError, IOError) as e:
+                    write_websocket_frame(self.wfile, WS_TEXT, to_json(dict(error=str(e))))
+        except ConnectionError:
+            pass
+        finally:
+            self.service.release_stream(stream)
+
+
+def build_server(service, host='127.0.0.1', port=8765):
+    """创建多线程HTTP服务，每个连接在独立线程中处理，推理由 ``service`` 统一批处理"""
+    server = ThreadingHTTPServer((host, port), PoseRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+
+def load_models(args):
+    """按 ``args.backend`` 加载检测器和姿态估计模型"""
+    return build_detector(args), build_pose_estimator(args)
+
+
+def main():
+    parser = ArgumentParser(description='常驻的姿态分析服务')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址，默认只接受本机连接')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口')
+    parser.add_argument('--device', default=None, help='推理设备，默认使用Config中的设置')
+    parser.add_argument('--max-batch', type=int, default=16, help='动态批处理每批最多的帧数')
+    parser.add_argument('--max-wait', type=float, default=0.01, help='动态批处理凑批的最长等待时间（秒）')
+    parser.add_argument('--pose-batch-size', type=int, default=32, help='姿态估计每次前向的裁剪图像数量')
+    parser.add_argument('--stream-timeout', type=float, default=60.0, help='客户端流空闲多久（秒）后释放状态')
+    cli_args = parser.parse_args()
+
+    args = Config()
+    if cli_args.device:
+        args.device = cli_args.device
+    assert has_mmdet or args.backend == 'onnxruntime', '请安装mmdet以运行姿态分析服务。'
+
+    detector, pose_estimator = load_models(args)
+    service = PoseService(
+        args,
+        detector,
+        pose_estimator,
+        max_batch=cli_args.max_batch,
+        max_wait=cli_args.max_wait,
+        pose_batch_size=cli_args.pose_batch_size,
+        stream_timeout=cli_args.stream_timeout).start()
+    server = build_server(service, cli_args.host, cli_args.port)
+    print(f'姿态分析服务已启动: http://{cli_args.host}:{cli_args.port}')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+import threading
+
+import numpy as np
+
+from mmpose.structures.bbox import bbox_clip_border, bbox_cs2xyxy, bbox_xyxy2cs
+
+# 用于跟踪的关键点索引：鼻子、双耳、身体和足部关键点（与filter_keypoints保留的一致）
+# 超出模型关键点数量的索引会被忽略，例如COCO-17模型没有足部关键点
+TRACK_KEYPOINT_INDICES = [0, 3, 4] + list(range(5, 23))
+
+
+class PoseTracker:
+    """自顶向下姿态跟踪器，由上一帧的关键点推算下一帧的边界框
+
+    与RTMPose的PoseTracker思路一致：检测器只在每隔 ``det_interval`` 帧、
+    或跟踪的关键点置信度下降时运行，其余帧直接使用上一帧关键点的外接框
+    （按 ``bbox_padding`` 放大）作为人体框，再交给 ``TopdownAffine`` 裁剪。
+    在单人、移动缓慢的场景中可以省去大部分检测器的开销。
+
+    检测阶段和姿态估计阶段可能在不同线程中调用（见 ``pose_pipeline``），
+    因此内部状态由锁保护。流水线中姿态估计阶段比检测阶段落后若干帧，
+    调用时传入帧序号后，早于最近一次检测结果的 :meth:`update` 和
+    :meth:`reset` 会被忽略，不会用过期的边界框覆盖新的检测结果。
+
+    Args:
+        det_interval: 每隔多少帧强制运行一次检测器，默认为10
+        kpt_thr: 参与计算外接框的关键点置信度阈值，默认为0.3
+        score_thr: 跟踪关键点的平均置信度低于该值时重新检测，默认为0.5
+        min_keypoints: 有效关键点少于该数量时重新检测，默认为4
+        bbox_padding: 关键点外接框的放大系数，默认为1.25
+        keypoint_indices: 参与跟踪的关键点索引，默认为
+            ``TRACK_KEYPOINT_INDICES``，超出关键点数量的索引被忽略，
+            ``None`` 表示使用全部关键点
+    """
+
+    def __init__(self,
+                 det_interval=10,
+                 kpt_thr=0.3,
+                 score_thr=0.5,
+                 min_keypoints=4,
+                 bbox_padding=1.25,
+                 keypoint_indices=TRACK_KEYPOINT_INDICES):
+        self.det_interval = det_interval
+        self.kpt_thr = kpt_thr
+        self.score_thr = score_thr
+        self.min_keypoints = min_keypoints
+        self.bbox_padding = bbox_padding
+        self.keypoint_indices = keypoint_indices
+
+        self._lock = threading.Lock()
+        self._tracked_bboxes = None
+        self._frames_since_det = 0
+        self._det_frame_idx = None
+        self.num_detections = 0
+        self.num_frames = 0
+
+    def reset(self, frame_idx=None):
+        """清空跟踪状态，下一帧将运行检测器
+
+        Args:
+            frame_idx: 触发重置的帧序号，早于最近一次检测的帧时忽略
+        """
+        with self._lock:
+            if self._is_stale(frame_idx):
+                return
+            self._tracked_bboxes = None
+            self._frames_since_det = 0
+
+    def predict_bboxes(self):
+        """返回当前帧可直接使用的跟踪边界框
+
+        Returns:
+            np.ndarray | None: 形状为(N, 4)的xyxy边界框；需要运行检测器时
+            返回 ``None``
+        """
+        with self._lock:
+            self.num_frames += 1
+            if (self._tracked_bboxes is None
+                    or self._frames_since_det >= self.det_interval):
+                return None
+            self._frames_since_det += 1
+            return self._tracked_bboxes.copy()
+
+    def set_detections(self, bboxes, frame_idx=None):
+        """记录检测器的输出，重置检测间隔计数
+
+        Args:
+            bboxes: 检测到的边界框，形状为(N, 4)或(N, 5)
+            frame_idx: 检测所在的帧序号
+        """
+        with self._lock:
+            self.num_detections += 1
+            self._frames_since_det = 1
+            self._det_frame_idx = frame_idx
+            self._tracked_bboxes = None if len(bboxes) == 0 else np.asarray(
+                bboxes, dtype=np.float32)[:, :4]
+
+    def update(self, keypoints, keypoint_scores, img_shape, frame_idx=None):
+        """根据当前帧的姿态估计结果推算下一帧的边界框
+
+        任一实例的跟踪关键点不足或平均置信度过低时，清空跟踪状态，
+        使下一帧重新运行检测器。
+
+        Args:
+            keypoints: 关键点坐标，形状为(N, K, 2)
+            keypoint_scores: 关键点置信度，形状为(N, K)
+            img_shape: 图像尺寸 (h, w)
+            frame_idx: 姿态估计结果所在的帧序号，早于最近一次检测的帧时
+                忽略该结果
+        """
+        bboxes = self.keypoints_to_bboxes(keypoints, keypoint_scores,
+                                          img_shape)
+        with self._lock:
+            if self._is_stale(frame_idx):
+                return
+            self._tracked_bboxes = bboxes
+
+    def _is_stale(self, frame_idx):
+        """判断给定帧是否早于最近一次检测的帧，需在持有锁时调用"""
+        return (frame_idx is not None and self._det_frame_idx is not None
+                and frame_idx < self._det_frame_idx)
+
+    def keypoints_to_bboxes(self, keypoints, keypoint_scores, img_shape):
+        """计算关键点的外接框并按 ``bbox_padding`` 放大
+
+        Returns:
+            np.ndarray | None: 形状为(N, 4)的xyxy边界框；任一实例不满足
+            跟踪条件时返回 ``None``
+        """
+        keypoints = np.asarray(keypoints, dtype=np.float32)
+        keypoint_scores = np.asarray(keypoint_scores, dtype=np.float32)
+        if keypoints.ndim != 3 or len(keypoints) == 0:
+            return None
+
+        if self.keypoint_indices is not None:
+            # 忽略超出模型关键点数量的索引
+            indices = [
+                i for i in self.keypoint_indices if i < keypoints.shape[1]
+            ]
+            if indices:
+                keypoints = keypoints[:, indices]
+                keypoint_scores = keypoint_scores[:, indices]
+
+        valid = keypoint_scores > self.kpt_thr
+        num_valid = valid.sum(axis=1)
+        if np.any(num_valid < self.min_keypoints):
+            return None
+        mean_scores = (keypoint_scores * valid).sum(axis=1) / num_valid
+        if np.any(mean_scores < self.score_thr):
+            return None
+
+        # 无效关键点不参与外接框计算
+        masked = np.where(valid[..., None], keypoints, np.nan)
+        bboxes = np.concatenate(
+            [np.nanmin(masked, axis=1),
+             np.nanmax(masked, axis=1)], axis=1)
+
+        center, scale = bbox_xyxy2cs(bboxes, padding=self.bbox_padding)
+        bboxes = bbox_cs2xyxy(center, scale)
+        h, w = img_shape[:2]
+        return bbox_clip_border(bboxes, (w, h)).astype(np.float32)
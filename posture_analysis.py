@@ -1,31 +1,21 @@
 import streamlit as st
 from config import NORMAL_RANGES
+from metric_registry import in_range
 
 def check_value_in_range(value, range_str):
     """检查值是否在正常范围内
     
     Args:
         value: 需要检查的值
-        range_str: 正常范围字符串，格式如"0°～5°", ">65°", "<39°"等
+        range_str: 正常范围字符串，格式如"0°～5°", ">65°", "<39°"等，解析结果由
+            :func:`metric_registry.parse_range` 缓存
     
     Returns:
         bool: 值是否在正常范围内
     """
     if value is None:
         return False
-    
-    if '～' in range_str:
-        parts = range_str.replace('°', '').split('～')
-        min_val = float(parts[0].replace('%', ''))
-        max_val = float(parts[1].replace('%', ''))
-        return min_val <= value <= max_val
-    elif '<' in range_str:
-        max_val = float(range_str.replace('<', '').replace('°', '').replace('%', ''))
-        return value < max_val
-    elif '>' in range_str:
-        min_val = float(range_str.replace('>', '').replace('°', '').replace('%', ''))
-        return value > min_val
-    return False
+    return bool(in_range(value, range_str))
 
 def display_metric(title, value, normal_range, key):
     """显示单个指标的卡片
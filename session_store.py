@@ -0,0 +1,273 @@
+import glob
+import os
+
+import json_tricks as json
+import numpy as np
+
+
+class RingBuffer:
+    """固定容量的列式环形缓冲区，用于实时图表的滑动窗口
+
+    每一行包含所有列，缺失的值填充为NaN，因此各列长度始终一致。追加一行
+    的开销为O(1)，不会像列表切片那样复制历史数据。
+
+    Args:
+        columns: 列名列表
+        capacity: 最多保留的行数，默认为100
+        dtype: 数据类型，默认为float32
+    """
+
+    def __init__(self, columns, capacity=100, dtype=np.float32):
+        self.columns = list(columns)
+        self.capacity = capacity
+        self._index = {name: i for i, name in enumerate(self.columns)}
+        self._data = np.full((capacity, len(self.columns)), np.nan, dtype=dtype)
+        self._start = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def append(self, row):
+        """追加一行数据
+
+        Args:
+            row: 列名到数值的映射，不在 ``columns`` 中的键被忽略，值为None
+                或缺失的列记为NaN
+        """
+        end = (self._start + self._size) % self.capacity
+        values = np.full(len(self.columns), np.nan, dtype=self._data.dtype)
+        for name, value in row.items():
+            idx = self._index.get(name)
+            if idx is not None and value is not None:
+                values[idx] = value
+        self._data[end] = values
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            self._start = (self._start + 1) % self.capacity
+
+    def column(self, name, last=None):
+        """按时间顺序返回某一列最近 ``last`` 行的数据（默认全部）"""
+        return self.window(last)[:, self._index[name]]
+
+    def window(self, last=None):
+        """按时间顺序返回最近 ``last`` 行的数据，形状为(n, 列数)"""
+        n = self._size if last is None else min(last, self._size)
+        start = (self._start + self._size - n) % self.capacity
+        idx = (start + np.arange(n)) % self.capacity
+        return self._data[idx]
+
+    def last(self):
+        """返回最新一行数据的字典，缓冲区为空时返回None"""
+        if self._size == 0:
+            return None
+        row = self._data[(self._start + self._size - 1) % self.capacity]
+        return {name: float(row[i]) for i, name in enumerate(self.columns)}
+
+    def to_dict(self, last=None):
+        """返回列名到数据数组的字典，可直接构造 ``pandas.DataFrame``"""
+        data = self.window(last)
+        return {name: data[:, i] for i, name in enumerate(self.columns)}
+
+    def clear(self):
+        self._start = 0
+        self._size = 0
+
+
+class SessionStore:
+    """会话级关键点时间序列的列式存储
+
+    关键点以固定dtype的数组保存：每个实例一行，坐标和置信度合并为形状为
+    (K, 3)的float32数组 (x, y, score)；每帧一行保存时间戳和派生指标。数据先
+    写入内存中的块，块满后追加写入 ``path`` 目录下的npz文件，不会在会话结束
+    时一次性序列化整个列表。同时维护最近若干帧指标的环形缓冲区，供实时
+    图表使用。
+
+    Args:
+        path: 保存目录，为None时只保存在内存中（仅保留环形缓冲区和当前块）
+        metric_names: 每帧派生指标的名称
+        num_keypoints: 关键点数量，为None时由第一次追加的数据确定
+        chunk_size: 每个块的帧数，默认为256
+        history_size: 环形缓冲区的容量（帧数），默认为100
+        resume: 是否在 ``path`` 中已写入的块之后继续追加，默认为False。
+            块文件是原子写入的，因此中断后已写入的块都是完整的，
+            ``last_frame_idx`` 为其中最后一帧的帧序号
+    """
+
+    def __init__(self,
+                 path=None,
+                 metric_names=(),
+                 num_keypoints=None,
+                 chunk_size=256,
+                 history_size=100,
+                 resume=False):
+        self.path = path
+        self.metric_names = list(metric_names)
+        self.num_keypoints = num_keypoints
+        self.chunk_size = chunk_size
+        self.history = RingBuffer(['timestamp'] + self.metric_names, history_size)
+        self.num_frames = 0
+        self.last_frame_idx = None
+        self._num_chunks = 0
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            if resume:
+                self._load_chunk_index()
+        self._reset_chunk()
+
+    def _load_chunk_index(self):
+        """统计已写入的块，后续的块从其后编号"""
+        for chunk_file in sorted(glob.glob(os.path.join(self.path, 'chunk_*.npz'))):
+            with np.load(chunk_file) as chunk:
+                frame_idx = chunk['frame_idx']
+                if self.num_keypoints is None and len(chunk['keypoints']) > 0:
+                    self.num_keypoints = chunk['keypoints'].shape[1]
+            self.num_frames += len(frame_idx)
+            if len(frame_idx) > 0:
+                self.last_frame_idx = int(frame_idx[-1])
+            self._num_chunks += 1
+
+    def _reset_chunk(self):
+        self._frames = dict(frame_idx=[], timestamp=[], num_instances=[], metrics=[])
+        self._instances = dict(frame_idx=[], keypoints=[], bboxes=[])
+
+    def append(self, frame_idx, timestamp, keypoints=None, keypoint_scores=None, bboxes=None, metrics=None):
+        """追加一帧数据
+
+        Args:
+            frame_idx: 帧序号
+            timestamp: 时间戳（秒）
+            keypoints: 关键点坐标，形状为(N, K, 2)
+            keypoint_scores: 关键点置信度，形状为(N, K)
+            bboxes: 边界框，形状为(N, 4)，可选
+            metrics: 指标名称到数值的映射，可选
+        """
+        num_instances = 0
+        if keypoints is not None and len(keypoints) > 0:
+            keypoints = np.asarray(keypoints, dtype=np.float32)
+            keypoint_scores = np.asarray(keypoint_scores, dtype=np.float32)
+            num_instances = len(keypoints)
+            if self.num_keypoints is None:
+                self.num_keypoints = keypoints.shape[1]
+            kpts = np.concatenate([keypoints, keypoint_scores[..., None]], axis=-1)
+            if bboxes is None or len(bboxes) != num_instances:
+                bboxes = np.full((num_instances, 4), np.nan, dtype=np.float32)
+            self._instances['frame_idx'].append(np.full(num_instances, frame_idx, dtype=np.int64))
+            self._instances['keypoints'].append(kpts)
+            self._instances['bboxes'].append(np.asarray(bboxes, dtype=np.float32))
+
+        metrics = metrics or {}
+        metric_row = np.array([np.nan if metrics.get(name) is None else metrics[name] for name in self.metric_names],
+                              dtype=np.float32)
+        self._frames['frame_idx'].append(frame_idx)
+        self.last_frame_idx = frame_idx
+        self._frames['timestamp'].append(timestamp)
+        self._frames['num_instances'].append(num_instances)
+        self._frames['metrics'].append(metric_row)
+        self.history.append(dict(metrics, timestamp=timestamp))
+        self.num_frames += 1
+
+        if len(self._frames['frame_idx']) >= self.chunk_size:
+            self.flush()
+
+    def append_data_samples(self, frame_idx, timestamp, data_samples, metrics=None):
+        """从 ``PoseDataSample`` 中提取所有实例的关键点并追加一帧数据"""
+        keypoints = keypoint_scores = bboxes = None
+        pred_instances = getattr(data_samples, 'pred_instances', None)
+        if pred_instances is not None and len(pred_instances) > 0:
+            keypoints = pred_instances.keypoints
+            keypoint_scores = pred_instances.keypoint_scores
+            bboxes = pred_instances.get('bboxes', None)
+        self.append(frame_idx, timestamp, keypoints, keypoint_scores, bboxes, metrics)
+
+    def _chunk_arrays(self):
+        num_keypoints = self.num_keypoints or 0
+        frames = self._frames
+        instances = self._instances
+        return dict(
+            frame_idx=np.asarray(frames['frame_idx'], dtype=np.int64),
+            timestamp=np.asarray(frames['timestamp'], dtype=np.float64),
+            num_instances=np.asarray(frames['num_instances'], dtype=np.int32),
+            # 按帧数reshape，没有指标时得到形状为(n, 0)的数组
+            metrics=np.asarray(frames['metrics'], dtype=np.float32).reshape(
+                len(frames['frame_idx']), len(self.metric_names)),
+            instance_frame_idx=(np.concatenate(instances['frame_idx'])
+                                if instances['frame_idx'] else np.zeros(0, dtype=np.int64)),
+            keypoints=(np.concatenate(instances['keypoints'])
+                       if instances['keypoints'] else np.zeros((0, num_keypoints, 3), dtype=np.float32)),
+            bboxes=(np.concatenate(instances['bboxes'])
+                    if instances['bboxes'] else np.zeros((0, 4), dtype=np.float32)))
+
+    def flush(self):
+        """将当前块写入磁盘（未设置保存目录时丢弃当前块）"""
+        if not self._frames['frame_idx']:
+            return
+        if self.path is not None:
+            # 先写入临时文件再重命名，中断时不会留下不完整的块
+            chunk_file = os.path.join(self.path, f'chunk_{self._num_chunks:05d}.npz')
+            with open(chunk_file + '.tmp', 'wb') as f:
+                np.savez(f, **self._chunk_arrays())
+            os.replace(chunk_file + '.tmp', chunk_file)
+            self._num_chunks += 1
+        self._reset_chunk()
+
+    def close(self, meta=None):
+        """写入剩余数据和会话元信息
+
+        Args:
+            meta: 额外的元信息，如 ``pose_estimator.dataset_meta``
+        """
+        self.flush()
+        if self.path is not None:
+            with open(os.path.join(self.path, 'meta.json'), 'w') as f:
+                json.dump(
+                    dict(
+                        metric_names=self.metric_names,
+                        num_keypoints=self.num_keypoints,
+                        num_frames=self.num_frames,
+                        meta=meta), f)
+
+
+def load_session(path):
+    """读取 :class:`SessionStore` 保存的会话数据
+
+    Args:
+        path: 会话目录
+
+    Returns:
+        dict: 包含以下键的字典
+
+        - ``frame_idx``、``timestamp``、``num_instances``: 每帧一行的数组
+        - ``metrics``: 指标名称到形状为(T,)的float32数组的映射
+        - ``instance_frame_idx``: 每个实例所属的帧序号
+        - ``keypoints``: 形状为(R, K, 3)的float32数组 (x, y, score)
+        - ``bboxes``: 形状为(R, 4)的float32数组
+        - ``meta``: 会话元信息
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        info = json.load(f)
+    metric_names = info['metric_names']
+    num_keypoints = info['num_keypoints'] or 0
+
+    keys = ('frame_idx', 'timestamp', 'num_instances', 'metrics', 'instance_frame_idx', 'keypoints', 'bboxes')
+    parts = {key: [] for key in keys}
+    for chunk_file in sorted(glob.glob(os.path.join(path, 'chunk_*.npz'))):
+        with np.load(chunk_file) as chunk:
+            for key in keys:
+                parts[key].append(chunk[key])
+
+    empty = dict(
+        frame_idx=np.zeros(0, dtype=np.int64),
+        timestamp=np.zeros(0, dtype=np.float64),
+        num_instances=np.zeros(0, dtype=np.int32),
+        metrics=np.zeros((0, len(metric_names)), dtype=np.float32),
+        instance_frame_idx=np.zeros(0, dtype=np.int64),
+        keypoints=np.zeros((0, num_keypoints, 3), dtype=np.float32),
+        bboxes=np.zeros((0, 4), dtype=np.float32))
+    data = {key: np.concatenate(parts[key]) if parts[key] else empty[key] for key in keys}
+
+    metrics = data.pop('metrics')
+    data['metrics'] = {name: metrics[:, i] for i, name in enumerate(metric_names)}
+    data['meta'] = info['meta']
+    return data
@@ -8,9 +8,9 @@ os.environ["KMP_DUPLICATE_LIB_OK"] = "TRUE"
 import streamlit as st
 import cv2
 import numpy as np
-from webcam_rtmw_demo import Config, process_one_image, init_detector, init_pose_estimator
+from webcam_rtmw_demo import Config, iter_pipelined_frames, iter_sequential_frames
+from inference_backend import build_detector, build_pose_estimator
 from mmpose.registry import VISUALIZERS
-from mmpose.utils import adapt_mmdet_pipeline
 import mmcv
 import time
 import pandas as pd
@@ -19,8 +19,20 @@ import matplotlib
 from matplotlib.font_manager import FontProperties
 import math
 import tempfile
+from config import (LEFT_ANKLE_IDX, RIGHT_ANKLE_IDX, LEFT_KNEE_IDX, RIGHT_KNEE_IDX, NORMAL_RANGES,
+                    GAIT_NORMAL_RANGES)
+from gait_engine import GAIT_TIME_METRICS, GaitEngine
+from session_store import RingBuffer, SessionStore
+from video_io import AsyncVideoWriter
+from dashboard import GaitChart, RefreshThrottle
+from metric_registry import in_range, parse_range
+from offline_video import analyze_video_offline, render_offline_video, summarize_offline_results
+from pose_client import PoseClient, iter_remote_frames
 matplotlib.use('Agg')  # 非交互式后端
 
+# 步态历史数据的列：步态时间指标和左右脚踝高度
+GAIT_HISTORY_COLUMNS = GAIT_TIME_METRICS + ('左脚踝高度', '右脚踝高度')
+
 # 设置matplotlib支持中文显示
 plt.rcParams['font.sans-serif'] = ['SimHei', 'Arial Unicode MS', 'Microsoft YaHei', 'SimSun', 'sans-serif']  # 优先使用的中文字体
 plt.rcParams['axes.unicode_minus'] = False  # 解决负号显示问题
@@ -198,137 +210,50 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 def check_value_in_range(value, range_str):
-    """检查值是否在正常范围内"""
+    """检查值是否在正常范围内，范围字符串的解析结果由 :func:`metric_registry.parse_range` 缓存"""
     if value is None:
         return False
-    
-    if '～' in range_str:
-        parts = range_str.replace('°', '').split('～')
-        min_val = float(parts[0].replace('%', ''))
-        max_val = float(parts[1].replace('%', ''))
-        return min_val <= value <= max_val
-    elif '<' in range_str:
-        max_val = float(range_str.replace('<', '').replace('°', '').replace('%', ''))
-        return value < max_val
-    elif '>' in range_str:
-        min_val = float(range_str.replace('>', '').replace('°', '').replace('%', ''))
-        return value > min_val
-    return False
+    return bool(in_range(value, range_str))
 
-def analyze_gait_metrics(keypoints, keypoint_scores, prev_frame_data=None):
+def analyze_gait_metrics(keypoints, keypoint_scores, prev_frame_data=None, timestamp=None):
     """分析步态相关指标
     
+    步态事件（足跟着地、足尖离地）由 :class:`gait_engine.GaitEngine` 根据帧时间戳
+    检测，因此视频文件的分析结果与处理速度无关。
+    
     Args:
         keypoints: 关键点坐标数组，形状为(N, 2)
         keypoint_scores: 关键点置信度，形状为(N,)
-        prev_frame_data: 前一帧的数据，用于计算时间差异
+        prev_frame_data: 前一帧的数据，用于保存步态引擎和调试信息
+        timestamp: 当前帧的时间戳（秒）。视频文件应使用视频时间
+            （见 :func:`gait_engine.frame_timestamp`），为None时使用当前系统时间
     
     Returns:
         dict: 包含步态测量值的字典
     """
-    # 关键点索引 (根据RTMPose全身模型)
-    LEFT_ANKLE_IDX = 15
-    RIGHT_ANKLE_IDX = 16
-    LEFT_KNEE_IDX = 13
-    RIGHT_KNEE_IDX = 14
-    LEFT_HIP_IDX = 11
-    RIGHT_HIP_IDX = 12
-    
-    # 从prev_frame_data获取已经累积的指标值，如果没有则初始化为0
-    results = {
-        '左腿抬起时间': prev_frame_data.get('左腿抬起时间', 0),
-        '右腿抬起时间': prev_frame_data.get('右腿抬起时间', 0),
-        '双支撑时间': prev_frame_data.get('双支撑时间', 0),
-        '步时': prev_frame_data.get('步时', 0),
-        '摆动时间': prev_frame_data.get('摆动时间', 0),
-        '支撑时间': prev_frame_data.get('支撑时间', 0)
-    }
-
-    # 定义关键点有效性检查函数
-    def is_valid(idx):
-        return idx < len(keypoint_scores) and keypoint_scores[idx] > 0.3  # 降低阈值，提高检测概率
-    
     # 没有前一帧数据时返回空结果
     if prev_frame_data is None:
-        return results
-    
-    # 检查所需关键点是否有效
-    if not all(is_valid(idx) for idx in [LEFT_ANKLE_IDX, RIGHT_ANKLE_IDX, LEFT_KNEE_IDX, RIGHT_KNEE_IDX]):
-        return results
-    
-    # 获取当前帧的时间戳
-    current_time = time.time()
-    
-    # 计算脚踝和膝盖高度，用于判断腿是否抬起
-    left_ankle_y = keypoints[LEFT_ANKLE_IDX][1]
-    right_ankle_y = keypoints[RIGHT_ANKLE_IDX][1]
-    left_knee_y = keypoints[LEFT_KNEE_IDX][1]
-    right_knee_y = keypoints[RIGHT_KNEE_IDX][1]
-    
-    # 获取前一帧的数据
-    prev_left_ankle_y = prev_frame_data.get('left_ankle_y')
-    prev_right_ankle_y = prev_frame_data.get('right_ankle_y')
-    prev_left_knee_y = prev_frame_data.get('left_knee_y', 0)
-    prev_right_knee_y = prev_frame_data.get('right_knee_y', 0)
-    prev_time = prev_frame_data.get('timestamp')
-    
-    # 计算时间差
-    if prev_time:
-        time_diff = current_time - prev_time
-        
-        # 新的判断逻辑：比较左右脚踝的高度差
-        # 在图像坐标系中，Y轴向下为正，向上为负，所以Y值越小表示位置越高
-        # 左脚踝比右脚踝高（左脚踝Y值小于右脚踝Y值），表示左腿抬起
-        # 右脚踝比左脚踝高（右脚踝Y值小于左脚踝Y值），表示右腿抬起
-        left_leg_up = left_ankle_y < right_ankle_y
-        right_leg_up = right_ankle_y < left_ankle_y
-        
-        # 将腿的状态存储到prev_frame_data中
-        prev_frame_data['left_leg_up'] = left_leg_up
-        prev_frame_data['right_leg_up'] = right_leg_up
-        
-        # 存储当前脚踝高度差的信息
-        prev_frame_data['ankle_height_diff'] = right_ankle_y - left_ankle_y
-        
-        # 其它数据仍需保存用于调试
-        prev_frame_data['left_knee_ankle_distance'] = abs(left_knee_y - left_ankle_y)
-        prev_frame_data['right_knee_ankle_distance'] = abs(right_knee_y - right_ankle_y)
-        prev_frame_data['prev_left_knee_ankle_distance'] = abs(prev_left_knee_y - prev_left_ankle_y) if prev_left_knee_y is not None and prev_left_ankle_y is not None else abs(left_knee_y - left_ankle_y)
-        prev_frame_data['prev_right_knee_ankle_distance'] = abs(prev_right_knee_y - prev_right_ankle_y) if prev_right_knee_y is not None and prev_right_ankle_y is not None else abs(right_knee_y - right_ankle_y)
-        
-        # 判断双腿是否都在地面上
-        both_legs_down = not left_leg_up and not right_leg_up
-        
-        # 更新步态指标，将时间差累加到已有的指标上
-        if left_leg_up:
-            results['左腿抬起时间'] += time_diff
-            results['摆动时间'] += time_diff
-        
-        if right_leg_up:
-            results['右腿抬起时间'] += time_diff
-            results['摆动时间'] += time_diff
-        
-        if both_legs_down:
-            results['双支撑时间'] += time_diff
-            results['支撑时间'] += time_diff
-        
-        # 步时是完整步态周期的时间
-        results['步时'] += time_diff
+        return {name: 0 for name in GAIT_TIME_METRICS}
     
-    # 添加调试信息以帮助确认关键点的坐标是否被正确检测和更新
-    print(f"左脚踝Y坐标: {left_ankle_y}, 右脚踝Y坐标: {right_ankle_y}")
-    print(f"左膝盖Y坐标: {left_knee_y}, 右膝盖Y坐标: {right_knee_y}")
-    print(f"脚踝高度差: {prev_frame_data['ankle_height_diff'] if 'ankle_height_diff' in prev_frame_data else '未知'}")
+    # 步态引擎保存在前一帧数据中，跨帧累积步态事件
+    engine = prev_frame_data.get('gait_engine')
+    if engine is None:
+        engine = GaitEngine()
+        prev_frame_data['gait_engine'] = engine
     
-    # 添加更多调试信息，确认腿部抬起状态是否正确
-    print(f"左腿抬起状态: {left_leg_up}, 右腿抬起状态: {right_leg_up}")
-    print(f"左腿抬起时间: {results['左腿抬起时间']}, 右腿抬起时间: {results['右腿抬起时间']}")
+    if timestamp is None:
+        timestamp = time.time()
+    results = engine.update(timestamp, keypoints, keypoint_scores)
     
-    # 确保前一帧数据正确保存
-    prev_frame_data['prev_left_ankle_y'] = left_ankle_y
-    prev_frame_data['prev_right_ankle_y'] = right_ankle_y
-    prev_frame_data['prev_left_knee_y'] = left_knee_y
-    prev_frame_data['prev_right_knee_y'] = right_knee_y
+    # 保存腿部状态和脚踝高度差，供调试面板显示
+    prev_frame_data['left_leg_up'] = engine.left_leg_up
+    prev_frame_data['right_leg_up'] = engine.right_leg_up
+    if keypoint_scores[LEFT_ANKLE_IDX] > 0.3 and keypoint_scores[RIGHT_ANKLE_IDX] > 0.3:
+        prev_frame_data['ankle_height_diff'] = keypoints[RIGHT_ANKLE_IDX][1] - keypoints[LEFT_ANKLE_IDX][1]
+    if keypoint_scores[LEFT_KNEE_IDX] > 0.3 and keypoint_scores[LEFT_ANKLE_IDX] > 0.3:
+        prev_frame_data['left_knee_ankle_distance'] = abs(keypoints[LEFT_KNEE_IDX][1] - keypoints[LEFT_ANKLE_IDX][1])
+    if keypoint_scores[RIGHT_KNEE_IDX] > 0.3 and keypoint_scores[RIGHT_ANKLE_IDX] > 0.3:
+        prev_frame_data['right_knee_ankle_distance'] = abs(keypoints[RIGHT_KNEE_IDX][1] - keypoints[RIGHT_ANKLE_IDX][1])
     
     return results
 
@@ -534,6 +459,12 @@ def main():
     with st.sidebar.expander("姿态估计配置", expanded=False):
         args.kpt_thr = st.slider("关键点阈值", min_value=0.0, max_value=1.0, value=0.5, step=0.05)
     
+    # 填写推理服务地址时由常驻的pose_server推理，多个页面共享同一组模型
+    server_url = st.sidebar.text_input("推理服务地址", value="",
+                                       help="如 http://127.0.0.1:8765，需先运行 python pose_server.py；"
+                                            "留空时在本页面加载模型。检测和平滑参数以服务端配置为准")
+    remote_client = PoseClient(server_url) if server_url else None
+    
     # 可视化配置部分
     st.sidebar.markdown("### 可视化配置")
     args.draw_bbox = st.sidebar.checkbox("显示边界框", value=False)
@@ -558,6 +489,14 @@ def main():
     st.sidebar.markdown("### 性能配置")
     args.fps = st.sidebar.checkbox("显示FPS", value=True)
     args.device = st.sidebar.selectbox("运行设备", options=['cuda:0', 'cpu'], index=0)
+    args.pipelined = st.sidebar.checkbox("多线程流水线", value=True)
+    ui_refresh_rate = st.sidebar.slider("界面刷新率(次/秒)", min_value=1, max_value=30, value=5,
+                                        help="指标卡片和步态图表的刷新频率，与推理帧率无关")
+    args.det_interval = st.sidebar.slider("检测器运行间隔(帧)", min_value=1, max_value=30, value=1,
+                                          help="大于1时，其余帧由上一帧关键点推算人体框，跳过检测器")
+    smooth_options = {"无": None, "One-Euro": 'one_euro', "Kalman": 'kalman', "Savitzky-Golay": 'savgol'}
+    args.smooth_method = smooth_options[st.sidebar.selectbox("关键点平滑", options=list(smooth_options), index=1,
+                                                             help="在体态和步态分析之前对关键点做时间平滑，减少抖动")]
     
     # 输出配置部分
     st.sidebar.markdown("### 输出配置")
@@ -570,47 +509,17 @@ def main():
         args.save_predictions = False
     
     # 正常范围的定义
-    normal_ranges = {
-        '头前倾角': '0°～5°',
-        '头侧倾角': '0°～2°',
-        '头旋转角': '0°～5°',
-        '肩倾斜角': '0°～2°',
-        '圆肩角': '>65°',
-        '背部角': '<39°',
-        '腹部肥胖度': '0%～35%',
-        '腰曲度': '0°～5°',
-        '骨盆前倾角': '-7°～7°',
-        '侧中位度': '175°～185°',
-        '腿型-左腿': '177°～183°',
-        '腿型-右腿': '177°～183°',
-        '左膝评估角': '175°～185°',
-        '右膝评估角': '175°～185°',
-        '身体倾斜度': '0°～2°',
-        '足八角': '-5°～11°'
-    }
+    normal_ranges = NORMAL_RANGES
     
-    # 初始化步态分析数据
+    # 最大历史数据点数量
+    max_history_points = 100
+    
+    # 初始化步态分析数据（环形缓冲区，每帧一行）
     if 'gait_history' not in st.session_state:
-        st.session_state.gait_history = {
-            '左腿抬起时间': [],
-            '右腿抬起时间': [],
-            '双支撑时间': [],
-            '步时': [],
-            '摆动时间': [],
-            '支撑时间': [],
-            '左脚踝高度': [],
-            '右脚踝高度': []
-        }
+        st.session_state.gait_history = RingBuffer(GAIT_HISTORY_COLUMNS, capacity=max_history_points)
         
     # 步态分析的正常范围 (x, y) 形式表示最小值和最大值
-    gait_normal_ranges = {
-        '左腿抬起时间': (0.25, 0.6),    # 正常范围：250-600毫秒
-        '右腿抬起时间': (0.25, 0.6),    # 正常范围：250-600毫秒
-        '双支撑时间': (0.05, 0.25),     # 正常范围：50-250毫秒
-        '步时': (0.8, 1.2),            # 正常范围：800-1200毫秒
-        '摆动时间': (0.25, 0.55),       # 正常范围：250-550毫秒
-        '支撑时间': (0.5, 0.8)         # 正常范围：500-800毫秒
-    }
+    gait_normal_ranges = GAIT_NORMAL_RANGES
     
     # 更新频率控制，每10帧更新一次图表
     frame_counter = 0
@@ -640,23 +549,16 @@ def main():
         'timestamp': time.time()
     }
     
-    # 最大历史数据点数量
-    max_history_points = 100
-    
     # 初始化模型
     @st.cache_resource
     def load_models():
-        """加载所需的模型"""
-        detector = init_detector(
-            args.det_config, args.det_checkpoint, device=args.device)
-        detector.cfg = adapt_mmdet_pipeline(detector.cfg)
+        """加载所需的模型，使用推理服务时只构建本地可视化器"""
+        if remote_client is not None:
+            return None, None, remote_client.build_visualizer(args)
         
-        pose_estimator = init_pose_estimator(
-            args.pose_config,
-            args.pose_checkpoint,
-            device=args.device,
-            cfg_options=dict(
-                model=dict(test_cfg=dict(output_heatmaps=args.draw_heatmap))))
+        # PyTorch或ONNX Runtime后端，由 args.backend 选择
+        detector = build_detector(args)
+        pose_estimator = build_pose_estimator(args)
         
         pose_estimator.cfg.visualizer.radius = args.radius
         pose_estimator.cfg.visualizer.alpha = args.alpha
@@ -715,35 +617,44 @@ def main():
                 st.error(f"连接摄像头时出错: {str(e)}")
                 st.stop()
             
-            # 视频写入器
+            # 视频写入器（后台线程编码，帧率由实际处理帧的时间间隔估计）
             video_writer = None
             if args.output_root:
                 mmengine.mkdir_or_exist(args.output_root)
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                video_writer = cv2.VideoWriter(
-                    f"{args.output_root}/output.mp4",
-                    fourcc,
-                    25,  # FPS
-                    (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), 
-                    int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))))
+                video_writer = AsyncVideoWriter(f"{args.output_root}/output.mp4")
+            
+            # 保存预测结果（列式存储，按块追加写入）
+            session_store = None
+            if args.save_predictions:
+                session_store = SessionStore(
+                    os.path.join(args.output_root, 'session'), metric_names=GAIT_HISTORY_COLUMNS)
+            
+            # 界面刷新节流器和可复用的步态图表
+            dashboard_throttle = RefreshThrottle(ui_refresh_rate)
+            try:
+                font_prop = chinese_font
+            except NameError:
+                font_prop = FontProperties(family=['SimHei', 'Microsoft YaHei'])
+            gait_chart = GaitChart(gait_normal_ranges, history_size=max_history_points, font_prop=font_prop)
+            for row in st.session_state.gait_history.window():
+                gait_chart.append(dict(zip(GAIT_HISTORY_COLUMNS, row)))
             
             # FPS计算变量
             fps_value = 0
             frame_count = 0
             start_time = time.time()
             
-            while True:
-                success, frame = cap.read()
-                if not success:
-                    st.error("无法读取摄像头画面")
-                    break
-                
-                # 处理帧并获取预测结果
-                pred_instances = process_one_image(
-                    args, frame, detector, pose_estimator, visualizer, 0.001)
-                
-                # 获取可视化后的帧
-                frame_vis = visualizer.get_image()
+            # 读取、推理和渲染帧，流水线模式下各阶段在独立线程中并行
+            if remote_client is not None:
+                frames = iter_remote_frames(args, cap, remote_client, visualizer)
+            elif args.pipelined:
+                frames = iter_pipelined_frames(
+                    args, cap, detector, pose_estimator, visualizer)
+            else:
+                frames = iter_sequential_frames(
+                    args, cap, detector, pose_estimator, visualizer)
+            
+            for _, pred_instances, frame_vis in frames:
                 
                 # 计算并显示FPS
                 frame_count += 1
@@ -761,6 +672,9 @@ def main():
                 # 显示处理后的帧
                 video_placeholder.image(frame_vis, channels="RGB", use_container_width=True)
                 
+                # 指标卡片和图表的刷新率与推理帧率解耦
+                refresh = dashboard_throttle.ready()
+                
                 # 保存视频
                 if video_writer is not None:
                     video_writer.write(cv2.cvtColor(frame_vis, cv2.COLOR_RGB2BGR))
@@ -778,54 +692,55 @@ def main():
                     from webcam_rtmw_demo import analyze_body_posture
                     posture_results = analyze_body_posture(keypoints, keypoint_scores, custom_kpts)
                     
-                    # 更新指标显示
-                    with metrics_placeholder.container():
-                        # 计算异常指标数量
-                        abnormal_metrics = []
-                        for title, value in posture_results.items():
-                            if value is not None and not check_value_in_range(value, normal_ranges[title]):
-                                abnormal_metrics.append(title)
+                    # 更新指标显示（按界面刷新率节流）
+                    if refresh:
+                        with metrics_placeholder.container():
+                            # 计算异常指标数量
+                            abnormal_metrics = []
+                            for title, value in posture_results.items():
+                                if value is not None and not check_value_in_range(value, normal_ranges[title]):
+                                    abnormal_metrics.append(title)
                         
-                        # 显示总结
-                        total_metrics = sum(1 for v in posture_results.values() if v is not None)
-                        if total_metrics > 0:
-                            abnormal_count = len(abnormal_metrics)
-                            normal_count = total_metrics - abnormal_count
-                            if abnormal_count > 0:
-                                advice = "建议关注以下异常指标并进行相应的调整和训练。"
-                                abnormal_text = "、".join(abnormal_metrics[:3])
-                                if len(abnormal_metrics) > 3:
-                                    abnormal_text += f"等{len(abnormal_metrics)}项"
-                            else:
-                                advice = "您的体态状况良好，请继续保持。"
-                                abnormal_text = ""
+                            # 显示总结
+                            total_metrics = sum(1 for v in posture_results.values() if v is not None)
+                            if total_metrics > 0:
+                                abnormal_count = len(abnormal_metrics)
+                                normal_count = total_metrics - abnormal_count
+                                if abnormal_count > 0:
+                                    advice = "建议关注以下异常指标并进行相应的调整和训练。"
+                                    abnormal_text = "、".join(abnormal_metrics[:3])
+                                    if len(abnormal_metrics) > 3:
+                                        abnormal_text += f"等{len(abnormal_metrics)}项"
+                                else:
+                                    advice = "您的体态状况良好，请继续保持。"
+                                    abnormal_text = ""
                             
-                            summary = f"""<div class="metrics-summary">
-                                检测到{total_metrics}项指标，其中{normal_count}项正常，{abnormal_count}项异常。{advice}
-                                {f'<br><span class="metric-warning">异常项: {abnormal_text}</span>' if abnormal_count > 0 else ''}
-                            </div>"""
-                            st.markdown(summary, unsafe_allow_html=True)
+                                summary = f"""<div class="metrics-summary">
+                                    检测到{total_metrics}项指标，其中{normal_count}项正常，{abnormal_count}项异常。{advice}
+                                    {f'<br><span class="metric-warning">异常项: {abnormal_text}</span>' if abnormal_count > 0 else ''}
+                                </div>"""
+                                st.markdown(summary, unsafe_allow_html=True)
                         
-                        st.markdown('<div class="metrics-container">', unsafe_allow_html=True)
-                        st.markdown('<div class="metrics-grid">', unsafe_allow_html=True)
-                        # 按分类组织指标
-                        metrics_grouped = {
-                            "头部": ["头前倾角", "头侧倾角", "头旋转角"],
-                            "上半身": ["肩倾斜角", "圆肩角", "背部角"],
-                            "中部": ["腹部肥胖度", "腰曲度", "骨盆前倾角", "侧中位度"],
-                            "下肢": ["腿型-左腿", "腿型-右腿", "左膝评估角", "右膝评估角", "身体倾斜度", "足八角"]
-                        }
+                            st.markdown('<div class="metrics-container">', unsafe_allow_html=True)
+                            st.markdown('<div class="metrics-grid">', unsafe_allow_html=True)
+                            # 按分类组织指标
+                            metrics_grouped = {
+                                "头部": ["头前倾角", "头侧倾角", "头旋转角"],
+                                "上半身": ["肩倾斜角", "圆肩角", "背部角"],
+                                "中部": ["腹部肥胖度", "腰曲度", "骨盆前倾角", "侧中位度"],
+                                "下肢": ["腿型-左腿", "腿型-右腿", "左膝评估角", "右膝评估角", "身体倾斜度", "足八角"]
+                            }
                         
-                        # 显示按组分类的指标
-                        for group, metrics in metrics_grouped.items():
-                            metrics_in_group = [m for m in metrics if m in posture_results and posture_results[m] is not None]
-                            if metrics_in_group:
-                                st.markdown(f'<div class="metrics-group-title">{group}</div>', unsafe_allow_html=True)
-                                for metric in metrics_in_group:
-                                    display_metric(metric, posture_results[metric], normal_ranges[metric], metric)
+                            # 显示按组分类的指标
+                            for group, metrics in metrics_grouped.items():
+                                metrics_in_group = [m for m in metrics if m in posture_results and posture_results[m] is not None]
+                                if metrics_in_group:
+                                    st.markdown(f'<div class="metrics-group-title">{group}</div>', unsafe_allow_html=True)
+                                    for metric in metrics_in_group:
+                                        display_metric(metric, posture_results[metric], normal_ranges[metric], metric)
                         
-                        st.markdown('</div>', unsafe_allow_html=True)
-                        st.markdown('</div>', unsafe_allow_html=True)
+                            st.markdown('</div>', unsafe_allow_html=True)
+                            st.markdown('</div>', unsafe_allow_html=True)
                     
                     # 分析步态数据
                     if LEFT_ANKLE_IDX < len(keypoints) and RIGHT_ANKLE_IDX < len(keypoints):
@@ -873,144 +788,87 @@ def main():
                     prev_frame_data.update(gait_metrics)
                     prev_frame_data['timestamp'] = time.time()
                     
-                    # 显示当前步态指标
-                    with gait_metrics_placeholder.container():
-                        # 生成步态总结
-                        summary_html = generate_gait_summary(gait_metrics, gait_normal_ranges)
-                        st.markdown(summary_html, unsafe_allow_html=True)
+                    # 显示当前步态指标（按界面刷新率节流）
+                    if refresh:
+                        with gait_metrics_placeholder.container():
+                            # 生成步态总结
+                            summary_html = generate_gait_summary(gait_metrics, gait_normal_ranges)
+                            st.markdown(summary_html, unsafe_allow_html=True)
                         
-                        # 显示所有指标的卡片
-                        col1, col2 = st.columns(2)
+                            # 显示所有指标的卡片
+                            col1, col2 = st.columns(2)
                         
-                        # 左右腿指标放在第一列
-                        with col1:
-                            st.markdown("<h4 style='font-size:1rem;'>左右腿指标</h4>", unsafe_allow_html=True)
-                            st.markdown(f"""
-                            <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;'>
-                                <div style='font-size:0.8rem;color:#666;'>左腿抬起时间</div>
-                                <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['左腿抬起时间'], 2)} 秒</div>
-                            </div>
-                            <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;'>
-                                <div style='font-size:0.8rem;color:#666;'>右腿抬起时间</div>
-                                <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['右腿抬起时间'], 2)} 秒</div>
-                            </div>
-                            """, unsafe_allow_html=True)
+                            # 左右腿指标放在第一列
+                            with col1:
+                                st.markdown("<h4 style='font-size:1rem;'>左右腿指标</h4>", unsafe_allow_html=True)
+                                st.markdown(f"""
+                                <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;'>
+                                    <div style='font-size:0.8rem;color:#666;'>左腿抬起时间</div>
+                                    <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['左腿抬起时间'], 2)} 秒</div>
+                                </div>
+                                <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;'>
+                                    <div style='font-size:0.8rem;color:#666;'>右腿抬起时间</div>
+                                    <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['右腿抬起时间'], 2)} 秒</div>
+                                </div>
+                                """, unsafe_allow_html=True)
                         
-                        # 步态时间指标放在第二列
-                        with col2:
-                            st.markdown("<h4 style='font-size:1rem;'>步态时间指标</h4>", unsafe_allow_html=True)
+                            # 步态时间指标放在第二列
+                            with col2:
+                                st.markdown("<h4 style='font-size:1rem;'>步态时间指标</h4>", unsafe_allow_html=True)
+                                st.markdown(f"""
+                                <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;'>
+                                    <div style='font-size:0.8rem;color:#666;'>双支撑时间</div>
+                                    <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['双支撑时间'], 2)} 秒</div>
+                                </div>
+                                <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;'>
+                                    <div style='font-size:0.8rem;color:#666;'>步时</div>
+                                    <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['步时'], 2)} 秒</div>
+                                </div>
+                                """, unsafe_allow_html=True)
+                        
+                            # 其他时间指标
+                            st.markdown("<h4 style='font-size:1rem;'>周期指标</h4>", unsafe_allow_html=True)
                             st.markdown(f"""
-                            <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;'>
-                                <div style='font-size:0.8rem;color:#666;'>双支撑时间</div>
-                                <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['双支撑时间'], 2)} 秒</div>
-                            </div>
-                            <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;'>
-                                <div style='font-size:0.8rem;color:#666;'>步时</div>
-                                <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['步时'], 2)} 秒</div>
+                            <div style='display:flex;gap:0.5rem;'>
+                                <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;flex:1;'>
+                                    <div style='font-size:0.8rem;color:#666;'>摆动时间</div>
+                                    <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['摆动时间'], 2)} 秒</div>
+                                </div>
+                                <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;flex:1;'>
+                                    <div style='font-size:0.8rem;color:#666;'>支撑时间</div>
+                                    <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['支撑时间'], 2)} 秒</div>
+                                </div>
                             </div>
                             """, unsafe_allow_html=True)
                         
-                        # 其他时间指标
-                        st.markdown("<h4 style='font-size:1rem;'>周期指标</h4>", unsafe_allow_html=True)
-                        st.markdown(f"""
-                        <div style='display:flex;gap:0.5rem;'>
-                            <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;flex:1;'>
-                                <div style='font-size:0.8rem;color:#666;'>摆动时间</div>
-                                <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['摆动时间'], 2)} 秒</div>
-                            </div>
-                            <div style='background-color:#f8f9fa;border-radius:0.3rem;padding:0.5rem;margin-bottom:0.5rem;border-top:3px solid #1f77b4;flex:1;'>
-                                <div style='font-size:0.8rem;color:#666;'>支撑时间</div>
-                                <div style='font-size:1.2rem;font-weight:bold;color:#1f77b4;'>{round(gait_metrics['支撑时间'], 2)} 秒</div>
-                            </div>
-                        </div>
-                        """, unsafe_allow_html=True)
-                        
-                        # 显示步态关键变量的值（新增部分）
-                        display_debug_variables(prev_frame_data)
+                            # 显示步态关键变量的值（新增部分）
+                            display_debug_variables(prev_frame_data)
                     
-                    # 更新步态历史数据
+                    # 更新步态历史数据（包含脚踝高度），环形缓冲区自动丢弃最旧的数据
                     frame_counter += 1
                     if frame_counter % 1 == 0:  # 每10帧更新一次
-                        for metric, value in gait_metrics.items():
-                            st.session_state.gait_history[metric].append(value)
-                            # 限制历史数据量
-                            if len(st.session_state.gait_history[metric]) > max_history_points:
-                                st.session_state.gait_history[metric] = st.session_state.gait_history[metric][-max_history_points:]
-                        
-                        # 添加脚踝高度数据
-                        if 'left_ankle_y' in prev_frame_data and prev_frame_data['left_ankle_y'] is not None:
-                            st.session_state.gait_history['左脚踝高度'].append(prev_frame_data['left_ankle_y'])
-                            if len(st.session_state.gait_history['左脚踝高度']) > max_history_points:
-                                st.session_state.gait_history['左脚踝高度'] = st.session_state.gait_history['左脚踝高度'][-max_history_points:]
-                        
-                        if 'right_ankle_y' in prev_frame_data and prev_frame_data['right_ankle_y'] is not None:
-                            st.session_state.gait_history['右脚踝高度'].append(prev_frame_data['right_ankle_y'])
-                            if len(st.session_state.gait_history['右脚踝高度']) > max_history_points:
-                                st.session_state.gait_history['右脚踝高度'] = st.session_state.gait_history['右脚踝高度'][-max_history_points:]
+                        history_row = dict(
+                            gait_metrics,
+                            左脚踝高度=prev_frame_data.get('left_ankle_y'),
+                            右脚踝高度=prev_frame_data.get('right_ankle_y'))
+                        st.session_state.gait_history.append(history_row)
+                        if session_store is not None:
+                            session_store.append_data_samples(frame_counter, time.time(), pred_instances, history_row)
                     
-                        # 显示步态图表
-                        with gait_chart_placeholder.container():
-                            # 创建三行一列的图表布局
-                            fig, axes = plt.subplots(3, 1, figsize=(5, 8), gridspec_kw={'height_ratios': [1, 1, 1]})
-                            
-                            # 创建DataFrame用于绘图
-                            df = pd.DataFrame(st.session_state.gait_history)
-                            
-                            # 为了可视化效果，计算移动平均
-                            if len(df) > 5:  # 至少有5个数据点才能进行移动平均
-                                df_smoothed = df.rolling(window=5, min_periods=1).mean()
-                                
-                                # 获取中文字体对象
-                                try:
-                                    font_prop = chinese_font
-                                except NameError:
-                                    font_prop = FontProperties(family=['SimHei', 'Microsoft YaHei'])
-                                
-                                # 第一个图表：左右腿的抬起时间对比
-                                axes[0].plot(df_smoothed['左腿抬起时间'], label='左腿抬起时间', color='#1f77b4')
-                                axes[0].plot(df_smoothed['右腿抬起时间'], label='右腿抬起时间', color='#ff7f0e', linestyle='--')
-                                axes[0].set_title("左右腿抬起时间对比", fontproperties=font_prop, fontsize=12)
-                                axes[0].set_ylabel("时间 (秒)", fontproperties=font_prop)
-                                axes[0].legend(loc='upper left', fontsize='small', prop=font_prop)
-                                axes[0].grid(True, linestyle='--', alpha=0.7)
-                                
-                                # 添加正常范围参考线
-                                min_val, max_val = gait_normal_ranges['左腿抬起时间']
-                                axes[0].axhspan(min_val, max_val, alpha=0.2, color='green', label='正常范围')
-                                
-                                # 第二个图表：步态周期相关时间
-                                axes[1].plot(df_smoothed['双支撑时间'], label='双支撑时间', color='#2ca02c')
-                                axes[1].plot(df_smoothed['步时'], label='步时', color='#d62728')
-                                axes[1].plot(df_smoothed['摆动时间'], label='摆动时间', color='#9467bd')
-                                axes[1].plot(df_smoothed['支撑时间'], label='支撑时间', color='#8c564b')
-                                axes[1].set_title("步态周期时间分析", fontproperties=font_prop, fontsize=12)
-                                axes[1].set_ylabel("时间 (秒)", fontproperties=font_prop)
-                                axes[1].legend(loc='upper left', fontsize='small', prop=font_prop)
-                                axes[1].grid(True, linestyle='--', alpha=0.7)
-                                
-                                # 第三个图表：左右脚踝高度
-                                if '左脚踝高度' in df_smoothed and '右脚踝高度' in df_smoothed:
-                                    # 将Y轴翻转，使得值越小（向上移动）显示在图表上方
-                                    axes[2].plot(df_smoothed['左脚踝高度'], label='左脚踝高度', color='#17becf')
-                                    axes[2].plot(df_smoothed['右脚踝高度'], label='右脚踝高度', color='#e377c2', linestyle='--')
-                                    axes[2].set_title("左右脚踝高度变化", fontproperties=font_prop, fontsize=12)
-                                    axes[2].set_xlabel("帧", fontproperties=font_prop)
-                                    axes[2].set_ylabel("像素坐标 (Y轴)", fontproperties=font_prop)
-                                    axes[2].legend(loc='upper left', fontsize='small', prop=font_prop)
-                                    axes[2].grid(True, linestyle='--', alpha=0.7)
-                                    # 因为在图像中Y坐标是向下增加的，所以翻转Y轴使得数值越小显示在上方
-                                    axes[2].invert_yaxis()
-                                
-                                # 设置图表字体和样式
-                                for ax in axes:
-                                    for label in ax.get_xticklabels() + ax.get_yticklabels():
-                                        label.set_fontproperties(font_prop)
-                                
-                                # 应用紧凑布局
-                                plt.tight_layout()
-                                st.pyplot(fig)
+                        # 追加图表数据（流式滑动平均），按界面刷新率重绘同一个图表对象
+                        gait_chart.append(history_row)
+                        if refresh:
+                            if gait_chart.ready:
+                                gait_chart_placeholder.pyplot(gait_chart.render())
                             else:
-                                st.info("收集更多数据点以显示步态图表...")
+                                gait_chart_placeholder.info("收集更多数据点以显示步态图表...")
+            else:
+                st.error("无法读取摄像头画面")
+            frames.close()
+            gait_chart.close()
+            if session_store is not None:
+                session_store.close(meta=remote_client.info()['dataset_meta'] if remote_client is not None
+                                    else pose_estimator.dataset_meta)
             
             # 控制刷新率
             if input_source == "实时摄像头":
@@ -1048,6 +906,11 @@ def main():
                     gait_metrics_placeholder = st.empty()
                     gait_chart_placeholder = st.empty()
                 
+                # 离线分析选项
+                render_video = st.checkbox("生成标注视频", value=False,
+                                           help="关闭时只分析关键点和指标，速度更快")
+                pose_batch_size = st.slider("姿态估计批大小", min_value=1, max_value=128, value=32)
+                
                 # 处理视频按钮
                 process_button = st.button("处理视频")
                 
@@ -1057,161 +920,50 @@ def main():
                         with st.spinner('正在加载模型...'):
                             detector, pose_estimator, visualizer = load_models()
                         
-                        # 视频写入器
-                        output_video_path = f"output_{int(time.time())}.mp4"
-                        
-                        # 打开视频文件
-                        cap = cv2.VideoCapture(video_path)
+                        # 离线批量分析：后台解码，多帧的裁剪合并为一次推理，不进行渲染
+                        def update_progress(done, total):
+                            progress = min(done / total, 1.0) if total > 0 else 0.0
+                            progress_bar.progress(progress)
+                            status_text.text(f"分析进度: {int(progress * 100)}% (帧 {done}/{total})")
                         
-                        if not cap.isOpened():
+                        try:
+                            if remote_client is not None:
+                                # 服务端逐帧推理，视频帧与其他客户端的帧一起动态批处理
+                                video_result = remote_client.analyze_video(video_path, progress_fn=update_progress)
+                            else:
+                                video_result = analyze_video_offline(
+                                    args, video_path, detector, pose_estimator,
+                                    batch_size=pose_batch_size, progress_fn=update_progress)
+                        except IOError:
                             st.error("无法打开视频文件")
                             st.stop()
                         
-                        # 获取视频属性
-                        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-                        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-                        fps = cap.get(cv2.CAP_PROP_FPS)
-                        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-                        
-                        # 初始化视频写入器
-                        fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                        video_writer = cv2.VideoWriter(
-                            output_video_path,
-                            fourcc,
-                            fps,
-                            (width, height))
-                        
-                        # 初始化前一帧数据
-                        prev_frame_data = {
-                            'left_ankle_y': None,
-                            'right_ankle_y': None,
-                            'left_knee_y': None,
-                            'right_knee_y': None,
-                            'left_hip_y': None,
-                            'right_hip_y': None,
-                            'left_ankle_x': None,
-                            'right_ankle_x': None,
-                            'left_knee_x': None,
-                            'right_knee_x': None,
-                            'left_hip_x': None,
-                            'right_hip_x': None,
-                            'timestamp': time.time()
-                        }
-                        
-                        # 存储每帧的分析结果
-                        frame_results = []
+                        # 批量计算每帧的体态和步态指标
+                        frame_results = summarize_offline_results(video_result)
+                        progress_bar.progress(1.0)
+                        status_text.text("视频分析完成！")
                         
-                        # 开始处理视频
-                        frame_index = 0
-                        while True:
-                            success, frame = cap.read()
-                            if not success:
-                                break
-                            
-                            # 更新进度条和状态文本
-                            progress = frame_index / total_frames
-                            progress_bar.progress(progress)
-                            status_text.text(f"处理进度: {int(progress * 100)}% (帧 {frame_index+1}/{total_frames})")
-                            
-                            # 处理帧并获取预测结果
-                            pred_instances = process_one_image(
-                                args, frame, detector, pose_estimator, visualizer, 0.001)
-                            
-                            # 获取可视化后的帧
-                            frame_vis = visualizer.get_image()
-                            
-                            # 显示当前处理的帧
-                            if frame_index % 5 == 0:  # 每5帧更新一次UI以减少卡顿
-                                video_placeholder.image(frame_vis, channels="RGB", use_container_width=True)
-                            
-                            # 保存处理后的帧到输出视频
-                            video_writer.write(cv2.cvtColor(frame_vis, cv2.COLOR_RGB2BGR))
-                            
-                            # 分析体态和步态
-                            frame_result = {}
-                            if hasattr(pred_instances, 'pred_instances') and len(pred_instances.pred_instances) > 0:
-                                keypoints = pred_instances.pred_instances.keypoints[0]
-                                keypoint_scores = pred_instances.pred_instances.keypoint_scores[0]
-                                
-                                custom_kpts = None
-                                if hasattr(pred_instances, 'custom_keypoints') and len(pred_instances.custom_keypoints) > 0:
-                                    custom_kpts = pred_instances.custom_keypoints[0]
-                                
-                                # 分析体态
-                                from webcam_rtmw_demo import analyze_body_posture
-                                posture_results = analyze_body_posture(keypoints, keypoint_scores, custom_kpts)
-                                frame_result['posture'] = posture_results
-                                
-                                # 分析步态
-                                if LEFT_ANKLE_IDX < len(keypoints) and RIGHT_ANKLE_IDX < len(keypoints):
-                                    # 保存和更新关节点数据
-                                    if prev_frame_data.get('left_ankle_y') is not None:
-                                        prev_frame_data['prev_left_ankle_y'] = prev_frame_data['left_ankle_y']
-                                        prev_frame_data['prev_left_ankle_x'] = prev_frame_data.get('left_ankle_x')
-                                    if prev_frame_data.get('right_ankle_y') is not None:
-                                        prev_frame_data['prev_right_ankle_y'] = prev_frame_data['right_ankle_y']
-                                        prev_frame_data['prev_right_ankle_x'] = prev_frame_data.get('right_ankle_x')
-                                    if prev_frame_data.get('left_knee_y') is not None:
-                                        prev_frame_data['prev_left_knee_y'] = prev_frame_data['left_knee_y']
-                                        prev_frame_data['prev_left_knee_x'] = prev_frame_data.get('left_knee_x')
-                                    if prev_frame_data.get('right_knee_y') is not None:
-                                        prev_frame_data['prev_right_knee_y'] = prev_frame_data['right_knee_y']
-                                        prev_frame_data['prev_right_knee_x'] = prev_frame_data.get('right_knee_x')
-                                    if prev_frame_data.get('left_hip_y') is not None:
-                                        prev_frame_data['prev_left_hip_y'] = prev_frame_data['left_hip_y']
-                                        prev_frame_data['prev_left_hip_x'] = prev_frame_data.get('left_hip_x')
-                                    if prev_frame_data.get('right_hip_y') is not None:
-                                        prev_frame_data['prev_right_hip_y'] = prev_frame_data['right_hip_y']
-                                        prev_frame_data['prev_right_hip_x'] = prev_frame_data.get('right_hip_x')
-                                    
-                                    # 更新当前帧数据
-                                    prev_frame_data['left_ankle_y'] = keypoints[LEFT_ANKLE_IDX][1]
-                                    prev_frame_data['left_ankle_x'] = keypoints[LEFT_ANKLE_IDX][0]
-                                    prev_frame_data['right_ankle_y'] = keypoints[RIGHT_ANKLE_IDX][1]
-                                    prev_frame_data['right_ankle_x'] = keypoints[RIGHT_ANKLE_IDX][0]
-                                    
-                                    # 添加膝盖坐标
-                                    if LEFT_KNEE_IDX < len(keypoints) and RIGHT_KNEE_IDX < len(keypoints):
-                                        prev_frame_data['left_knee_y'] = keypoints[LEFT_KNEE_IDX][1]
-                                        prev_frame_data['left_knee_x'] = keypoints[LEFT_KNEE_IDX][0]
-                                        prev_frame_data['right_knee_y'] = keypoints[RIGHT_KNEE_IDX][1]
-                                        prev_frame_data['right_knee_x'] = keypoints[RIGHT_KNEE_IDX][0]
-                                    
-                                    # 添加髋部坐标
-                                    if LEFT_HIP_IDX < len(keypoints) and RIGHT_HIP_IDX < len(keypoints):
-                                        prev_frame_data['left_hip_y'] = keypoints[LEFT_HIP_IDX][1]
-                                        prev_frame_data['left_hip_x'] = keypoints[LEFT_HIP_IDX][0]
-                                        prev_frame_data['right_hip_y'] = keypoints[RIGHT_HIP_IDX][1]
-                                        prev_frame_data['right_hip_x'] = keypoints[RIGHT_HIP_IDX][0]
-                                    
-                                    gait_metrics = analyze_gait_metrics(keypoints, keypoint_scores, prev_frame_data)
-                                    frame_result['gait'] = gait_metrics
-                                    prev_frame_data.update(gait_metrics)
+                        # 按需渲染带关键点的标注视频
+                        if render_video:
+                            output_video_path = f"output_{int(time.time())}.mp4"
+                            status_text.text("正在生成标注视频...")
+                            render_offline_video(
+                                args, video_path, video_result, visualizer, output_video_path,
+                                progress_fn=update_progress)
+                            status_text.text("标注视频生成完成！")
                             
-                            # 保存帧结果
-                            frame_results.append(frame_result)
+                            # 显示输出视频
+                            st.subheader("处理后的视频")
+                            st.video(output_video_path)
                             
-                            # 更新帧计数器
-                            frame_index += 1
-                        
-                        # 完成视频处理
-                        cap.release()
-                        video_writer.release()
-                        progress_bar.progress(1.0)
-                        status_text.text("视频处理完成！")
-                        
-                        # 显示输出视频
-                        st.subheader("处理后的视频")
-                        st.video(output_video_path)
-                        
-                        # 提供下载链接
-                        with open(output_video_path, 'rb') as file:
-                            st.download_button(
-                                label="下载处理后的视频",
-                                data=file,
-                                file_name=f"processed_video_{int(time.time())}.mp4",
-                                mime="video/mp4"
-                            )
+                            # 提供下载链接
+                            with open(output_video_path, 'rb') as file:
+                                st.download_button(
+                                    label="下载处理后的视频",
+                                    data=file,
+                                    file_name=f"processed_video_{int(time.time())}.mp4",
+                                    mime="video/mp4"
+                                )
                         
                         # 生成并显示分析报告
                         st.subheader("分析报告")
@@ -1388,10 +1140,11 @@ def main():
                                             if group_metrics:
                                                 st.markdown(f"#### {group_name}指标趋势")
                                                 
-                                                # 计算每个指标的移动平均
+                                                # 关键点已在分析前平滑时直接绘制，否则计算每个指标的移动平均
                                                 smoothed_df = posture_df[group_metrics].copy()
-                                                for col in smoothed_df.columns:
-                                                    smoothed_df[col] = smoothed_df[col].rolling(window=5, min_periods=1).mean()
+                                                if not args.smooth_method:
+                                                    for col in smoothed_df.columns:
+                                                        smoothed_df[col] = smoothed_df[col].rolling(window=5, min_periods=1).mean()
                                                 
                                                 # 分批绘图，每批最多显示3个指标
                                                 for i in range(0, len(group_metrics), 3):
@@ -1404,34 +1157,12 @@ def main():
                                                         # 添加正常范围区域
                                                         for metric in batch_metrics:
                                                             if metric in normal_ranges:
-                                                                range_str = normal_ranges[metric]
+                                                                value_range = parse_range(normal_ranges[metric])
                                                                 min_val, max_val = None, None
-                                                                
-                                                                # 解析正常范围
-                                                                if '～' in range_str:
-                                                                    parts = range_str.split('～')
-                                                                    min_part = parts[0].replace('°', '').replace('<', '').replace('>', '')
-                                                                    max_part = parts[1].replace('°', '').replace('<', '').replace('>', '')
-                                                                    
-                                                                    try:
-                                                                        min_val = float(min_part)
-                                                                        max_val = float(max_part)
-                                                                    except ValueError:
-                                                                        pass
-                                                                elif '<' in range_str:
-                                                                    max_part = range_str.replace('°', '').replace('<', '')
-                                                                    try:
-                                                                        max_val = float(max_part)
-                                                                        min_val = smoothed_df[metric].min() - 5  # 假设下限
-                                                                    except ValueError:
-                                                                        pass
-                                                                elif '>' in range_str:
-                                                                    min_part = range_str.replace('°', '').replace('>', '')
-                                                                    try:
-                                                                        min_val = float(min_part)
-                                                                        max_val = smoothed_df[metric].max() + 5  # 假设上限
-                                                                    except ValueError:
-                                                                        pass
+                                                                if value_range is not None:
+                                                                    # 单侧范围按数据范围补全另一侧
+                                                                    min_val = value_range.low if np.isfinite(value_range.low) else smoothed_df[metric].min() - 5
+                                                                    max_val = value_range.high if np.isfinite(value_range.high) else smoothed_df[metric].max() + 5
                                                                 
                                                                 if min_val is not None and max_val is not None:
                                                                     ax.axhspan(min_val, max_val, alpha=0.2, color='green', label=f"{metric}正常范围")
@@ -1458,10 +1189,11 @@ def main():
                                         if group_metrics:
                                             st.markdown(f"#### {group_name}趋势")
                                             
-                                            # 计算移动平均
+                                            # 关键点已在分析前平滑时直接绘制，否则计算移动平均
                                             smoothed_df = gait_df[group_metrics].copy()
-                                            for col in smoothed_df.columns:
-                                                smoothed_df[col] = smoothed_df[col].rolling(window=5, min_periods=1).mean()
+                                            if not args.smooth_method:
+                                                for col in smoothed_df.columns:
+                                                    smoothed_df[col] = smoothed_df[col].rolling(window=5, min_periods=1).mean()
                                             
                                             fig, ax = plt.subplots(figsize=(10, 5))
                                             for metric in group_metrics:
@@ -1493,7 +1225,7 @@ def main():
                                             values = posture_df[metric].dropna()
                                             if len(values) > 0:
                                                 mean_val = values.mean()
-                                                abnormal_count = sum(1 for v in values if not check_value_in_range(v, normal_ranges[metric]))
+                                                abnormal_count = int((~in_range(values.to_numpy(), normal_ranges[metric])).sum())
                                                 abnormal_pct = (abnormal_count / len(values)) * 100
                                                 
                                                 stats_data.append({
@@ -1582,7 +1314,7 @@ def main():
         if 'cap' in locals():
             cap.release()
         if 'video_writer' in locals() and video_writer is not None:
-            video_writer.release()
+            video_writer.close()
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
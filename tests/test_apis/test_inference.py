@@ -1,4 +1,5 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import copy
 import os.path as osp
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -10,7 +11,8 @@ from mmcv.image import imread, imwrite
 from mmengine.utils import is_list_of
 from parameterized import parameterized
 
-from mmpose.apis import inference_bottomup, inference_topdown, init_model
+from mmpose.apis import (inference_bottomup, inference_topdown,
+                         inference_topdown_batch, init_model)
 from mmpose.structures import PoseDataSample
 from mmpose.testing._utils import _rand_bboxes, get_config_file, get_repo_dir
 from mmpose.utils import register_all_modules
@@ -88,6 +90,101 @@ class TestInference(TestCase):
                 self.assertTrue(results[0].pred_instances.keypoints.shape,
                                 (1, 17, 2))
 
+    @parameterized.expand([(('configs/body_2d_keypoint/topdown_heatmap/coco/'
+                             'td-hm_hrnet-w32_8xb64-210e_coco-256x192.py'),
+                            ('cpu', 'cuda'))])
+    def test_inference_topdown_batch(self, config, devices):
+        config_file = get_config_file(config)
+
+        rng = np.random.RandomState(0)
+        img_w = img_h = 100
+        imgs = [
+            rng.randint(0, 255, (img_h, img_w, 3), dtype=np.uint8)
+            for _ in range(3)
+        ]
+        bboxes = [
+            _rand_bboxes(rng, 2, img_w, img_h), None,
+            _rand_bboxes(rng, 3, img_w, img_h)
+        ]
+
+        for device in devices:
+            if device == 'cuda' and not torch.cuda.is_available():
+                # Skip the test if cuda is required but unavailable
+                continue
+            model = init_model(config_file, device=device)
+            inputs = list(zip(imgs, bboxes))
+
+            results = inference_topdown_batch(
+                model, inputs, bbox_format='xywh', batch_size=4)
+            self.assertEqual(len(results), 3)
+            self.assertEqual([len(r) for r in results], [2, 1, 3])
+            for frame_results in results:
+                self.assertTrue(is_list_of(frame_results, PoseDataSample))
+
+            # results should be consistent with single-image inference
+            for img, bbox, frame_results in zip(imgs, bboxes, results):
+                expected = inference_topdown(
+                    model, img, bbox, bbox_format='xywh')
+                for res, exp in zip(frame_results, expected):
+                    np.testing.assert_allclose(
+                        res.pred_instances.keypoints,
+                        exp.pred_instances.keypoints,
+                        rtol=1e-4,
+                        atol=1e-3)
+
+            # test crops prepared in a thread pool with padding
+            results = inference_topdown_batch(
+                model,
+                inputs,
+                bbox_format='xywh',
+                batch_size=4,
+                num_workers=2,
+                pad_batch=True)
+            self.assertEqual([len(r) for r in results], [2, 1, 3])
+
+            # test empty inputs
+            self.assertEqual(inference_topdown_batch(model, []), [])
+
+    @parameterized.expand([(('configs/body_2d_keypoint/topdown_heatmap/coco/'
+                             'td-hm_hrnet-w32_8xb64-210e_coco-256x192.py'), )])
+    def test_inference_topdown_pipeline_cache(self, config):
+        config_file = get_config_file(config)
+        model = init_model(config_file, device='cpu')
+
+        rng = np.random.RandomState(0)
+        img = rng.randint(0, 255, (100, 100, 3), dtype=np.uint8)
+
+        # the pipeline is built once and reused by the following calls
+        results = inference_topdown(model, img)
+        pipeline = model._test_pipeline_cache['pipeline']
+        _ = inference_topdown(model, img)
+        _ = inference_topdown_batch(model, [(img, None)])
+        self.assertIs(model._test_pipeline_cache['pipeline'], pipeline)
+
+        # only the dataset meta read by the pipeline is attached to the
+        # data infos
+        meta = model._test_pipeline_cache['meta']
+        self.assertIn('flip_indices', meta)
+        self.assertNotIn('sigmas', meta)
+        self.assertEqual(results[0].metainfo['flip_indices'],
+                         model.dataset_meta['flip_indices'])
+
+        # the pipeline is rebuilt after the pipeline config is replaced
+        pipeline_cfg = copy.deepcopy(
+            model.cfg.test_dataloader.dataset.pipeline)
+        pipeline_cfg[2]['input_size'] = (96, 128)
+        model.cfg.test_dataloader.dataset.pipeline = pipeline_cfg
+        results_resized = inference_topdown(model, img)
+        self.assertIsNot(model._test_pipeline_cache['pipeline'], pipeline)
+        self.assertEqual(results_resized[0].metainfo['input_size'], (96, 128))
+        self.assertNotEqual(results[0].metainfo['input_size'], (96, 128))
+
+        # the pipeline is rebuilt after the dataset meta is replaced
+        pipeline = model._test_pipeline_cache['pipeline']
+        model.dataset_meta = dict(model.dataset_meta)
+        _ = inference_topdown(model, img)
+        self.assertIsNot(model._test_pipeline_cache['pipeline'], pipeline)
+
     @parameterized.expand([(('configs/body_2d_keypoint/'
                              'associative_embedding/coco/'
                              'ae_hrnet-w32_8xb24-300e_coco-512x512.py'),
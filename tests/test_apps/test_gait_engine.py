@@ -0,0 +1,43 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from unittest import TestCase
+
+import numpy as np
+
+from config import LEFT_ANKLE_IDX, LEFT_HIP_IDX, RIGHT_ANKLE_IDX, RIGHT_HIP_IDX
+from gait_engine import MAX_GAIT_EVENTS, GaitEngine
+
+
+class TestGaitEngine(TestCase):
+
+    def _walk(self, duration, fps=30., cycle_time=1.):
+        """Synthetic walking in image coordinates, one cycle per second.
+
+        Each ankle lifts for the first 40% of its cycle, and the right foot
+        is half a cycle behind the left foot.
+        """
+        timestamps = np.arange(int(duration * fps)) / fps
+        keypoints = np.zeros((len(timestamps), 17, 2))
+        keypoints[:, LEFT_HIP_IDX] = [40, 100]
+        keypoints[:, RIGHT_HIP_IDX] = [60, 100]
+        for idx, offset in ((LEFT_ANKLE_IDX, 0.), (RIGHT_ANKLE_IDX, 0.5)):
+            phase = (timestamps / cycle_time + offset) % 1
+            lift = np.where(phase < 0.4, np.sin(np.pi * phase / 0.4), 0.)
+            keypoints[:, idx, 1] = 200 - 20 * lift
+        return timestamps, keypoints, np.ones((len(timestamps), 17))
+
+    def test_long_session(self):
+        engine = GaitEngine()
+        cycles = engine.process(*self._walk(120))
+
+        # about one cycle per foot and second, with the same timing
+        # throughout the session
+        self.assertGreater(len(cycles), 200)
+        for cycle in cycles[-4:]:
+            self.assertAlmostEqual(cycle['cycle_time'], 1., delta=0.05)
+            self.assertAlmostEqual(cycle['swing_time'], 0.4, delta=0.1)
+        self.assertAlmostEqual(engine.metrics['步时'], 1., delta=0.05)
+
+        # the event history does not grow with the number of steps
+        for foot in engine.feet.values():
+            self.assertEqual(len(foot.heel_strikes), MAX_GAIT_EVENTS)
+            self.assertEqual(len(foot.toe_offs), MAX_GAIT_EVENTS)
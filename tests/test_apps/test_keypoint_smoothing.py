@@ -0,0 +1,68 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from unittest import TestCase
+
+import numpy as np
+
+from keypoint_smoothing import KeypointSmoother
+
+
+class TestKeypointSmoother(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.RandomState(0)
+        # two persons far apart, slightly jittering over time
+        self.persons = [
+            rng.uniform(0, 100, (17, 2)),
+            rng.uniform(300, 400, (17, 2))
+        ]
+        self.scores = np.ones((2, 17))
+        self.rng = rng
+
+    def _frame(self, order):
+        jitter = self.rng.randn(len(order), 17, 2)
+        return np.stack([self.persons[i] for i in order]) + jitter
+
+    def test_reordered_instances(self):
+        for method in ('one_euro', 'kalman', 'savgol'):
+            smoother = KeypointSmoother(method)
+            smoother(self._frame([0, 1]), self.scores, 0.)
+            person_ids = list(smoother.track_ids)
+            self.assertEqual(len(set(person_ids)), 2)
+            for t in range(1, 5):
+                # the detector swaps the instance order every frame
+                order = [0, 1] if t % 2 == 0 else [1, 0]
+                keypoints = self._frame(order)
+                smoothed = smoother(keypoints, self.scores, t / 30.)
+                # each instance keeps its own history
+                self.assertLess(np.abs(smoothed - keypoints).max(), 10)
+                self.assertEqual(smoother.track_ids,
+                                 [person_ids[i] for i in order])
+
+    def test_instance_leaves(self):
+        smoother = KeypointSmoother('one_euro')
+        smoother(self._frame([0, 1]), self.scores, 0.)
+        ids = list(smoother.track_ids)
+
+        # the first person leaves, the remaining one keeps its track
+        keypoints = self._frame([1])
+        smoothed = smoother(keypoints, self.scores[:1], 1 / 30.)
+        self.assertEqual(smoother.track_ids, ids[1:])
+        self.assertLess(np.abs(smoothed - keypoints).max(), 10)
+
+        # the first person comes back within max_dt and is matched again
+        smoother(self._frame([1, 0]), self.scores, 2 / 30.)
+        self.assertEqual(smoother.track_ids, ids[::-1])
+
+        # tracks expire after max_dt
+        smoother(self._frame([0]), self.scores[:1], 2.)
+        self.assertNotIn(smoother.track_ids[0], ids)
+
+    def test_low_score_keypoints(self):
+        smoother = KeypointSmoother('kalman')
+        scores = self.scores[:1].copy()
+        smoother(self._frame([0]), scores, 0.)
+        scores[0, :5] = 0.
+        keypoints = self._frame([0])
+        smoothed = smoother(keypoints, scores, 1 / 30.)
+        # keypoints below the score threshold are kept unchanged
+        np.testing.assert_array_equal(smoothed[0, :5], keypoints[0, :5])
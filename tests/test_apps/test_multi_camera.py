@@ -0,0 +1,46 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+import time
+from tempfile import TemporaryDirectory
+from types import SimpleNamespace
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from multi_camera import MultiStreamRunner
+
+
+class FailingDetector:
+
+    def detect(self, imgs):
+        raise RuntimeError('detector failed')
+
+
+class TestMultiStreamRunner(TestCase):
+
+    def _write_video(self, path, num_frames=5):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10,
+                                 (32, 24))
+        for i in range(num_frames):
+            writer.write(np.full((24, 32, 3), i * 10, dtype=np.uint8))
+        writer.release()
+
+    def test_schedule_error(self):
+        args = SimpleNamespace(det_interval=1, smooth_method=None)
+        pose_estimator = SimpleNamespace(dataset_meta=dict(num_keypoints=17))
+        with TemporaryDirectory() as tmpdir:
+            sources = []
+            for i in range(2):
+                sources.append(osp.join(tmpdir, f'camera{i}.avi'))
+                self._write_video(sources[-1])
+            runner = MultiStreamRunner(args, sources, FailingDetector(),
+                                       pose_estimator)
+
+            with self.assertRaisesRegex(RuntimeError, 'detector failed'):
+                with runner:
+                    deadline = time.time() + 5
+                    while not runner.finished and time.time() < deadline:
+                        runner.read()
+            self.assertTrue(runner.finished)
+            self.assertIsInstance(runner.error, RuntimeError)
@@ -0,0 +1,119 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import time
+from unittest import TestCase
+
+import numpy as np
+
+from pose_pipeline import PosePipeline
+
+
+class DummyCapture:
+
+    def __init__(self, num_frames, interval=0.01):
+        self.num_frames = num_frames
+        self.interval = interval
+        self.num_read = 0
+
+    def read(self):
+        if self.num_read >= self.num_frames:
+            return False, None
+        # a real camera delivers frames at intervals, so that the dropping
+        # queues do not skip every frame
+        time.sleep(self.interval)
+        self.num_read += 1
+        return True, np.zeros((4, 4, 3), dtype=np.uint8)
+
+
+def _identity(item):
+    return item
+
+
+class TestPosePipeline(TestCase):
+
+    def _read_all(self, pipeline, max_reads=100):
+        items = []
+        for _ in range(max_reads):
+            if pipeline.finished:
+                break
+            item = pipeline.read(timeout=1.0)
+            if item is not None:
+                items.append(item)
+        return items
+
+    def test_run(self):
+        for drop_frames in (True, False):
+            pipeline = PosePipeline(
+                DummyCapture(5),
+                _identity,
+                _identity,
+                _identity,
+                drop_frames=drop_frames)
+            with pipeline:
+                items = self._read_all(pipeline)
+            self.assertTrue(pipeline.finished)
+            self.assertIsNone(pipeline.error)
+            if not drop_frames:
+                self.assertEqual([item['frame_idx'] for item in items],
+                                 [1, 2, 3, 4, 5])
+
+    def test_stage_error(self):
+
+        def pose_fn(item):
+            if item['frame_idx'] >= 3:
+                raise RuntimeError('pose failed')
+            return item
+
+        for drop_frames in (True, False):
+            pipeline = PosePipeline(
+                DummyCapture(100),
+                _identity,
+                pose_fn,
+                _identity,
+                drop_frames=drop_frames)
+            pipeline.start()
+            with self.assertRaisesRegex(RuntimeError, 'pose failed'):
+                self._read_all(pipeline)
+            self.assertTrue(pipeline.finished)
+            self.assertIsInstance(pipeline.error, RuntimeError)
+            # the error is raised only once
+            self.assertIsNone(pipeline.read(timeout=0.1))
+            pipeline.stop()
+
+    def test_stage_error_raised_on_stop(self):
+
+        def render_fn(item):
+            raise ValueError('bad frame')
+
+        pipeline = PosePipeline(
+            DummyCapture(3), _identity, _identity, render_fn)
+        pipeline.start()
+        pipeline._threads[-1].join(timeout=5)
+        with self.assertRaisesRegex(ValueError, 'bad frame'):
+            pipeline.stop()
+        # stopping again does not raise
+        pipeline.stop()
+
+    def test_timestamp_error(self):
+
+        def timestamp_fn(capture):
+            if capture.num_read >= 3:
+                raise IOError('no timestamp')
+            return float(capture.num_read)
+
+        pipeline = PosePipeline(
+            DummyCapture(100),
+            _identity,
+            _identity,
+            _identity,
+            timestamp_fn=timestamp_fn,
+            drop_frames=False)
+        pipeline.start()
+        items = []
+        with self.assertRaisesRegex(IOError, 'no timestamp'):
+            for _ in range(100):
+                item = pipeline.read(timeout=1.0)
+                if item is not None:
+                    items.append(item)
+        self.assertEqual([item['timestamp'] for item in items], [1., 2.])
+        self.assertTrue(pipeline.finished)
+        pipeline.stop()
@@ -0,0 +1,51 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from unittest import TestCase
+
+import numpy as np
+
+from pose_tracker import PoseTracker
+
+
+class TestPoseTracker(TestCase):
+
+    def _get_keypoints(self, num_keypoints, offset=0.):
+        rng = np.random.RandomState(0)
+        keypoints = rng.uniform(100, 200, (1, num_keypoints, 2)) + offset
+        keypoint_scores = np.ones((1, num_keypoints))
+        return keypoints, keypoint_scores
+
+    def test_update(self):
+        # the default indices include foot keypoints which COCO-17 and
+        # Halpe-26 layouts do not (fully) have
+        for num_keypoints in (17, 26, 133):
+            tracker = PoseTracker(det_interval=5)
+            tracker.set_detections(np.array([[0, 0, 10, 10]]))
+            keypoints, keypoint_scores = self._get_keypoints(num_keypoints)
+            tracker.update(keypoints, keypoint_scores, (480, 640))
+            bboxes = tracker.predict_bboxes()
+            self.assertEqual(bboxes.shape, (1, 4))
+            indices = [
+                i for i in tracker.keypoint_indices if i < num_keypoints
+            ]
+            self.assertTrue(
+                np.all(bboxes[0, :2] <= keypoints[0, indices].min(axis=0)))
+            self.assertTrue(
+                np.all(bboxes[0, 2:] >= keypoints[0, indices].max(axis=0)))
+
+    def test_stale_update(self):
+        tracker = PoseTracker(det_interval=5)
+        detections = np.array([[0, 0, 10, 10]], dtype=np.float32)
+        tracker.set_detections(detections, frame_idx=5)
+
+        # the pose result of an earlier frame must not overwrite the newer
+        # detections
+        keypoints, keypoint_scores = self._get_keypoints(133)
+        tracker.update(keypoints, keypoint_scores, (480, 640), frame_idx=4)
+        np.testing.assert_array_equal(tracker.predict_bboxes(), detections)
+        tracker.reset(frame_idx=4)
+        np.testing.assert_array_equal(tracker.predict_bboxes(), detections)
+
+        tracker.update(keypoints, keypoint_scores, (480, 640), frame_idx=5)
+        self.assertFalse(np.array_equal(tracker.predict_bboxes(), detections))
+        tracker.reset(frame_idx=6)
+        self.assertIsNone(tracker.predict_bboxes())
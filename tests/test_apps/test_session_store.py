@@ -0,0 +1,47 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+import numpy as np
+
+from session_store import SessionStore, load_session
+
+
+class TestSessionStore(TestCase):
+
+    def _append_frames(self, store, num_frames, num_keypoints=17):
+        rng = np.random.RandomState(0)
+        for frame_idx in range(num_frames):
+            num_instances = frame_idx % 3
+            store.append(
+                frame_idx,
+                frame_idx / 30.,
+                keypoints=rng.rand(num_instances, num_keypoints, 2),
+                keypoint_scores=rng.rand(num_instances, num_keypoints),
+                metrics=dict(speed=float(frame_idx)))
+
+    def test_append_and_load(self):
+        with TemporaryDirectory() as tmpdir:
+            store = SessionStore(tmpdir, metric_names=['speed'], chunk_size=4)
+            self._append_frames(store, 10)
+            store.close(meta=dict(dataset_name='coco'))
+
+            data = load_session(tmpdir)
+            np.testing.assert_array_equal(data['frame_idx'], np.arange(10))
+            np.testing.assert_array_equal(data['metrics']['speed'],
+                                          np.arange(10))
+            self.assertEqual(data['keypoints'].shape, (9, 17, 3))
+            self.assertEqual(data['meta'], dict(dataset_name='coco'))
+
+    def test_without_metric_names(self):
+        # the demo builds the store without metric names
+        with TemporaryDirectory() as tmpdir:
+            store = SessionStore(tmpdir, chunk_size=4)
+            self._append_frames(store, 10)
+            store.flush()
+            store.close()
+
+            data = load_session(tmpdir)
+            np.testing.assert_array_equal(data['frame_idx'], np.arange(10))
+            self.assertEqual(data['metrics'], {})
+            self.assertEqual(data['keypoints'].shape, (9, 17, 3))
@@ -0,0 +1,47 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import os.path as osp
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from video_io import VideoReader, _OpenCVSource
+
+
+class TestVideoReader(TestCase):
+
+    def _write_video(self, path, num_frames=6):
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10,
+                                 (32, 24))
+        for i in range(num_frames):
+            writer.write(np.full((24, 32, 3), i * 10, dtype=np.uint8))
+        writer.release()
+
+    def test_read(self):
+        with TemporaryDirectory() as tmpdir:
+            path = osp.join(tmpdir, 'test.avi')
+            self._write_video(path)
+            with VideoReader(path, stride=2, backend='opencv') as reader:
+                frame_indices = [frame_idx for frame_idx, _, _ in reader]
+            self.assertEqual(frame_indices, [0, 2, 4])
+
+    def test_read_error(self):
+        read = _OpenCVSource.read
+
+        def corrupt_read(source, frame_idx):
+            if frame_idx >= 2:
+                raise ValueError('corrupt frame')
+            return read(source, frame_idx)
+
+        with TemporaryDirectory() as tmpdir:
+            path = osp.join(tmpdir, 'test.avi')
+            self._write_video(path)
+            with patch.object(_OpenCVSource, 'read', corrupt_read):
+                with VideoReader(path, backend='opencv') as reader:
+                    frame_indices = []
+                    with self.assertRaisesRegex(ValueError, 'corrupt frame'):
+                        for frame_idx, _, _ in reader:
+                            frame_indices.append(frame_idx)
+            self.assertEqual(frame_indices, [0, 1])
@@ -0,0 +1,191 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from itertools import product
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from mmpose.codecs.utils import (gaussian_blur, gaussian_blur1d,
+                                 generate_gaussian_heatmaps,
+                                 refine_keypoints_dark,
+                                 refine_keypoints_dark_udp, refine_simcc_dark)
+
+# The per-instance loop implementations that the vectorized ones replaced,
+# used as the reference results.
+
+
+def _gaussian_blur_loop(heatmaps, kernel=11):
+    border = (kernel - 1) // 2
+    K, H, W = heatmaps.shape
+    for k in range(K):
+        origin_max = np.max(heatmaps[k])
+        dr = np.zeros((H + 2 * border, W + 2 * border), dtype=np.float32)
+        dr[border:-border, border:-border] = heatmaps[k].copy()
+        dr = cv2.GaussianBlur(dr, (kernel, kernel), 0)
+        heatmaps[k] = dr[border:-border, border:-border].copy()
+        heatmaps[k] *= origin_max / np.max(heatmaps[k])
+    return heatmaps
+
+
+def _gaussian_blur1d_loop(simcc, kernel=11):
+    border = (kernel - 1) // 2
+    N, K, Wx = simcc.shape
+    for n, k in product(range(N), range(K)):
+        origin_max = np.max(simcc[n, k])
+        dr = np.zeros((1, Wx + 2 * border), dtype=np.float32)
+        dr[0, border:-border] = simcc[n, k].copy()
+        dr = cv2.GaussianBlur(dr, (kernel, 1), 0)
+        simcc[n, k] = dr[0, border:-border].copy()
+        simcc[n, k] *= origin_max / np.max(simcc[n, k])
+    return simcc
+
+
+def _refine_keypoints_dark_loop(keypoints, heatmaps, blur_kernel_size):
+    N, K = keypoints.shape[:2]
+    H, W = heatmaps.shape[1:]
+    heatmaps = _gaussian_blur_loop(heatmaps, blur_kernel_size)
+    np.maximum(heatmaps, 1e-10, heatmaps)
+    np.log(heatmaps, heatmaps)
+    for n, k in product(range(N), range(K)):
+        x, y = keypoints[n, k, :2].astype(int)
+        if 1 < x < W - 2 and 1 < y < H - 2:
+            dx = 0.5 * (heatmaps[k, y, x + 1] - heatmaps[k, y, x - 1])
+            dy = 0.5 * (heatmaps[k, y + 1, x] - heatmaps[k, y - 1, x])
+            dxx = 0.25 * (
+                heatmaps[k, y, x + 2] - 2 * heatmaps[k, y, x] +
+                heatmaps[k, y, x - 2])
+            dxy = 0.25 * (
+                heatmaps[k, y + 1, x + 1] - heatmaps[k, y - 1, x + 1] -
+                heatmaps[k, y + 1, x - 1] + heatmaps[k, y - 1, x - 1])
+            dyy = 0.25 * (
+                heatmaps[k, y + 2, x] - 2 * heatmaps[k, y, x] +
+                heatmaps[k, y - 2, x])
+            derivative = np.array([[dx], [dy]])
+            hessian = np.array([[dxx, dxy], [dxy, dyy]])
+            if dxx * dyy - dxy**2 != 0:
+                hessianinv = np.linalg.inv(hessian)
+                offset = -hessianinv @ derivative
+                offset = np.squeeze(np.array(offset.T), axis=0)
+                keypoints[n, k, :2] += offset
+    return keypoints
+
+
+def _refine_keypoints_dark_udp_loop(keypoints, heatmaps, blur_kernel_size):
+    N, K = keypoints.shape[:2]
+    H, W = heatmaps.shape[1:]
+    heatmaps = _gaussian_blur_loop(heatmaps, blur_kernel_size)
+    np.clip(heatmaps, 1e-3, 50., heatmaps)
+    np.log(heatmaps, heatmaps)
+    heatmaps_pad = np.pad(
+        heatmaps, ((0, 0), (1, 1), (1, 1)), mode='edge').flatten()
+    for n in range(N):
+        index = keypoints[n, :, 0] + 1 + (keypoints[n, :, 1] + 1) * (W + 2)
+        index += (W + 2) * (H + 2) * np.arange(0, K)
+        index = index.astype(int).reshape(-1, 1)
+        i_ = heatmaps_pad[index]
+        ix1 = heatmaps_pad[index + 1]
+        iy1 = heatmaps_pad[index + W + 2]
+        ix1y1 = heatmaps_pad[index + W + 3]
+        ix1_y1_ = heatmaps_pad[index - W - 3]
+        ix1_ = heatmaps_pad[index - 1]
+        iy1_ = heatmaps_pad[index - 2 - W]
+        dx = 0.5 * (ix1 - ix1_)
+        dy = 0.5 * (iy1 - iy1_)
+        derivative = np.concatenate([dx, dy], axis=1).reshape(K, 2, 1)
+        dxx = ix1 - 2 * i_ + ix1_
+        dyy = iy1 - 2 * i_ + iy1_
+        dxy = 0.5 * (ix1y1 - ix1 - iy1 + i_ + i_ - ix1_ - iy1_ + ix1_y1_)
+        hessian = np.concatenate([dxx, dxy, dxy, dyy], axis=1)
+        hessian = hessian.reshape(K, 2, 2)
+        hessian = np.linalg.inv(hessian + np.finfo(np.float32).eps * np.eye(2))
+        keypoints[n] -= np.einsum('imn,ink->imk', hessian,
+                                  derivative).squeeze()
+    return keypoints
+
+
+def _refine_simcc_dark_loop(keypoints, simcc, blur_kernel_size):
+    N = simcc.shape[0]
+    simcc = _gaussian_blur1d_loop(simcc, blur_kernel_size)
+    np.clip(simcc, 1e-3, 50., simcc)
+    np.log(simcc, simcc)
+    simcc = np.pad(simcc, ((0, 0), (0, 0), (2, 2)), 'edge')
+    for n in range(N):
+        px = (keypoints[n] + 2.5).astype(np.int64).reshape(-1, 1)
+        dx0 = np.take_along_axis(simcc[n], px, axis=1)
+        dx1 = np.take_along_axis(simcc[n], px + 1, axis=1)
+        dx_1 = np.take_along_axis(simcc[n], px - 1, axis=1)
+        dx2 = np.take_along_axis(simcc[n], px + 2, axis=1)
+        dx_2 = np.take_along_axis(simcc[n], px - 2, axis=1)
+        dx = 0.5 * (dx1 - dx_1)
+        dxx = 1e-9 + 0.25 * (dx2 - 2 * dx0 + dx_2)
+        keypoints[n] -= (dx / dxx).reshape(-1)
+    return keypoints
+
+
+class TestRefinement(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.RandomState(0)
+        self.N, self.K = 5, 17
+        self.heatmap_size = (48, 64)
+        W, H = self.heatmap_size
+        # keypoints near the borders of the heatmaps are included to cover
+        # the skipped and the edge-padded cases
+        self.keypoints = (rng.rand(self.N, self.K, 2) * [W + 4, H + 4] -
+                          2).astype(np.float32)
+        heatmaps, _ = generate_gaussian_heatmaps(
+            self.heatmap_size, self.keypoints + rng.rand(self.N, self.K, 2),
+            np.ones((self.N, self.K), dtype=np.float32), 2.)
+        self.heatmaps = (heatmaps +
+                         rng.rand(*heatmaps.shape) * 0.01).astype(np.float32)
+        self.simcc = rng.rand(self.N, self.K, 384).astype(np.float32)
+
+    def test_gaussian_blur(self):
+        for kernel in (3, 11, 17):
+            heatmaps = self.heatmaps.copy()
+            blurred = gaussian_blur(heatmaps, kernel)
+            self.assertIs(blurred, heatmaps)
+            self.assertTrue(
+                np.allclose(
+                    blurred,
+                    _gaussian_blur_loop(self.heatmaps.copy(), kernel),
+                    atol=1e-6))
+
+    def test_gaussian_blur1d(self):
+        for kernel in (3, 11, 17):
+            simcc = self.simcc.copy()
+            blurred = gaussian_blur1d(simcc, kernel)
+            self.assertIs(blurred, simcc)
+            self.assertTrue(
+                np.allclose(
+                    blurred,
+                    _gaussian_blur1d_loop(self.simcc.copy(), kernel),
+                    atol=1e-6))
+
+    def test_refine_keypoints_dark(self):
+        keypoints = refine_keypoints_dark(self.keypoints.copy(),
+                                          self.heatmaps.copy(), 11)
+        expected = _refine_keypoints_dark_loop(self.keypoints.copy(),
+                                               self.heatmaps.copy(), 11)
+        self.assertEqual(keypoints.shape, (self.N, self.K, 2))
+        self.assertTrue(np.allclose(keypoints, expected, atol=1e-4))
+
+    def test_refine_keypoints_dark_udp(self):
+        # the UDP refinement expects keypoints inside the heatmaps
+        W, H = self.heatmap_size
+        keypoints = np.clip(self.keypoints, 0, [W - 1, H - 1])
+        refined = refine_keypoints_dark_udp(keypoints.copy(),
+                                            self.heatmaps.copy(), 11)
+        expected = _refine_keypoints_dark_udp_loop(keypoints.copy(),
+                                                   self.heatmaps.copy(), 11)
+        self.assertEqual(refined.shape, (self.N, self.K, 2))
+        self.assertTrue(np.allclose(refined, expected, atol=1e-4))
+
+    def test_refine_simcc_dark(self):
+        keypoints = np.random.randint(0, 384,
+                                      (self.N, self.K)).astype(np.float32)
+        refined = refine_simcc_dark(keypoints.copy(), self.simcc.copy(), 11)
+        expected = _refine_simcc_dark_loop(keypoints.copy(), self.simcc.copy(),
+                                           11)
+        self.assertEqual(refined.shape, (self.N, self.K))
+        self.assertTrue(np.allclose(refined, expected, atol=1e-4))
@@ -2,6 +2,7 @@
 from unittest import TestCase
 
 import numpy as np
+import torch
 
 from mmpose.codecs import SimCCLabel  # noqa: F401
 from mmpose.registry import KEYPOINT_CODECS
@@ -117,6 +118,47 @@ class TestSimCCLabel(TestCase):
         self.assertGreaterEqual(scores[1].min(), 0.0)
         self.assertLessEqual(scores[1].max(), 1.0)
 
+    def test_batch_decode(self):
+        keypoints = self.data['keypoints']
+        keypoints_visible = self.data['keypoints_visible']
+
+        for name, cfg in self.configs:
+            cfg = dict(cfg, decode_visibility=True)
+            codec = KEYPOINT_CODECS.build(cfg)
+            self.assertTrue(codec.support_batch_decoding)
+
+            # a batch of 2 noisy SimCC labels
+            encoded = codec.encode(keypoints, keypoints_visible)
+            simcc_x = np.concatenate([encoded['keypoint_x_labels']] * 2)
+            simcc_y = np.concatenate([encoded['keypoint_y_labels']] * 2)
+            simcc_x += np.random.rand(*simcc_x.shape) * 0.01
+            simcc_y += np.random.rand(*simcc_y.shape) * 0.01
+            simcc_x = simcc_x.astype(np.float32)
+            simcc_y = simcc_y.astype(np.float32)
+
+            batch_keypoints, (batch_scores, batch_visibility) = \
+                codec.batch_decode(
+                    torch.from_numpy(simcc_x), torch.from_numpy(simcc_y))
+            self.assertEqual(len(batch_keypoints), 2)
+
+            for i in range(2):
+                # the NumPy reference modifies its inputs with DARK
+                _keypoints, _scores = codec.decode(simcc_x[i:i + 1].copy(),
+                                                   simcc_y[i:i + 1].copy())
+                self.assertEqual(batch_keypoints[i].shape, (1, 17, 2),
+                                 f'Failed case: "{name}"')
+                self.assertTrue(
+                    np.allclose(batch_keypoints[i], _keypoints, atol=1e-3),
+                    f'Failed case: "{name}"')
+                self.assertTrue(
+                    np.allclose(batch_scores[i], _scores[0], atol=1e-5),
+                    f'Failed case: "{name}"')
+                if not codec.use_dark:
+                    self.assertTrue(
+                        np.allclose(
+                            batch_visibility[i], _scores[1], atol=1e-5),
+                        f'Failed case: "{name}"')
+
     def test_cicular_verification(self):
         keypoints = self.data['keypoints']
         keypoints_visible = self.data['keypoints_visible']
@@ -4,7 +4,9 @@ from unittest import TestCase
 import numpy as np
 import torch
 
-from mmpose.evaluation.functional.nms import nearby_joints_nms, nms_torch
+from mmpose.evaluation.functional.nms import (nearby_joints_nms, nms_torch,
+                                              oks_iou, oks_matrix, oks_nms,
+                                              soft_oks_nms)
 
 
 class TestNearbyJointsNMS(TestCase):
@@ -57,3 +59,96 @@ class TestNMSTorch(TestCase):
         result = nms_torch(bboxes, scores, threshold=0.5, return_group=True)
         for res_out, res_expected in zip(result, expected_result):
             self.assertTrue(torch.equal(res_out, res_expected))
+
+
+class TestOKSNMS(TestCase):
+
+    def setUp(self) -> None:
+        rng = np.random.RandomState(0)
+        # 3 persons, each with 4 jittered candidates
+        persons = rng.rand(3, 17, 2) * 300
+        keypoints = np.repeat(persons, 4, axis=0) + rng.randn(12, 17, 2)
+        scores = rng.rand(12, 17, 1)
+        self.keypoints = np.concatenate((keypoints, scores), axis=2)
+        self.areas = rng.uniform(50, 100, 12)**2
+        self.sigmas = rng.uniform(0.025, 0.107, 17)
+        self.kpts_db = [
+            dict(
+                keypoints=self.keypoints[i],
+                score=rng.rand(),
+                area=self.areas[i]) for i in range(12)
+        ]
+
+    def _naive_oks(self, i, j, vis_thr=None):
+        vars = (self.sigmas * 2)**2
+        dist = ((self.keypoints[i, :, :2] -
+                 self.keypoints[j, :, :2])**2).sum(-1)
+        e = dist / vars / ((self.areas[i] + self.areas[j]) / 2) / 2
+        valid = np.ones(17, dtype=bool)
+        if vis_thr is not None:
+            valid = (self.keypoints[i, :, 2] > vis_thr) & (
+                self.keypoints[j, :, 2] > vis_thr)
+        return np.exp(-e[valid]).mean() if valid.any() else 0.
+
+    def test_oks_matrix(self):
+        for vis_thr in (None, 0.5, 1.):
+            oks = oks_matrix(self.keypoints, self.keypoints[:5], self.areas,
+                             self.areas[:5], self.sigmas, vis_thr)
+            self.assertEqual(oks.shape, (12, 5))
+            expected = np.array(
+                [[self._naive_oks(i, j, vis_thr) for j in range(5)]
+                 for i in range(12)])
+            self.assertTrue(np.allclose(oks, expected, atol=1e-6))
+
+            # flattened keypoints and a small chunk size
+            oks_chunked = oks_matrix(
+                self.keypoints.reshape(12, -1),
+                self.keypoints[:5].reshape(5, -1),
+                self.areas,
+                self.areas[:5],
+                self.sigmas,
+                vis_thr,
+                chunk_size=17 * 5 * 2)
+            self.assertTrue(np.allclose(oks_chunked, oks))
+
+            # torch
+            oks_tensor = oks_matrix(
+                torch.from_numpy(self.keypoints),
+                torch.from_numpy(self.keypoints[:5]),
+                torch.from_numpy(self.areas), self.areas[:5], self.sigmas,
+                vis_thr)
+            self.assertIsInstance(oks_tensor, torch.Tensor)
+            self.assertTrue(np.allclose(oks_tensor.numpy(), oks, atol=1e-6))
+
+        # oks_iou of one instance against the others
+        ious = oks_iou(self.keypoints[0].flatten(),
+                       self.keypoints.reshape(12, -1), self.areas[0],
+                       self.areas, self.sigmas)
+        expected = oks_matrix(self.keypoints[:1], self.keypoints,
+                              self.areas[:1], self.areas, self.sigmas)[0]
+        self.assertTrue(np.allclose(ious, expected))
+        self.assertEqual(
+            len(
+                oks_iou(self.keypoints[0].flatten(), np.zeros((0, 51)),
+                        self.areas[0], np.zeros(0), self.sigmas)), 0)
+
+    def test_oks_nms(self):
+        self.assertEqual(len(oks_nms([], 0.9)), 0)
+
+        keep = oks_nms(self.kpts_db, 0.9, self.sigmas)
+        # one candidate per person survives
+        self.assertEqual(sorted(k // 4 for k in keep), [0, 1, 2])
+        scores = [self.kpts_db[k]['score'] for k in keep]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        for k in keep:
+            group = range(k // 4 * 4, k // 4 * 4 + 4)
+            self.assertEqual(
+                k, max(group, key=lambda i: self.kpts_db[i]['score']))
+
+    def test_soft_oks_nms(self):
+        self.assertEqual(len(soft_oks_nms([], 0.3)), 0)
+
+        keep = soft_oks_nms(self.kpts_db, 0.3, max_dets=5, sigmas=self.sigmas)
+        self.assertEqual(len(keep), 5)
+        # the rescored duplicates rank after the other persons
+        self.assertEqual(sorted(k // 4 for k in keep[:3]), [0, 1, 2])
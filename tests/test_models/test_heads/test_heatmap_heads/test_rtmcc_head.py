@@ -3,6 +3,7 @@ import unittest
 from typing import List, Tuple
 from unittest import TestCase
 
+import numpy as np
 import torch
 import torch.nn as nn
 from mmengine.structures import InstanceData
@@ -553,6 +554,60 @@ class TestRTMCCHead(TestCase):
         self.assertEqual(preds[0].keypoints.shape,
                          batch_data_samples[0].gt_instances.keypoints.shape)
 
+    def test_predict_keypoint_subset(self):
+        if digit_version(TORCH_VERSION) < digit_version('1.7.0'):
+            return unittest.skip('RTMCCHead requires PyTorch >= 1.7')
+
+        head = RTMCCHead(
+            in_channels=32,
+            out_channels=17,
+            input_size=(192, 256),
+            in_featuremap_size=(6, 8),
+            simcc_split_ratio=2.0,
+            final_layer_kernel_size=7,
+            gau_cfg=dict(
+                hidden_dims=256,
+                s=128,
+                expansion_factor=2,
+                dropout_rate=0.,
+                drop_path=0.,
+                act_fn='SiLU',
+                use_rel_bias=False,
+                pos_enc=False),
+            decoder=dict(
+                type='SimCCLabel',
+                input_size=(192, 256),
+                smoothing_type='gaussian',
+                sigma=(4.9, 5.66),
+                simcc_split_ratio=2.0,
+                normalize=False))
+        head.eval()
+        self.assertTrue(head.support_keypoint_subset)
+
+        keypoint_indices = [0, 5, 6, 11, 12, 15]
+        feats = self._get_feats(batch_size=2, feat_shapes=[(32, 8, 6)])
+        flip_feats = self._get_feats(batch_size=2, feat_shapes=[(32, 8, 6)])
+        batch_data_samples = get_packed_inputs(
+            batch_size=2, simcc_split_ratio=2.0,
+            with_simcc_label=True)['data_samples']
+
+        for inputs, test_cfg in [(feats, dict()),
+                                 ([feats, flip_feats], dict(flip_test=True))]:
+            with torch.no_grad():
+                preds_full = head.predict(inputs, batch_data_samples, test_cfg)
+                preds_subset = head.predict(
+                    inputs, batch_data_samples,
+                    dict(test_cfg, output_keypoint_indices=keypoint_indices))
+
+            for pred_full, pred_subset in zip(preds_full, preds_subset):
+                keypoints = pred_full.keypoints[:, keypoint_indices]
+                scores = pred_full.keypoint_scores[:, keypoint_indices]
+                self.assertEqual(pred_subset.keypoints.shape,
+                                 (1, len(keypoint_indices), 2))
+                self.assertTrue(np.allclose(pred_subset.keypoints, keypoints))
+                self.assertTrue(
+                    np.allclose(pred_subset.keypoint_scores, scores))
+
     def test_loss(self):
         if digit_version(TORCH_VERSION) < digit_version('1.7.0'):
             return unittest.skip('RTMCCHead requires PyTorch >= 1.7')
@@ -0,0 +1,126 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+from unittest import TestCase
+
+import numpy as np
+
+from mmpose.utils import (MultiViewTriangulator, SimpleCamera,
+                          camera_projection_matrix, project_points,
+                          triangulate_points, undistort_points)
+
+
+def _look_at_camera(position, distortion=False):
+    """Build a camera at ``position`` looking at the world origin (z up)."""
+    position = np.asarray(position, dtype=np.float64)
+    forward = -position / np.linalg.norm(position)
+    right = np.cross(forward, [0, 0, 1])
+    right /= np.linalg.norm(right)
+    down = np.cross(forward, right)
+    # columns are the camera axes in world coordinates (camera-to-world)
+    R = np.stack([right, down, forward], axis=1)
+    param = dict(
+        R=R,
+        T=position.reshape(3, 1),
+        f=[[1000.], [1000.]],
+        c=[[640.], [360.]])
+    if distortion:
+        param.update(k=[0.05, -0.01, 0.], p=[0.001, -0.001])
+    return SimpleCamera(param)
+
+
+class TestTriangulation(TestCase):
+
+    def setUp(self):
+        self.cameras = [
+            _look_at_camera([0, -4, 1]),
+            _look_at_camera([4, 0, 1.2]),
+            _look_at_camera([-3, 3, 0.8]),
+        ]
+        rng = np.random.default_rng(0)
+        # (T, K, 3) points around the origin
+        self.points_3d = rng.uniform(-0.5, 0.5, size=(5, 17, 3))
+
+    def _project(self, cameras, points_3d):
+        return np.stack([
+            camera.world_to_pixel(points_3d.astype(np.float32))
+            for camera in cameras
+        ]).astype(np.float64)
+
+    def test_projection_matrix(self):
+        proj = np.stack(
+            [camera_projection_matrix(cam) for cam in self.cameras])
+        expected = self._project(self.cameras, self.points_3d)
+        np.testing.assert_allclose(
+            project_points(proj, self.points_3d), expected, atol=1e-2)
+
+    def test_triangulate_points(self):
+        proj = np.stack(
+            [camera_projection_matrix(cam) for cam in self.cameras])
+        points_2d = project_points(proj, self.points_3d)
+        points_3d, valid = triangulate_points(proj, points_2d)
+        self.assertEqual(points_3d.shape, (5, 17, 3))
+        self.assertTrue(valid.all())
+        np.testing.assert_allclose(points_3d, self.points_3d, atol=1e-6)
+
+        # a heavily corrupted view with a tiny weight barely matters
+        corrupted = points_2d.copy()
+        corrupted[2] += 50
+        weights = np.ones(points_2d.shape[:-1])
+        weights[2] = 1e-3
+        points_3d, _ = triangulate_points(proj, corrupted, weights)
+        np.testing.assert_allclose(points_3d, self.points_3d, atol=1e-3)
+
+        # points seen in fewer than two views are invalid
+        weights = np.ones(points_2d.shape[:-1])
+        weights[1:, 0, 0] = 0
+        weights[2, 0, 1] = 0
+        points_3d, valid = triangulate_points(proj, points_2d, weights)
+        self.assertFalse(valid[0, 0])
+        self.assertTrue(np.isnan(points_3d[0, 0]).all())
+        self.assertTrue(valid[0, 1])
+        np.testing.assert_allclose(
+            points_3d[0, 1], self.points_3d[0, 1], atol=1e-6)
+
+    def test_undistort_points(self):
+        camera = _look_at_camera([0, -4, 1], distortion=True)
+        distorted = self._project([camera], self.points_3d)[0]
+        undistorted = undistort_points(camera, distorted)
+        expected = project_points(
+            camera_projection_matrix(camera)[None], self.points_3d)[0]
+        np.testing.assert_allclose(undistorted, expected, atol=1e-2)
+
+        # cameras without distortion keep the points unchanged
+        np.testing.assert_array_equal(
+            undistort_points(self.cameras[0], distorted), distorted)
+
+    def test_multiview_triangulator(self):
+        cameras = [
+            self.cameras[0],
+            _look_at_camera([4, 0, 1.2], distortion=True)
+        ]
+        keypoints = self._project(cameras, self.points_3d)
+        scores = np.full(keypoints.shape[:-1], 0.9)
+        scores[1, :, 3] = 0.1
+
+        triangulator = MultiViewTriangulator(cameras, score_thr=0.3)
+        keypoints_3d, scores_3d = triangulator(keypoints, scores)
+        self.assertEqual(keypoints_3d.shape, (5, 17, 3))
+        self.assertEqual(scores_3d.shape, (5, 17))
+
+        # keypoint 3 is only confident in one view
+        self.assertTrue(np.isnan(keypoints_3d[:, 3]).all())
+        np.testing.assert_array_equal(scores_3d[:, 3], 0)
+        mask = np.ones(17, dtype=bool)
+        mask[3] = False
+        np.testing.assert_allclose(
+            keypoints_3d[:, mask], self.points_3d[:, mask], atol=1e-3)
+        np.testing.assert_allclose(scores_3d[:, mask], 0.9)
+
+        # at least two cameras are required
+        with self.assertRaises(AssertionError):
+            MultiViewTriangulator([
+                dict(
+                    R=np.eye(3),
+                    T=np.zeros((3, 1)),
+                    f=[[1.], [1.]],
+                    c=[[0.], [0.]])
+            ])
@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from functools import lru_cache
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+# 按顺序尝试的中文字体路径
+CHINESE_FONT_PATHS = (
+    "simhei.ttf",
+    "NotoSansCJK-Regular.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simkai.ttf",
+)
+
+
+@lru_cache(maxsize=None)
+def load_font(font_size):
+    """加载指定字号的中文字体，每个字号只加载一次"""
+    for font_path in CHINESE_FONT_PATHS:
+        try:
+            return ImageFont.truetype(font_path, font_size)
+        except OSError:
+            continue
+    print("警告：未找到可用的中文字体，将使用默认字体")
+    return ImageFont.load_default()
+
+
+class TextRenderer:
+    """带LRU缓存的文本渲染器
+
+    每个（文本, 字号, 颜色）组合只用PIL渲染一次，缓存预乘颜色后的位图和
+    剩余透明度，合成时只需要两次uint8逐元素运算。
+
+    Args:
+        max_cache: 最多缓存的位图数量，默认为512
+    """
+
+    def __init__(self, max_cache=512):
+        self.max_cache = max_cache
+        self._cache = OrderedDict()
+
+    def render(self, text, font_size, color):
+        """返回文本的位图及其相对绘制位置的偏移
+
+        Args:
+            text: 文本
+            font_size: 字号
+            color: 文本颜色，与目标图像的通道顺序一致
+
+        Returns:
+            tuple: (预乘颜色后的位图, 剩余透明度, x偏移, y偏移)，两个位图的
+            形状均为(h, w, 3)，dtype为uint8
+        """
+        key = (text, font_size, tuple(color))
+        item = self._cache.get(key)
+        if item is not None:
+            self._cache.move_to_end(key)
+            return item
+
+        font = load_font(font_size)
+        left, top, right, bottom = font.getbbox(text)
+        width, height = max(right - left, 1), max(bottom - top, 1)
+        mask = Image.new('L', (width, height), 0)
+        ImageDraw.Draw(mask).text((-left, -top), text, font=font, fill=255)
+        alpha = np.asarray(mask, dtype=np.float32)[..., None] / 255
+        premultiplied = np.round(alpha * np.asarray(color, dtype=np.float32)).astype(np.uint8)
+        keep = np.round(np.repeat(1 - alpha, 3, axis=2) * 255).astype(np.uint8)
+        item = (premultiplied, keep, left, top)
+
+        self._cache[key] = item
+        if len(self._cache) > self.max_cache:
+            self._cache.popitem(last=False)
+        return item
+
+
+class TextPanel:
+    """可复用的半透明文本面板
+
+    面板以预乘颜色和剩余透明度两个uint8数组表示，尺寸和背景不变时在帧之间
+    复用，开始新的一帧时只恢复上一帧绘制过文本的区域。文本位图只在各自的
+    区域内合成到面板上，最后用一次混合把整个面板叠加到图像上，不需要每段
+    文本都在整帧图像和PIL图像之间来回转换。
+
+    Args:
+        renderer: 文本渲染器，默认新建 :class:`TextRenderer`
+    """
+
+    def __init__(self, renderer=None):
+        self.renderer = renderer or TextRenderer()
+        self._color = None
+        self._keep = None
+        self._buffer = None
+        self._background = None
+        self._dirty = []
+
+    def begin(self, width, height, background=(0, 0, 0), alpha=0.7):
+        """清空面板并填充背景
+
+        Args:
+            width: 面板宽度
+            height: 面板高度
+            background: 背景颜色，与目标图像的通道顺序一致
+            alpha: 背景不透明度，默认为0.7
+        """
+        color = np.round(np.asarray(background, dtype=np.float32) * alpha).astype(np.uint8)
+        keep = np.uint8(round((1 - alpha) * 255))
+        key = (height, width, tuple(color), keep)
+        if self._background != key:
+            self._color = np.empty((height, width, 3), dtype=np.uint8)
+            self._keep = np.empty((height, width, 3), dtype=np.uint8)
+            self._buffer = np.empty((height, width, 3), dtype=np.uint8)
+            self._color[:] = color
+            self._keep[:] = keep
+            self._background = key
+        else:
+            for y0, y1, x0, x1 in self._dirty:
+                self._color[y0:y1, x0:x1] = color
+                self._keep[y0:y1, x0:x1] = keep
+        self._dirty = []
+
+    def draw_text(self, text, position, color, font_size=20):
+        """将文本合成到面板上，``position`` 与 ``ImageDraw.text`` 的含义相同"""
+        premultiplied, keep, left, top = self.renderer.render(text, font_size, color)
+        height, width = self._keep.shape[:2]
+        x0, y0 = position[0] + left, position[1] + top
+        x1, y1 = min(x0 + keep.shape[1], width), min(y0 + keep.shape[0], height)
+        if x1 <= max(x0, 0) or y1 <= max(y0, 0):
+            return
+        crop = np.s_[max(-y0, 0):y1 - y0, max(-x0, 0):x1 - x0]
+        x0, y0 = max(x0, 0), max(y0, 0)
+
+        color_region = self._color[y0:y1, x0:x1]
+        keep_region = self._keep[y0:y1, x0:x1]
+        cv2.multiply(color_region, keep[crop], dst=color_region, scale=1 / 255)
+        cv2.add(color_region, premultiplied[crop], dst=color_region)
+        cv2.multiply(keep_region, keep[crop], dst=keep_region, scale=1 / 255)
+        self._dirty.append((y0, y1, x0, x1))
+
+    def blend(self, img, origin=(0, 0)):
+        """将面板原地叠加到 ``img`` 上，``origin`` 为面板左上角在图像中的位置"""
+        x, y = origin
+        height, width = self._keep.shape[:2]
+        region = img[y:y + height, x:x + width]
+        h, w = region.shape[:2]
+        kept = self._buffer[:h, :w]
+        cv2.multiply(region, self._keep[:h, :w], dst=kept, scale=1 / 255)
+        cv2.add(kept, self._color[:h, :w], dst=region)
+        return img
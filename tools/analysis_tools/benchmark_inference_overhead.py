@@ -0,0 +1,90 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+import argparse
+import time
+
+import numpy as np
+from mmengine.config import DictAction
+from mmengine.dataset import Compose
+from mmengine.registry import init_default_scope
+
+from mmpose.apis.inference import (_get_test_pipeline, inference_topdown,
+                                   init_model)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the per-call overhead of inference_topdown '
+        'with and without the cached test pipeline')
+    parser.add_argument('config', help='model config file path')
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file')
+    parser.add_argument(
+        '--device', default='cpu', help='Device used for inference')
+    parser.add_argument(
+        '--num-iters', type=int, default=200, help='number of iterations')
+    parser.add_argument(
+        '--num-warmup', type=int, default=10, help='number of warmup calls')
+    parser.add_argument(
+        '--cfg-options',
+        nargs='+',
+        action=DictAction,
+        default={},
+        help='override some settings in the used config, the key-value pair '
+        'in xxx=yyy format will be merged into config file. For example, '
+        "'--cfg-options model.backbone.depth=18 model.backbone.with_cp=True'")
+    args = parser.parse_args()
+    return args
+
+
+def timeit(fn, num_iters, num_warmup):
+    """Return the average time of ``fn`` in milliseconds."""
+    for _ in range(num_warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(num_iters):
+        fn()
+    return (time.perf_counter() - start) / num_iters * 1000
+
+
+def main():
+    args = parse_args()
+    model = init_model(
+        args.config,
+        args.checkpoint,
+        device=args.device,
+        cfg_options=args.cfg_options)
+
+    rng = np.random.RandomState(0)
+    img = rng.randint(0, 255, (480, 640, 3), dtype=np.uint8)
+    bboxes = np.array([[100, 50, 300, 450]], dtype=np.float32)
+
+    def build_pipeline():
+        # the per-call work done by inference_topdown before caching
+        scope = model.cfg.get('default_scope', 'mmpose')
+        if scope is not None:
+            init_default_scope(scope)
+        Compose(model.cfg.test_dataloader.dataset.pipeline)
+
+    def get_cached_pipeline():
+        _get_test_pipeline(model)
+
+    def inference_uncached():
+        model._test_pipeline_cache = None
+        inference_topdown(model, img, bboxes)
+
+    def inference_cached():
+        inference_topdown(model, img, bboxes)
+
+    results = [
+        ('pipeline setup (rebuild)', build_pipeline),
+        ('pipeline setup (cached)', get_cached_pipeline),
+        ('inference_topdown (rebuild)', inference_uncached),
+        ('inference_topdown (cached)', inference_cached),
+    ]
+    print(f'{"item":<32}{"time (ms)":>12}')
+    for name, fn in results:
+        print(f'{name:<32}'
+              f'{timeit(fn, args.num_iters, args.num_warmup):>12.4f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,217 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Benchmark the vectorized DARK/UDP refinement and Gaussian blur against
+the previous per-instance loop implementations on synthetic heatmaps and
+SimCC distributions of realistic sizes."""
+import argparse
+import time
+from itertools import product
+
+import cv2
+import numpy as np
+
+from mmpose.codecs.utils import (gaussian_blur, gaussian_blur1d,
+                                 generate_gaussian_heatmaps,
+                                 refine_keypoints_dark,
+                                 refine_keypoints_dark_udp, refine_simcc_dark)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the vectorized keypoint refinement against '
+        'the loop implementations')
+    parser.add_argument(
+        '--num-iters', type=int, default=20, help='number of iterations')
+    parser.add_argument(
+        '--num-warmup', type=int, default=2, help='number of warmup calls')
+    args = parser.parse_args()
+    return args
+
+
+def timeit(fn, num_iters, num_warmup):
+    """Return the average time of ``fn`` in milliseconds."""
+    for _ in range(num_warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(num_iters):
+        fn()
+    return (time.perf_counter() - start) / num_iters * 1000
+
+
+# The loop implementations replaced by the vectorized ones
+
+
+def _gaussian_blur_loop(heatmaps, kernel=11):
+    border = (kernel - 1) // 2
+    K, H, W = heatmaps.shape
+    for k in range(K):
+        origin_max = np.max(heatmaps[k])
+        dr = np.zeros((H + 2 * border, W + 2 * border), dtype=np.float32)
+        dr[border:-border, border:-border] = heatmaps[k].copy()
+        dr = cv2.GaussianBlur(dr, (kernel, kernel), 0)
+        heatmaps[k] = dr[border:-border, border:-border].copy()
+        heatmaps[k] *= origin_max / np.max(heatmaps[k])
+    return heatmaps
+
+
+def _gaussian_blur1d_loop(simcc, kernel=11):
+    border = (kernel - 1) // 2
+    N, K, Wx = simcc.shape
+    for n, k in product(range(N), range(K)):
+        origin_max = np.max(simcc[n, k])
+        dr = np.zeros((1, Wx + 2 * border), dtype=np.float32)
+        dr[0, border:-border] = simcc[n, k].copy()
+        dr = cv2.GaussianBlur(dr, (kernel, 1), 0)
+        simcc[n, k] = dr[0, border:-border].copy()
+        simcc[n, k] *= origin_max / np.max(simcc[n, k])
+    return simcc
+
+
+def _refine_keypoints_dark_loop(keypoints, heatmaps, blur_kernel_size):
+    N, K = keypoints.shape[:2]
+    H, W = heatmaps.shape[1:]
+    heatmaps = _gaussian_blur_loop(heatmaps, blur_kernel_size)
+    np.maximum(heatmaps, 1e-10, heatmaps)
+    np.log(heatmaps, heatmaps)
+    for n, k in product(range(N), range(K)):
+        x, y = keypoints[n, k, :2].astype(int)
+        if 1 < x < W - 2 and 1 < y < H - 2:
+            dx = 0.5 * (heatmaps[k, y, x + 1] - heatmaps[k, y, x - 1])
+            dy = 0.5 * (heatmaps[k, y + 1, x] - heatmaps[k, y - 1, x])
+            dxx = 0.25 * (
+                heatmaps[k, y, x + 2] - 2 * heatmaps[k, y, x] +
+                heatmaps[k, y, x - 2])
+            dxy = 0.25 * (
+                heatmaps[k, y + 1, x + 1] - heatmaps[k, y - 1, x + 1] -
+                heatmaps[k, y + 1, x - 1] + heatmaps[k, y - 1, x - 1])
+            dyy = 0.25 * (
+                heatmaps[k, y + 2, x] - 2 * heatmaps[k, y, x] +
+                heatmaps[k, y - 2, x])
+            derivative = np.array([[dx], [dy]])
+            hessian = np.array([[dxx, dxy], [dxy, dyy]])
+            if dxx * dyy - dxy**2 != 0:
+                hessianinv = np.linalg.inv(hessian)
+                offset = -hessianinv @ derivative
+                offset = np.squeeze(np.array(offset.T), axis=0)
+                keypoints[n, k, :2] += offset
+    return keypoints
+
+
+def _refine_keypoints_dark_udp_loop(keypoints, heatmaps, blur_kernel_size):
+    N, K = keypoints.shape[:2]
+    H, W = heatmaps.shape[1:]
+    heatmaps = _gaussian_blur_loop(heatmaps, blur_kernel_size)
+    np.clip(heatmaps, 1e-3, 50., heatmaps)
+    np.log(heatmaps, heatmaps)
+    heatmaps_pad = np.pad(
+        heatmaps, ((0, 0), (1, 1), (1, 1)), mode='edge').flatten()
+    for n in range(N):
+        index = keypoints[n, :, 0] + 1 + (keypoints[n, :, 1] + 1) * (W + 2)
+        index += (W + 2) * (H + 2) * np.arange(0, K)
+        index = index.astype(int).reshape(-1, 1)
+        i_ = heatmaps_pad[index]
+        ix1 = heatmaps_pad[index + 1]
+        iy1 = heatmaps_pad[index + W + 2]
+        ix1y1 = heatmaps_pad[index + W + 3]
+        ix1_y1_ = heatmaps_pad[index - W - 3]
+        ix1_ = heatmaps_pad[index - 1]
+        iy1_ = heatmaps_pad[index - 2 - W]
+        dx = 0.5 * (ix1 - ix1_)
+        dy = 0.5 * (iy1 - iy1_)
+        derivative = np.concatenate([dx, dy], axis=1).reshape(K, 2, 1)
+        dxx = ix1 - 2 * i_ + ix1_
+        dyy = iy1 - 2 * i_ + iy1_
+        dxy = 0.5 * (ix1y1 - ix1 - iy1 + i_ + i_ - ix1_ - iy1_ + ix1_y1_)
+        hessian = np.concatenate([dxx, dxy, dxy, dyy], axis=1)
+        hessian = hessian.reshape(K, 2, 2)
+        hessian = np.linalg.inv(hessian + np.finfo(np.float32).eps * np.eye(2))
+        keypoints[n] -= np.einsum('imn,ink->imk', hessian,
+                                  derivative).squeeze()
+    return keypoints
+
+
+def _refine_simcc_dark_loop(keypoints, simcc, blur_kernel_size):
+    N = simcc.shape[0]
+    simcc = _gaussian_blur1d_loop(simcc, blur_kernel_size)
+    np.clip(simcc, 1e-3, 50., simcc)
+    np.log(simcc, simcc)
+    simcc = np.pad(simcc, ((0, 0), (0, 0), (2, 2)), 'edge')
+    for n in range(N):
+        px = (keypoints[n] + 2.5).astype(np.int64).reshape(-1, 1)
+        dx0 = np.take_along_axis(simcc[n], px, axis=1)
+        dx1 = np.take_along_axis(simcc[n], px + 1, axis=1)
+        dx_1 = np.take_along_axis(simcc[n], px - 1, axis=1)
+        dx2 = np.take_along_axis(simcc[n], px + 2, axis=1)
+        dx_2 = np.take_along_axis(simcc[n], px - 2, axis=1)
+        dx = 0.5 * (dx1 - dx_1)
+        dxx = 1e-9 + 0.25 * (dx2 - 2 * dx0 + dx_2)
+        keypoints[n] -= (dx / dxx).reshape(-1)
+    return keypoints
+
+
+def main():
+    args = parse_args()
+    rng = np.random.RandomState(0)
+
+    # (name, N, K, heatmap size [W, H], simcc length)
+    settings = [
+        ('top-down coco 256x192', 1, 17, (48, 64), 384),
+        ('top-down wholebody 384x288', 1, 133, (72, 96), 576),
+        ('bottom-up coco 512x512, 30 persons', 30, 17, (128, 128), 1024),
+        ('crowd wholebody 384x288, 64 persons', 64, 133, (72, 96), 576),
+    ]
+
+    # (name, inputs, vectorized, loop) on synthetic Gaussian heatmaps and
+    # SimCC distributions with noise
+    def cases(N, K, heatmap_size, simcc_len):
+        W, H = heatmap_size
+        keypoints = (rng.rand(N, K, 2) * [W - 1, H - 1]).astype(np.float32)
+        heatmaps, _ = generate_gaussian_heatmaps(heatmap_size,
+                                                 keypoints + rng.rand(N, K, 2),
+                                                 np.ones((N, K)), 2.)
+        heatmaps = (heatmaps + rng.rand(K, H, W) * 0.01).astype(np.float32)
+        simcc_keypoints = (rng.rand(N, K) * (simcc_len - 1)).astype(np.float32)
+        simcc = np.exp(-(np.arange(simcc_len) - simcc_keypoints[..., None] -
+                         rng.rand(N, K, 1))**2 / (2 * 5.66**2))
+        simcc = (simcc + rng.rand(N, K, simcc_len) * 0.01).astype(np.float32)
+        return [
+            ('gaussian_blur', (heatmaps, 11), gaussian_blur,
+             _gaussian_blur_loop),
+            ('gaussian_blur1d', (simcc, 11), gaussian_blur1d,
+             _gaussian_blur1d_loop),
+            ('refine_keypoints_dark', (keypoints, heatmaps, 11),
+             refine_keypoints_dark, _refine_keypoints_dark_loop),
+            ('refine_keypoints_dark_udp', (keypoints, heatmaps, 11),
+             refine_keypoints_dark_udp, _refine_keypoints_dark_udp_loop),
+            ('refine_simcc_dark', (simcc_keypoints, simcc, 11),
+             refine_simcc_dark, _refine_simcc_dark_loop),
+        ]
+
+    def copy_inputs(inputs):
+        return [x.copy() if isinstance(x, np.ndarray) else x for x in inputs]
+
+    for setting, N, K, heatmap_size, simcc_len in settings:
+        print(f'{setting}: N={N}, K={K}, heatmap={heatmap_size}, '
+              f'simcc={simcc_len}')
+        for name, inputs, func, loop_func in cases(N, K, heatmap_size,
+                                                   simcc_len):
+            assert np.allclose(
+                func(*copy_inputs(inputs)), loop_func(*copy_inputs(inputs)),
+                rtol=1e-3, atol=1e-3), \
+                f'{name} differs from the loop implementation'
+
+            # the functions work in-place, so the inputs are copied outside
+            # of the timed calls
+            num_calls = args.num_iters + args.num_warmup
+            loop_inputs = [copy_inputs(inputs) for _ in range(num_calls)]
+            vec_inputs = [copy_inputs(inputs) for _ in range(num_calls)]
+            loop_time = timeit(lambda: loop_func(*loop_inputs.pop()),
+                               args.num_iters, args.num_warmup)
+            vec_time = timeit(lambda: func(*vec_inputs.pop()), args.num_iters,
+                              args.num_warmup)
+            print(f'  {name:<28}loop {loop_time:9.3f} ms    '
+                  f'vectorized {vec_time:8.3f} ms    '
+                  f'speedup {loop_time / vec_time:6.1f}x')
+
+
+if __name__ == '__main__':
+    main()
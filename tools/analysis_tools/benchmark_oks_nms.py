@@ -0,0 +1,168 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Benchmark ``oks_nms`` and ``soft_oks_nms`` on the vectorized OKS kernel
+``oks_matrix`` against the previous implementations that compute the OKS of
+one pair of instances at a time in a Python loop."""
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from mmpose.evaluation.functional import oks_matrix, oks_nms, soft_oks_nms
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the OKS NMS on the vectorized OKS kernel '
+        'against the loop implementations')
+    parser.add_argument(
+        '--num-instances',
+        type=int,
+        nargs='+',
+        default=[10, 100, 1000],
+        help='numbers of candidate instances')
+    parser.add_argument(
+        '--num-keypoints', type=int, default=17, help='number of keypoints')
+    parser.add_argument(
+        '--num-iters', type=int, default=10, help='number of iterations')
+    parser.add_argument(
+        '--device',
+        default=None,
+        help='also time the torch OKS matrix on this device, e.g. cuda:0')
+    args = parser.parse_args()
+    return args
+
+
+def timeit(fn, num_iters, num_warmup=1):
+    """Return the average time of ``fn`` in milliseconds."""
+    for _ in range(num_warmup):
+        fn()
+    start = time.perf_counter()
+    for _ in range(num_iters):
+        fn()
+    return (time.perf_counter() - start) / num_iters * 1000
+
+
+# The loop implementations replaced by the vectorized OKS kernel
+
+
+def _oks_iou_loop(g, d, a_g, a_d, sigmas, vis_thr=None):
+    vars = (sigmas * 2)**2
+    xg = g[0::3]
+    yg = g[1::3]
+    vg = g[2::3]
+    ious = np.zeros(len(d), dtype=np.float32)
+    for n_d in range(0, len(d)):
+        xd = d[n_d, 0::3]
+        yd = d[n_d, 1::3]
+        vd = d[n_d, 2::3]
+        dx = xd - xg
+        dy = yd - yg
+        e = (dx**2 + dy**2) / vars / ((a_g + a_d[n_d]) / 2 + np.spacing(1)) / 2
+        if vis_thr is not None:
+            ind = list((vg > vis_thr) & (vd > vis_thr))
+            e = e[ind]
+        ious[n_d] = np.sum(np.exp(-e)) / len(e) if len(e) != 0 else 0.0
+    return ious
+
+
+def _oks_nms_loop(kpts_db, thr, sigmas, vis_thr=None):
+    scores = np.array([k['score'] for k in kpts_db])
+    kpts = np.array([k['keypoints'].flatten() for k in kpts_db])
+    areas = np.array([k['area'] for k in kpts_db])
+    order = scores.argsort()[::-1]
+    keep = []
+    while len(order) > 0:
+        i = order[0]
+        keep.append(i)
+        oks_ovr = _oks_iou_loop(kpts[i], kpts[order[1:]], areas[i],
+                                areas[order[1:]], sigmas, vis_thr)
+        inds = np.where(oks_ovr <= thr)[0]
+        order = order[inds + 1]
+    return np.array(keep)
+
+
+def _soft_oks_nms_loop(kpts_db, thr, sigmas, max_dets=20, vis_thr=None):
+    scores = np.array([k['score'] for k in kpts_db])
+    kpts = np.array([k['keypoints'].flatten() for k in kpts_db])
+    areas = np.array([k['area'] for k in kpts_db])
+    order = scores.argsort()[::-1]
+    scores = scores[order]
+    keep = np.zeros(max_dets, dtype=np.intp)
+    keep_cnt = 0
+    while len(order) > 0 and keep_cnt < max_dets:
+        i = order[0]
+        oks_ovr = _oks_iou_loop(kpts[i], kpts[order[1:]], areas[i],
+                                areas[order[1:]], sigmas, vis_thr)
+        order = order[1:]
+        scores = scores[1:] * np.exp(-oks_ovr**2 / thr)
+        tmp = scores.argsort()[::-1]
+        order = order[tmp]
+        scores = scores[tmp]
+        keep[keep_cnt] = i
+        keep_cnt += 1
+    return keep[:keep_cnt]
+
+
+def make_kpts_db(num_instances, num_keypoints, rng):
+    """Candidates clustered around a few persons like bottom-up outputs."""
+    num_persons = max(1, num_instances // 10)
+    persons = rng.rand(num_persons, num_keypoints, 2) * 640
+    person_inds = rng.randint(num_persons, size=num_instances)
+    keypoints = persons[person_inds] + rng.randn(num_instances, num_keypoints,
+                                                 2) * 5
+    keypoint_scores = rng.rand(num_instances, num_keypoints, 1)
+    keypoints = np.concatenate((keypoints, keypoint_scores), axis=2)
+    return [
+        dict(
+            keypoints=keypoints[i],
+            score=rng.rand(),
+            area=rng.uniform(50, 200)**2) for i in range(num_instances)
+    ]
+
+
+def main():
+    args = parse_args()
+    rng = np.random.RandomState(0)
+    sigmas = rng.uniform(0.025, 0.107, args.num_keypoints)
+
+    for num_instances in args.num_instances:
+        kpts_db = make_kpts_db(num_instances, args.num_keypoints, rng)
+        print(f'{num_instances} instances, {args.num_keypoints} keypoints')
+
+        cases = [
+            ('oks_nms', lambda: oks_nms(kpts_db, 0.9, sigmas, vis_thr=0.2),
+             lambda: _oks_nms_loop(kpts_db, 0.9, sigmas, vis_thr=0.2)),
+            ('soft_oks_nms',
+             lambda: soft_oks_nms(kpts_db, 0.3, sigmas=sigmas, vis_thr=0.2),
+             lambda: _soft_oks_nms_loop(kpts_db, 0.3, sigmas, vis_thr=0.2)),
+        ]
+        for name, func, loop_func in cases:
+            assert np.array_equal(func(), loop_func()), \
+                f'{name} differs from the loop implementation'
+            loop_time = timeit(loop_func, args.num_iters)
+            vec_time = timeit(func, args.num_iters)
+            print(f'  {name:<16}loop {loop_time:10.3f} ms    '
+                  f'vectorized {vec_time:9.3f} ms    '
+                  f'speedup {loop_time / vec_time:7.1f}x')
+
+        kpts = np.array([k['keypoints'] for k in kpts_db])
+        areas = np.array([k['area'] for k in kpts_db])
+        numpy_time = timeit(
+            lambda: oks_matrix(kpts, kpts, areas, areas, sigmas, 0.2),
+            args.num_iters)
+        print(f'  {"oks_matrix":<16}numpy {numpy_time:9.3f} ms')
+        if args.device is not None:
+            kpts_t = torch.from_numpy(kpts).float().to(args.device)
+            areas_t = torch.from_numpy(areas).float().to(args.device)
+
+            def run_torch():
+                oks_matrix(kpts_t, kpts_t, areas_t, areas_t, sigmas, 0.2).cpu()
+
+            torch_time = timeit(run_torch, args.num_iters)
+            print(f'  {"oks_matrix":<16}torch {torch_time:9.3f} ms '
+                  f'({args.device})')
+
+
+if __name__ == '__main__':
+    main()
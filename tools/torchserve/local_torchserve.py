@@ -0,0 +1,169 @@
+# Copyright (c) OpenMMLab. All rights reserved.
+"""Run ``MMPoseHandler`` locally the way TorchServe drives it.
+
+TorchServe is not needed: the model directory that ``torch-model-archiver``
+would unpack is staged from a config and checkpoint, the handler is
+initialized with a minimal context and the given image is sent as batches of
+requests of growing size to measure the batching throughput.
+
+Example:
+    python tools/torchserve/local_torchserve.py demo.jpg \\
+        configs/body_2d_keypoint/rtmpose/coco/\\
+rtmpose-m_8xb256-420e_coco-256x192.py rtmpose-m.pth \\
+        --batch-sizes 1 4 8 --pose-batch-size 32
+"""
+import json
+import os
+import os.path as osp
+import shutil
+import time
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+
+from mmengine.config import Config
+from mmpose_handler import MMPoseHandler
+
+
+class LocalMetrics:
+    """Collects the metrics a handler reports through ``context.metrics``."""
+
+    def __init__(self):
+        self.times = {}
+
+    def add_time(self, name, value, idx=None, unit='ms'):
+        self.times.setdefault(name, []).append(value)
+
+
+class LocalContext:
+    """A minimal stand-in of TorchServe's ``ts.context.Context``."""
+
+    def __init__(self,
+                 model_dir,
+                 serialized_file,
+                 gpu_id=None,
+                 model_yaml_config=None):
+        self.system_properties = dict(model_dir=model_dir, gpu_id=gpu_id)
+        self.manifest = dict(model=dict(serializedFile=serialized_file))
+        self.model_yaml_config = model_yaml_config or {}
+        self.metrics = LocalMetrics()
+
+    def get_request_header(self, idx, key):
+        return None
+
+
+def stage_model_dir(model_dir,
+                    config_file,
+                    checkpoint_file,
+                    det_config_file=None,
+                    det_checkpoint_file=None):
+    """Lay out a model directory like an unpacked ``.mar`` archive built by
+    ``mmpose2torchserve.py``.
+
+    Returns:
+        str: The serialized file name of the pose checkpoint.
+    """
+    Config.fromfile(config_file).dump(osp.join(model_dir, 'config.py'))
+    serialized_file = osp.basename(checkpoint_file)
+    _link_or_copy(checkpoint_file, osp.join(model_dir, serialized_file))
+    if det_config_file is not None:
+        Config.fromfile(det_config_file).dump(
+            osp.join(model_dir, MMPoseHandler.det_config_file))
+        _link_or_copy(det_checkpoint_file,
+                      osp.join(model_dir, MMPoseHandler.det_checkpoint_file))
+    return serialized_file
+
+
+def _link_or_copy(src, dst):
+    try:
+        os.symlink(osp.abspath(src), dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def handle(handler, context, data):
+    """Process one batch of requests like TorchServe does."""
+    if hasattr(handler, 'handle'):
+        return handler.handle(data, context)
+    start = time.perf_counter()
+    output = handler.postprocess(handler.inference(handler.preprocess(data)))
+    context.metrics.add_time('HandlerTime',
+                             (time.perf_counter() - start) * 1000)
+    return output
+
+
+def parse_args():
+    parser = ArgumentParser(
+        description='Benchmark the MMPose TorchServe handler locally.')
+    parser.add_argument('img', help='Image file sent in every request')
+    parser.add_argument('config', help='Pose config file')
+    parser.add_argument('checkpoint', help='Pose checkpoint file')
+    parser.add_argument('--det-config', default=None, help='Detector config')
+    parser.add_argument(
+        '--det-checkpoint', default=None, help='Detector checkpoint')
+    parser.add_argument(
+        '--gpu-id',
+        type=int,
+        default=None,
+        help='GPU used by the handler, CPU if not given')
+    parser.add_argument(
+        '--batch-sizes',
+        type=int,
+        nargs='+',
+        default=[1, 2, 4, 8],
+        help='Numbers of requests per TorchServe batch to benchmark')
+    parser.add_argument(
+        '--pose-batch-size',
+        type=int,
+        default=32,
+        help='Tensor batch size of the pose estimator in the handler')
+    parser.add_argument(
+        '--num-iters',
+        type=int,
+        default=10,
+        help='Number of timed batches per batch size')
+    parser.add_argument(
+        '--show-result',
+        action='store_true',
+        help='Print the response of the first request')
+    args = parser.parse_args()
+    assert (args.det_config is None) == (args.det_checkpoint is None), \
+        '`--det-config` and `--det-checkpoint` must be given together'
+    return args
+
+
+def main():
+    args = parse_args()
+    with open(args.img, 'rb') as f:
+        img_bytes = f.read()
+
+    with TemporaryDirectory() as model_dir:
+        serialized_file = stage_model_dir(model_dir, args.config,
+                                          args.checkpoint, args.det_config,
+                                          args.det_checkpoint)
+        context = LocalContext(
+            model_dir,
+            serialized_file,
+            gpu_id=args.gpu_id,
+            model_yaml_config=dict(
+                handler=dict(pose_batch_size=args.pose_batch_size)))
+        handler = MMPoseHandler()
+        handler.initialize(context)
+
+        for batch_size in args.batch_sizes:
+            data = [dict(body=img_bytes) for _ in range(batch_size)]
+            output = handle(handler, context, data)  # warmup
+            assert len(output) == batch_size
+            if args.show_result:
+                print(json.dumps(output[0]))
+
+            start = time.perf_counter()
+            for _ in range(args.num_iters):
+                handle(handler, context, data)
+            elapsed = time.perf_counter() - start
+            print(f'batch size {batch_size:3d}: '
+                  f'{elapsed / args.num_iters * 1000:8.1f} ms/batch, '
+                  f'{batch_size * args.num_iters / elapsed:7.1f} img/s')
+
+
+if __name__ == '__main__':
+    main()
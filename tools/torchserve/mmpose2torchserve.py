@@ -1,12 +1,14 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import os.path as osp
+import shutil
 import warnings
 from argparse import ArgumentParser, Namespace
 from tempfile import TemporaryDirectory
 
-import mmcv
 import torch
+from mmengine.config import Config
 from mmengine.runner import CheckpointLoader
+from mmengine.utils import mkdir_or_exist
 
 try:
     from model_archiver.model_packaging import package_model
@@ -20,7 +22,9 @@ def mmpose2torchserve(config_file: str,
                       output_folder: str,
                       model_name: str,
                       model_version: str = '1.0',
-                      force: bool = False):
+                      force: bool = False,
+                      det_config_file: str = None,
+                      det_checkpoint_file: str = None):
     """Converts MMPose model (config + checkpoint) to TorchServe `.mar`.
 
     Args:
@@ -42,11 +46,17 @@ def mmpose2torchserve(config_file: str,
         force:
             If True, if there is an existing `{model_name}.mar`
             file under `output_folder` it will be overwritten.
+        det_config_file:
+            Optional MMDetection config of the person detector packaged
+            into the archive and run by the handler before the top-down
+            pose estimator.
+        det_checkpoint_file:
+            Checkpoint of the person detector.
     """
 
-    mmcv.mkdir_or_exist(output_folder)
+    mkdir_or_exist(output_folder)
 
-    config = mmcv.Config.fromfile(config_file)
+    config = Config.fromfile(config_file)
 
     with TemporaryDirectory() as tmpdir:
         model_file = osp.join(tmpdir, 'config.py')
@@ -55,13 +65,26 @@ def mmpose2torchserve(config_file: str,
         model_name = model_name or osp.splitext(
             osp.basename(checkpoint_file))[0]
 
-        # use mmcv CheckpointLoader if checkpoint is not from a local file
+        # use mmengine CheckpointLoader if checkpoint is not from a local file
         if not osp.isfile(checkpoint_file):
             ckpt = CheckpointLoader.load_checkpoint(checkpoint_file)
             checkpoint_file = osp.join(tmpdir, 'checkpoint.pth')
             with open(checkpoint_file, 'wb') as f:
                 torch.save(ckpt, f)
 
+        # the handler looks the detector up by these fixed file names
+        extra_files = None
+        if det_config_file is not None:
+            det_config_path = osp.join(tmpdir, 'det_config.py')
+            Config.fromfile(det_config_file).dump(det_config_path)
+            det_checkpoint_path = osp.join(tmpdir, 'det_checkpoint.pth')
+            if osp.isfile(det_checkpoint_file):
+                shutil.copyfile(det_checkpoint_file, det_checkpoint_path)
+            else:
+                ckpt = CheckpointLoader.load_checkpoint(det_checkpoint_file)
+                torch.save(ckpt, det_checkpoint_path)
+            extra_files = f'{det_config_path},{det_checkpoint_path}'
+
         args = Namespace(
             **{
                 'model_file': model_file,
@@ -72,7 +95,7 @@ def mmpose2torchserve(config_file: str,
                 'export_path': output_folder,
                 'force': force,
                 'requirements_file': None,
-                'extra_files': None,
+                'extra_files': extra_files,
                 'runtime': 'python',
                 'archive_format': 'default'
             })
@@ -107,7 +130,20 @@ def parse_args():
         '--force',
         action='store_true',
         help='overwrite the existing `{model_name}.mar`')
+    parser.add_argument(
+        '--det-config',
+        type=str,
+        default=None,
+        help='Optional detector config packaged with the pose model')
+    parser.add_argument(
+        '--det-checkpoint',
+        type=str,
+        default=None,
+        help='Detector checkpoint file path')
     args = parser.parse_args()
+    if (args.det_config is None) != (args.det_checkpoint is None):
+        parser.error('--det-config and --det-checkpoint must be given '
+                     'together')
 
     return args
 
@@ -132,4 +168,5 @@ if __name__ == '__main__':
                           'Try: pip install torch-model-archiver')
 
     mmpose2torchserve(args.config, args.checkpoint, args.output_folder,
-                      args.model_name, args.model_version, args.force)
+                      args.model_name, args.model_version, args.force,
+                      args.det_config, args.det_checkpoint)
@@ -1,80 +1,190 @@
 # Copyright (c) OpenMMLab. All rights reserved.
 import base64
-import os
+import os.path as osp
 
 import mmcv
+import numpy as np
 import torch
 
-from mmpose.apis import (inference_bottom_up_pose_model,
-                         inference_top_down_pose_model, init_pose_model)
-from mmpose.models.detectors import AssociativeEmbedding, TopDown
+from mmpose.apis import inference_bottomup, inference_topdown_batch, init_model
+from mmpose.evaluation.functional import nms
+from mmpose.models.pose_estimators import TopdownPoseEstimator
+from mmpose.structures import merge_data_samples
+from mmpose.utils import adapt_mmdet_pipeline
+
+try:
+    from mmdet.apis import inference_detector, init_detector
+    has_mmdet = True
+except (ImportError, ModuleNotFoundError):
+    has_mmdet = False
 
 try:
     from ts.torch_handler.base_handler import BaseHandler
 except ImportError:
-    raise ImportError('Please install torchserve.')
+    # The handler can still be driven by the local stand-in in
+    # ``local_torchserve.py`` without TorchServe.
+    BaseHandler = object
 
 
 class MMPoseHandler(BaseHandler):
+    """TorchServe handler for MMPose 1.x pose estimators.
+
+    Every request carries one image, either as the raw image bytes or as a
+    JSON object ``{"image": <base64 image>, "bboxes": [[x1, y1, x2, y2],
+    ...]}``. The requests that TorchServe batches together are processed as
+    one batch:
+
+    - If the model archive contains a detector (``det_config.py`` and
+      ``det_checkpoint.pth``, see ``mmpose2torchserve.py``), the images
+      without given bboxes are passed to the detector in a single call.
+      Without a detector, the whole image is used as the bbox.
+    - The person crops of all images are stacked into fixed-size tensor
+      batches for the top-down pose estimator, so that a batch of requests
+      costs a few forward passes instead of one per image and bbox.
+
+    Bottom-up models are run image by image. The response of each request is
+    a compact JSON object with the arrays ``keypoints`` (N, K, 2),
+    ``keypoint_scores`` (N, K), ``bboxes`` (N, 4) and ``bbox_scores`` (N, ).
+
+    The optional ``handler`` section of the model config YAML accepts
+    ``pose_batch_size`` (default 32), ``num_workers`` (threads preparing the
+    crops, default 0), ``det_cat_id`` (default 0), ``bbox_thr`` (default
+    0.3) and ``nms_thr`` (default 0.3).
+    """
+
+    det_config_file = 'det_config.py'
+    det_checkpoint_file = 'det_checkpoint.pth'
 
     def initialize(self, context):
         properties = context.system_properties
-        self.map_location = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.device = torch.device(self.map_location + ':' +
-                                   str(properties.get('gpu_id')) if torch.cuda.
-                                   is_available() else self.map_location)
+        gpu_id = properties.get('gpu_id')
+        if torch.cuda.is_available() and gpu_id is not None:
+            self.device = f'cuda:{gpu_id}'
+        else:
+            self.device = 'cpu'
         self.manifest = context.manifest
 
         model_dir = properties.get('model_dir')
         serialized_file = self.manifest['model']['serializedFile']
-        checkpoint = os.path.join(model_dir, serialized_file)
-        self.config_file = os.path.join(model_dir, 'config.py')
+        checkpoint = osp.join(model_dir, serialized_file)
+        self.config_file = osp.join(model_dir, 'config.py')
+        self.model = init_model(self.config_file, checkpoint, self.device)
+        self.topdown = isinstance(self.model, TopdownPoseEstimator)
+
+        model_yaml_config = getattr(context, 'model_yaml_config', None) or {}
+        handler_cfg = model_yaml_config.get('handler', {})
+        self.pose_batch_size = int(handler_cfg.get('pose_batch_size', 32))
+        self.num_workers = int(handler_cfg.get('num_workers', 0))
+        self.det_cat_id = int(handler_cfg.get('det_cat_id', 0))
+        self.bbox_thr = float(handler_cfg.get('bbox_thr', 0.3))
+        self.nms_thr = float(handler_cfg.get('nms_thr', 0.3))
+
+        self.detector = None
+        det_config = osp.join(model_dir, self.det_config_file)
+        if self.topdown and osp.isfile(det_config):
+            if not has_mmdet:
+                raise ImportError('Please install mmdet to run the detector '
+                                  'in the handler.')
+            self.detector = init_detector(
+                det_config,
+                osp.join(model_dir, self.det_checkpoint_file),
+                device=self.device)
+            self.detector.cfg = adapt_mmdet_pipeline(self.detector.cfg)
 
-        self.model = init_pose_model(self.config_file, checkpoint, self.device)
         self.initialized = True
 
     def preprocess(self, data):
-        images = []
-
+        inputs = []
         for row in data:
-            image = row.get('data') or row.get('body')
-            if isinstance(image, str):
-                image = base64.b64decode(image)
-            image = mmcv.imfrombytes(image)
-            images.append(image)
-
-        return images
+            body = row.get('data') or row.get('body')
+            bboxes = None
+            if isinstance(body, dict):
+                bboxes = body.get('bboxes')
+                body = body['image']
+            if isinstance(body, str):
+                body = base64.b64decode(body)
+            img = mmcv.imfrombytes(body)
+
+            if bboxes is not None:
+                bboxes = np.array(bboxes, dtype=np.float32).reshape(-1, 4)
+            inputs.append(dict(img=img, bboxes=bboxes, bbox_scores=None))
+        return inputs
 
     def inference(self, data, *args, **kwargs):
-        if isinstance(self.model, TopDown):
-            results = self._inference_top_down_pose_model(data)
-        elif isinstance(self.model, (AssociativeEmbedding, )):
-            results = self._inference_bottom_up_pose_model(data)
-        else:
-            raise NotImplementedError(
-                f'Model type {type(self.model)} is not supported.')
-
-        return results
-
-    def _inference_top_down_pose_model(self, data):
-        results = []
-        for image in data:
-            # use dummy person bounding box
-            preds, _ = inference_top_down_pose_model(
-                self.model, image, person_results=None)
-            results.append(preds)
-        return results
-
-    def _inference_bottom_up_pose_model(self, data):
-        results = []
-        for image in data:
-            preds, _ = inference_bottom_up_pose_model(self.model, image)
-            results.append(preds)
-        return results
+        if not self.topdown:
+            for item in data:
+                item['results'] = inference_bottomup(self.model, item['img'])
+            return data
+
+        # detect the persons of all images without given bboxes at once
+        det_items = [item for item in data if item['bboxes'] is None]
+        if self.detector is not None and det_items:
+            det_results = inference_detector(
+                self.detector, [item['img'] for item in det_items])
+            for item, det_result in zip(det_items, det_results):
+                item['bboxes'], item['bbox_scores'] = self._select_bboxes(
+                    det_result)
+
+        # images where the detector found nobody are skipped, images
+        # without a detector or given bboxes use the whole image
+        pose_items = [
+            item for item in data
+            if item['bboxes'] is None or len(item['bboxes']) > 0
+        ]
+        pose_results = inference_topdown_batch(
+            self.model, [(item['img'], item['bboxes']) for item in pose_items],
+            batch_size=self.pose_batch_size,
+            num_workers=self.num_workers)
+        for item in data:
+            item['results'] = []
+        for item, results in zip(pose_items, pose_results):
+            item['results'] = results
+        return data
+
+    def _select_bboxes(self, det_result):
+        """Filter the person bboxes of a detection result by category, score
+        threshold and NMS."""
+        pred_instances = det_result.pred_instances.cpu().numpy()
+        keep = np.logical_and(pred_instances.labels == self.det_cat_id,
+                              pred_instances.scores > self.bbox_thr)
+        dets = np.concatenate(
+            (pred_instances.bboxes[keep], pred_instances.scores[keep, None]),
+            axis=1)
+        dets = dets[nms(dets, self.nms_thr)]
+        return dets[:, :4], dets[:, 4]
 
     def postprocess(self, data):
-        output = [[{
-            'keypoints': pred['keypoints'].tolist()
-        } for pred in preds] for preds in data]
-
+        output = []
+        for item in data:
+            if not item['results']:
+                output.append(
+                    dict(
+                        keypoints=[],
+                        keypoint_scores=[],
+                        bboxes=[],
+                        bbox_scores=[]))
+                continue
+
+            pred_instances = merge_data_samples(item['results']).pred_instances
+            keypoints = pred_instances.keypoints[..., :2]
+            bboxes = pred_instances.get('bboxes')
+            if bboxes is None:
+                # bottom-up models may not predict bboxes
+                bboxes = np.concatenate(
+                    (keypoints.min(axis=1), keypoints.max(axis=1)), axis=1)
+            bbox_scores = item['bbox_scores']
+            if bbox_scores is None:
+                bbox_scores = pred_instances.get('bbox_scores',
+                                                 np.ones(len(keypoints)))
+            output.append(
+                dict(
+                    keypoints=_round(keypoints, 2),
+                    keypoint_scores=_round(pred_instances.keypoint_scores, 3),
+                    bboxes=_round(bboxes, 1),
+                    bbox_scores=_round(bbox_scores, 3)))
         return output
+
+
+def _round(array, decimals):
+    # round in float64 so that the JSON response has no float32 noise
+    return np.round(np.asarray(array, dtype=np.float64), decimals).tolist()
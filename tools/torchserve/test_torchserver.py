@@ -4,12 +4,14 @@ import os.path as osp
 import warnings
 from argparse import ArgumentParser
 
+import mmcv
+import numpy as np
 import requests
 
-from mmpose.apis import (inference_bottom_up_pose_model,
-                         inference_top_down_pose_model, init_pose_model,
-                         vis_pose_result)
-from mmpose.models import AssociativeEmbedding, TopDown
+from mmpose.apis import inference_bottomup, inference_topdown, init_model
+from mmpose.models.pose_estimators import TopdownPoseEstimator
+from mmpose.registry import VISUALIZERS
+from mmpose.structures import PoseDataSample, merge_data_samples
 
 
 def parse_args():
@@ -30,37 +32,59 @@ def parse_args():
     return args
 
 
+def server_result_to_data_sample(server_result):
+    """Convert the compact response of ``MMPoseHandler`` to a
+    :obj:`PoseDataSample` for visualization."""
+    data_sample = PoseDataSample()
+    keypoints = np.array(server_result['keypoints'], dtype=np.float32)
+    data_sample.pred_instances = dict(
+        keypoints=keypoints,
+        keypoint_scores=np.array(
+            server_result['keypoint_scores'],
+            dtype=np.float32).reshape(keypoints.shape[:2]),
+        bboxes=np.array(server_result['bboxes'],
+                        dtype=np.float32).reshape(-1, 4))
+    return data_sample
+
+
 def main(args):
     os.makedirs(args.out_dir, exist_ok=True)
 
     # Inference single image by native apis.
-    model = init_pose_model(args.config, args.checkpoint, device=args.device)
-    if isinstance(model, TopDown):
-        pytorch_result, _ = inference_top_down_pose_model(
-            model, args.img, person_results=None)
-    elif isinstance(model, (AssociativeEmbedding, )):
-        pytorch_result, _ = inference_bottom_up_pose_model(model, args.img)
+    model = init_model(args.config, args.checkpoint, device=args.device)
+    if isinstance(model, TopdownPoseEstimator):
+        pytorch_result = merge_data_samples(inference_topdown(model, args.img))
     else:
-        raise NotImplementedError()
+        pytorch_result = inference_bottomup(model, args.img)[0]
 
-    vis_pose_result(
-        model,
-        args.img,
+    visualizer = VISUALIZERS.build(model.cfg.visualizer)
+    visualizer.set_dataset_meta(model.dataset_meta)
+    img = mmcv.imread(args.img, channel_order='rgb')
+    visualizer.add_datasample(
+        'pytorch_result',
+        img,
         pytorch_result,
+        draw_gt=False,
         out_file=osp.join(args.out_dir, 'pytorch_result.png'))
 
     # Inference single image by torchserve engine.
     url = 'http://' + args.inference_addr + '/predictions/' + args.model_name
     with open(args.img, 'rb') as image:
         response = requests.post(url, image)
-    server_result = response.json()
+    server_result = server_result_to_data_sample(response.json())
 
-    vis_pose_result(
-        model,
-        args.img,
+    visualizer.add_datasample(
+        'torchserve_result',
+        img,
         server_result,
+        draw_gt=False,
         out_file=osp.join(args.out_dir, 'torchserve_result.png'))
 
+    # The server rounds the keypoints to 2 decimals.
+    diff = np.abs(pytorch_result.pred_instances.keypoints -
+                  server_result.pred_instances.keypoints).max()
+    print(f'max keypoint difference (pytorch vs. torchserve): {diff:.3f}')
+
 
 if __name__ == '__main__':
     args = parse_args()
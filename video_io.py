@@ -0,0 +1,495 @@
+"""视频读写层：后台线程解码和编码，可选PyAV或ffmpeg管道后端
+
+:class:`VideoReader` 在后台线程中预读解码帧，支持从指定帧开始读取和按
+步长抽帧；:class:`AsyncVideoWriter` 在后台线程中编码，推理线程写入帧时
+只是放入队列，编码不会阻塞推理。
+
+后端:
+    ``opencv``  ``cv2.VideoCapture`` / ``cv2.VideoWriter``，始终可用，
+                解码时可请求硬件加速（``hw_accel=True``）
+    ``pyav``    PyAV（``pip install av``），解码使用FFmpeg的多线程解码，
+                编码默认使用H.264
+    ``ffmpeg``  通过管道调用系统中的 ``ffmpeg`` 命令，解码时可使用
+                ``-hwaccel auto``，编码可指定 ``h264_nvenc`` 等硬件编码器
+
+``backend='auto'`` 时优先使用PyAV，其次（仅编码）ffmpeg命令，否则使用OpenCV。
+"""
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from fractions import Fraction
+
+import cv2
+import numpy as np
+
+from gait_engine import frame_timestamp
+
+try:
+    import av
+    has_av = True
+except (ImportError, ModuleNotFoundError):
+    has_av = False
+
+FFMPEG_BINARY = shutil.which('ffmpeg')
+
+# 读取结束标记
+_END_OF_VIDEO = object()
+
+
+def available_backends():
+    """返回当前环境可用的后端名称"""
+    backends = ['opencv']
+    if has_av:
+        backends.append('pyav')
+    if FFMPEG_BINARY:
+        backends.append('ffmpeg')
+    return backends
+
+
+def _check_backend(backend):
+    if backend not in ('opencv', 'pyav', 'ffmpeg'):
+        raise ValueError(f'未知的视频后端: {backend}')
+    if backend not in available_backends():
+        raise RuntimeError(f'视频后端 {backend} 不可用，请安装PyAV或ffmpeg')
+    return backend
+
+
+class _OpenCVSource:
+    """基于 ``cv2.VideoCapture`` 的解码器"""
+
+    def __init__(self, path, hw_accel=False):
+        self.path = path
+        self.hw_accel = hw_accel
+        self.cap = self._open()
+        if not self.cap.isOpened():
+            raise IOError(f'无法打开视频文件: {path}')
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+    def _open(self):
+        if self.hw_accel:
+            return cv2.VideoCapture(self.path, cv2.CAP_ANY,
+                                    [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+        return cv2.VideoCapture(self.path)
+
+    def seek(self, frame_idx):
+        """定位到指定帧；部分编码格式的定位不精确，此时从头逐帧跳过"""
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+        if int(self.cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_idx:
+            return
+        self.cap.release()
+        self.cap = self._open()
+        for _ in range(frame_idx):
+            if not self.cap.grab():
+                break
+
+    def read(self, frame_idx):
+        success, img = self.cap.read()
+        if not success:
+            return None
+        return frame_timestamp(self.cap, frame_idx, self.fps), img
+
+    def skip(self):
+        """跳过一帧，只解封装不做颜色转换"""
+        return self.cap.grab()
+
+    def release(self):
+        self.cap.release()
+
+
+class _PyAVSource:
+    """基于PyAV的解码器，使用FFmpeg的帧级和片级多线程解码"""
+
+    def __init__(self, path):
+        self.container = av.open(path)
+        self.stream = self.container.streams.video[0]
+        self.stream.thread_type = 'AUTO'
+        self.fps = float(self.stream.average_rate or self.stream.guessed_rate or 0)
+        self.width = self.stream.codec_context.width
+        self.height = self.stream.codec_context.height
+        self.total_frames = self.stream.frames or int(
+            float(self.stream.duration * self.stream.time_base) * self.fps if self.stream.duration else 0)
+        self._start_time = float(self.stream.start_time * self.stream.time_base) if self.stream.start_time else 0.0
+        self._frames = self.container.decode(self.stream)
+        self._pending = None
+
+    def seek(self, frame_idx):
+        """定位到指定帧之前的关键帧，再解码并丢弃之前的帧"""
+        if frame_idx <= 0 or not self.fps:
+            return
+        target = self._start_time + frame_idx / self.fps
+        self.container.seek(int(target / self.stream.time_base), stream=self.stream, backward=True)
+        self._frames = self.container.decode(self.stream)
+        for frame in self._frames:
+            if frame.time is None or frame.time >= target - 0.5 / self.fps:
+                self._pending = frame
+                return
+
+    def _next(self):
+        if self._pending is not None:
+            frame, self._pending = self._pending, None
+            return frame
+        return next(self._frames, None)
+
+    def read(self, frame_idx):
+        frame = self._next()
+        if frame is None:
+            return None
+        timestamp = frame.time - self._start_time if frame.time is not None else None
+        return timestamp, frame.to_ndarray(format='bgr24')
+
+    def skip(self):
+        return self._next() is not None
+
+    def release(self):
+        self.container.close()
+
+
+class _FFmpegSource:
+    """通过管道读取 ``ffmpeg`` 解码的BGR原始帧，视频信息由OpenCV读取"""
+
+    def __init__(self, path, hw_accel=False):
+        probe = _OpenCVSource(path)
+        self.fps, self.width, self.height, self.total_frames = probe.fps, probe.width, probe.height, probe.total_frames
+        probe.release()
+        self.path = path
+        self.hw_accel = hw_accel
+        self.frame_size = self.width * self.height * 3
+        self.process = None
+        self._start(0)
+
+    def _start(self, frame_idx):
+        self.release()
+        cmd = [FFMPEG_BINARY, '-v', 'error', '-nostdin']
+        if self.hw_accel:
+            cmd += ['-hwaccel', 'auto']
+        if frame_idx > 0 and self.fps:
+            # -ss位于-i之前时ffmpeg从关键帧解码并丢弃之前的帧，定位是精确的
+            cmd += ['-ss', f'{frame_idx / self.fps:.6f}']
+        cmd += ['-i', self.path, '-map', '0:v:0', '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-']
+        self.process = subprocess.Popen(cmd, stdout=subprocess.PIPE, bufsize=self.frame_size * 4)
+
+    def seek(self, frame_idx):
+        self._start(frame_idx)
+
+    def _read_bytes(self):
+        data = self.process.stdout.read(self.frame_size)
+        return data if len(data) == self.frame_size else None
+
+    def read(self, frame_idx):
+        data = self._read_bytes()
+        if data is None:
+            return None
+        img = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3).copy()
+        return (frame_idx / self.fps if self.fps else None), img
+
+    def skip(self):
+        return self._read_bytes() is not None
+
+    def release(self):
+        if self.process is not None:
+            self.process.stdout.close()
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+
+class VideoReader:
+    """在后台线程中解码视频帧，推理线程无需等待解码
+
+    Args:
+        video_path: 视频文件路径
+        prefetch: 预读帧数上限，默认为64
+        start_frame: 从第几帧开始读取（从0开始），默认为0
+        stride: 抽帧步长，每隔 ``stride`` 帧读取一帧，跳过的帧不做颜色
+            转换，默认为1
+        end_frame: 读取到第几帧之前结束（不含），默认读到视频结尾
+        backend: ``'auto'``、``'opencv'``、``'pyav'`` 或 ``'ffmpeg'``，
+            默认为 ``'auto'``（有PyAV时使用PyAV，否则使用OpenCV）
+        hw_accel: 是否请求硬件解码（OpenCV和ffmpeg后端），默认为False
+    """
+
+    def __init__(self,
+                 video_path,
+                 prefetch=64,
+                 start_frame=0,
+                 stride=1,
+                 end_frame=None,
+                 backend='auto',
+                 hw_accel=False):
+        if backend == 'auto':
+            backend = 'pyav' if has_av else 'opencv'
+        self.backend = _check_backend(backend)
+        if backend == 'pyav':
+            self.source = _PyAVSource(video_path)
+        elif backend == 'ffmpeg':
+            self.source = _FFmpegSource(video_path, hw_accel)
+        else:
+            self.source = _OpenCVSource(video_path, hw_accel)
+        self.video_path = video_path
+        self.fps = self.source.fps
+        self.width = self.source.width
+        self.height = self.source.height
+        self.total_frames = self.source.total_frames
+        self.start_frame = start_frame
+        self.stride = max(int(stride), 1)
+        self.end_frame = end_frame
+        if start_frame > 0:
+            self.source.seek(start_frame)
+
+        self._error = None
+        self._queue = queue.Queue(maxsize=prefetch)
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._read_loop, daemon=True)
+        self._thread.start()
+
+    @property
+    def num_frames(self):
+        """将要读取的帧数（视频总帧数未知时为0）"""
+        end = self.total_frames if self.end_frame is None else min(self.end_frame, self.total_frames)
+        return max(0, (end - self.start_frame + self.stride - 1) // self.stride)
+
+    def __iter__(self):
+        """依次产生 (帧序号, 时间戳, BGR图像)，帧序号为视频中的原始帧序号
+
+        解码出错（如视频文件损坏）时，在已读出的帧之后抛出该异常。
+        """
+        while True:
+            item = self._queue.get()
+            if item is _END_OF_VIDEO:
+                if self._error is not None:
+                    raise self._error
+                return
+            yield item
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """停止后台读取并释放视频"""
+        self._stop_event.set()
+        # 取出队列中的帧，使阻塞的读取线程退出
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        self.source.release()
+
+    def _read_loop(self):
+        frame_idx = self.start_frame
+        try:
+            while not self._stop_event.is_set():
+                if self.end_frame is not None and frame_idx >= self.end_frame:
+                    break
+                result = self.source.read(frame_idx)
+                if result is None:
+                    break
+                timestamp, img = result
+                self._put((frame_idx, timestamp, img))
+                frame_idx += 1
+                for _ in range(self.stride - 1):
+                    if not self.source.skip():
+                        break
+                    frame_idx += 1
+        except Exception as e:
+            self._error = e
+        finally:
+            # 出错时也要发出结束标记，否则迭代端会一直阻塞
+            self._put(_END_OF_VIDEO)
+
+    def _put(self, item):
+        while not self._stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+
+class _OpenCVSink:
+
+    def __init__(self, path, fps, size, codec=None):
+        self.writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*(codec or 'mp4v')), fps, size)
+        if not self.writer.isOpened():
+            raise IOError(f'无法创建视频文件: {path}')
+
+    def write(self, img):
+        self.writer.write(img)
+
+    def close(self):
+        self.writer.release()
+
+
+class _PyAVSink:
+
+    def __init__(self, path, fps, size, codec=None):
+        self.container = av.open(path, 'w')
+        self.stream = self.container.add_stream(codec or 'libx264', rate=Fraction(fps).limit_denominator(1001))
+        # yuv420p要求宽高为偶数
+        self.width, self.height = size[0] // 2 * 2, size[1] // 2 * 2
+        self.stream.width = self.width
+        self.stream.height = self.height
+        self.stream.pix_fmt = 'yuv420p'
+
+    def write(self, img):
+        frame = av.VideoFrame.from_ndarray(
+            np.ascontiguousarray(img[:self.height, :self.width]), format='bgr24')
+        for packet in self.stream.encode(frame):
+            self.container.mux(packet)
+
+    def close(self):
+        for packet in self.stream.encode():
+            self.container.mux(packet)
+        self.container.close()
+
+
+class _FFmpegSink:
+
+    def __init__(self, path, fps, size, codec=None):
+        self.size = size
+        cmd = [
+            FFMPEG_BINARY, '-y', '-v', 'error', '-f', 'rawvideo', '-pix_fmt', 'bgr24', '-s', f'{size[0]}x{size[1]}',
+            '-r', f'{fps:.6f}', '-i', '-', '-c:v', codec or 'libx264', '-pix_fmt', 'yuv420p', '-vf',
+            'pad=ceil(iw/2)*2:ceil(ih/2)*2', path
+        ]
+        self.process = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+
+    def write(self, img):
+        self.process.stdin.write(np.ascontiguousarray(img).tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise IOError('ffmpeg编码失败')
+
+
+class AsyncVideoWriter:
+    """在后台线程中编码视频，``write`` 只把帧放入队列
+
+    视频尺寸由第一帧确定。``fps`` 为None时根据前 ``fps_probe_frames`` 帧的
+    时间戳估计实际帧率（适用于实时摄像头，输出视频的播放速度与真实时间
+    一致），离线处理视频时应传入原视频的帧率。
+
+    Args:
+        path: 输出视频路径
+        fps: 输出帧率，为None时由时间戳估计
+        backend: ``'auto'``、``'opencv'``、``'pyav'`` 或 ``'ffmpeg'``，
+            默认为 ``'auto'``（依次尝试PyAV、ffmpeg命令和OpenCV）
+        codec: 编码器，OpenCV后端为FourCC（默认 ``'mp4v'``），PyAV和
+            ffmpeg后端为编码器名称（默认 ``'libx264'``，如 ``'h264_nvenc'``）
+        queue_size: 编码队列长度，默认为64
+        drop_frames: 队列满时是否丢弃新帧而不是等待编码，默认为False
+        fps_probe_frames: 估计帧率使用的帧数，默认为30
+    """
+
+    def __init__(self,
+                 path,
+                 fps=None,
+                 backend='auto',
+                 codec=None,
+                 queue_size=64,
+                 drop_frames=False,
+                 fps_probe_frames=30):
+        if backend == 'auto':
+            backend = 'pyav' if has_av else ('ffmpeg' if FFMPEG_BINARY else 'opencv')
+        self.backend = _check_backend(backend)
+        self.path = path
+        self.fps = fps
+        self.codec = codec
+        self.drop_frames = drop_frames
+        self.fps_probe_frames = fps_probe_frames
+        self.num_written = 0
+        self.num_dropped = 0
+        self._error = None
+        self._closed = False
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, img, timestamp=None):
+        """放入一帧BGR图像，``timestamp`` 用于估计帧率，默认为当前时间"""
+        if self._error is not None:
+            raise self._error
+        item = (img, time.time() if timestamp is None else timestamp)
+        if not self.drop_frames:
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.num_dropped += 1
+
+    def close(self):
+        """等待队列中的帧编码完成并关闭文件"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_END_OF_VIDEO)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+    def _open(self, fps, img):
+        size = (img.shape[1], img.shape[0])
+        if self.backend == 'pyav':
+            return _PyAVSink(self.path, fps, size, self.codec)
+        if self.backend == 'ffmpeg':
+            return _FFmpegSink(self.path, fps, size, self.codec)
+        return _OpenCVSink(self.path, fps, size, self.codec)
+
+    @staticmethod
+    def _estimate_fps(timestamps):
+        intervals = np.diff(timestamps)
+        intervals = intervals[intervals > 0]
+        return round(float(1.0 / np.median(intervals)), 2) if len(intervals) else 25.0
+
+    def _write_loop(self):
+        sink = None
+        pending = []
+        done = False
+        try:
+            while not done:
+                item = self._queue.get()
+                done = item is _END_OF_VIDEO
+                if not done:
+                    if sink is not None:
+                        sink.write(item[0])
+                        self.num_written += 1
+                        continue
+                    # 未指定帧率时先缓存若干帧用于估计帧率
+                    pending.append(item)
+                    if self.fps is None and len(pending) < self.fps_probe_frames:
+                        continue
+                if sink is None and pending:
+                    if self.fps is None:
+                        self.fps = self._estimate_fps([t for _, t in pending])
+                    sink = self._open(self.fps, pending[0][0])
+                    for img, _ in pending:
+                        sink.write(img)
+                        self.num_written += 1
+                    pending = []
+        except Exception as e:
+            self._error = e
+            # 继续取出队列中的帧，避免写入端阻塞
+            while not done:
+                done = self._queue.get() is _END_OF_VIDEO
+        finally:
+            if sink is not None:
+                try:
+                    sink.close()
+                except Exception as e:
+                    self._error = self._error or e
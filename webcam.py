@@ -20,6 +20,7 @@ from mmpose.evaluation.functional import nms
 from mmpose.registry import VISUALIZERS
 from mmpose.structures import merge_data_samples, split_instances
 from mmpose.utils import adapt_mmdet_pipeline
+from video_io import AsyncVideoWriter, VideoReader
 
 try:
     from mmdet.apis import inference_detector, init_detector
@@ -393,33 +394,27 @@ def main():
     visualizer.set_dataset_meta(
         pose_estimator.dataset_meta, skeleton_style=args.skeleton_style)
     
-    # 打开视频文件
-    cap = cv2.VideoCapture(input_file)
-    video_writer = None
+    # 打开视频文件（后台线程预读解码）
+    reader = VideoReader(input_file)
     pred_instances_list = []
-    frame_idx = 0
 
     # 获取视频信息
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    fps = reader.fps
+    width = reader.width
+    height = reader.height
+    total_frames = reader.total_frames
     
     print(f"处理视频: {input_file}")
     print(f"总帧数: {total_frames}, FPS: {fps}, 分辨率: {width}x{height}")
 
-    # 初始化视频写入器
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    # 初始化视频写入器（后台线程编码，使用原始视频的帧率）
+    video_writer = AsyncVideoWriter(output_file, fps=fps or 25.0)
     
     progress_step = max(1, total_frames // 100)  # 每处理1%的帧数更新一次进度
 
-    while cap.isOpened():
-        success, frame = cap.read()
+    for frame_idx, _, frame in reader:
         frame_idx += 1
 
-        if not success:
-            break
-            
         # 显示处理进度
         if frame_idx % progress_step == 0:
             progress = (frame_idx / total_frames) * 100
@@ -440,20 +435,11 @@ def main():
         # 获取可视化后的帧
         frame_vis = visualizer.get_image()
         
-        # 输出视频
-        if video_writer is None:
-            # 可视化图像的大小可能会因热图的存在而变化
-            video_writer = cv2.VideoWriter(
-                output_file,
-                fourcc,
-                fps,  # 使用原始视频的帧率
-                (frame_vis.shape[1], frame_vis.shape[0]))
-
+        # 输出视频（视频尺寸由第一帧确定，可能会因热图的存在而变化）
         video_writer.write(mmcv.rgb2bgr(frame_vis))
 
-    cap.release()
-    if video_writer:
-        video_writer.release()
+    reader.close()
+    video_writer.close()
     cv2.destroyAllWindows()
     
     print(f"处理完成，输出文件: {output_file}")
@@ -5,27 +5,26 @@ import mimetypes
 import os
 import time
 from argparse import ArgumentParser
-import math
 
 import cv2
-import json_tricks as json
 import mmcv
 import mmengine
 import numpy as np
 from mmengine.logging import print_log
 
-from mmpose.apis import inference_topdown
-from mmpose.apis import init_model as init_pose_estimator
 from mmpose.evaluation.functional import nms
 from mmpose.registry import VISUALIZERS
-from mmpose.structures import merge_data_samples, split_instances
-from mmpose.utils import adapt_mmdet_pipeline
-
-try:
-    from mmdet.apis import inference_detector, init_detector
-    has_mmdet = True
-except (ImportError, ModuleNotFoundError):
-    has_mmdet = False
+from mmpose.structures import merge_data_samples
+from batch_analysis import POSTURE_METRICS, analyze_body_posture_batch, derive_custom_keypoints_batch
+from config import NORMAL_RANGES
+from inference_backend import build_detector, build_pose_estimator, has_mmdet
+from keypoint_layout import DERIVED_KEYPOINTS, derive_keypoints, get_keep_mask
+from keypoint_smoothing import KeypointSmoother
+from metric_registry import in_range, parse_range
+from pose_pipeline import PosePipeline
+from pose_tracker import PoseTracker
+from session_store import SessionStore
+from video_io import AsyncVideoWriter
 
 
 # 定义配置常量
@@ -61,6 +60,13 @@ class Config:
     def __init__(self):
         # 设备配置
         self.device = 'cuda:0'  # 使用GPU (cuda:0) 或 CPU ('cpu')
+
+        # 推理后端配置（inference_backend.py）
+        self.backend = 'pytorch'       # 'pytorch'（mmdet + mmpose）或 'onnxruntime'（只加载ONNX模型，启动更快）
+        self.det_onnx = ''             # onnxruntime后端的检测模型（mmdeploy导出的RTMDet end2end.onnx）
+        self.pose_onnx = ''            # onnxruntime后端的姿态模型（python inference_backend.py 导出）
+        self.ort_num_threads = 0       # onnxruntime每个模型的算子内线程数，0表示使用默认值
+        self.ort_io_binding = None     # 是否使用IO绑定，None表示仅在GPU上使用
         
         # 人体检测器配置
         self.det_config = MODEL_CONFIGS['det']['config']
@@ -78,6 +84,8 @@ class Config:
         self.thickness = MODEL_CONFIGS['pose']['thickness']
         self.alpha = MODEL_CONFIGS['pose']['alpha']
         self.show_posture_analysis = MODEL_CONFIGS['pose']['show_posture_analysis']
+        # 姿态模型只计算和解码这些关键点（身体和足部0-22），为None时解码全部关键点
+        self.pose_keypoint_indices = list(range(23))
         
         # 可视化配置
         self.draw_heatmap = False     # 是否绘制热图
@@ -94,6 +102,24 @@ class Config:
         
         # 性能指标
         self.fps = False               # 是否显示FPS
+
+        # 流水线配置
+        self.pipelined = True          # 采集/检测/姿态估计/渲染在独立线程中并行
+        self.pipeline_queue_size = 2   # 流水线阶段之间的队列长度
+        self.stats_interval = 100      # 每处理多少帧打印一次各阶段延迟与吞吐，0表示不打印
+
+        # 多路视频源配置（multi_camera.py）
+        self.camera_sources = [0]      # 视频源列表：摄像头ID、视频文件路径或RTSP地址
+        self.pose_batch_size = 32      # 多路画面的裁剪图像合并推理时每批的数量
+
+        # 边界框跟踪配置
+        self.det_interval = 1          # 每隔多少帧运行一次检测器，大于1时其余帧由上一帧关键点推算边界框
+        self.track_score_thr = 0.5     # 跟踪关键点平均置信度低于该值时立即重新检测
+
+        # 关键点时间平滑配置
+        self.smooth_method = None      # 平滑方法：None（不平滑）、'one_euro'、'kalman' 或 'savgol'
+        self.smooth_kpt_thr = 0.3      # 参与平滑的关键点置信度阈值
+        self.smooth_params = {}        # 传给平滑滤波器的参数，如 {'min_cutoff': 1.0, 'beta': 0.05}
         
         # 可视化过滤选项
         self.draw_hands = False       # 不绘制手部关键点
@@ -106,135 +132,70 @@ class Config:
         self.custom_keypoint_thickness = 4   # 自定义连接线粗细（比普通线条稍粗）
 
 
-def filter_keypoints(data_samples, args=None):
-    """过滤关键点，只保留需要的关键点（鼻子、双耳、身体和足部，去除手部和其他面部关键点）"""
-    if hasattr(data_samples, 'pred_instances'):
-        for i in range(len(data_samples.pred_instances)):
-            # 获取关键点和分数
-            keypoints = data_samples.pred_instances.keypoints[i]
-            keypoint_scores = data_samples.pred_instances.keypoint_scores[i]
-            
-            # 需要保留的关键点索引列表（0-16: 身体关键点, 17-22: 足部关键点）
-            # 面部只保留鼻子和耳朵 (索引0, 3, 4)
-            remove_indices = [1, 2]  # 移除眼睛关键点 (索引1, 2为左右眼)
-            
-            # 移除除鼻子和耳朵外的面部关键点 (索引23-90)
-            for idx in range(23, 91):
-                remove_indices.append(idx)
-            
-            # 移除手部关键点 (索引91-132)
-            for idx in range(91, 133):
-                remove_indices.append(idx)
-            
-            # 设置需要移除的关键点的置信度为0，坐标为无效值
-            for idx in remove_indices:
-                if idx < len(keypoint_scores):
-                    keypoint_scores[idx] = 0.0
-                    keypoints[idx, :] = -1
-            
-            # 更新数据
-            data_samples.pred_instances.keypoints[i] = keypoints
-            data_samples.pred_instances.keypoint_scores[i] = keypoint_scores
-            
-            # 新增关键点的列表
-            new_keypoints = []
-            new_keypoint_scores = []
-            
-            # 添加两个新的估算关键点
-            # 假设骨盆关键点（髋部）在身体关键点中的索引为11和12
-            # 注意：实际索引取决于具体模型，可能需要调整
-            HIP_LEFT_IDX = 11
-            HIP_RIGHT_IDX = 12
-            
-            # 假设颈部关键点在身体关键点中的索引为5和6
-            # 注意：可能需要根据实际模型调整
-            NECK_BASE_IDX = 5  # 肩膀中心或胸部顶端
-            NOSE_IDX = 0  # 鼻子
-            LEFT_SHOULDER_IDX = 5  # 左肩
-            RIGHT_SHOULDER_IDX = 6  # 右肩
-            
-            # 1. 计算髂前上棘连线中点
-            # 根据配置选项决定是否添加髂前上棘中点
-            if args is None or args.draw_iliac_midpoint:
-                # 检查左右髋部关键点是否有效
-                if (keypoint_scores[HIP_LEFT_IDX] > 0.5 and 
-                    keypoint_scores[HIP_RIGHT_IDX] > 0.5):
-                    # 计算髋部中点
-                    iliac_x = (keypoints[HIP_LEFT_IDX, 0] + keypoints[HIP_RIGHT_IDX, 0]) / 2
-                    iliac_y = (keypoints[HIP_LEFT_IDX, 1] + keypoints[HIP_RIGHT_IDX, 1]) / 2
-                    
-                    # 添加到新关键点列表
-                    new_keypoints.append([iliac_x, iliac_y])
-                    # 添加对应的置信度分数
-                    avg_score = (keypoint_scores[HIP_LEFT_IDX] + keypoint_scores[HIP_RIGHT_IDX]) / 2
-                    new_keypoint_scores.append(avg_score)
-            
-            # 2. 计算颈椎中点（喉结处）
-            if args is None or args.draw_neck_midpoint:
-                # 检查是否能获取有效的肩膀和鼻子关键点
-                valid_shoulders = (keypoint_scores[LEFT_SHOULDER_IDX] > 0.5 and 
-                                  keypoint_scores[RIGHT_SHOULDER_IDX] > 0.5)
-                valid_nose = keypoint_scores[NOSE_IDX] > 0.5
-                
-                if valid_shoulders and valid_nose:
-                    # 首先计算左右肩膀的水平中点
-                    shoulder_mid_x = (keypoints[LEFT_SHOULDER_IDX, 0] + keypoints[RIGHT_SHOULDER_IDX, 0]) / 2
-                    shoulder_mid_y = (keypoints[LEFT_SHOULDER_IDX, 1] + keypoints[RIGHT_SHOULDER_IDX, 1]) / 2
-                    
-                    # 然后计算喉结位置 - 在肩膀中点和鼻子之间的位置
-                    # 通常喉结在肩膀中点到鼻子连线的下三分之一处
-                    neck_midpoint_x = shoulder_mid_x + (keypoints[NOSE_IDX, 0] - shoulder_mid_x) / 3
-                    neck_midpoint_y = shoulder_mid_y + (keypoints[NOSE_IDX, 1] - shoulder_mid_y) / 3
-                    
-                    # 添加到新关键点列表
-                    new_keypoints.append([neck_midpoint_x, neck_midpoint_y])
-                    # 添加对应的置信度分数
-                    avg_score = (keypoint_scores[LEFT_SHOULDER_IDX] + 
-                                keypoint_scores[RIGHT_SHOULDER_IDX] + 
-                                keypoint_scores[NOSE_IDX]) / 3
-                    new_keypoint_scores.append(avg_score)
-            
-            # 记录新添加的关键点数量，用于可视化时识别
-            # 注意：这里我们不修改原始数组，而是在数据样本中存储新关键点
-            if new_keypoints:
-                # 将新关键点和分数转换为numpy数组
-                new_keypoints_array = np.array(new_keypoints)
-                new_keypoint_scores_array = np.array(new_keypoint_scores)
-                
-                # 将新关键点和分数存储到数据样本中，供后续处理
-                if not hasattr(data_samples, 'custom_keypoints'):
-                    data_samples.custom_keypoints = []
-                    data_samples.custom_keypoint_scores = []
-                
-                data_samples.custom_keypoints.append(new_keypoints_array)
-                data_samples.custom_keypoint_scores.append(new_keypoint_scores_array)
-    
+def expand_keypoint_subset(data_samples, args, num_keypoints):
+    """将只包含关键点子集的预测结果还原为完整的关键点布局
+
+    未解码的关键点坐标为-1、置信度为0，后续的过滤、可视化和分析代码无需
+    区分是否启用了关键点子集。
+    """
+    indices = getattr(args, 'pose_keypoint_indices', None)
+    pred_instances = getattr(data_samples, 'pred_instances', None)
+    if indices is None or pred_instances is None or len(pred_instances) == 0:
+        return data_samples
+    if pred_instances.keypoints.shape[1] == num_keypoints:
+        return data_samples
+
+    for key, value in pred_instances.all_items():
+        if not key.startswith('keypoint'):
+            continue
+        fill_value = -1 if key == 'keypoints' else 0
+        full = np.full((value.shape[0], num_keypoints) + value.shape[2:], fill_value, dtype=value.dtype)
+        full[:, indices] = value
+        pred_instances.set_field(full, key)
     return data_samples
 
 
-def calculate_angle(p1, p2, p3=None):
-    """计算两点或三点之间的角度
-    
-    如果只有两个点，计算与水平线的角度
-    如果有三个点，计算三点形成的角度
+def filter_keypoints(data_samples, args=None):
+    """过滤关键点，只保留需要的关键点（鼻子、双耳、身体和足部，去除手部和其他面部关键点）
+
+    需要保留的关键点由 :func:`keypoint_layout.get_keep_mask` 按关键点布局
+    预先计算，对所有实例一次完成掩码赋值；自定义关键点按
+    :data:`keypoint_layout.DERIVED_KEYPOINTS` 的定义批量计算。每个实例只保存
+    有效的自定义关键点，没有有效自定义关键点的实例对应一个空数组。
     """
-    if p3 is None:
-        # 计算与水平线的角度
-        return math.degrees(math.atan2(p2[1] - p1[1], p2[0] - p1[0]))
-    else:
-        # 计算三点角度
-        ang = math.degrees(
-            math.atan2(p3[1] - p2[1], p3[0] - p2[0]) - 
-            math.atan2(p1[1] - p2[1], p1[0] - p2[0]))
-        return ang + 360 if ang < 0 else ang
+    if not hasattr(data_samples, 'pred_instances') or len(data_samples.pred_instances) == 0:
+        return data_samples
+
+    keypoints = data_samples.pred_instances.keypoints
+    keypoint_scores = data_samples.pred_instances.keypoint_scores
+
+    # 设置需要移除的关键点的置信度为0，坐标为无效值
+    removed = ~get_keep_mask(keypoint_scores.shape[1])
+    keypoints[:, removed] = -1
+    keypoint_scores[:, removed] = 0.0
+    data_samples.pred_instances.keypoints = keypoints
+    data_samples.pred_instances.keypoint_scores = keypoint_scores
+
+    # 根据配置选项决定添加哪些自定义关键点
+    derived = [item for item in DERIVED_KEYPOINTS if args is None or getattr(args, item.option)]
+    if not derived:
+        return data_samples
+    new_keypoints, new_keypoint_scores, valid = derive_keypoints(keypoints, keypoint_scores, derived)
+    if not valid.any():
+        return data_samples
+
+    # 将有效的新关键点和分数存储到数据样本中，供后续处理
+    data_samples.custom_keypoints = [kpts[v] for kpts, v in zip(new_keypoints, valid)]
+    data_samples.custom_keypoint_scores = [scores[v] for scores, v in zip(new_keypoint_scores, valid)]
+    return data_samples
 
-def calculate_distance(p1, p2):
-    """计算两点之间的欧几里得距离"""
-    return math.sqrt((p2[0] - p1[0])**2 + (p2[1] - p1[1])**2)
 
 def analyze_body_posture(keypoints, keypoint_scores, custom_keypoints=None, return_keypoints=False):
     """分析身体姿态并计算各种体态测量值
     
+    数值由 :func:`batch_analysis.analyze_body_posture_batch` 计算，离线处理多帧
+    时可直接调用批量版本。
+    
     Args:
         keypoints: 关键点坐标数组，形状为(N, 2)
         keypoint_scores: 关键点置信度，形状为(N,)
@@ -244,218 +205,31 @@ def analyze_body_posture(keypoints, keypoint_scores, custom_keypoints=None, retu
     Returns:
         dict: 包含各种体态测量值的字典，或者自定义关键点列表（如果return_keypoints=True）
     """
-    # 关键点索引 (根据RTMPose全身模型)
-    NOSE_IDX = 0
-    LEFT_EYE_IDX = 1
-    RIGHT_EYE_IDX = 2
-    LEFT_EAR_IDX = 3
-    RIGHT_EAR_IDX = 4
-    LEFT_SHOULDER_IDX = 5
-    RIGHT_SHOULDER_IDX = 6
-    LEFT_ELBOW_IDX = 7
-    RIGHT_ELBOW_IDX = 8
-    LEFT_WRIST_IDX = 9
-    RIGHT_WRIST_IDX = 10
-    LEFT_HIP_IDX = 11
-    RIGHT_HIP_IDX = 12
-    LEFT_KNEE_IDX = 13
-    RIGHT_KNEE_IDX = 14
-    LEFT_ANKLE_IDX = 15
-    RIGHT_ANKLE_IDX = 16
-    
-    # 计算自定义关键点索引
-    ILIAC_MIDPOINT_IDX = 0  # 髂前上棘连线中点
-    NECK_MIDPOINT_IDX = 1   # 颈椎中点（喉结处）
-    
-    results = {
-        '头前倾角': None,
-        '头侧倾角': None,
-        '头旋转角': None,
-        '肩倾斜角': None,
-        '圆肩角': None,
-        '背部角': None,
-        '腹部肥胖度': None,
-        '腰曲度': None,
-        '骨盆前倾角': None,
-        '侧中位度': None,
-        '腿型-左腿': None,
-        '腿型-右腿': None,
-        '左膝评估角': None,
-        '右膝评估角': None,
-        '身体倾斜度': None,
-        '足八角': None
-    }
-    
-    # 只有当关键点有效时才计算
-    valid_keypoints = {}
-    
-    # 验证关键点有效性
-    def is_valid(idx):
-        return idx < len(keypoint_scores) and keypoint_scores[idx] > 0.5
-    
-    # 获取有效关键点
-    for idx in range(len(keypoint_scores)):
-        if is_valid(idx):
-            valid_keypoints[idx] = keypoints[idx]
+    if return_keypoints:
+        new_keypoints, _ = derive_custom_keypoints_batch(keypoints, keypoint_scores)
+        return new_keypoints[0].tolist()
     
-    # 获取自定义关键点
-    custom_points = {}
+    # 自定义关键点的置信度取关键点置信度的最后几项
+    custom_scores = None
     if custom_keypoints is not None and len(custom_keypoints) > 0:
-        custom_scores = keypoint_scores[-len(custom_keypoints):]
-        for idx, kpt in enumerate(custom_keypoints):
-            if idx < len(custom_scores) and custom_scores[idx] > 0.5:
-                custom_points[idx] = kpt
-    
-    # 计算自定义关键点
-    new_keypoints = []
-    
-    # 1. 计算髂前上棘连线中点
-    if is_valid(LEFT_HIP_IDX) and is_valid(RIGHT_HIP_IDX):
-        # 计算髂前上棘连线中点
-        iliac_x = (valid_keypoints[LEFT_HIP_IDX][0] + valid_keypoints[RIGHT_HIP_IDX][0]) / 2
-        iliac_y = (valid_keypoints[LEFT_HIP_IDX][1] + valid_keypoints[RIGHT_HIP_IDX][1]) / 2
-        new_keypoints.append([iliac_x, iliac_y])
-    else:
-        # 如果无法计算，添加一个无效的点
-        new_keypoints.append([-1, -1])
-    
-    # 2. 计算颈椎中点
-    if is_valid(LEFT_SHOULDER_IDX) and is_valid(RIGHT_SHOULDER_IDX) and is_valid(NOSE_IDX):
-        # 首先计算左右肩膀的水平中点
-        shoulder_mid_x = (valid_keypoints[LEFT_SHOULDER_IDX][0] + valid_keypoints[RIGHT_SHOULDER_IDX][0]) / 2
-        shoulder_mid_y = (valid_keypoints[LEFT_SHOULDER_IDX][1] + valid_keypoints[RIGHT_SHOULDER_IDX][1]) / 2
-        
-        # 然后计算喉结位置 - 在肩膀中点和鼻子之间的位置
-        neck_midpoint_x = shoulder_mid_x + (valid_keypoints[NOSE_IDX][0] - shoulder_mid_x) / 3
-        neck_midpoint_y = shoulder_mid_y + (valid_keypoints[NOSE_IDX][1] - shoulder_mid_y) / 3
-        new_keypoints.append([neck_midpoint_x, neck_midpoint_y])
+        custom_scores = np.zeros(len(custom_keypoints))
+        tail_scores = np.asarray(keypoint_scores)[-len(custom_keypoints):]
+        custom_scores[:len(tail_scores)] = tail_scores
     else:
-        # 如果无法计算，添加一个无效的点
-        new_keypoints.append([-1, -1])
-    
-    # 如果需要返回自定义关键点
-    if return_keypoints:
-        return new_keypoints
-    
-    # 1. 计算头前倾角
-    if is_valid(NOSE_IDX) and NECK_MIDPOINT_IDX in custom_points:
-        results['头前倾角'] = abs(calculate_angle(valid_keypoints[NOSE_IDX], custom_points[NECK_MIDPOINT_IDX]) - 90)
-    
-    # 2. 计算头侧倾角
-    if is_valid(LEFT_EAR_IDX) and is_valid(RIGHT_EAR_IDX):
-        ear_angle = abs(calculate_angle(valid_keypoints[LEFT_EAR_IDX], valid_keypoints[RIGHT_EAR_IDX]))
-        results['头侧倾角'] = abs(ear_angle - 0 if ear_angle <= 90 else 180 - ear_angle)
-    
-    # 3. 计算头旋转角
-    if is_valid(LEFT_EAR_IDX) and is_valid(RIGHT_EAR_IDX) and is_valid(NOSE_IDX):
-        left_dist = calculate_distance(valid_keypoints[NOSE_IDX], valid_keypoints[LEFT_EAR_IDX])
-        right_dist = calculate_distance(valid_keypoints[NOSE_IDX], valid_keypoints[RIGHT_EAR_IDX])
-        ratio = abs(left_dist - right_dist) / ((left_dist + right_dist) / 2)
-        results['头旋转角'] = ratio * 45  # 粗略估计，最大45度
-    
-    # 4. 计算肩倾斜角
-    if is_valid(LEFT_SHOULDER_IDX) and is_valid(RIGHT_SHOULDER_IDX):
-        shoulder_angle = abs(calculate_angle(valid_keypoints[LEFT_SHOULDER_IDX], valid_keypoints[RIGHT_SHOULDER_IDX]))
-        results['肩倾斜角'] = abs(shoulder_angle - 0 if shoulder_angle <= 90 else 180 - shoulder_angle)
-    
-    # 5. 计算圆肩角
-    if is_valid(LEFT_SHOULDER_IDX) and is_valid(RIGHT_SHOULDER_IDX) and NECK_MIDPOINT_IDX in custom_points:
-        # 取肩膀中点
-        shoulder_mid_x = (valid_keypoints[LEFT_SHOULDER_IDX][0] + valid_keypoints[RIGHT_SHOULDER_IDX][0]) / 2
-        shoulder_mid_y = (valid_keypoints[LEFT_SHOULDER_IDX][1] + valid_keypoints[RIGHT_SHOULDER_IDX][1]) / 2
-        shoulder_mid = [shoulder_mid_x, shoulder_mid_y]
-        
-        # 计算肩膀中点-颈部中点-鼻子的角度
-        if is_valid(NOSE_IDX):
-            results['圆肩角'] = calculate_angle(shoulder_mid, custom_points[NECK_MIDPOINT_IDX], valid_keypoints[NOSE_IDX])
+        custom_keypoints = np.zeros((0, 2))
+        custom_scores = np.zeros(0)
     
-    # 6. 计算背部角
-    if is_valid(LEFT_SHOULDER_IDX) and is_valid(LEFT_HIP_IDX) and is_valid(LEFT_KNEE_IDX):
-        results['背部角'] = calculate_angle(valid_keypoints[LEFT_SHOULDER_IDX], valid_keypoints[LEFT_HIP_IDX], valid_keypoints[LEFT_KNEE_IDX])
-    elif is_valid(RIGHT_SHOULDER_IDX) and is_valid(RIGHT_HIP_IDX) and is_valid(RIGHT_KNEE_IDX):
-        results['背部角'] = calculate_angle(valid_keypoints[RIGHT_SHOULDER_IDX], valid_keypoints[RIGHT_HIP_IDX], valid_keypoints[RIGHT_KNEE_IDX])
-    
-    # 7. 腹部肥胖度（简化估算）
-    if is_valid(LEFT_HIP_IDX) and is_valid(RIGHT_HIP_IDX) and is_valid(LEFT_SHOULDER_IDX) and is_valid(RIGHT_SHOULDER_IDX):
-        hip_width = calculate_distance(valid_keypoints[LEFT_HIP_IDX], valid_keypoints[RIGHT_HIP_IDX])
-        shoulder_width = calculate_distance(valid_keypoints[LEFT_SHOULDER_IDX], valid_keypoints[RIGHT_SHOULDER_IDX])
-        # 腰围与肩宽的比率作为肥胖度的粗略估计
-        results['腹部肥胖度'] = (hip_width / shoulder_width) * 100 - 65  # 调整为百分比
-    
-    # 8. 计算腰曲度
-    if ILIAC_MIDPOINT_IDX in custom_points and NECK_MIDPOINT_IDX in custom_points:
-        # 使用自定义的颈椎中点和髂前上棘中点计算腰曲度
-        back_angle = calculate_angle(custom_points[NECK_MIDPOINT_IDX], custom_points[ILIAC_MIDPOINT_IDX])
-        results['腰曲度'] = abs(back_angle - 90)
-    
-    # 9. 计算骨盆前倾角
-    if is_valid(LEFT_HIP_IDX) and is_valid(RIGHT_HIP_IDX) and ILIAC_MIDPOINT_IDX in custom_points:
-        hip_midpoint = [(valid_keypoints[LEFT_HIP_IDX][0] + valid_keypoints[RIGHT_HIP_IDX][0]) / 2,
-                        (valid_keypoints[LEFT_HIP_IDX][1] + valid_keypoints[RIGHT_HIP_IDX][1]) / 2]
-        pelvic_angle = calculate_angle(hip_midpoint, custom_points[ILIAC_MIDPOINT_IDX])
-        results['骨盆前倾角'] = pelvic_angle - 90
-    
-    # 10. 计算侧中位度
-    if is_valid(LEFT_SHOULDER_IDX) and is_valid(LEFT_HIP_IDX) and is_valid(LEFT_ANKLE_IDX):
-        results['侧中位度'] = 180 - calculate_angle(valid_keypoints[LEFT_SHOULDER_IDX], valid_keypoints[LEFT_HIP_IDX], valid_keypoints[LEFT_ANKLE_IDX])
-    elif is_valid(RIGHT_SHOULDER_IDX) and is_valid(RIGHT_HIP_IDX) and is_valid(RIGHT_ANKLE_IDX):
-        results['侧中位度'] = 180 - calculate_angle(valid_keypoints[RIGHT_SHOULDER_IDX], valid_keypoints[RIGHT_HIP_IDX], valid_keypoints[RIGHT_ANKLE_IDX])
-    
-    # 11-12. 计算腿型角度
-    if is_valid(LEFT_HIP_IDX) and is_valid(LEFT_KNEE_IDX) and is_valid(LEFT_ANKLE_IDX):
-        results['腿型-左腿'] = calculate_angle(valid_keypoints[LEFT_HIP_IDX], valid_keypoints[LEFT_KNEE_IDX], valid_keypoints[LEFT_ANKLE_IDX])
-    
-    if is_valid(RIGHT_HIP_IDX) and is_valid(RIGHT_KNEE_IDX) and is_valid(RIGHT_ANKLE_IDX):
-        results['腿型-右腿'] = calculate_angle(valid_keypoints[RIGHT_HIP_IDX], valid_keypoints[RIGHT_KNEE_IDX], valid_keypoints[RIGHT_ANKLE_IDX])
-    
-    # 13-14. 膝关节评估角
-    if is_valid(LEFT_HIP_IDX) and is_valid(LEFT_KNEE_IDX) and is_valid(LEFT_ANKLE_IDX):
-        results['左膝评估角'] = 180 - calculate_angle(valid_keypoints[LEFT_HIP_IDX], valid_keypoints[LEFT_KNEE_IDX], valid_keypoints[LEFT_ANKLE_IDX])
-    
-    if is_valid(RIGHT_HIP_IDX) and is_valid(RIGHT_KNEE_IDX) and is_valid(RIGHT_ANKLE_IDX):
-        results['右膝评估角'] = 180 - calculate_angle(valid_keypoints[RIGHT_HIP_IDX], valid_keypoints[RIGHT_KNEE_IDX], valid_keypoints[RIGHT_ANKLE_IDX])
-    
-    # 15. 身体倾斜度
-    if NECK_MIDPOINT_IDX in custom_points and ILIAC_MIDPOINT_IDX in custom_points:
-        body_tilt_angle = calculate_angle(custom_points[NECK_MIDPOINT_IDX], custom_points[ILIAC_MIDPOINT_IDX])
-        results['身体倾斜度'] = abs(body_tilt_angle - 90)
-    
-    # 16. 足八角
-    if is_valid(LEFT_ANKLE_IDX) and is_valid(RIGHT_ANKLE_IDX) and is_valid(LEFT_KNEE_IDX) and is_valid(RIGHT_KNEE_IDX):
-        left_foot_angle = calculate_angle(valid_keypoints[LEFT_KNEE_IDX], valid_keypoints[LEFT_ANKLE_IDX])
-        right_foot_angle = calculate_angle(valid_keypoints[RIGHT_KNEE_IDX], valid_keypoints[RIGHT_ANKLE_IDX])
-        feet_angle_diff = abs(left_foot_angle - right_foot_angle)
-        results['足八角'] = feet_angle_diff
+    values, masks = analyze_body_posture_batch(
+        keypoints, keypoint_scores, custom_keypoints=[custom_keypoints], custom_scores=[custom_scores])
     
     # 处理结果，保留一位小数
-    for key in results:
-        if results[key] is not None:
-            results[key] = round(results[key], 1)
-    
-    return results
+    return {
+        name: round(float(values[name][0]), 1) if masks[name][0] else None
+        for name in POSTURE_METRICS
+    }
 
 def display_posture_analysis(frame, results):
     """在命令行显示姿态分析结果，不再在图像上显示"""
-    # 正常范围的定义
-    normal_ranges = {
-        '头前倾角': '0°～5°',
-        '头侧倾角': '0°～2°',
-        '头旋转角': '0°～5°',
-        '肩倾斜角': '0°～2°',
-        '圆肩角': '>65°',
-        '背部角': '<39°',
-        '腹部肥胖度': '0%～35%',
-        '腰曲度': '0°～5°',
-        '骨盆前倾角': '-7°～7°',
-        '侧中位度': '175°～185°',
-        '腿型-左腿': '177°～183°',
-        '腿型-右腿': '177°～183°',
-        '左膝评估角': '175°～185°',
-        '右膝评估角': '175°～185°',
-        '身体倾斜度': '0°～2°',
-        '足八角': '-5°～11°'
-    }
-    
     # 打印到控制台
     print("\n===== 姿态分析结果 =====")
     print("参数数据\t测量值\t正常范围\t状态")
@@ -464,20 +238,9 @@ def display_posture_analysis(frame, results):
     for idx, (key, value) in enumerate(results.items()):
         if value is not None:
             # 检查是否在正常范围内
-            normal = True
-            range_str = normal_ranges.get(key, "")
-            
-            if '～' in range_str:
-                parts = range_str.replace('°', '').split('～')
-                min_val = float(parts[0].replace('%', ''))
-                max_val = float(parts[1].replace('%', ''))
-                normal = min_val <= value <= max_val
-            elif '<' in range_str:
-                max_val = float(range_str.replace('<', '').replace('°', '').replace('%', ''))
-                normal = value < max_val
-            elif '>' in range_str:
-                min_val = float(range_str.replace('>', '').replace('°', '').replace('%', ''))
-                normal = value > min_val
+            range_str = NORMAL_RANGES.get(key, "")
+            value_range = parse_range(range_str)
+            normal = value_range is None or bool(in_range(value, value_range))
             
             # 添加单位
             unit = '%' if '肥胖度' in key else '°'
@@ -489,26 +252,140 @@ def display_posture_analysis(frame, results):
     # 不修改图像，直接返回原始帧
     return frame
 
+def build_tracker(args):
+    """根据配置构建边界框跟踪器，det_interval不大于1时不启用跟踪"""
+    if args.det_interval <= 1:
+        return None
+    return PoseTracker(
+        det_interval=args.det_interval, score_thr=args.track_score_thr)
+
+
+def build_smoother(args):
+    """根据配置构建关键点时间平滑器，smooth_method为空时不启用平滑"""
+    method = getattr(args, 'smooth_method', None)
+    if not method:
+        return None
+    return KeypointSmoother(
+        method,
+        kpt_thr=getattr(args, 'smooth_kpt_thr', 0.3),
+        **getattr(args, 'smooth_params', {}))
+
+
+def detect_persons(args, img, detector, tracker=None, frame_idx=None):
+    """检测人体边界框，返回经过阈值过滤和NMS后的xyxy边界框，形状为(N, 4)
+
+    若提供跟踪器且跟踪状态有效，直接返回由上一帧关键点推算的边界框，
+    跳过检测器。``frame_idx`` 为帧序号，用于跟踪器丢弃过期的姿态结果。
+    """
+    if tracker is not None:
+        bboxes = tracker.predict_bboxes()
+        if bboxes is not None:
+            return bboxes
+
+    det_result = detector.detect([img])[0]
+    bboxes = select_person_bboxes(args, det_result)
+    if tracker is not None:
+        tracker.set_detections(bboxes, frame_idx)
+    return bboxes
+
+
+def select_person_bboxes(args, det_result):
+    """从检测结果中筛选人体边界框（类别、阈值过滤和NMS），返回形状为(N, 4)的xyxy边界框"""
+    bboxes = np.concatenate(
+        (det_result.bboxes, det_result.scores[:, None]), axis=1)
+    bboxes = bboxes[np.logical_and(det_result.labels == args.det_cat_id,
+                                   det_result.scores > args.bbox_thr)]
+    return bboxes[nms(bboxes, args.nms_thr), :4]
+
+
+def estimate_poses(args,
+                   img,
+                   bboxes,
+                   pose_estimator,
+                   tracker=None,
+                   smoother=None,
+                   timestamp=None,
+                   frame_idx=None):
+    """在给定边界框内估计关键点，并过滤关键点、添加自定义关键点
+
+    提供平滑器时，在过滤关键点之前对关键点做时间平滑，自定义关键点和后续
+    的体态、步态分析都基于平滑后的关键点。``timestamp`` 为帧时间戳（秒），
+    默认使用当前时间；``frame_idx`` 为帧序号，传递给跟踪器。
+    """
+    pose_results = pose_estimator.predict([(img, bboxes)])[0]
+    return postprocess_pose_results(args, img, bboxes, pose_results,
+                                    pose_estimator.dataset_meta['num_keypoints'],
+                                    tracker, smoother, timestamp, frame_idx)
+
+
+def postprocess_pose_results(args,
+                             img,
+                             bboxes,
+                             pose_results,
+                             num_keypoints,
+                             tracker=None,
+                             smoother=None,
+                             timestamp=None,
+                             frame_idx=None):
+    """合并单帧的姿态估计结果，更新跟踪器，做时间平滑并过滤关键点
+
+    ``pose_results`` 为该帧每个边界框的 ``PoseDataSample`` 列表，即
+    ``pose_estimator.predict`` 返回的某一帧的结果。
+    """
+    data_samples = merge_data_samples(pose_results)
+    data_samples = expand_keypoint_subset(data_samples, args, num_keypoints)
+
+    # 用过滤前的关键点推算下一帧的跟踪边界框
+    if tracker is not None:
+        if len(bboxes) > 0:
+            tracker.update(data_samples.pred_instances.keypoints,
+                           data_samples.pred_instances.keypoint_scores,
+                           img.shape[:2], frame_idx)
+        else:
+            tracker.reset(frame_idx)
+
+    # 平滑在filter_keypoints之前进行，使其派生的髂骨/颈部中点也基于平滑后的
+    # 关键点计算；被过滤的关键点置信度为0，本来也不参与平滑
+    if smoother is not None:
+        smoother.smooth_data_samples(
+            data_samples, time.time() if timestamp is None else timestamp)
+
+    # 过滤关键点数据，只保留鼻子、双耳和身体关键点，并添加自定义关键点
+    if (not args.draw_hands) or (not args.draw_face) or args.draw_iliac_midpoint or args.draw_neck_midpoint:
+        data_samples = filter_keypoints(data_samples, args)
+
+    return data_samples
+
+
 def process_one_image(args,
                       img,
                       detector,
                       pose_estimator,
                       visualizer=None,
-                      show_interval=0):
+                      show_interval=0,
+                      tracker=None,
+                      smoother=None,
+                      timestamp=None):
     """处理单张图像，预测关键点并可视化结果。"""
 
-    # 预测边界框
-    det_result = inference_detector(detector, img)
-    pred_instance = det_result.pred_instances.cpu().numpy()
-    bboxes = np.concatenate(
-        (pred_instance.bboxes, pred_instance.scores[:, None]), axis=1)
-    bboxes = bboxes[np.logical_and(pred_instance.labels == args.det_cat_id,
-                                   pred_instance.scores > args.bbox_thr)]
-    bboxes = bboxes[nms(bboxes, args.nms_thr), :4]
+    # 预测边界框（启用跟踪时，大部分帧直接使用跟踪边界框）
+    bboxes = detect_persons(args, img, detector, tracker)
 
     # 预测关键点
-    pose_results = inference_topdown(pose_estimator, img, bboxes)
-    data_samples = merge_data_samples(pose_results)
+    data_samples = estimate_poses(args, img, bboxes, pose_estimator, tracker,
+                                  smoother, timestamp)
+
+    # 分析体态并可视化
+    return render_pose_results(args, img, data_samples, visualizer,
+                               show_interval)
+
+
+def render_pose_results(args,
+                        img,
+                        data_samples,
+                        visualizer=None,
+                        show_interval=0):
+    """分析体态并将关键点和自定义关键点绘制到可视化器中"""
 
     # 确保图像是RGB格式用于MMPose处理
     img_rgb = img
@@ -518,10 +395,6 @@ def process_one_image(args,
         # 如果图像是BGR格式(从OpenCV获取的)，转换为RGB
         img_rgb = mmcv.bgr2rgb(img)
 
-    # 过滤关键点数据，只保留鼻子、双耳和身体关键点，并添加自定义关键点
-    if (not args.draw_hands) or (not args.draw_face) or args.draw_iliac_midpoint or args.draw_neck_midpoint:
-        data_samples = filter_keypoints(data_samples, args)
-
     # 分析体态并获取测量结果
     posture_results = None
     if hasattr(data_samples, 'pred_instances') and len(data_samples.pred_instances) > 0:
@@ -640,13 +513,97 @@ def process_one_image(args,
     return data_samples
 
 
+def iter_sequential_frames(args, cap, detector, pose_estimator, visualizer):
+    """在单线程中依次读取、推理和渲染每一帧
+
+    Yields:
+        tuple: (帧序号, 姿态估计结果, 可视化后的RGB图像)
+    """
+    frame_idx = 0
+    tracker = build_tracker(args)
+    smoother = build_smoother(args)
+    while cap.isOpened():
+        success, frame = cap.read()
+        frame_idx += 1
+
+        if not success:
+            break
+
+        # 姿态估计
+        pred_instances = process_one_image(args, frame, detector,
+                                          pose_estimator, visualizer,
+                                          0.001, tracker, smoother)
+        yield frame_idx, pred_instances, visualizer.get_image()
+
+
+def build_pose_pipeline(args, cap, detector, pose_estimator, visualizer,
+                        **kwargs):
+    """构建采集/检测/姿态估计/渲染四阶段流水线
+
+    各阶段复用 :func:`detect_persons`、:func:`estimate_poses` 和
+    :func:`render_pose_results`，其余关键字参数传递给
+    :class:`pose_pipeline.PosePipeline`。
+    """
+    tracker = build_tracker(args)
+    smoother = build_smoother(args)
+
+    def detect_stage(item):
+        item['bboxes'] = detect_persons(args, item['img'], detector, tracker,
+                                        item['frame_idx'])
+        return item
+
+    def pose_stage(item):
+        item['data_samples'] = estimate_poses(args, item['img'],
+                                              item['bboxes'], pose_estimator,
+                                              tracker, smoother,
+                                              item['timestamp'],
+                                              item['frame_idx'])
+        return item
+
+    def render_stage(item):
+        # 可视化器不是线程安全的，只在渲染阶段线程中使用
+        item['data_samples'] = render_pose_results(args, item['img'],
+                                                   item['data_samples'],
+                                                   visualizer)
+        item['frame_vis'] = visualizer.get_image()
+        return item
+
+    kwargs.setdefault('queue_size', args.pipeline_queue_size)
+    return PosePipeline(cap, detect_stage, pose_stage, render_stage,
+                        **kwargs)
+
+
+def iter_pipelined_frames(args, cap, detector, pose_estimator, visualizer):
+    """使用多线程流水线处理摄像头画面，产出最新完成的帧
+
+    Yields:
+        tuple: (帧序号, 姿态估计结果, 可视化后的RGB图像)
+    """
+    pipeline = build_pose_pipeline(args, cap, detector, pose_estimator,
+                                   visualizer)
+    pipeline.start()
+    num_outputs = 0
+    try:
+        while not pipeline.finished:
+            item = pipeline.read(timeout=1.0)
+            if item is None:
+                continue
+            num_outputs += 1
+            if args.stats_interval and num_outputs % args.stats_interval == 0:
+                print(f"流水线统计: {pipeline.format_stats()}")
+            yield item['frame_idx'], item['data_samples'], item['frame_vis']
+    finally:
+        pipeline.stop()
+        print(f"流水线统计: {pipeline.format_stats()}")
+
+
 def main():
     """使用MMDet进行人体检测，并使用RTMPose全身姿态估计模型进行姿态估计。"""
     
     # 使用程序内定义的配置参数
     args = Config()
     
-    assert has_mmdet, '请安装mmdet以运行演示。'
+    assert has_mmdet or args.backend == 'onnxruntime', '请安装mmdet以运行演示。'
     assert args.show or (args.output_root != ''), '必须设置show=True或提供输出路径'
 
     output_file = None
@@ -654,18 +611,9 @@ def main():
         mmengine.mkdir_or_exist(args.output_root)
         output_file = os.path.join(args.output_root, 'webcam.mp4')
 
-    # 构建检测器
-    detector = init_detector(
-        args.det_config, args.det_checkpoint, device=args.device)
-    detector.cfg = adapt_mmdet_pipeline(detector.cfg)
-
-    # 构建姿态估计器
-    pose_estimator = init_pose_estimator(
-        args.pose_config,
-        args.pose_checkpoint,
-        device=args.device,
-        cfg_options=dict(
-            model=dict(test_cfg=dict(output_heatmaps=args.draw_heatmap))))
+    # 构建检测器和姿态估计器（PyTorch或ONNX Runtime后端）
+    detector = build_detector(args)
+    pose_estimator = build_pose_estimator(args)
 
     # 构建可视化器
     pose_estimator.cfg.visualizer.radius = args.radius
@@ -679,8 +627,10 @@ def main():
     # 打开摄像头
     cap = cv2.VideoCapture(0)
     video_writer = None
-    pred_instances_list = []
-    frame_idx = 0
+    session_store = None
+    if args.save_predictions:
+        # 按块追加写入列式存储，不在内存中累积所有帧
+        session_store = SessionStore(os.path.join(args.output_root, 'session'))
 
     # 用于显示FPS的变量
     start_time = time.time()
@@ -694,12 +644,14 @@ def main():
     print("按ESC键退出程序")
     print("开始实时姿态分析...")
 
-    while cap.isOpened():
-        success, frame = cap.read()
-        frame_idx += 1
+    if args.pipelined:
+        frames = iter_pipelined_frames(args, cap, detector, pose_estimator,
+                                       visualizer)
+    else:
+        frames = iter_sequential_frames(args, cap, detector, pose_estimator,
+                                        visualizer)
 
-        if not success:
-            break
+    for frame_idx, pred_instances, frame_vis in frames:
 
         # 用于计算FPS
         if args.fps:
@@ -709,31 +661,15 @@ def main():
                 fps_count = 0
                 start_time = time.time()
 
-        # 姿态估计
-        pred_instances = process_one_image(args, frame, detector,
-                                          pose_estimator, visualizer,
-                                          0.001)
-
-        if args.save_predictions:
+        if session_store is not None:
             # 保存预测结果
-            pred_instances_list.append(
-                dict(
-                    frame_id=frame_idx,
-                    instances=split_instances(pred_instances)))
+            session_store.append_data_samples(frame_idx, time.time(), pred_instances)
 
-        # 获取可视化后的帧
-        frame_vis = visualizer.get_image()
-        
         # 输出视频
         if output_file:
             if video_writer is None:
-                fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-                # 可视化图像的大小可能会因热图的存在而变化
-                video_writer = cv2.VideoWriter(
-                    output_file,
-                    fourcc,
-                    25,  # 保存的帧率
-                    (frame_vis.shape[1], frame_vis.shape[0]))
+                # 后台线程编码，帧率由实际输出帧的时间间隔估计
+                video_writer = AsyncVideoWriter(output_file)
 
             video_writer.write(mmcv.rgb2bgr(frame_vis))
         
@@ -759,20 +695,17 @@ def main():
         if cv2.waitKey(1) & 0xFF == 27:  # ESC键
             break
 
+    # 关闭生成器，流水线模式下会停止所有阶段线程并打印统计
+    frames.close()
+
     cap.release()
     if video_writer:
-        video_writer.release()
+        video_writer.close()
     cv2.destroyAllWindows()
 
-    if args.save_predictions:
-        with open(os.path.join(args.output_root, 'result.json'), 'w') as f:
-            json.dump(
-                dict(
-                    meta_info=pose_estimator.dataset_meta,
-                    instance_info=pred_instances_list),
-                f,
-                indent='\t')
-        print(f'结果已保存在 {os.path.join(args.output_root, "result.json")}')
+    if session_store is not None:
+        session_store.close(meta=pose_estimator.dataset_meta)
+        print(f'结果已保存在 {session_store.path}')
 
 
 if __name__ == '__main__':